@@ -2,12 +2,22 @@
 import asyncio
 import logging
 from collections.abc import Sequence
-from typing import Annotated, TypedDict
+from typing import Annotated, Any, Optional, TypedDict
 
-from langchain_core.messages import BaseMessage, ToolMessage
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
 from langgraph.graph import END, StateGraph
 from langgraph.prebuilt import ToolExecutor, ToolInvocation
 
+from app.agents.response_cache import (
+    ReadOnlyTool,
+    agent_response_cache,
+    build_response_key,
+    build_tool_key,
+    is_cacheable_tool_result,
+    resolve_cache_scope,
+    tool_result_cache,
+)
+from app.agents.tracing import trace_agent_invocation, trace_llm_call, trace_tool_call
 from app.agents.utils.llm_router import get_llm
 
 # Set up logging
@@ -27,16 +37,20 @@ class BaseAgent:
     allowing leaf agents to be created by simply providing their specific tools and model.
     """
 
-    def __init__(self, tools: list, llm_tier: str = "power"):
+    def __init__(self, tools: list, llm_tier: str = "power", read_only_tools: Optional[dict[str, ReadOnlyTool]] = None):
         """
         Initializes the BaseAgent.
 
         Args:
             tools (list): A list of tools for the agent to use.
             llm_tier (str): The tier of the LLM to use ('fast', 'medium', 'power').
+            read_only_tools (dict, optional): Tool name -> ReadOnlyTool declarations. Runs that only
+                use these tools are cached per school and role; see app.agents.response_cache.
         """
         self.tools = tools
         self.llm_tier = llm_tier
+        self.agent_name = type(self).__name__
+        self.read_only_tools = read_only_tools or {}
         self.tool_executor = ToolExecutor(tools) if tools else None
         self.model = get_llm(llm_tier).bind_tools(tools) if tools else get_llm(llm_tier)
         self.graph = self._build_graph()
@@ -53,14 +67,14 @@ class BaseAgent:
         """Calls the LLM with the current messages."""
         messages = state["messages"]
         try:
-            response = self.model.invoke(messages)
+            with trace_llm_call(self.agent_name, self.model) as llm_trace:
+                response = self.model.invoke(messages)
+                llm_trace.record_response(response)
             logger.debug(f"LLM response: {response}")
             return {"messages": [response]}
         except Exception as e:
             logger.error(f"LLM invocation failed: {e}", exc_info=True)
             # Return an error message that doesn't trigger tool calls
-            from langchain_core.messages import AIMessage
-
             error_response = AIMessage(content=f"I encountered an error: {str(e)}")
             return {"messages": [error_response]}
 
@@ -82,13 +96,24 @@ class BaseAgent:
             logger.info(f"Executing tool: {tool_name} with args: {tool_args}")
 
             try:
-                action = ToolInvocation(tool=tool_name, tool_input=tool_args)
-                result = self._run_coroutine(self.tool_executor.ainvoke(action))
+                with trace_tool_call(self.agent_name, tool_name, tool_args) as tool_trace:
+                    cache_key, cache_scope = self._tool_cache_key(tool_name, tool_args)
+                    result = tool_result_cache.get(cache_key) if cache_key else None
+                    if result is not None:
+                        tool_trace.cache_hit = True
+                        logger.info(f"Tool {tool_name} served from cache")
+                    else:
+                        action = ToolInvocation(tool=tool_name, tool_input=tool_args)
+                        result = self._run_coroutine(self.tool_executor.ainvoke(action))
+
+                        if cache_key and is_cacheable_tool_result(result):
+                            tool_result_cache.set(cache_key, result, school_id=cache_scope.school_id, tables=self.read_only_tools[tool_name].tables)
+                        logger.info(f"Tool {tool_name} executed successfully")
+                    tool_trace.record_result(result)
 
                 # Create a ToolMessage with the result
                 tool_message = ToolMessage(content=str(result), tool_call_id=tool_id, name=tool_name)
                 tool_messages.append(tool_message)
-                logger.info(f"Tool {tool_name} executed successfully")
 
             except Exception as e:
                 logger.error(f"Tool execution failed for {tool_name}: {e}", exc_info=True)
@@ -101,6 +126,51 @@ class BaseAgent:
 
         return {"messages": tool_messages}
 
+    def _tool_cache_key(self, tool_name: str, tool_args: dict) -> tuple[Optional[tuple], Any]:
+        """Returns the tool-result cache key and scope, or (None, None) if the call is not cacheable."""
+        spec = self.read_only_tools.get(tool_name)
+        if spec is None or not spec.deterministic:
+            return None, None
+        scope = resolve_cache_scope()
+        if scope is None:
+            return None, None
+        return build_tool_key(scope, tool_name, tool_args), scope
+
+    def _response_cache_key(self, messages: list) -> tuple[Optional[tuple], Any]:
+        """
+        Returns the response cache key and scope for a fresh single-question conversation.
+        Conversations carrying history are never cached, since the answer depends on it.
+        """
+        if not self.read_only_tools:
+            return None, None
+        human_messages = [message for message in messages if isinstance(message, HumanMessage)]
+        if len(human_messages) != 1 or any(not isinstance(message, (SystemMessage, HumanMessage)) for message in messages):
+            return None, None
+        scope = resolve_cache_scope()
+        if scope is None:
+            return None, None
+        return build_response_key(scope, self.agent_name, human_messages[0].content), scope
+
+    def _cacheable_tables(self, result_messages: Sequence[BaseMessage]) -> Optional[frozenset[str]]:
+        """
+        Returns the tables a finished run depends on, or None if the run must not be cached
+        because it invoked a tool that is not read-only/deterministic or ended in an error.
+        """
+        tables: set[str] = set()
+        for message in result_messages:
+            if isinstance(message, ToolMessage) and str(message.content).startswith("Error executing"):
+                return None
+            for tool_call in getattr(message, "tool_calls", None) or []:
+                spec = self.read_only_tools.get(tool_call.get("name"))
+                if spec is None or not spec.deterministic:
+                    return None
+                tables.update(spec.tables)
+
+        final_message = result_messages[-1] if result_messages else None
+        if not isinstance(final_message, AIMessage) or str(final_message.content).startswith("I encountered an error"):
+            return None
+        return frozenset(tables)
+
     @staticmethod
     def _run_coroutine(coro):
         """Utility to execute a coroutine from synchronous context."""
@@ -137,10 +207,24 @@ class BaseAgent:
             dict: The final state containing all messages
         """
         try:
-            logger.info(f"Invoking agent with {len(messages)} messages")
-            result = self.graph.invoke({"messages": messages})
-            logger.info("Agent invocation completed successfully")
-            return result
+            with trace_agent_invocation(self.agent_name, len(messages)) as invocation_trace:
+                cache_key, cache_scope = self._response_cache_key(messages)
+                if cache_key:
+                    cached_messages = agent_response_cache.get(cache_key)
+                    if cached_messages is not None:
+                        invocation_trace.cache_hit = True
+                        logger.info(f"{self.agent_name} response served from cache")
+                        return {"messages": list(cached_messages)}
+
+                logger.info(f"Invoking agent with {len(messages)} messages")
+                result = self.graph.invoke({"messages": messages})
+                logger.info("Agent invocation completed successfully")
+
+                if cache_key:
+                    tables = self._cacheable_tables(result["messages"])
+                    if tables is not None:
+                        agent_response_cache.set(cache_key, tuple(result["messages"]), school_id=cache_scope.school_id, tables=tables)
+                return result
         except Exception as e:
             logger.error(f"Agent invocation failed: {e}", exc_info=True)
             raise
@@ -0,0 +1,26 @@
+# backend/app/agents/benchmark/__init__.py
+"""
+Offline benchmark harness for the leaf agents.
+
+Agents run with a scripted fake chat model against a seeded SQLite stand-in of
+the school database, so latency and query-count regressions can be measured
+without provider API keys or network access. Run ``python -m app.agents.benchmark``.
+"""
+
+from app.agents.benchmark.fake_llm import ScriptedChatModel, answer_turn, tool_call, tool_turn
+from app.agents.benchmark.harness import AgentBenchmark, RunMetrics, ScenarioResult, StepMetrics, format_report
+from app.agents.benchmark.scenarios import DEFAULT_SCENARIOS, AgentScenario
+
+__all__ = [
+    "DEFAULT_SCENARIOS",
+    "AgentBenchmark",
+    "AgentScenario",
+    "RunMetrics",
+    "ScenarioResult",
+    "ScriptedChatModel",
+    "StepMetrics",
+    "answer_turn",
+    "format_report",
+    "tool_call",
+    "tool_turn",
+]
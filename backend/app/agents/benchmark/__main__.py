@@ -0,0 +1,41 @@
+# backend/app/agents/benchmark/__main__.py
+"""Command line entry point: ``python -m app.agents.benchmark``."""
+
+import argparse
+import json
+import logging
+import sys
+
+from app.agents.benchmark.harness import AgentBenchmark, format_report
+from app.agents.benchmark.scenarios import DEFAULT_SCENARIOS
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the leaf agents offline with a scripted LLM and a SQLite stand-in database.")
+    parser.add_argument("--iterations", type=int, default=5, help="Runs per scenario (default: 5)")
+    parser.add_argument("--students", type=int, default=30, help="Students seeded into class 10A (default: 30)")
+    parser.add_argument("--scenario", action="append", default=[], help="Only run scenarios whose name starts with this prefix (repeatable)")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated latency of every LLM call")
+    parser.add_argument("--json", dest="json_path", help="Also write the full per-step results to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show agent and tool logs")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+
+    scenarios = [scenario for scenario in DEFAULT_SCENARIOS if not args.scenario or any(scenario.name.startswith(prefix) for prefix in args.scenario)]
+    if not scenarios:
+        parser.error("No scenario matched the given --scenario prefixes.")
+
+    with AgentBenchmark(students=args.students, llm_latency_seconds=args.llm_latency_ms / 1000) as benchmark:
+        results = benchmark.run(scenarios, iterations=args.iterations)
+
+    print(format_report(results))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as handle:
+            json.dump([result.as_dict() for result in results], handle, indent=2)
+
+    return 1 if any(not run.success for result in results for run in result.runs) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
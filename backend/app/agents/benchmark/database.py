@@ -0,0 +1,265 @@
+# backend/app/agents/benchmark/database.py
+"""SQLite stand-in for the school database used by the agent benchmark.
+
+The production schema targets PostgreSQL (JSONB columns, ``now()`` server
+defaults, interval check constraints). :func:`sqlite_metadata` builds a copy of
+the ORM metadata that SQLite can create, and :func:`create_standin_engine`
+registers the handful of PostgreSQL functions the services rely on, so the
+agents' tools run their real queries without a database server.
+"""
+
+import datetime
+import uuid
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import JSON, CheckConstraint, DefaultClause, MetaData, event, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+import app.models  # noqa: F401  (registers every model on Base.metadata)
+from app.db.base_class import Base
+from app.models.academic_year import AcademicYear
+from app.models.attendance_record import AttendanceRecord
+from app.models.class_model import Class
+from app.models.exam_type import ExamType
+from app.models.exams import Exam
+from app.models.mark import Mark
+from app.models.period import Period
+from app.models.profile import Profile
+from app.models.role_definition import RoleDefinition
+from app.models.school import School
+from app.models.student import Student
+from app.models.subject import Subject
+from app.models.teacher import Teacher
+from app.models.timetable import Timetable
+from app.models.user_roles import UserRole
+
+_TIMESTAMP_DEFAULTS = ("now()", "current_timestamp")
+_UNSUPPORTED_CHECK_TOKENS = ("INTERVAL", "::")
+
+SUBJECT_NAMES = ("Mathematics", "Science", "English")
+STUDENT_NAMES = (
+    ("Aarav", "Sharma"),
+    ("Diya", "Patel"),
+    ("Vihaan", "Reddy"),
+    ("Ananya", "Iyer"),
+    ("Arjun", "Nair"),
+    ("Saanvi", "Gupta"),
+    ("Kabir", "Mehta"),
+    ("Ishita", "Rao"),
+)
+
+
+def sqlite_metadata() -> MetaData:
+    """Return a copy of ``Base.metadata`` with PostgreSQL-only DDL rewritten for SQLite."""
+    metadata = MetaData()
+    for table in Base.metadata.sorted_tables:
+        copy = table.to_metadata(metadata)
+        for column in copy.columns:
+            if isinstance(column.type, JSONB):
+                column.type = JSON()
+            if column.server_default is not None:
+                default = str(getattr(column.server_default.arg, "text", column.server_default.arg)).lower()
+                if any(token in default for token in _TIMESTAMP_DEFAULTS):
+                    column.server_default = DefaultClause(text("CURRENT_TIMESTAMP"))
+                elif "::" in default or "(" in default:
+                    column.server_default = None
+        for constraint in list(copy.constraints):
+            if isinstance(constraint, CheckConstraint) and any(token in str(constraint.sqltext) for token in _UNSUPPORTED_CHECK_TOKENS):
+                copy.constraints.discard(constraint)
+    return metadata
+
+
+def _register_postgres_functions(dbapi_connection, connection_record) -> None:
+    # SQLite < 3.44 has no concat(); the student search builds full names with it.
+    dbapi_connection.create_function("concat", -1, lambda *parts: "".join("" if part is None else str(part) for part in parts))
+
+
+def create_standin_engine(url: str) -> AsyncEngine:
+    """
+    Create an async SQLite engine for the stand-in database.
+
+    Connections are not pooled: agent tools run on short-lived event loops, and an
+    aiosqlite connection must not outlive the loop that opened it. ``url`` must
+    point at a file (``sqlite+aiosqlite:////tmp/bench.db``); an in-memory
+    database would be discarded with every connection.
+    """
+    engine = create_async_engine(url, poolclass=NullPool)
+    event.listen(engine.sync_engine, "connect", _register_postgres_functions)
+    return engine
+
+
+@dataclass
+class SeededSchool:
+    """Identifiers of the rows created by :func:`seed_school`."""
+
+    school_id: int
+    academic_year_id: int
+    class_id: int
+    class_name: str
+    exam_id: int
+    exam_name: str
+    teacher_user_id: uuid.UUID
+    teacher_id: int
+    admin_user_id: uuid.UUID
+    student_ids: list[int] = field(default_factory=list)
+    student_names: list[str] = field(default_factory=list)
+    subject_ids: dict[str, int] = field(default_factory=dict)
+    attendance_start: Optional[datetime.date] = None
+    attendance_end: Optional[datetime.date] = None
+
+
+async def create_schema(engine: AsyncEngine) -> None:
+    """Create every table of the application schema on ``engine``."""
+    metadata = sqlite_metadata()
+    async with engine.begin() as connection:
+        await connection.run_sync(metadata.create_all)
+
+
+async def seed_school(
+    session: AsyncSession,
+    *,
+    students: int = 30,
+    attendance_days: int = 20,
+    periods_per_day: int = 6,
+    today: Optional[datetime.date] = None,
+) -> SeededSchool:
+    """
+    Seed one school with a class, staff, students, marks, attendance and a timetable.
+
+    The data set is deterministic so benchmark runs are comparable over time.
+    """
+    today = today or datetime.date(2025, 11, 14)
+
+    school = School(name="Benchmark Public School", city="Bengaluru", is_active=True)
+    session.add(school)
+    await session.flush()
+
+    academic_year = AcademicYear(school_id=school.school_id, name="2025-2026", start_date=datetime.date(2025, 6, 1), end_date=datetime.date(2026, 3, 31), is_active=True)
+    session.add(academic_year)
+
+    roles = {name: RoleDefinition(role_name=name) for name in ("Admin", "Teacher", "Student", "Parent")}
+    session.add_all(roles.values())
+    await session.flush()
+
+    def _profile(first_name: str, last_name: str) -> Profile:
+        profile = Profile(user_id=uuid.uuid4(), school_id=school.school_id, first_name=first_name, last_name=last_name, is_active=True)
+        session.add(profile)
+        return profile
+
+    admin = _profile("Asha", "Menon")
+    teacher_profile = _profile("Meera", "Krishnan")
+    await session.flush()
+    session.add_all(
+        [
+            UserRole(user_id=admin.user_id, role_id=roles["Admin"].role_id),
+            UserRole(user_id=teacher_profile.user_id, role_id=roles["Teacher"].role_id),
+        ]
+    )
+    teacher = Teacher(user_id=teacher_profile.user_id, school_id=school.school_id, department="Mathematics", subject_specialization="Mathematics", is_active=True)
+    session.add(teacher)
+    await session.flush()
+
+    class_obj = Class(school_id=school.school_id, grade_level=10, section="A", class_teacher_id=teacher.teacher_id, academic_year_id=academic_year.id, is_active=True)
+    session.add(class_obj)
+
+    subjects = {name: Subject(school_id=school.school_id, name=name, short_code=name[:4].upper(), is_active=True) for name in SUBJECT_NAMES}
+    session.add_all(subjects.values())
+
+    exam_type = ExamType(school_id=school.school_id, type_name="Term")
+    session.add(exam_type)
+    await session.flush()
+
+    exam = Exam(
+        school_id=school.school_id,
+        exam_name="Midterm",
+        exam_type_id=exam_type.exam_type_id,
+        start_date=today - datetime.timedelta(days=30),
+        end_date=today - datetime.timedelta(days=25),
+        marks=Decimal("100"),
+        academic_year_id=academic_year.id,
+        is_active=True,
+    )
+    session.add(exam)
+
+    periods = [
+        Period(school_id=school.school_id, period_number=number, period_name=f"Period {number}", start_time=datetime.time(8 + number, 0), end_time=datetime.time(8 + number, 45), duration_minutes=45, is_active=True)
+        for number in range(1, periods_per_day + 1)
+    ]
+    session.add_all(periods)
+    await session.flush()
+
+    seeded = SeededSchool(
+        school_id=school.school_id,
+        academic_year_id=academic_year.id,
+        class_id=class_obj.class_id,
+        class_name="10A",
+        exam_id=exam.id,
+        exam_name=exam.exam_name,
+        teacher_user_id=teacher_profile.user_id,
+        teacher_id=teacher.teacher_id,
+        admin_user_id=admin.user_id,
+        subject_ids={name: subject.subject_id for name, subject in subjects.items()},
+    )
+
+    student_rows: list[Student] = []
+    for index in range(students):
+        first_name, last_name = STUDENT_NAMES[index % len(STUDENT_NAMES)]
+        if index >= len(STUDENT_NAMES):
+            last_name = f"{last_name}{index // len(STUDENT_NAMES)}"
+        profile = _profile(first_name, last_name)
+        student = Student(user_id=profile.user_id, current_class_id=class_obj.class_id, roll_number=f"{index + 1:02d}", enrollment_date=academic_year.start_date, is_active=True)
+        student_rows.append(student)
+        seeded.student_names.append(f"{first_name} {last_name}")
+    await session.flush()
+    session.add_all(student_rows)
+    await session.flush()
+    seeded.student_ids = [student.student_id for student in student_rows]
+
+    for position, student in enumerate(student_rows):
+        for offset, subject in enumerate(subjects.values()):
+            score = Decimal(40 + (position * 7 + offset * 11) % 60)
+            session.add(Mark(school_id=school.school_id, student_id=student.student_id, exam_id=exam.id, subject_id=subject.subject_id, marks_obtained=score, max_marks=Decimal("100")))
+
+    school_days = [today - datetime.timedelta(days=offset) for offset in range(attendance_days * 2) if (today - datetime.timedelta(days=offset)).weekday() < 5][:attendance_days]
+    seeded.attendance_start, seeded.attendance_end = min(school_days), max(school_days)
+    statuses = ("Present", "Present", "Present", "Late", "Absent")
+    for position, student in enumerate(student_rows):
+        for day_index, day in enumerate(school_days):
+            session.add(
+                AttendanceRecord(
+                    student_id=student.student_id,
+                    class_id=class_obj.class_id,
+                    date=day,
+                    status=statuses[(position + day_index) % len(statuses)],
+                    period_id=periods[0].id,
+                    teacher_id=teacher.teacher_id,
+                )
+            )
+
+    subject_cycle = list(subjects.values())
+    for day_of_week in range(1, 6):
+        for period in periods:
+            subject = subject_cycle[(day_of_week + period.period_number) % len(subject_cycle)]
+            session.add(
+                Timetable(
+                    school_id=school.school_id,
+                    class_id=class_obj.class_id,
+                    subject_id=subject.subject_id,
+                    teacher_id=teacher.teacher_id,
+                    period_id=period.id,
+                    day_of_week=day_of_week,
+                    academic_year_id=academic_year.id,
+                    is_active=True,
+                )
+            )
+
+    await session.commit()
+    return seeded
+
+
+def standin_sessionmaker(engine: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
@@ -0,0 +1,70 @@
+# backend/app/agents/benchmark/fake_llm.py
+"""A chat model that replays a scripted conversation instead of calling a provider."""
+
+import itertools
+import time
+from typing import Any, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic.v1 import PrivateAttr
+
+_tool_call_ids = itertools.count(1)
+
+
+def tool_call(name: str, **args: Any) -> dict[str, Any]:
+    """Build a tool call entry for :func:`tool_turn`."""
+    return {"name": name, "args": args, "id": f"call_{next(_tool_call_ids)}"}
+
+
+def tool_turn(*calls: dict[str, Any]) -> AIMessage:
+    """An assistant turn that requests one or more tool calls."""
+    return AIMessage(content="", tool_calls=list(calls))
+
+
+def answer_turn(content: str) -> AIMessage:
+    """A final assistant turn without tool calls."""
+    return AIMessage(content=content)
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Replays ``script`` one message per call, ignoring the prompt.
+
+    ``bind_tools`` returns the model itself, so it can be dropped into
+    ``BaseAgent`` through ``app.agents.utils.llm_router.use_llm_override``.
+    Once the script is exhausted every call returns ``exhausted_reply`` so a
+    mis-scripted scenario ends instead of looping.
+    """
+
+    script: list[AIMessage]
+    latency_seconds: float = 0.0
+    exhausted_reply: str = "Scripted conversation exhausted."
+    bound_tool_names: list[str] = []
+    _cursor: int = PrivateAttr(default=0)
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-chat-model"
+
+    @property
+    def calls(self) -> int:
+        return self._cursor
+
+    def reset(self) -> None:
+        self._cursor = 0
+
+    def bind_tools(self, tools: list, **kwargs: Any) -> "ScriptedChatModel":
+        self.bound_tool_names = [getattr(tool, "name", str(tool)) for tool in tools]
+        return self
+
+    def _generate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        if self._cursor < len(self.script):
+            message = self.script[self._cursor].copy(deep=True)
+        else:
+            message = AIMessage(content=self.exhausted_reply)
+        self._cursor += 1
+        return ChatResult(generations=[ChatGeneration(message=message)])
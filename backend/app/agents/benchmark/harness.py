@@ -0,0 +1,396 @@
+# backend/app/agents/benchmark/harness.py
+"""Runs leaf agents against the SQLite stand-in with a scripted LLM and records metrics.
+
+For every graph step the harness records wall-clock latency, the number of SQL
+statements executed, the number of HTTP requests the tools made (served
+in-process through ``httpx.ASGITransport``), the tool calls requested or
+executed, and the size of each ``ToolMessage``. Nothing leaves the process, so
+the benchmark runs in CI without network access or provider API keys.
+"""
+
+import ast
+import asyncio
+import importlib
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from collections.abc import Iterable, Sequence
+from dataclasses import asdict, dataclass, field
+from typing import Any, Optional
+
+import httpx
+from fastapi import FastAPI
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.agents.base_agent import BaseAgent
+from app.agents.benchmark.database import SeededSchool, create_schema, create_standin_engine, seed_school, standin_sessionmaker
+from app.agents.benchmark.fake_llm import ScriptedChatModel
+from app.agents.benchmark.scenarios import AGENT_CLASSES, DEFAULT_SCENARIOS, AgentScenario
+from app.agents.response_cache import agent_response_cache, is_cacheable_tool_result, tool_result_cache
+from app.agents.tool_context import ToolRuntimeContext, use_tool_context
+from app.agents.utils.llm_router import use_llm_override
+from app.core.config import settings
+from app.models.profile import Profile
+from app.models.user_roles import UserRole
+from app.services.timetable_occupancy_service import invalidate_occupancy
+
+logger = logging.getLogger(__name__)
+
+API_BASE_URL = f"http://benchmark{settings.API_V1_STR}"
+
+
+@dataclass
+class StepMetrics:
+    """Metrics for one node execution of the agent graph ("llm" or "tools")."""
+
+    node: str
+    latency_ms: float
+    db_queries: int = 0
+    http_requests: int = 0
+    tool_calls: list[str] = field(default_factory=list)
+    tool_message_bytes: list[int] = field(default_factory=list)
+    tool_failures: int = 0
+
+
+@dataclass
+class RunMetrics:
+    """Metrics for one execution of a scenario."""
+
+    latency_ms: float
+    steps: list[StepMetrics]
+    success: bool  # the agent reported success and no tool call failed
+    response: str
+
+    @property
+    def db_queries(self) -> int:
+        return sum(step.db_queries for step in self.steps)
+
+    @property
+    def http_requests(self) -> int:
+        return sum(step.http_requests for step in self.steps)
+
+    @property
+    def llm_calls(self) -> int:
+        return sum(1 for step in self.steps if step.node == "llm")
+
+    @property
+    def tool_calls(self) -> int:
+        return sum(len(step.tool_calls) for step in self.steps if step.node == "tools")
+
+    @property
+    def max_fan_out(self) -> int:
+        return max((len(step.tool_calls) for step in self.steps if step.node == "llm"), default=0)
+
+    @property
+    def tool_message_bytes(self) -> int:
+        return sum(sum(step.tool_message_bytes) for step in self.steps)
+
+    @property
+    def max_tool_message_bytes(self) -> int:
+        return max((size for step in self.steps for size in step.tool_message_bytes), default=0)
+
+    @property
+    def tool_failures(self) -> int:
+        return sum(step.tool_failures for step in self.steps)
+
+
+@dataclass
+class ScenarioResult:
+    """Aggregated metrics of all iterations of one scenario."""
+
+    scenario: str
+    agent: str
+    runs: list[RunMetrics]
+
+    @property
+    def last_run(self) -> RunMetrics:
+        return self.runs[-1]
+
+    @property
+    def latency_p50_ms(self) -> float:
+        return statistics.median(run.latency_ms for run in self.runs)
+
+    @property
+    def latency_max_ms(self) -> float:
+        return max(run.latency_ms for run in self.runs)
+
+    def as_dict(self) -> dict[str, Any]:
+        run = self.last_run
+        return {
+            "scenario": self.scenario,
+            "agent": self.agent,
+            "iterations": len(self.runs),
+            "latency_p50_ms": round(self.latency_p50_ms, 2),
+            "latency_max_ms": round(self.latency_max_ms, 2),
+            "llm_calls": run.llm_calls,
+            "tool_calls": run.tool_calls,
+            "max_fan_out": run.max_fan_out,
+            "db_queries": run.db_queries,
+            "http_requests": run.http_requests,
+            "tool_message_bytes": run.tool_message_bytes,
+            "max_tool_message_bytes": run.max_tool_message_bytes,
+            "tool_failures": run.tool_failures,
+            "success": run.success,
+            "steps": [asdict(step) for step in run.steps],
+        }
+
+
+class _Counters:
+    """Thread-safe query/request counters; tool steps run on LangGraph worker threads."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.db_queries = 0
+        self.http_requests = 0
+
+    def count_query(self, *args: Any) -> None:
+        with self._lock:
+            self.db_queries += 1
+
+    def count_request(self) -> None:
+        with self._lock:
+            self.http_requests += 1
+
+    def snapshot(self) -> tuple[int, int]:
+        with self._lock:
+            return self.db_queries, self.http_requests
+
+
+class _CountingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, inner: httpx.AsyncBaseTransport, counters: _Counters):
+        self._inner = inner
+        self._counters = counters
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self._counters.count_request()
+        return await self._inner.handle_async_request(request)
+
+
+def _tool_message_failed(message: ToolMessage) -> bool:
+    content = str(message.content)
+    if content.startswith("Error executing"):
+        return True
+    try:
+        result = ast.literal_eval(content)
+    except (ValueError, SyntaxError):
+        return False
+    return not is_cacheable_tool_result(result)
+
+
+def _build_api(sessionmaker) -> FastAPI:
+    """The v1 API with its database and Supabase dependencies pointed at the stand-in."""
+    from app.api.v1.api import api_router
+    from app.core.security import get_supabase_client
+    from app.db.session import get_db
+
+    async def _standin_db():
+        async with sessionmaker() as session:
+            yield session
+
+    async def _no_supabase():
+        # Benchmark tokens are signed locally and never reach Supabase.
+        return None
+
+    api = FastAPI()
+    api.include_router(api_router, prefix=settings.API_V1_STR)
+    api.dependency_overrides[get_db] = _standin_db
+    api.dependency_overrides[get_supabase_client] = _no_supabase
+    return api
+
+
+def _load_agent_class(agent: str) -> type[BaseAgent]:
+    module_path, class_name = AGENT_CLASSES[agent].split(":")
+    return getattr(importlib.import_module(module_path), class_name)
+
+
+class AgentBenchmark:
+    """
+    Seeds a stand-in database and runs scripted scenarios against the leaf agents.
+
+    Usage:
+        with AgentBenchmark() as benchmark:
+            results = benchmark.run(iterations=5)
+        print(format_report(results))
+    """
+
+    def __init__(self, database_url: Optional[str] = None, students: int = 30, llm_latency_seconds: float = 0.0):
+        self._tmpdir: Optional[tempfile.TemporaryDirectory] = None
+        if database_url is None:
+            self._tmpdir = tempfile.TemporaryDirectory(prefix="agent-benchmark-")
+            database_url = f"sqlite+aiosqlite:///{os.path.join(self._tmpdir.name, 'benchmark.db')}"
+        self.database_url = database_url
+        self.students = students
+        self.llm_latency_seconds = llm_latency_seconds
+        self.counters = _Counters()
+        self.engine: Optional[AsyncEngine] = None
+        self.seed: Optional[SeededSchool] = None
+        self._sessionmaker = None
+        self._transport: Optional[httpx.AsyncBaseTransport] = None
+
+    def __enter__(self) -> "AgentBenchmark":
+        self.setup()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def setup(self) -> SeededSchool:
+        """Create the schema, seed it and wire the in-process API."""
+        self.engine = create_standin_engine(self.database_url)
+        self._sessionmaker = standin_sessionmaker(self.engine)
+
+        async def _prepare() -> SeededSchool:
+            await create_schema(self.engine)
+            async with self._sessionmaker() as session:
+                return await seed_school(session, students=self.students)
+
+        self.seed = asyncio.run(_prepare())
+        # Count only the queries issued while scenarios run, not the seeding.
+        event.listen(self.engine.sync_engine, "before_cursor_execute", self.counters.count_query)
+        self._transport = _CountingTransport(httpx.ASGITransport(app=_build_api(self._sessionmaker)), self.counters)
+        return self.seed
+
+    def close(self) -> None:
+        if self.engine is not None:
+            asyncio.run(self.engine.dispose())
+            self.engine = None
+        if self._tmpdir is not None:
+            self._tmpdir.cleanup()
+            self._tmpdir = None
+
+    def run(self, scenarios: Iterable[AgentScenario] = DEFAULT_SCENARIOS, iterations: int = 1) -> list[ScenarioResult]:
+        return [self.run_scenario(scenario, iterations=iterations) for scenario in scenarios]
+
+    def run_scenario(self, scenario: AgentScenario, iterations: int = 1) -> ScenarioResult:
+        if self.seed is None:
+            raise RuntimeError("AgentBenchmark.setup() must be called before running scenarios.")
+
+        model = ScriptedChatModel(script=scenario.script(self.seed), latency_seconds=self.llm_latency_seconds)
+        with use_llm_override(lambda tier: model):
+            agent = _load_agent_class(scenario.agent)()
+
+        steps: list[StepMetrics] = []
+        self._instrument(agent, steps)
+
+        runs = []
+        for _ in range(iterations):
+            # Measure the cold path: the response/tool caches would otherwise serve repeats.
+            agent_response_cache.clear()
+            tool_result_cache.clear()
+            invalidate_occupancy()
+            model.reset()
+            steps.clear()
+            runs.append(self._run_once(agent, scenario, steps))
+        return ScenarioResult(scenario=scenario.name, agent=scenario.agent, runs=runs)
+
+    def _run_once(self, agent: BaseAgent, scenario: AgentScenario, steps: list[StepMetrics]) -> RunMetrics:
+        session = self._sessionmaker()
+        try:
+            profile = asyncio.run(self._load_profile(session, scenario.role))
+            context = ToolRuntimeContext(
+                db=session,
+                current_profile=profile,
+                jwt_token=_access_token(profile.user_id),
+                api_base_url=API_BASE_URL,
+                http_transport=self._transport,
+            )
+            start = time.perf_counter()
+            with use_tool_context(context):
+                result = agent.invoke(scenario.query)
+            latency_ms = (time.perf_counter() - start) * 1000
+        finally:
+            asyncio.run(session.close())
+
+        # A run only succeeds if the agent did and none of its tool calls errored.
+        success = bool(result.get("success")) and not any(step.tool_failures for step in steps)
+        return RunMetrics(latency_ms=latency_ms, steps=list(steps), success=success, response=str(result.get("response", "")))
+
+    async def _load_profile(self, session: AsyncSession, role: str) -> Profile:
+        user_id = self.seed.admin_user_id if role == "Admin" else self.seed.teacher_user_id
+        stmt = (
+            select(Profile)
+            .where(Profile.user_id == user_id)
+            .options(
+                selectinload(Profile.roles).selectinload(UserRole.role_definition),
+                selectinload(Profile.teacher),
+                selectinload(Profile.student),
+            )
+        )
+        result = await session.execute(stmt)
+        return result.scalars().one()
+
+    def _instrument(self, agent: BaseAgent, steps: list[StepMetrics]) -> None:
+        """Wrap the graph nodes with timers and rebuild the graph around them."""
+        counters = self.counters
+
+        def _timed(node: str, call):
+            def _wrapper(state):
+                queries_before, requests_before = counters.snapshot()
+                start = time.perf_counter()
+                update = call(state)
+                latency_ms = (time.perf_counter() - start) * 1000
+                queries_after, requests_after = counters.snapshot()
+                messages: Sequence[BaseMessage] = update.get("messages", [])
+                tool_messages = [message for message in messages if isinstance(message, ToolMessage)]
+                if node == "llm":
+                    tool_calls = [call["name"] for message in messages if isinstance(message, AIMessage) for call in message.tool_calls or []]
+                else:
+                    tool_calls = [message.name for message in tool_messages]
+                steps.append(
+                    StepMetrics(
+                        node=node,
+                        latency_ms=latency_ms,
+                        db_queries=queries_after - queries_before,
+                        http_requests=requests_after - requests_before,
+                        tool_calls=tool_calls,
+                        tool_message_bytes=[len(str(message.content).encode("utf-8")) for message in tool_messages],
+                        tool_failures=sum(1 for message in tool_messages if _tool_message_failed(message)),
+                    )
+                )
+                return update
+
+            return _wrapper
+
+        agent._call_model = _timed("llm", agent._call_model)
+        agent._call_tool = _timed("tools", agent._call_tool)
+        agent.graph = agent._build_graph()
+
+
+def _access_token(user_id: uuid.UUID) -> str:
+    from app.core.security import create_access_token
+
+    return create_access_token(str(user_id))
+
+
+def format_report(results: Sequence[ScenarioResult]) -> str:
+    """Render results as a fixed-width table."""
+    header = ("scenario", "p50 ms", "max ms", "llm", "tools", "fan-out", "db q", "http", "tool bytes", "max msg", "failed")
+    rows = [header]
+    for result in results:
+        run = result.last_run
+        rows.append(
+            (
+                result.scenario,
+                f"{result.latency_p50_ms:.1f}",
+                f"{result.latency_max_ms:.1f}",
+                str(run.llm_calls),
+                str(run.tool_calls),
+                str(run.max_fan_out),
+                str(run.db_queries),
+                str(run.http_requests),
+                str(run.tool_message_bytes),
+                str(run.max_tool_message_bytes),
+                str(run.tool_failures),
+            )
+        )
+    widths = [max(len(row[index]) for row in rows) for index in range(len(header))]
+    lines = ["  ".join(cell.ljust(widths[index]) if index == 0 else cell.rjust(widths[index]) for index, cell in enumerate(row)) for row in rows]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
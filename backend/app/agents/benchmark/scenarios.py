@@ -0,0 +1,128 @@
+# backend/app/agents/benchmark/scenarios.py
+"""Scripted conversations for every academics leaf agent.
+
+Each scenario pairs a user query with the assistant turns the fake LLM replays.
+Scripts are built from the seeded data, so tool arguments always point at rows
+that exist in the stand-in database.
+"""
+
+import datetime
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from langchain_core.messages import AIMessage
+
+from app.agents.benchmark.database import SeededSchool
+from app.agents.benchmark.fake_llm import answer_turn, tool_call, tool_turn
+
+# Leaf agent classes, imported lazily so that importing this module never builds an LLM.
+AGENT_CLASSES: dict[str, str] = {
+    "mark": "app.agents.modules.academics.leaves.mark_agent.main:MarkAgent",
+    "attendance": "app.agents.modules.academics.leaves.attendance_agent.main:AttendanceAgent",
+    "class": "app.agents.modules.academics.leaves.class_agent.main:ClassAgent",
+    "exam": "app.agents.modules.academics.leaves.exam_agent.main:ExamAgent",
+    "subject": "app.agents.modules.academics.leaves.subject_agent.main:SubjectAgent",
+    "timetable": "app.agents.modules.academics.leaves.timetable_agent.main:TimetableAgent",
+}
+
+
+@dataclass(frozen=True)
+class AgentScenario:
+    """A single benchmark conversation for one leaf agent."""
+
+    name: str
+    agent: str
+    query: str
+    script: Callable[[SeededSchool], list[AIMessage]]
+    role: str = "Teacher"
+
+
+def _class_performance(seed: SeededSchool) -> list[AIMessage]:
+    return [
+        tool_turn(tool_call("get_class_performance_in_subject", class_name=seed.class_name, subject_name="Mathematics", exam_name=seed.exam_name)),
+        answer_turn("Here is how 10A performed in Mathematics in the Midterm."),
+    ]
+
+
+def _student_marks_fan_out(seed: SeededSchool) -> list[AIMessage]:
+    calls = [tool_call("get_student_marks_for_exam", student_name=name, exam_name=seed.exam_name) for name in seed.student_names[:3]]
+    return [tool_turn(*calls), answer_turn("Here are the Midterm marks for the three students.")]
+
+
+def _marksheet(seed: SeededSchool) -> list[AIMessage]:
+    return [
+        tool_turn(tool_call("get_marksheet_for_exam", student_name=seed.student_names[0], exam_name=seed.exam_name)),
+        answer_turn("Here is the Midterm marksheet."),
+    ]
+
+
+def _attendance_range(seed: SeededSchool) -> list[AIMessage]:
+    return [
+        tool_turn(
+            tool_call(
+                "get_student_attendance_for_date_range",
+                student_id=str(seed.student_ids[0]),
+                start_date=seed.attendance_start.isoformat(),
+                end_date=seed.attendance_end.isoformat(),
+            )
+        ),
+        answer_turn("Here is the attendance for the requested period."),
+    ]
+
+
+def _attendance_sequential(seed: SeededSchool) -> list[AIMessage]:
+    week_start = (seed.attendance_end - datetime.timedelta(days=6)).isoformat()
+    turns = [tool_turn(tool_call("get_student_attendance_for_date_range", student_id=str(student_id), start_date=week_start, end_date=seed.attendance_end.isoformat())) for student_id in seed.student_ids[:3]]
+    return [*turns, answer_turn("Here is last week's attendance for the three students.")]
+
+
+def _attendance_class_roster(seed: SeededSchool) -> list[AIMessage]:
+    next_monday = (seed.attendance_end + datetime.timedelta(days=7 - seed.attendance_end.weekday())).isoformat()
+    entries = [{"student": name, "status": "absent" if index % 4 == 3 else "present"} for index, name in enumerate(seed.student_names)]
+    return [
+        tool_turn(tool_call("mark_class_attendance", class_name=seed.class_name, attendance_date=next_monday, entries=entries)),
+        answer_turn("Attendance for 10A has been recorded."),
+    ]
+
+
+def _class_roster(seed: SeededSchool) -> list[AIMessage]:
+    return [
+        tool_turn(tool_call("get_class_details", class_name=seed.class_name), tool_call("list_students_in_class", class_name=seed.class_name, include_details=True)),
+        answer_turn("Here are the details and roster for 10A."),
+    ]
+
+
+def _exam_schedule(seed: SeededSchool) -> list[AIMessage]:
+    return [
+        tool_turn(tool_call("get_exam_schedule_for_class", class_name=seed.class_name)),
+        answer_turn("Here is the exam schedule for 10A."),
+    ]
+
+
+def _class_subjects(seed: SeededSchool) -> list[AIMessage]:
+    return [
+        tool_turn(tool_call("list_subjects_for_class", class_name=seed.class_name)),
+        tool_turn(tool_call("get_teacher_for_subject", subject_name="Mathematics", class_name=seed.class_name)),
+        answer_turn("10A studies Mathematics, Science and English."),
+    ]
+
+
+def _timetable(seed: SeededSchool) -> list[AIMessage]:
+    return [
+        tool_turn(tool_call("get_class_timetable", class_name=seed.class_name, day_of_week="Monday"), tool_call("find_free_teachers", day_of_week="Tuesday", period_number=3)),
+        answer_turn("Here is Monday's timetable and the teachers free on Tuesday period 3."),
+    ]
+
+
+DEFAULT_SCENARIOS: tuple[AgentScenario, ...] = (
+    AgentScenario("mark.class_performance", "mark", "How did class 10A do in Mathematics in the Midterm?", _class_performance),
+    AgentScenario("mark.student_marks_fan_out", "mark", "Show the Midterm marks for the first three students.", _student_marks_fan_out),
+    AgentScenario("mark.marksheet", "mark", "Get the Midterm marksheet for the first student.", _marksheet),
+    AgentScenario("attendance.date_range", "attendance", "Show attendance for the first student this term.", _attendance_range),
+    AgentScenario("attendance.sequential_lookups", "attendance", "Show last week's attendance for the first three students.", _attendance_sequential),
+    AgentScenario("attendance.class_roster", "attendance", "Mark today's attendance for the whole of 10A.", _attendance_class_roster),
+    AgentScenario("class.roster", "class", "Give me the details and roster of 10A.", _class_roster),
+    AgentScenario("exam.schedule", "exam", "When are the exams for 10A?", _exam_schedule),
+    AgentScenario("subject.class_subjects", "subject", "Which subjects does 10A study and who teaches Mathematics?", _class_subjects),
+    AgentScenario("timetable.day_and_free_teachers", "timetable", "Show 10A's Monday timetable and who is free Tuesday period 3.", _timetable),
+)
@@ -23,6 +23,7 @@ import httpx
 from fastapi import status
 
 from app.agents.tool_context import ToolContextError, get_tool_context
+from app.agents.tracing import record_http_request
 
 logger = logging.getLogger(__name__)
 
@@ -89,9 +90,16 @@ class AgentHTTPClient:
 
     async def __aenter__(self) -> "AgentHTTPClient":
         """Context manager entry - creates the HTTP client."""
+        try:
+            transport = get_tool_context().http_transport
+        except ToolContextError:
+            transport = None
+
         self._client = httpx.AsyncClient(
             timeout=httpx.Timeout(self.timeout),
             follow_redirects=True,
+            transport=transport,
+            event_hooks={"request": [record_http_request]},
         )
         return self
 
@@ -8,6 +8,7 @@ from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from app.agents.base_agent import BaseAgent
 from app.agents.modules.academics.leaves.attendance_agent.prompts import SYSTEM_PROMPT
 from app.agents.modules.academics.leaves.attendance_agent.tools import (
+    attendance_agent_read_only_tools,
     attendance_agent_tools,
 )
 
@@ -39,7 +40,7 @@ class AttendanceAgent(BaseAgent):
                           function calling capabilities. Options: 'fast', 'medium', 'power'
         """
         logger.info("Initializing AttendanceAgent...")
-        super().__init__(tools=attendance_agent_tools, llm_tier=llm_tier)
+        super().__init__(tools=attendance_agent_tools, llm_tier=llm_tier, read_only_tools=attendance_agent_read_only_tools)
         logger.info(f"AttendanceAgent initialized with {len(attendance_agent_tools)} tools and '{llm_tier}' tier LLM")
 
     def invoke(self, query: str, conversation_history: Optional[list] = None) -> dict[str, Any]:
@@ -64,6 +64,71 @@ class MarkStudentAttendanceSchema(BaseModel):
         }
 
 
+class ClassAttendanceEntry(BaseModel):
+    """One row of a class-wide attendance submission."""
+
+    student: str = Field(
+        ...,
+        description="The student's full name, roll number or student ID, e.g., 'Rohan Sharma' or '12'.",
+        min_length=1,
+    )
+    status: str = Field(
+        default="present",
+        description="The attendance status. Valid values: 'present', 'absent', 'late'. Case-insensitive.",
+    )
+    remarks: Optional[str] = Field(default=None, description="Optional: Notes about this student's attendance.")
+
+    @validator("status")
+    def validate_status(cls, v):
+        """Ensure status is one of the allowed values."""
+        allowed_statuses = ["present", "absent", "late"]
+        if v.lower() not in allowed_statuses:
+            raise ValueError(f"Status must be one of: {', '.join(allowed_statuses)}")
+        return v.lower()
+
+
+class MarkClassAttendanceSchema(BaseModel):
+    """Input schema for the mark_class_attendance tool."""
+
+    class_name: str = Field(..., description="The class whose attendance is being marked, e.g., '10A'.", min_length=1)
+    attendance_date: str = Field(
+        ...,
+        description="The date for which attendance is being marked (format: YYYY-MM-DD). Must not be in the future.",
+        min_length=10,
+        max_length=10,
+    )
+    entries: list[ClassAttendanceEntry] = Field(
+        ...,
+        description="One entry per student. Students are matched against the class roster by name, roll number or student ID.",
+        min_items=1,
+        max_items=200,
+    )
+    period_id: Optional[int] = Field(default=None, description="Optional: The period the attendance is for. Omit for daily attendance.")
+
+    @validator("attendance_date")
+    def validate_attendance_date(cls, v):
+        """Ensure attendance_date is in correct format and not in the future."""
+        try:
+            attendance_date_obj = datetime.strptime(v, "%Y-%m-%d").date()
+        except ValueError:
+            raise ValueError("Attendance date must be in YYYY-MM-DD format")
+        if attendance_date_obj > date.today():
+            raise ValueError("Attendance date cannot be in the future")
+        return v
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "class_name": "10A",
+                "attendance_date": "2025-11-02",
+                "entries": [
+                    {"student": "Rohan Sharma", "status": "present"},
+                    {"student": "12", "status": "absent", "remarks": "Sick leave"},
+                ],
+            }
+        }
+
+
 class GetStudentAttendanceForDateRangeSchema(BaseModel):
     """Input schema for the get_student_attendance_for_date_range tool."""
 
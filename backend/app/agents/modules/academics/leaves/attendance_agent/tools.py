@@ -43,11 +43,14 @@ from app.agents.http_client import (
     AgentValidationError,
 )
 from app.agents.modules.academics.leaves.attendance_agent.schemas import (
+    ClassAttendanceEntry,
     GetClassAttendanceForDateSchema,
     GetStudentAttendanceForDateRangeSchema,
     GetStudentAttendanceSummarySchema,
+    MarkClassAttendanceSchema,
     MarkStudentAttendanceSchema,
 )
+from app.agents.response_cache import read_only
 
 logger = logging.getLogger(__name__)
 
@@ -173,6 +176,77 @@ async def mark_student_attendance(
         }
 
 
+@tool("mark_class_attendance", args_schema=MarkClassAttendanceSchema)
+async def mark_class_attendance(
+    class_name: str,
+    attendance_date: str,
+    entries: list[ClassAttendanceEntry],
+    period_id: Optional[int] = None,
+) -> dict[str, Any]:
+    """
+    Mark attendance for many students of one class in a single request via HTTP API.
+
+    Use this instead of repeated mark_student_attendance calls when a teacher gives
+    attendance for a whole class or a list of students. The rows are sent to
+    POST /api/v1/attendance/roster, which matches every student against the class
+    roster in one query and writes all matched rows in a single transaction.
+
+    Args:
+        class_name: Class name (e.g., "10A")
+        attendance_date: Date in YYYY-MM-DD format
+        entries: One row per student (student name/roll number/ID, status, optional remarks)
+        period_id: Optional period for period-wise attendance
+
+    Returns:
+        Counts of recorded and skipped rows plus a per-row result, or error details
+    """
+    payload: dict[str, Any] = {
+        "class_name": class_name,
+        "date": attendance_date,
+        "entries": [
+            {
+                "student": entry.student,
+                "status": entry.status.capitalize(),
+                **({"notes": entry.remarks} if entry.remarks else {}),
+            }
+            for entry in entries
+        ],
+    }
+    if period_id is not None:
+        payload["period_id"] = period_id
+
+    try:
+        logger.info(f"Marking class attendance via API: class={class_name}, date={attendance_date}, rows={len(entries)}")
+        async with AgentHTTPClient() as client:
+            response = await client.post("/attendance/roster", json=payload)
+
+        return {
+            "success": True,
+            "message": f"Recorded attendance for {response['recorded']} of {len(entries)} students in {class_name} on {attendance_date}.",
+            "class_id": response["class_id"],
+            "date": response["date"],
+            "recorded_entries": response["recorded"],
+            "skipped_entries": response["skipped"],
+            "rows": response["rows"],
+        }
+
+    except AgentResourceNotFoundError as e:
+        logger.error(f"Class not found while marking class attendance: {e.message}")
+        return _format_error_response(e)
+
+    except AgentHTTPClientError as e:
+        logger.error(f"HTTP error while marking class attendance: {e.message}")
+        return _format_error_response(e)
+
+    except Exception as e:
+        logger.exception(f"Unexpected error while marking class attendance: {e}")
+        return {
+            "success": False,
+            "error": "An unexpected error occurred while marking class attendance",
+            "detail": str(e),
+        }
+
+
 @tool("get_student_attendance_for_date_range", args_schema=GetStudentAttendanceForDateRangeSchema)
 async def get_student_attendance_for_date_range(
     student_id: str,
@@ -465,14 +539,24 @@ async def get_student_attendance_summary(
 # Export tools for agent registration
 attendance_agent_tools = [
     mark_student_attendance,
+    mark_class_attendance,
     get_student_attendance_for_date_range,
     get_class_attendance_for_date,
     get_student_attendance_summary,
 ]
 
+# Tools that never write, with the tables their results are built from (see app.agents.response_cache)
+attendance_agent_read_only_tools = {
+    "get_student_attendance_for_date_range": read_only("attendance_records", "students"),
+    "get_class_attendance_for_date": read_only("attendance_records", "classes"),
+    "get_student_attendance_summary": read_only("attendance_records", "students"),
+}
+
 __all__ = [
     "attendance_agent_tools",
+    "attendance_agent_read_only_tools",
     "mark_student_attendance",
+    "mark_class_attendance",
     "get_student_attendance_for_date_range",
     "get_class_attendance_for_date",
     "get_student_attendance_summary",
@@ -8,7 +8,10 @@ from langchain_core.messages import HumanMessage, SystemMessage
 
 from app.agents.base_agent import BaseAgent
 from app.agents.modules.academics.leaves.class_agent.prompts import SYSTEM_PROMPT
-from app.agents.modules.academics.leaves.class_agent.tools import class_agent_tools
+from app.agents.modules.academics.leaves.class_agent.tools import (
+    class_agent_read_only_tools,
+    class_agent_tools,
+)
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -38,7 +41,7 @@ class ClassAgent(BaseAgent):
                           function calling capabilities. Options: 'fast', 'medium', 'power'.
         """
         logger.info("Initializing ClassAgent...")
-        super().__init__(tools=class_agent_tools, llm_tier=llm_tier)
+        super().__init__(tools=class_agent_tools, llm_tier=llm_tier, read_only_tools=class_agent_read_only_tools)
         logger.info(f"ClassAgent initialized successfully with {len(self.tools)} tools.")
 
     def invoke(self, query: str) -> dict[str, Any]:
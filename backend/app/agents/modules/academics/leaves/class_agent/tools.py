@@ -17,10 +17,12 @@ from app.agents.modules.academics.leaves.class_agent.schemas import (
     ListAllClassesSchema,
     ListStudentsInClassSchema,
 )
+from app.agents.response_cache import read_only
 from app.agents.tool_context import ToolContextError, get_tool_context
 from app.models.class_model import Class
 from app.models.profile import Profile
 from app.models.student import Student
+from app.models.teacher import Teacher
 from app.models.timetable import Timetable
 
 # Set up logging for tool activity
@@ -123,7 +125,7 @@ async def _resolve_class(
     # Query for the class
     stmt = (
         select(Class)
-        .options(selectinload(Class.class_teacher).selectinload(Profile.roles))
+        .options(selectinload(Class.class_teacher).selectinload(Teacher.profile))
         .where(
             Class.school_id == school_id,
             Class.grade_level == grade_level,
@@ -302,19 +304,15 @@ async def get_class_details(class_name: str) -> dict[str, Any]:
     total_students = student_count_result.scalar() or 0
 
     # Get class teacher details
+    # class_teacher (and its profile) is loaded by _resolve_class
     class_teacher_info = None
-    if class_obj.class_teacher_id:
-        teacher_stmt = select(Profile).where(Profile.profile_id == class_obj.class_teacher_id)
-        teacher_result = await db.execute(teacher_stmt)
-        teacher = teacher_result.scalars().first()
-
-        if teacher:
-            class_teacher_info = {
-                "teacher_id": teacher.profile_id,
-                "teacher_name": f"{teacher.first_name or ''} {teacher.last_name or ''}".strip(),
-                "email": teacher.email,
-                "phone": teacher.phone_number,
-            }
+    teacher = class_obj.class_teacher
+    if teacher and teacher.profile:
+        class_teacher_info = {
+            "teacher_id": teacher.teacher_id,
+            "teacher_name": f"{teacher.profile.first_name or ''} {teacher.profile.last_name or ''}".strip(),
+            "phone": teacher.profile.phone_number,
+        }
 
     # Get subjects taught in this class (from timetable)
     subjects_stmt = select(Timetable.subject_id).where(Timetable.class_id == class_obj.class_id).distinct()
@@ -331,9 +329,7 @@ async def get_class_details(class_name: str) -> dict[str, Any]:
             "section": class_obj.section,
             "class_teacher": class_teacher_info or "Not assigned",
             "total_students": total_students,
-            "max_students": class_obj.max_students,
             "subjects_count": len(subject_ids),
-            "room_number": class_obj.room_number,
             "is_active": class_obj.is_active,
         },
     }
@@ -393,8 +389,7 @@ async def list_students_in_class(class_name: str, include_details: Optional[bool
                     "student_id": student.student_id,
                     "student_name": _student_display_name(student),
                     "roll_number": student.roll_number,
-                    "date_of_birth": student.date_of_birth.isoformat() if student.date_of_birth else None,
-                    "email": student.profile.email if student.profile else None,
+                    "date_of_birth": student.profile.date_of_birth.isoformat() if student.profile and student.profile.date_of_birth else None,
                     "enrollment_date": student.enrollment_date.isoformat() if student.enrollment_date else None,
                 }
             )
@@ -710,9 +705,18 @@ class_agent_tools = [
     list_all_classes,
 ]
 
+# Tools that never write, with the tables their results are built from (see app.agents.response_cache)
+class_agent_read_only_tools = {
+    "get_class_details": read_only("classes", "teachers", "profiles", "students"),
+    "list_students_in_class": read_only("classes", "students", "profiles"),
+    "get_class_schedule": read_only("classes", "timetable", "periods", "subjects", "teachers"),
+    "list_all_classes": read_only("classes", "academic_years", "teachers", "profiles", "students"),
+}
+
 # Export tool names for easy reference
 __all__ = [
     "class_agent_tools",
+    "class_agent_read_only_tools",
     "create_new_class",
     "get_class_details",
     "list_students_in_class",
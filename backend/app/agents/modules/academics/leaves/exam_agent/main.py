@@ -7,7 +7,10 @@ from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 
 from app.agents.base_agent import BaseAgent
 from app.agents.modules.academics.leaves.exam_agent.prompts import SYSTEM_PROMPT
-from app.agents.modules.academics.leaves.exam_agent.tools import exam_agent_tools
+from app.agents.modules.academics.leaves.exam_agent.tools import (
+    exam_agent_read_only_tools,
+    exam_agent_tools,
+)
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -37,7 +40,7 @@ class ExamAgent(BaseAgent):
                           function calling capabilities. Options: 'fast', 'medium', 'power'
         """
         logger.info("Initializing ExamAgent...")
-        super().__init__(tools=exam_agent_tools, llm_tier=llm_tier)
+        super().__init__(tools=exam_agent_tools, llm_tier=llm_tier, read_only_tools=exam_agent_read_only_tools)
         logger.info(f"ExamAgent initialized with {len(exam_agent_tools)} tools and '{llm_tier}' tier LLM")
 
     def invoke(self, query: str, conversation_history: Optional[list] = None) -> dict[str, Any]:
@@ -11,6 +11,7 @@ from app.agents.modules.academics.leaves.exam_agent.schemas import (
     GetUpcomingExamsSchema,
     ScheduleExamSchema,
 )
+from app.agents.response_cache import read_only
 
 # Set up logging for tool activity
 logger = logging.getLogger(__name__)
@@ -352,9 +353,16 @@ exam_agent_tools = [
     define_new_exam_type,
 ]
 
+# Tools that never write, with the tables their results are built from (see app.agents.response_cache)
+exam_agent_read_only_tools = {
+    "get_exam_schedule_for_class": read_only("exams", "exam_types", "classes"),
+    "get_upcoming_exams": read_only("exams", "exam_types", deterministic=False),
+}
+
 # Export tool names for easy reference
 __all__ = [
     "exam_agent_tools",
+    "exam_agent_read_only_tools",
     "schedule_exam",
     "get_exam_schedule_for_class",
     "get_upcoming_exams",
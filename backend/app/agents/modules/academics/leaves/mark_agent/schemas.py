@@ -108,6 +108,73 @@ class RecordStudentMarksSchema(BaseModel):
         }
 
 
+class ClassMarkEntry(BaseModel):
+    """One row of a class-wide mark entry."""
+
+    student: str = Field(
+        ...,
+        description="The student's full name, roll number or student ID, e.g., 'Rohan Sharma' or '12'.",
+        min_length=1,
+    )
+    marks_obtained: float = Field(..., description="The score the student received.", ge=0)
+    max_marks: Optional[float] = Field(
+        default=None,
+        description="Optional: Maximum marks for this row. Defaults to the max_marks of the request.",
+        ge=1,
+    )
+
+
+class RecordClassMarksSchema(BaseModel):
+    """Input schema for the record_class_marks tool."""
+
+    class_name: str = Field(
+        ...,
+        description="The class whose marks are being recorded, e.g., '10A'.",
+        min_length=1,
+    )
+    exam_name: str = Field(
+        ...,
+        description="The name of the exam, e.g., 'Midterm'.",
+        min_length=2,
+    )
+    subject_name: str = Field(
+        ...,
+        description="The subject the marks are for, e.g., 'Mathematics'.",
+        min_length=1,
+    )
+    max_marks: float = Field(default=100.0, description="The maximum possible marks. Defaults to 100.", ge=1)
+    entries: list[ClassMarkEntry] = Field(
+        ...,
+        description="One entry per student. Students are matched against the class roster by name, roll number or student ID.",
+        min_items=1,
+        max_items=200,
+    )
+
+    @validator("entries")
+    def validate_entries_within_max_marks(cls, entries, values):
+        """Ensure no row exceeds its maximum marks."""
+        default_max = values.get("max_marks", 100.0)
+        for entry in entries:
+            max_marks = entry.max_marks if entry.max_marks is not None else default_max
+            if entry.marks_obtained > max_marks:
+                raise ValueError(f"Marks obtained ({entry.marks_obtained}) for '{entry.student}' cannot exceed max marks ({max_marks})")
+        return entries
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "class_name": "10A",
+                "exam_name": "Midterm",
+                "subject_name": "Mathematics",
+                "max_marks": 100,
+                "entries": [
+                    {"student": "Rohan Sharma", "marks_obtained": 78},
+                    {"student": "12", "marks_obtained": 91},
+                ],
+            }
+        }
+
+
 class UpdateStudentMarksSchema(BaseModel):
     """Input schema for the update_student_marks tool."""
 
@@ -14,13 +14,16 @@ from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 
 from app.agents.modules.academics.leaves.mark_agent.schemas import (
+    ClassMarkEntry,
     GetClassPerformanceSchema,
     GetMarksheetSchema,
     GetStudentMarksSchema,
     MarkInput,
+    RecordClassMarksSchema,
     RecordStudentMarksSchema,
     UpdateStudentMarksSchema,
 )
+from app.agents.response_cache import read_only
 from app.agents.tool_context import ToolContextError, get_tool_context
 from app.models.class_model import Class
 from app.models.exams import Exam
@@ -723,6 +726,138 @@ async def record_student_marks(
     }
 
 
+@tool("record_class_marks", args_schema=RecordClassMarksSchema)
+async def record_class_marks(
+    class_name: str,
+    exam_name: str,
+    subject_name: str,
+    entries: list[ClassMarkEntry],
+    max_marks: float = 100.0,
+) -> dict[str, Any]:
+    """
+    Records marks in one subject for many students of a class at once.
+    Use this tool instead of repeated record_student_marks calls when a teacher enters marks for a whole class or a list of students.
+    Students are matched against the class roster by name, roll number or student ID; rows that cannot be matched are reported and skipped.
+
+    Args:
+        class_name: Name of the class, e.g. '10A'
+        exam_name: Name of the exam
+        subject_name: Subject the marks are for
+        entries: One row per student (student, marks_obtained, optional max_marks)
+        max_marks: Maximum marks for rows that do not specify their own
+
+    Returns:
+        Dictionary with the number of recorded rows and a per-row result
+    """
+    db, current_profile, context_error = _get_runtime_dependencies()
+    if context_error:
+        logger.warning("Tool context unavailable for record_class_marks")
+        return context_error
+
+    logger.info(
+        "[TOOL:record_class_marks] User: '%s', Class: '%s', Exam: '%s', Subject: '%s', Rows: %d",
+        current_profile.user_id,
+        class_name,
+        exam_name,
+        subject_name,
+        len(entries),
+    )
+
+    role_names = {role.role_definition.role_name for role in current_profile.roles if getattr(role, "role_definition", None) and getattr(role.role_definition, "role_name", None)}
+    if not {"Admin", "Teacher"} & role_names:
+        return {
+            "status": "forbidden",
+            "message": "Only teachers and administrators can record marks.",
+        }
+
+    class_obj, class_error = await _resolve_class(db, current_profile.school_id, class_name)
+    if class_error:
+        return class_error
+
+    exam, exam_error = await _resolve_exam(db, current_profile.school_id, exam_name)
+    if exam_error:
+        return exam_error
+
+    subject, subject_error = await _resolve_subject(db, current_profile.school_id, subject_name)
+    if subject_error:
+        return subject_error
+
+    matches = await student_service.match_class_roster(db, class_id=class_obj.class_id, lookups=[entry.student for entry in entries])
+    matched_ids = {match.student.student_id for match in matches if match.student is not None}
+
+    existing_ids: set[int] = set()
+    if matched_ids:
+        existing_result = await db.execute(
+            select(Mark.student_id).where(
+                Mark.exam_id == exam.id,
+                Mark.subject_id == subject.subject_id,
+                Mark.student_id.in_(matched_ids),
+            )
+        )
+        existing_ids = set(existing_result.scalars().all())
+
+    rows: list[dict[str, Any]] = []
+    payloads: list[MarkCreate] = []
+    pending_rows: list[dict[str, Any]] = []
+    seen_ids: set[int] = set()
+
+    for index, (entry, match) in enumerate(zip(entries, matches), start=1):
+        row: dict[str, Any] = {"row": index, "student": entry.student}
+        rows.append(row)
+
+        if match.student is None:
+            row["result"] = match.status
+            if match.candidates:
+                row["candidates"] = [{"student_id": candidate.student_id, "student_name": _student_display_name(candidate), "roll_number": candidate.roll_number} for candidate in match.candidates]
+            continue
+
+        student = match.student
+        row.update(student_id=student.student_id, student_name=_student_display_name(student))
+        if student.student_id in seen_ids:
+            row["result"] = "duplicate_row"
+            continue
+        seen_ids.add(student.student_id)
+        if student.student_id in existing_ids:
+            row["result"] = "already_recorded"
+            continue
+
+        row_max_marks = float(entry.max_marks if entry.max_marks is not None else max_marks)
+        payloads.append(
+            MarkCreate(
+                school_id=current_profile.school_id,
+                student_id=student.student_id,
+                exam_id=exam.id,
+                subject_id=subject.subject_id,
+                marks_obtained=float(entry.marks_obtained),
+                max_marks=row_max_marks,
+            )
+        )
+        pending_rows.append(row)
+
+    created_marks = await mark_service.bulk_create_marks(db, marks_in=payloads) if payloads else []
+    mark_by_student = {mark.student_id: mark for mark in created_marks}
+    for row in pending_rows:
+        mark = mark_by_student.get(row["student_id"])
+        row.update(
+            result="recorded",
+            mark_id=mark.id if mark else None,
+            marks_obtained=_to_float(mark.marks_obtained) if mark else None,
+            max_marks=_to_float(mark.max_marks) if mark else None,
+        )
+
+    skipped = len(rows) - len(pending_rows)
+    return {
+        "status": "success" if not skipped else ("partial_success" if pending_rows else "no_changes"),
+        "message": f"Recorded {len(pending_rows)} of {len(rows)} {subject.name} marks for {_format_class_name(class_obj) or class_name} in {exam.exam_name}.",
+        "class_id": class_obj.class_id,
+        "exam_id": exam.id,
+        "subject_id": subject.subject_id,
+        "recorded_entries": len(pending_rows),
+        "skipped_entries": skipped,
+        "rows": rows,
+    }
+
+
 @tool("update_student_marks", args_schema=UpdateStudentMarksSchema)
 async def update_student_marks(
     student_name: str,
@@ -1153,16 +1288,26 @@ async def get_class_performance_in_subject(
 mark_agent_tools = [
     get_student_marks_for_exam,
     record_student_marks,
+    record_class_marks,
     update_student_marks,
     get_marksheet_for_exam,
     get_class_performance_in_subject,
 ]
 
+# Tools that never write, with the tables their results are built from (see app.agents.response_cache)
+mark_agent_read_only_tools = {
+    "get_student_marks_for_exam": read_only("marks", "exams", "subjects", "students", "profiles", "student_contacts"),
+    "get_marksheet_for_exam": read_only("marks", "exams", "subjects", "students", "profiles", "student_contacts", "classes"),
+    "get_class_performance_in_subject": read_only("marks", "exams", "subjects", "students", "profiles", "classes"),
+}
+
 # Export tool names for easy reference
 __all__ = [
     "mark_agent_tools",
+    "mark_agent_read_only_tools",
     "get_student_marks_for_exam",
     "record_student_marks",
+    "record_class_marks",
     "update_student_marks",
     "get_marksheet_for_exam",
     "get_class_performance_in_subject",
@@ -7,7 +7,10 @@ from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 
 from app.agents.base_agent import BaseAgent
 from app.agents.modules.academics.leaves.subject_agent.prompts import SYSTEM_PROMPT
-from app.agents.modules.academics.leaves.subject_agent.tools import subject_agent_tools
+from app.agents.modules.academics.leaves.subject_agent.tools import (
+    subject_agent_read_only_tools,
+    subject_agent_tools,
+)
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -38,7 +41,7 @@ class SubjectAgent(BaseAgent):
                           function calling capabilities. Options: 'fast', 'medium', 'power'
         """
         logger.info("Initializing SubjectAgent...")
-        super().__init__(tools=subject_agent_tools, llm_tier=llm_tier)
+        super().__init__(tools=subject_agent_tools, llm_tier=llm_tier, read_only_tools=subject_agent_read_only_tools)
         logger.info(f"SubjectAgent initialized with {len(subject_agent_tools)} tools and '{llm_tier}' tier LLM")
 
     def invoke(self, query: str, conversation_history: Optional[list] = None) -> dict[str, Any]:
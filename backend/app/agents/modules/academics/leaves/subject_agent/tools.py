@@ -12,6 +12,7 @@ from app.agents.modules.academics.leaves.subject_agent.schemas import (
     ListAcademicStreamsSchema,
     ListSubjectsForClassSchema,
 )
+from app.agents.response_cache import read_only
 
 # Set up logging for tool activity
 logger = logging.getLogger(__name__)
@@ -398,9 +399,17 @@ subject_agent_tools = [
     assign_teacher_to_subject,
 ]
 
+# Tools that never write, with the tables their results are built from (see app.agents.response_cache)
+subject_agent_read_only_tools = {
+    "list_subjects_for_class": read_only("subjects", "classes", "streams"),
+    "get_teacher_for_subject": read_only("subjects", "teacher_subjects", "teachers", "profiles"),
+    "list_academic_streams": read_only("streams"),
+}
+
 # Export tool names for easy reference
 __all__ = [
     "subject_agent_tools",
+    "subject_agent_read_only_tools",
     "list_subjects_for_class",
     "get_teacher_for_subject",
     "assign_subject_to_class",
@@ -7,6 +7,7 @@ from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 
 from app.agents.base_agent import BaseAgent
 from app.agents.modules.academics.leaves.timetable_agent.tools import (
+    timetable_agent_read_only_tools,
     timetable_agent_tools,
 )
 
@@ -38,7 +39,7 @@ class TimetableAgent(BaseAgent):
                           function calling capabilities. Options: 'fast', 'medium', 'power'
         """
         logger.info("Initializing TimetableAgent...")
-        super().__init__(tools=timetable_agent_tools, llm_tier=llm_tier)
+        super().__init__(tools=timetable_agent_tools, llm_tier=llm_tier, read_only_tools=timetable_agent_read_only_tools)
         logger.info("TimetableAgent initialized successfully.")
 
     def invoke(self, query: str) -> dict[str, Any]:
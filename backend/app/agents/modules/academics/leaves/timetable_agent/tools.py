@@ -5,6 +5,7 @@ from datetime import datetime
 from typing import Any, Optional
 
 from langchain_core.tools import tool
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.agents.modules.academics.leaves.timetable_agent.schemas import (
     CreateOrUpdateTimetableEntrySchema,
@@ -13,6 +14,11 @@ from app.agents.modules.academics.leaves.timetable_agent.schemas import (
     GetClassTimetableSchema,
     GetTeacherTimetableSchema,
 )
+from app.agents.response_cache import read_only
+from app.agents.tool_context import ToolContextError, get_tool_context
+from app.models.profile import Profile
+from app.services import timetable_occupancy_service
+from app.services.timetable_occupancy_service import DAY_NAMES, TimetableOccupancy, TimetableSlot, day_number
 
 # Set up logging for tool activity
 logger = logging.getLogger(__name__)
@@ -21,8 +27,84 @@ logger = logging.getLogger(__name__)
 BASE_URL = "http://localhost:8000/api/v1"
 
 
+def _get_runtime_dependencies() -> tuple[Optional[AsyncSession], Optional[Profile], Optional[dict[str, Any]]]:
+    """Fetch the per-request dependencies that tools require."""
+
+    try:
+        context = get_tool_context()
+    except ToolContextError:
+        return (
+            None,
+            None,
+            {
+                "status": "context_unavailable",
+                "message": "Runtime context missing. Authenticate and retry your request.",
+            },
+        )
+
+    if context.db is None or context.current_profile is None:
+        return (
+            None,
+            None,
+            {
+                "status": "context_unavailable",
+                "message": "Database session or profile unavailable for this request.",
+            },
+        )
+
+    return context.db, context.current_profile, None
+
+
+def _parse_day(day_of_week: Optional[str]) -> tuple[Optional[int], Optional[dict[str, Any]]]:
+    if not day_of_week:
+        return None, None
+    day = day_number(day_of_week)
+    if day is None:
+        return None, {
+            "status": "error",
+            "error": f"Invalid day: {day_of_week}. Please use Monday-Sunday.",
+        }
+    return day, None
+
+
+def _format_time(value) -> Optional[str]:
+    return value.strftime("%H:%M") if value else None
+
+
+def _teacher_name(occupancy: TimetableOccupancy, teacher_id: Optional[int]) -> Optional[str]:
+    teacher = occupancy.teachers.get(teacher_id) if teacher_id is not None else None
+    return teacher.name if teacher else None
+
+
+def _class_period(occupancy: TimetableOccupancy, slot: TimetableSlot) -> dict[str, Any]:
+    return {
+        "period": slot.period_number,
+        "start_time": _format_time(slot.start_time),
+        "end_time": _format_time(slot.end_time),
+        "subject": occupancy.subjects.get(slot.subject_id),
+        "teacher": _teacher_name(occupancy, slot.teacher_id),
+    }
+
+
+def _teacher_period(occupancy: TimetableOccupancy, slot: TimetableSlot) -> dict[str, Any]:
+    return {
+        "period": slot.period_number,
+        "start_time": _format_time(slot.start_time),
+        "end_time": _format_time(slot.end_time),
+        "class": occupancy.classes.get(slot.class_id),
+        "subject": occupancy.subjects.get(slot.subject_id),
+    }
+
+
+def _group_by_day(slots: list[TimetableSlot], formatter, occupancy: TimetableOccupancy) -> dict[str, list[dict[str, Any]]]:
+    week: dict[str, list[dict[str, Any]]] = {}
+    for slot in slots:
+        week.setdefault(DAY_NAMES[slot.day_of_week - 1], []).append(formatter(occupancy, slot))
+    return week
+
+
 @tool("get_class_timetable", args_schema=GetClassTimetableSchema)
-def get_class_timetable(class_name: str, day_of_week: Optional[str] = None) -> dict[str, Any]:
+async def get_class_timetable(class_name: str, day_of_week: Optional[str] = None) -> dict[str, Any]:
     """
     Retrieves the full weekly timetable for a specified class, showing all periods and subjects.
     Use this tool when a user asks for a class schedule, class timetable, or what subjects a class has on specific days.
@@ -34,309 +116,46 @@ def get_class_timetable(class_name: str, day_of_week: Optional[str] = None) -> d
     Returns:
         Dictionary containing the timetable data or error information
     """
+    db, current_profile, context_error = _get_runtime_dependencies()
+    if context_error:
+        logger.warning("Tool context unavailable for get_class_timetable")
+        return context_error
+
     logger.info(f"[TOOL:get_class_timetable] Class: '{class_name}', Day: {day_of_week or 'Full Week'}")
 
-    # Real implementation would be:
-    # try:
-    #     params = {}
-    #     if day_of_week:
-    #         params["day_of_week"] = day_of_week
-    #
-    #     response = requests.get(
-    #         f"{BASE_URL}/timetable/class/{class_name}",
-    #         params=params,
-    #         timeout=10
-    #     )
-    #     response.raise_for_status()
-    #     return response.json()
-    # except requests.Timeout:
-    #     logger.error("API request timed out")
-    #     return {"error": "Request timed out. Please try again."}
-    # except requests.RequestException as e:
-    #     logger.error(f"API call failed: {e}")
-    #     return {"error": f"Failed to fetch class timetable: {str(e)}"}
+    day, day_error = _parse_day(day_of_week)
+    if day_error:
+        return day_error
 
-    # Placeholder timetable data for development/testing
-    full_week_schedule = {
-        "Monday": [
-            {
-                "period": 1,
-                "start_time": "08:00",
-                "end_time": "08:45",
-                "subject": "Mathematics",
-                "teacher": "Mrs. Sharma",
-                "room": "101",
-            },
-            {
-                "period": 2,
-                "start_time": "08:50",
-                "end_time": "09:35",
-                "subject": "Physics",
-                "teacher": "Mr. Kumar",
-                "room": "Lab-1",
-            },
-            {
-                "period": 3,
-                "start_time": "09:40",
-                "end_time": "10:25",
-                "subject": "Chemistry",
-                "teacher": "Dr. Patel",
-                "room": "Lab-2",
-            },
-            {
-                "period": 4,
-                "start_time": "10:45",
-                "end_time": "11:30",
-                "subject": "English",
-                "teacher": "Ms. Reddy",
-                "room": "102",
-            },
-            {
-                "period": 5,
-                "start_time": "11:35",
-                "end_time": "12:20",
-                "subject": "Biology",
-                "teacher": "Dr. Singh",
-                "room": "Lab-3",
-            },
-            {
-                "period": 6,
-                "start_time": "13:00",
-                "end_time": "13:45",
-                "subject": "Physical Education",
-                "teacher": "Mr. Mehta",
-                "room": "Playground",
-            },
-        ],
-        "Tuesday": [
-            {
-                "period": 1,
-                "start_time": "08:00",
-                "end_time": "08:45",
-                "subject": "Chemistry",
-                "teacher": "Dr. Patel",
-                "room": "Lab-2",
-            },
-            {
-                "period": 2,
-                "start_time": "08:50",
-                "end_time": "09:35",
-                "subject": "Mathematics",
-                "teacher": "Mrs. Sharma",
-                "room": "101",
-            },
-            {
-                "period": 3,
-                "start_time": "09:40",
-                "end_time": "10:25",
-                "subject": "English",
-                "teacher": "Ms. Reddy",
-                "room": "102",
-            },
-            {
-                "period": 4,
-                "start_time": "10:45",
-                "end_time": "11:30",
-                "subject": "Physics",
-                "teacher": "Mr. Kumar",
-                "room": "Lab-1",
-            },
-            {
-                "period": 5,
-                "start_time": "11:35",
-                "end_time": "12:20",
-                "subject": "Computer Science",
-                "teacher": "Mr. Gupta",
-                "room": "Computer Lab",
-            },
-            {
-                "period": 6,
-                "start_time": "13:00",
-                "end_time": "13:45",
-                "subject": "Social Studies",
-                "teacher": "Mrs. Nair",
-                "room": "103",
-            },
-        ],
-        "Wednesday": [
-            {
-                "period": 1,
-                "start_time": "08:00",
-                "end_time": "08:45",
-                "subject": "Biology",
-                "teacher": "Dr. Singh",
-                "room": "Lab-3",
-            },
-            {
-                "period": 2,
-                "start_time": "08:50",
-                "end_time": "09:35",
-                "subject": "English",
-                "teacher": "Ms. Reddy",
-                "room": "102",
-            },
-            {
-                "period": 3,
-                "start_time": "09:40",
-                "end_time": "10:25",
-                "subject": "Mathematics",
-                "teacher": "Mrs. Sharma",
-                "room": "101",
-            },
-            {
-                "period": 4,
-                "start_time": "10:45",
-                "end_time": "11:30",
-                "subject": "Physics",
-                "teacher": "Mr. Kumar",
-                "room": "Lab-1",
-            },
-            {
-                "period": 5,
-                "start_time": "11:35",
-                "end_time": "12:20",
-                "subject": "Chemistry",
-                "teacher": "Dr. Patel",
-                "room": "Lab-2",
-            },
-            {
-                "period": 6,
-                "start_time": "13:00",
-                "end_time": "13:45",
-                "subject": "Art",
-                "teacher": "Mrs. Joshi",
-                "room": "Art Room",
-            },
-        ],
-        "Thursday": [
-            {
-                "period": 1,
-                "start_time": "08:00",
-                "end_time": "08:45",
-                "subject": "Mathematics",
-                "teacher": "Mrs. Sharma",
-                "room": "101",
-            },
-            {
-                "period": 2,
-                "start_time": "08:50",
-                "end_time": "09:35",
-                "subject": "Social Studies",
-                "teacher": "Mrs. Nair",
-                "room": "103",
-            },
-            {
-                "period": 3,
-                "start_time": "09:40",
-                "end_time": "10:25",
-                "subject": "Computer Science",
-                "teacher": "Mr. Gupta",
-                "room": "Computer Lab",
-            },
-            {
-                "period": 4,
-                "start_time": "10:45",
-                "end_time": "11:30",
-                "subject": "English",
-                "teacher": "Ms. Reddy",
-                "room": "102",
-            },
-            {
-                "period": 5,
-                "start_time": "11:35",
-                "end_time": "12:20",
-                "subject": "Physics",
-                "teacher": "Mr. Kumar",
-                "room": "Lab-1",
-            },
-            {
-                "period": 6,
-                "start_time": "13:00",
-                "end_time": "13:45",
-                "subject": "Chemistry",
-                "teacher": "Dr. Patel",
-                "room": "Lab-2",
-            },
-        ],
-        "Friday": [
-            {
-                "period": 1,
-                "start_time": "08:00",
-                "end_time": "08:45",
-                "subject": "English",
-                "teacher": "Ms. Reddy",
-                "room": "102",
-            },
-            {
-                "period": 2,
-                "start_time": "08:50",
-                "end_time": "09:35",
-                "subject": "Biology",
-                "teacher": "Dr. Singh",
-                "room": "Lab-3",
-            },
-            {
-                "period": 3,
-                "start_time": "09:40",
-                "end_time": "10:25",
-                "subject": "Mathematics",
-                "teacher": "Mrs. Sharma",
-                "room": "101",
-            },
-            {
-                "period": 4,
-                "start_time": "10:45",
-                "end_time": "11:30",
-                "subject": "Social Studies",
-                "teacher": "Mrs. Nair",
-                "room": "103",
-            },
-            {
-                "period": 5,
-                "start_time": "11:35",
-                "end_time": "12:20",
-                "subject": "Physical Education",
-                "teacher": "Mr. Mehta",
-                "room": "Playground",
-            },
-            {
-                "period": 6,
-                "start_time": "13:00",
-                "end_time": "13:45",
-                "subject": "Library Period",
-                "teacher": "Mrs. Desai",
-                "room": "Library",
-            },
-        ],
-    }
+    occupancy = await timetable_occupancy_service.get_occupancy(db, current_profile.school_id)
+    class_id = occupancy.find_class_id(class_name)
+    if class_id is None:
+        return {
+            "status": "not_found",
+            "message": f"No active class named '{class_name}' exists in your school.",
+        }
 
-    # If a specific day is requested, filter the schedule
-    if day_of_week:
-        day_schedule = full_week_schedule.get(day_of_week.capitalize())
-        if not day_schedule:
-            return {
-                "status": "error",
-                "error": f"Invalid day: {day_of_week}. Please use Monday-Friday.",
-            }
+    if day:
+        day_schedule = [_class_period(occupancy, slot) for slot in occupancy.class_schedule(class_id, day)]
         return {
             "status": "success",
-            "class_name": class_name,
-            "day_of_week": day_of_week.capitalize(),
+            "class_name": occupancy.classes[class_id],
+            "day_of_week": DAY_NAMES[day - 1],
             "schedule": day_schedule,
             "total_periods": len(day_schedule),
         }
 
-    # Return full week schedule
+    week_schedule = _group_by_day(occupancy.class_schedule(class_id), _class_period, occupancy)
     return {
         "status": "success",
-        "class_name": class_name,
-        "week_schedule": full_week_schedule,
-        "total_days": len(full_week_schedule),
+        "class_name": occupancy.classes[class_id],
+        "week_schedule": week_schedule,
+        "total_days": len(week_schedule),
     }
 
 
 @tool("get_teacher_timetable", args_schema=GetTeacherTimetableSchema)
-def get_teacher_timetable(teacher_name: str, day_of_week: Optional[str] = None) -> dict[str, Any]:
+async def get_teacher_timetable(teacher_name: str, day_of_week: Optional[str] = None) -> dict[str, Any]:
     """
     Fetches the weekly teaching schedule for a specific teacher, including classes and subjects.
     Use this tool when a user asks about a teacher's schedule, which classes they teach, or their availability.
@@ -348,193 +167,58 @@ def get_teacher_timetable(teacher_name: str, day_of_week: Optional[str] = None)
     Returns:
         Dictionary containing the teacher's timetable data or error information
     """
+    db, current_profile, context_error = _get_runtime_dependencies()
+    if context_error:
+        logger.warning("Tool context unavailable for get_teacher_timetable")
+        return context_error
+
     logger.info(f"[TOOL:get_teacher_timetable] Teacher: '{teacher_name}', Day: {day_of_week or 'Full Week'}")
 
-    # Real implementation would be:
-    # try:
-    #     params = {}
-    #     if day_of_week:
-    #         params["day_of_week"] = day_of_week
-    #
-    #     response = requests.get(
-    #         f"{BASE_URL}/timetable/teacher/{teacher_name}",
-    #         params=params,
-    #         timeout=10
-    #     )
-    #     response.raise_for_status()
-    #     return response.json()
-    # except requests.Timeout:
-    #     logger.error("API request timed out")
-    #     return {"error": "Request timed out. Please try again."}
-    # except requests.RequestException as e:
-    #     logger.error(f"API call failed: {e}")
-    #     return {"error": f"Failed to fetch teacher timetable: {str(e)}"}
+    day, day_error = _parse_day(day_of_week)
+    if day_error:
+        return day_error
 
-    # Placeholder teacher schedule for development/testing
-    # Simulating Mrs. Sharma's Mathematics teaching schedule
-    teacher_week_schedule = {
-        "Monday": [
-            {
-                "period": 1,
-                "start_time": "08:00",
-                "end_time": "08:45",
-                "class": "10A",
-                "subject": "Mathematics",
-                "room": "101",
-            },
-            {
-                "period": 3,
-                "start_time": "09:40",
-                "end_time": "10:25",
-                "class": "9B",
-                "subject": "Mathematics",
-                "room": "105",
-            },
-            {
-                "period": 5,
-                "start_time": "11:35",
-                "end_time": "12:20",
-                "class": "11A",
-                "subject": "Mathematics",
-                "room": "201",
-            },
-        ],
-        "Tuesday": [
-            {
-                "period": 2,
-                "start_time": "08:50",
-                "end_time": "09:35",
-                "class": "10A",
-                "subject": "Mathematics",
-                "room": "101",
-            },
-            {
-                "period": 4,
-                "start_time": "10:45",
-                "end_time": "11:30",
-                "class": "12A",
-                "subject": "Mathematics",
-                "room": "202",
-            },
-            {
-                "period": 6,
-                "start_time": "13:00",
-                "end_time": "13:45",
-                "class": "9A",
-                "subject": "Mathematics",
-                "room": "104",
-            },
-        ],
-        "Wednesday": [
-            {
-                "period": 3,
-                "start_time": "09:40",
-                "end_time": "10:25",
-                "class": "10A",
-                "subject": "Mathematics",
-                "room": "101",
-            },
-            {
-                "period": 1,
-                "start_time": "08:00",
-                "end_time": "08:45",
-                "class": "11A",
-                "subject": "Mathematics",
-                "room": "201",
-            },
-            {
-                "period": 5,
-                "start_time": "11:35",
-                "end_time": "12:20",
-                "class": "9B",
-                "subject": "Mathematics",
-                "room": "105",
-            },
-        ],
-        "Thursday": [
-            {
-                "period": 1,
-                "start_time": "08:00",
-                "end_time": "08:45",
-                "class": "10A",
-                "subject": "Mathematics",
-                "room": "101",
-            },
-            {
-                "period": 4,
-                "start_time": "10:45",
-                "end_time": "11:30",
-                "class": "9A",
-                "subject": "Mathematics",
-                "room": "104",
-            },
-            {
-                "period": 6,
-                "start_time": "13:00",
-                "end_time": "13:45",
-                "class": "12A",
-                "subject": "Mathematics",
-                "room": "202",
-            },
-        ],
-        "Friday": [
-            {
-                "period": 3,
-                "start_time": "09:40",
-                "end_time": "10:25",
-                "class": "10A",
-                "subject": "Mathematics",
-                "room": "101",
-            },
-            {
-                "period": 2,
-                "start_time": "08:50",
-                "end_time": "09:35",
-                "class": "11A",
-                "subject": "Mathematics",
-                "room": "201",
-            },
-            {
-                "period": 5,
-                "start_time": "11:35",
-                "end_time": "12:20",
-                "class": "9B",
-                "subject": "Mathematics",
-                "room": "105",
-            },
-        ],
-    }
+    occupancy = await timetable_occupancy_service.get_occupancy(db, current_profile.school_id)
+    matches = occupancy.find_teachers(teacher_name)
+    if not matches:
+        return {
+            "status": "not_found",
+            "message": f"No active teacher named '{teacher_name}' exists in your school.",
+        }
+    if len(matches) > 1:
+        return {
+            "status": "ambiguous",
+            "message": "Multiple teachers matched the provided name. Please use the full name.",
+            "candidates": [{"teacher_id": teacher.teacher_id, "teacher_name": teacher.name, "department": teacher.department} for teacher in matches],
+        }
 
-    # If a specific day is requested, filter the schedule
-    if day_of_week:
-        day_schedule = teacher_week_schedule.get(day_of_week.capitalize())
-        if not day_schedule:
-            return {
-                "status": "error",
-                "error": f"Invalid day: {day_of_week}. Please use Monday-Friday.",
-            }
+    teacher = matches[0]
+    periods_per_day = len(occupancy.period_numbers)
+    if day:
+        day_schedule = [_teacher_period(occupancy, slot) for slot in occupancy.teacher_schedule(teacher.teacher_id, day)]
         return {
             "status": "success",
-            "teacher_name": teacher_name,
-            "day_of_week": day_of_week.capitalize(),
+            "teacher_name": teacher.name,
+            "day_of_week": DAY_NAMES[day - 1],
             "schedule": day_schedule,
             "total_periods": len(day_schedule),
-            "free_periods": 6 - len(day_schedule),
+            "free_periods": max(periods_per_day - len(day_schedule), 0),
         }
 
-    # Return full week schedule
+    teacher_week_schedule = _group_by_day(occupancy.teacher_schedule(teacher.teacher_id), _teacher_period, occupancy)
     total_teaching_periods = sum(len(periods) for periods in teacher_week_schedule.values())
+    school_days = {day_of_week for day_of_week, _ in occupancy.busy_teachers}
     return {
         "status": "success",
-        "teacher_name": teacher_name,
+        "teacher_name": teacher.name,
         "week_schedule": teacher_week_schedule,
         "total_teaching_periods": total_teaching_periods,
-        "total_free_periods": 30 - total_teaching_periods,  # Assuming 6 periods/day * 5 days = 30
+        "total_free_periods": max(len(school_days) * periods_per_day - total_teaching_periods, 0),
     }
 
 
 @tool("find_current_period_for_class", args_schema=FindCurrentPeriodForClassSchema)
-def find_current_period_for_class(class_name: str) -> dict[str, Any]:
+async def find_current_period_for_class(class_name: str) -> dict[str, Any]:
     """
     Identifies the subject and teacher for the ongoing period in a given class.
     Use this tool when asked "what is happening right now", "current period", or "what class is going on".
@@ -545,86 +229,49 @@ def find_current_period_for_class(class_name: str) -> dict[str, Any]:
     Returns:
         Dictionary containing current period information or error information
     """
+    db, current_profile, context_error = _get_runtime_dependencies()
+    if context_error:
+        logger.warning("Tool context unavailable for find_current_period_for_class")
+        return context_error
+
     logger.info(f"[TOOL:find_current_period_for_class] Class: '{class_name}'")
 
-    # Real implementation would be:
-    # try:
-    #     response = requests.get(
-    #         f"{BASE_URL}/timetable/current-period/{class_name}",
-    #         timeout=10
-    #     )
-    #     response.raise_for_status()
-    #     return response.json()
-    # except requests.Timeout:
-    #     logger.error("API request timed out")
-    #     return {"error": "Request timed out. Please try again."}
-    # except requests.RequestException as e:
-    #     logger.error(f"API call failed: {e}")
-    #     return {"error": f"Failed to fetch current period: {str(e)}"}
+    occupancy = await timetable_occupancy_service.get_occupancy(db, current_profile.school_id)
+    class_id = occupancy.find_class_id(class_name)
+    if class_id is None:
+        return {
+            "status": "not_found",
+            "message": f"No active class named '{class_name}' exists in your school.",
+        }
 
-    # Simulate current time and determine current period
     current_time = datetime.now()
     current_day = current_time.strftime("%A")
+    slot = occupancy.slot_at(class_id, current_time)
 
-    # Check if it's a weekday
-    if current_day in ["Saturday", "Sunday"]:
+    if slot is None:
         return {
             "status": "success",
-            "class_name": class_name,
+            "class_name": occupancy.classes[class_id],
             "current_day": current_day,
-            "message": "It's a weekend. No classes scheduled.",
+            "message": "No class is currently in session. It might be a break, a holiday or outside school hours.",
             "is_class_time": False,
         }
 
-    # Simulated time-based period detection (simplified)
-    current_hour = current_time.hour
-    current_minute = current_time.minute
-
-    # Define period timings
-    periods = [
-        {"period": 1, "start": (8, 0), "end": (8, 45)},
-        {"period": 2, "start": (8, 50), "end": (9, 35)},
-        {"period": 3, "start": (9, 40), "end": (10, 25)},
-        {"period": 4, "start": (10, 45), "end": (11, 30)},
-        {"period": 5, "start": (11, 35), "end": (12, 20)},
-        {"period": 6, "start": (13, 0), "end": (13, 45)},
-    ]
-
-    current_period = None
-    for period_info in periods:
-        start_h, start_m = period_info["start"]
-        end_h, end_m = period_info["end"]
-
-        if (current_hour > start_h or (current_hour == start_h and current_minute >= start_m)) and (current_hour < end_h or (current_hour == end_h and current_minute < end_m)):
-            current_period = period_info["period"]
-            break
-
-    if not current_period:
-        return {
-            "status": "success",
-            "class_name": class_name,
-            "current_day": current_day,
-            "message": "No class is currently in session. It might be a break or outside school hours.",
-            "is_class_time": False,
-        }
-
-    # Return placeholder data for the current period
     return {
         "status": "success",
-        "class_name": class_name,
+        "class_name": occupancy.classes[class_id],
         "current_day": current_day,
-        "current_period": current_period,
-        "subject": "Mathematics",
-        "teacher": "Mrs. Sharma",
-        "room": "101",
-        "start_time": "09:40",
-        "end_time": "10:25",
+        "current_period": slot.period_number,
+        "subject": occupancy.subjects.get(slot.subject_id),
+        "teacher": _teacher_name(occupancy, slot.teacher_id),
+        "start_time": _format_time(slot.start_time),
+        "end_time": _format_time(slot.end_time),
         "is_class_time": True,
     }
 
 
 @tool("find_free_teachers", args_schema=FindFreeTeachersSchema)
-def find_free_teachers(day_of_week: str, period_number: int) -> dict[str, Any]:
+async def find_free_teachers(day_of_week: str, period_number: int) -> dict[str, Any]:
     """
     Lists all teachers who do not have a class assigned during a specific period.
     Use this tool when asked about teacher availability, free teachers, or who can substitute.
@@ -636,68 +283,39 @@ def find_free_teachers(day_of_week: str, period_number: int) -> dict[str, Any]:
     Returns:
         Dictionary containing list of free teachers or error information
     """
-    logger.info(f"[TOOL:find_free_teachers] Day: '{day_of_week}', Period: {period_number}")
+    db, current_profile, context_error = _get_runtime_dependencies()
+    if context_error:
+        logger.warning("Tool context unavailable for find_free_teachers")
+        return context_error
 
-    # Real implementation would be:
-    # try:
-    #     params = {
-    #         "day_of_week": day_of_week,
-    #         "period_number": period_number
-    #     }
-    #     response = requests.get(
-    #         f"{BASE_URL}/timetable/free-teachers",
-    #         params=params,
-    #         timeout=10
-    #     )
-    #     response.raise_for_status()
-    #     return response.json()
-    # except requests.Timeout:
-    #     logger.error("API request timed out")
-    #     return {"error": "Request timed out. Please try again."}
-    # except requests.RequestException as e:
-    #     logger.error(f"API call failed: {e}")
-    #     return {"error": f"Failed to fetch free teachers: {str(e)}"}
+    logger.info(f"[TOOL:find_free_teachers] Day: '{day_of_week}', Period: {period_number}")
 
-    # Validate inputs
-    valid_days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
-    if day_of_week.capitalize() not in valid_days:
-        return {
-            "status": "error",
-            "error": f"Invalid day: {day_of_week}. Please use Monday-Friday.",
-        }
+    day, day_error = _parse_day(day_of_week)
+    if day_error:
+        return day_error
 
-    if not 1 <= period_number <= 6:
+    occupancy = await timetable_occupancy_service.get_occupancy(db, current_profile.school_id)
+    if occupancy.period_numbers and period_number not in occupancy.period_numbers:
         return {
             "status": "error",
-            "error": f"Invalid period number: {period_number}. Please use 1-6.",
+            "error": f"Invalid period number: {period_number}. Your school's periods are {', '.join(map(str, occupancy.period_numbers))}.",
         }
 
-    # Placeholder data for free teachers
+    free_teachers = occupancy.free_teachers(day, period_number)
     return {
         "status": "success",
-        "day_of_week": day_of_week.capitalize(),
+        "day_of_week": DAY_NAMES[day - 1],
         "period_number": period_number,
         "free_teachers": [
             {
-                "teacher_name": "Dr. Iyer",
-                "department": "Mathematics",
-                "phone": "+91-9876543222",
-                "email": "dr.iyer@school.edu",
-            },
-            {
-                "teacher_name": "Mrs. Verma",
-                "department": "English",
-                "phone": "+91-9876543223",
-                "email": "verma@school.edu",
-            },
-            {
-                "teacher_name": "Mr. Rao",
-                "department": "Social Studies",
-                "phone": "+91-9876543224",
-                "email": "rao@school.edu",
-            },
+                "teacher_id": teacher.teacher_id,
+                "teacher_name": teacher.name,
+                "department": teacher.department,
+                "subject_specialization": teacher.subject_specialization,
+            }
+            for teacher in free_teachers
         ],
-        "total_free_teachers": 3,
+        "total_free_teachers": len(free_teachers),
     }
 
 
@@ -800,9 +418,18 @@ timetable_agent_tools = [
     update_timetable_entry,
 ]
 
+# Tools that never write, with the tables their results are built from (see app.agents.response_cache)
+timetable_agent_read_only_tools = {
+    "get_class_timetable": read_only("timetable", "periods", "subjects", "teachers", "profiles", "classes"),
+    "get_teacher_timetable": read_only("timetable", "periods", "subjects", "teachers", "profiles", "classes"),
+    "find_current_period_for_class": read_only("timetable", "periods", "subjects", "teachers", "profiles", "classes", deterministic=False),
+    "find_free_teachers": read_only("timetable", "periods", "teachers", "profiles"),
+}
+
 # Export tool names for easy reference
 __all__ = [
     "timetable_agent_tools",
+    "timetable_agent_read_only_tools",
     "get_class_timetable",
     "get_teacher_timetable",
     "find_current_period_for_class",
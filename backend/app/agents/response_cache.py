@@ -0,0 +1,223 @@
+# backend/app/agents/response_cache.py
+"""Caching for read-only agent interactions.
+
+Two caches live here:
+
+- ``agent_response_cache`` stores complete agent runs keyed by
+  (school_id, role, agent, normalized query). A run is only stored when every
+  tool it invoked is declared read-only and deterministic by its agent.
+- ``tool_result_cache`` stores the results of individual deterministic
+  read-only tools keyed by (school_id, role, tool, arguments), so differently
+  phrased questions that resolve to the same tool call skip the database.
+
+Both caches are scoped to the authenticated profile taken from the tool
+runtime context (see :mod:`app.agents.tool_context`); nothing is cached when
+no profile is available. Parents and students get a per-user scope because
+their tools return user-specific data.
+
+Entries expire after a TTL and are invalidated as soon as a commit writes to
+any table the cached answer was built from (see :mod:`app.db.write_tracking`).
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Hashable, Iterable
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from app.agents.tool_context import ToolContextError, get_tool_context
+from app.db.write_tracking import TableWrites, on_tables_committed
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = float(os.getenv("AGENT_CACHE_TTL_SECONDS", "300"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("AGENT_CACHE_MAX_ENTRIES", "2048"))
+
+# Roles whose tool results do not depend on who is asking within a school.
+SCHOOL_WIDE_ROLES = ("Admin", "Teacher")
+
+
+@dataclass(frozen=True)
+class ReadOnlyTool:
+    """Declares that a tool never writes and lists the tables its result is built from.
+
+    Set ``deterministic=False`` for tools whose answer depends on something other
+    than their arguments and those tables (e.g. the current time); such tools keep
+    a run read-only but prevent it from being cached.
+    """
+
+    tables: frozenset[str]
+    deterministic: bool = True
+
+
+def read_only(*tables: str, deterministic: bool = True) -> ReadOnlyTool:
+    """Shorthand for building a :class:`ReadOnlyTool` declaration."""
+    return ReadOnlyTool(tables=frozenset(tables), deterministic=deterministic)
+
+
+@dataclass(frozen=True)
+class CacheScope:
+    """Who a cached answer may be served to."""
+
+    school_id: int
+    role: str
+    user_id: Optional[str] = None
+
+
+@dataclass
+class _CacheEntry:
+    value: Any
+    expires_at: float
+    school_id: int
+    tables: frozenset[str] = field(default_factory=frozenset)
+
+
+class AgentResponseCache:
+    """A thread-safe, TTL-bounded LRU cache with table-based invalidation."""
+
+    def __init__(self, name: str, ttl_seconds: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Hashable, _CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for ``key`` or ``None`` if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def set(self, key: Hashable, value: Any, *, school_id: int, tables: Iterable[str] = ()) -> None:
+        """Store ``value`` under ``key``; it is dropped when any of ``tables`` changes for ``school_id``."""
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[key] = _CacheEntry(
+                value=value,
+                expires_at=time.monotonic() + self.ttl_seconds,
+                school_id=school_id,
+                tables=frozenset(tables),
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_writes(self, writes: TableWrites) -> int:
+        """Drop every entry that depends on a table written for the affected schools."""
+        removed = 0
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                for table in entry.tables:
+                    schools = writes.get(table)
+                    if schools is not None and (None in schools or entry.school_id in schools):
+                        del self._entries[key]
+                        removed += 1
+                        break
+        if removed:
+            logger.debug("Invalidated %s entries from %s cache", removed, self.name)
+        return removed
+
+    def invalidate_school(self, school_id: int) -> None:
+        """Drop every entry belonging to ``school_id``."""
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry.school_id == school_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+agent_response_cache = AgentResponseCache("agent_response")
+tool_result_cache = AgentResponseCache("tool_result")
+
+on_tables_committed(agent_response_cache.invalidate_writes)
+on_tables_committed(tool_result_cache.invalidate_writes)
+
+
+def normalize_query(query: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation from a user query."""
+    return " ".join(str(query).lower().split()).rstrip(" ?.!")
+
+
+def _role_names(profile: Any) -> set[str]:
+    return {role.role_definition.role_name for role in getattr(profile, "roles", None) or [] if getattr(role, "role_definition", None) and getattr(role.role_definition, "role_name", None)}
+
+
+def resolve_cache_scope() -> Optional[CacheScope]:
+    """Build the cache scope for the current request, or ``None`` if it cannot be cached."""
+    try:
+        context = get_tool_context()
+    except ToolContextError:
+        return None
+
+    profile = context.current_profile
+    school_id = getattr(profile, "school_id", None)
+    if profile is None or school_id is None:
+        return None
+
+    role_names = _role_names(profile)
+    for role in SCHOOL_WIDE_ROLES:
+        if role in role_names:
+            return CacheScope(school_id=school_id, role=role)
+
+    # Parent/student answers are user-specific, so key them by user as well.
+    role = ",".join(sorted(role_names)) or "anonymous"
+    return CacheScope(school_id=school_id, role=role, user_id=str(profile.user_id))
+
+
+def build_response_key(scope: CacheScope, agent_name: str, query: str) -> tuple:
+    return ("response", scope.school_id, scope.role, scope.user_id, agent_name, normalize_query(query))
+
+
+def build_tool_key(scope: CacheScope, tool_name: str, tool_args: dict[str, Any]) -> tuple:
+    normalized_args = json.dumps(
+        {name: value.strip().lower() if isinstance(value, str) else value for name, value in (tool_args or {}).items()},
+        sort_keys=True,
+        default=str,
+    )
+    return ("tool", scope.school_id, scope.role, scope.user_id, tool_name, normalized_args)
+
+
+def is_cacheable_tool_result(result: Any) -> bool:
+    """Only successful tool results are cached; errors and lookups that failed are retried."""
+    if isinstance(result, dict):
+        if "status" in result:
+            return result["status"] == "success"
+        if "success" in result:
+            return bool(result["success"])
+    return True
+
+
+__all__ = [
+    "AgentResponseCache",
+    "CacheScope",
+    "ReadOnlyTool",
+    "agent_response_cache",
+    "build_response_key",
+    "build_tool_key",
+    "is_cacheable_tool_result",
+    "normalize_query",
+    "read_only",
+    "resolve_cache_scope",
+    "tool_result_cache",
+]
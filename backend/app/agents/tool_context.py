@@ -13,6 +13,7 @@ from contextvars import ContextVar
 from dataclasses import dataclass
 from typing import Optional
 
+import httpx
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.profile import Profile
@@ -27,6 +28,8 @@ class ToolRuntimeContext:
       HTTP requests to the backend API. This token is passed from the frontend through
       the agent invocation layer.
     - api_base_url: Base URL for the backend API (e.g., http://localhost:8000/api/v1)
+    - http_transport: Optional httpx transport used instead of the network, e.g.
+      ``httpx.ASGITransport(app)`` to call the API in-process from tests and benchmarks.
 
     For legacy service-based agents (deprecated):
     - db: Database session for direct service calls
@@ -37,6 +40,7 @@ class ToolRuntimeContext:
     current_profile: Optional[Profile] = None
     jwt_token: Optional[str] = None
     api_base_url: Optional[str] = None
+    http_transport: Optional[httpx.AsyncBaseTransport] = None
 
 
 class ToolContextError(RuntimeError):
@@ -0,0 +1,229 @@
+# backend/app/agents/tracing.py
+"""
+Tracing for agent invocations.
+
+``BaseAgent.invoke`` runs inside an ``agent.invoke`` Sentry span (a transaction
+of its own when no request transaction is active); every LLM call gets a
+``gen_ai.chat`` child span with provider, model, token usage and latency, and
+every tool call an ``agent.tool`` child span with argument/result sizes.
+
+SQL statements and loopback HTTP requests issued while a tool runs are counted
+on that tool's span. When Sentry is enabled its SQLAlchemy and httpx
+integrations also nest their own DB and HTTP spans under it, since tools run
+with the invoking context.
+
+Latencies, token counts and per-tool query counts are exported as Prometheus
+metrics (see app.core.metrics), so they are available without Sentry.
+"""
+
+import json
+import logging
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import httpx
+import sentry_sdk
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.metrics import (
+    AGENT_INVOCATION_SECONDS,
+    AGENT_LLM_CALL_SECONDS,
+    AGENT_LLM_TOKENS,
+    AGENT_TOOL_CALL_SECONDS,
+    AGENT_TOOL_DB_QUERIES,
+    AGENT_TOOL_RESULT_BYTES,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class InvocationTrace:
+    agent: str
+    cache_hit: bool = False
+
+
+@dataclass
+class LLMCallTrace:
+    provider: str
+    model: str
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+
+    def record_response(self, message: Any) -> None:
+        self.prompt_tokens, self.completion_tokens = token_usage(message)
+
+
+@dataclass
+class ToolCallTrace:
+    agent: str
+    tool: str
+    args_bytes: int = 0
+    result_bytes: int = 0
+    db_queries: int = 0
+    http_requests: int = 0
+    cache_hit: bool = False
+    result_status: Optional[str] = None
+
+    def record_result(self, result: Any) -> None:
+        self.result_bytes = len(str(result).encode())
+        if isinstance(result, dict):
+            status = result.get("status", result.get("success"))
+            self.result_status = None if status is None else str(status)
+
+
+# The tool call currently running in this context; DB and HTTP hooks attribute their work to it.
+_current_tool: ContextVar[Optional[ToolCallTrace]] = ContextVar("agent_current_tool", default=None)
+
+
+def current_tool_trace() -> Optional[ToolCallTrace]:
+    return _current_tool.get()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_tool_query(conn, cursor, statement, parameters, context, executemany) -> None:
+    trace = _current_tool.get()
+    if trace is not None:
+        trace.db_queries += 1
+
+
+async def record_http_request(request: httpx.Request) -> None:
+    """httpx request hook used by AgentHTTPClient."""
+    trace = _current_tool.get()
+    if trace is not None:
+        trace.http_requests += 1
+
+
+def describe_model(model: Any) -> tuple[str, str]:
+    """(provider, model name) of a chat model, unwrapping ``bind_tools`` bindings."""
+    while hasattr(model, "bound"):
+        model = model.bound
+    try:
+        provider = model._llm_type
+    except Exception:
+        provider = type(model).__name__
+    name = getattr(model, "model_name", None) or getattr(model, "model", None) or getattr(model, "model_id", None)
+    return str(provider), str(name or "unknown")
+
+
+def token_usage(message: Any) -> tuple[Optional[int], Optional[int]]:
+    """(prompt, completion) token counts reported on an AIMessage, if the provider sent them."""
+    usage = getattr(message, "usage_metadata", None)
+    if isinstance(usage, dict) and usage:
+        return usage.get("input_tokens"), usage.get("output_tokens")
+
+    metadata = getattr(message, "response_metadata", None) or {}
+    for key, prompt_key, completion_key in (
+        ("token_usage", "prompt_tokens", "completion_tokens"),  # OpenAI-compatible (Groq, DeepSeek)
+        ("usage", "input_tokens", "output_tokens"),  # Anthropic
+        ("usage_metadata", "prompt_token_count", "candidates_token_count"),  # Google
+    ):
+        usage = metadata.get(key)
+        if isinstance(usage, dict) and (prompt_key in usage or completion_key in usage):
+            return usage.get(prompt_key), usage.get(completion_key)
+    return None, None
+
+
+def _args_bytes(args: Any) -> int:
+    try:
+        return len(json.dumps(args, default=str).encode())
+    except (TypeError, ValueError):
+        return len(str(args).encode())
+
+
+@contextmanager
+def trace_agent_invocation(agent_name: str, message_count: int) -> Iterator[InvocationTrace]:
+    """Span and latency histogram around one ``BaseAgent.invoke``."""
+    if sentry_sdk.get_current_span() is None:
+        span_cm = sentry_sdk.start_transaction(op="agent.invoke", name=f"agent.{agent_name}")
+    else:
+        span_cm = sentry_sdk.start_span(op="agent.invoke", name=agent_name)
+
+    trace = InvocationTrace(agent=agent_name)
+    started = time.perf_counter()
+    outcome = "success"
+    with span_cm as span:
+        span.set_tag("agent", agent_name)
+        span.set_data("agent.message_count", message_count)
+        try:
+            yield trace
+        except Exception:
+            outcome = "error"
+            span.set_status("internal_error")
+            raise
+        finally:
+            span.set_data("agent.cache_hit", trace.cache_hit)
+            if outcome == "success" and trace.cache_hit:
+                outcome = "cached"
+            AGENT_INVOCATION_SECONDS.labels(agent=agent_name, outcome=outcome).observe(time.perf_counter() - started)
+
+
+@contextmanager
+def trace_llm_call(agent_name: str, model: Any) -> Iterator[LLMCallTrace]:
+    """Span, latency histogram and token counters for one chat model call."""
+    provider, model_name = describe_model(model)
+    trace = LLMCallTrace(provider=provider, model=model_name)
+    started = time.perf_counter()
+    outcome = "success"
+    with sentry_sdk.start_span(op="gen_ai.chat", name=f"chat {model_name}") as span:
+        span.set_data("gen_ai.system", provider)
+        span.set_data("gen_ai.request.model", model_name)
+        try:
+            yield trace
+        except Exception:
+            outcome = "error"
+            span.set_status("internal_error")
+            raise
+        finally:
+            latency = time.perf_counter() - started
+            AGENT_LLM_CALL_SECONDS.labels(agent=agent_name, provider=provider, model=model_name, outcome=outcome).observe(latency)
+            for kind, tokens in (("prompt", trace.prompt_tokens), ("completion", trace.completion_tokens)):
+                if tokens:
+                    span.set_data(f"gen_ai.usage.{'input' if kind == 'prompt' else 'output'}_tokens", tokens)
+                    AGENT_LLM_TOKENS.labels(agent=agent_name, provider=provider, model=model_name, kind=kind).inc(tokens)
+
+
+@contextmanager
+def trace_tool_call(agent_name: str, tool_name: str, tool_args: Any) -> Iterator[ToolCallTrace]:
+    """Span and histograms for one tool call; DB queries and HTTP requests made inside it are counted."""
+    trace = ToolCallTrace(agent=agent_name, tool=tool_name, args_bytes=_args_bytes(tool_args))
+    token = _current_tool.set(trace)
+    started = time.perf_counter()
+    outcome = "success"
+    with sentry_sdk.start_span(op="agent.tool", name=tool_name) as span:
+        span.set_tag("agent.tool", tool_name)
+        try:
+            yield trace
+        except Exception:
+            outcome = "error"
+            span.set_status("internal_error")
+            raise
+        finally:
+            _current_tool.reset(token)
+            if outcome == "success" and trace.cache_hit:
+                outcome = "cached"
+            span.set_data("tool.args_bytes", trace.args_bytes)
+            span.set_data("tool.result_bytes", trace.result_bytes)
+            span.set_data("tool.db_queries", trace.db_queries)
+            span.set_data("tool.http_requests", trace.http_requests)
+            span.set_data("tool.cache_hit", trace.cache_hit)
+            if trace.result_status is not None:
+                span.set_data("tool.result_status", trace.result_status)
+            AGENT_TOOL_CALL_SECONDS.labels(agent=agent_name, tool=tool_name, outcome=outcome).observe(time.perf_counter() - started)
+            if not trace.cache_hit:
+                AGENT_TOOL_DB_QUERIES.labels(agent=agent_name, tool=tool_name).observe(trace.db_queries)
+            AGENT_TOOL_RESULT_BYTES.labels(agent=agent_name, tool=tool_name).observe(trace.result_bytes)
+            logger.debug(
+                "Tool %s.%s: outcome=%s db_queries=%d http_requests=%d result_bytes=%d",
+                agent_name,
+                tool_name,
+                outcome,
+                trace.db_queries,
+                trace.http_requests,
+                trace.result_bytes,
+            )
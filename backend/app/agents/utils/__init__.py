@@ -8,7 +8,9 @@ Contains LLM routing, helper functions, and shared utilities.
 from app.agents.utils.llm_router import (
     get_available_tiers,
     get_llm,
+    set_llm_override,
     test_llm_connection,
+    use_llm_override,
 )
 
-__all__ = ["get_llm", "get_available_tiers", "test_llm_connection"]
+__all__ = ["get_llm", "get_available_tiers", "set_llm_override", "test_llm_connection", "use_llm_override"]
@@ -20,6 +20,7 @@ from app.api.v1.endpoints import (
     exams,
     fee_structure,
     fee_templates,
+    finance_exports,
     invoices,
     leaderboards,
     marks,
@@ -32,6 +33,7 @@ from app.api.v1.endpoints import (
     profiles,  # Added this import
     refunds,
     report_cards,  # <-- 1. ADDED THIS LINE
+    sales_analytics,
     schools,
     student_contacts,
     student_fee_assignments,
@@ -69,6 +71,7 @@ api_router.include_router(admin_product_categories.router, prefix="/admin/produc
 api_router.include_router(admin_product_packages.router, prefix="/admin/product-packages", tags=["Admin: Product Packages"])
 api_router.include_router(carts.router, prefix="/cart", tags=["E-Commerce: Cart"])
 api_router.include_router(orders.router, prefix="/orders", tags=["E-Commerce: Orders"])
+api_router.include_router(sales_analytics.router, prefix="/admin/sales-analytics", tags=["Admin: Sales Analytics"])
 
 # Staff
 api_router.include_router(employment_statuses.router, prefix="/employment-statuses", tags=["Staff"])
@@ -89,6 +92,7 @@ api_router.include_router(student_fee_assignments.router, prefix="/finance", tag
 api_router.include_router(refunds.router, prefix="/finance/refunds", tags=["Finance - Refunds"])
 api_router.include_router(payment_gateway.router, prefix="/finance/gateway", tags=["Finance - Gateway Configuration"])
 api_router.include_router(payments.router, prefix="/finance/payments", tags=["Finance - Payments"])
+api_router.include_router(finance_exports.router, prefix="/finance/exports", tags=["Finance - Exports"])
 api_router.include_router(webhooks.router, prefix="/webhooks", tags=["Webhooks"])
 
 api_router.include_router(albums.router, prefix="/albums", tags=["albums"])
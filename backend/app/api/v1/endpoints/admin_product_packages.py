@@ -18,6 +18,7 @@ from app.models.profile import Profile
 from app.schemas.product_package_schema import (
     ProductPackageAddItems,
     ProductPackageCreate,
+    ProductPackageListOut,
     ProductPackageOut,
     ProductPackageUpdate,
     ProductPackageUpdateItemQuantity,
@@ -108,6 +109,33 @@ async def get_all_packages(
     )
 
 
+@router.get(
+    "/summaries",
+    response_model=list[ProductPackageListOut],
+    dependencies=[Depends(require_role("Admin"))],
+)
+async def get_package_summaries(
+    include_inactive: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_profile: Profile = Depends(get_current_user_profile),
+):
+    """
+    Get all packages for admin's school without their items.
+
+    Query Parameters:
+    - include_inactive: Show soft-deleted packages (default: false)
+
+    Returns:
+    - List of packages with item counts, calculated price and how many
+      packages the component stock covers (computed by the database)
+    """
+    service = ProductPackageService(db)
+    return await service.get_package_summaries(
+        school_id=current_profile.school_id,
+        include_inactive=include_inactive,
+    )
+
+
 @router.get(
     "/{package_id}",
     response_model=ProductPackageOut,
@@ -13,11 +13,12 @@ Security:
 
 from typing import Optional
 
-from fastapi import APIRouter, Depends, Query, status
+from fastapi import APIRouter, Depends, File, Query, UploadFile, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.security import get_current_user_profile, get_db, require_role
 from app.models.profile import Profile
+from app.schemas.product_import_schema import ProductImportResult
 from app.schemas.product_schema import BulkUpdateCategoryRequest, ProductCreate, ProductOut, ProductStockAdjustment, ProductUpdate
 from app.services.product_service import ProductService
 
@@ -87,6 +88,41 @@ async def bulk_update_category(
     )
 
 
+_IMPORT_FORMATS = {".csv": "csv", "text/csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", "application/x-ndjson": "jsonl", "application/jsonl": "jsonl"}
+
+
+@router.post("/import", response_model=ProductImportResult, dependencies=[Depends(require_role("Admin"))])
+async def import_products(
+    file: UploadFile = File(..., description="CSV with a header row, or JSON Lines (one object per line)"),
+    import_key: Optional[str] = Query(None, min_length=1, max_length=100, description="Identifies this upload; re-uploading with the same key never applies a stock_adjustment twice"),
+    db: AsyncSession = Depends(get_db),
+    current_profile: Profile = Depends(get_current_user_profile),
+):
+    """
+    Bulk create/update products and restock from a file (Admin only).
+
+    Columns / keys: sku (required), name, price, category_id, stock_quantity
+    (absolute), stock_adjustment (relative), description, manufacturer,
+    image_url, reorder_level, reorder_quantity, is_active.
+
+    Business Rules:
+    - Rows are matched by SKU: existing products are updated, others created
+    - Blank cells leave the product's value unchanged
+    - New products need name and price
+    - Invalid rows are reported with their row number; the rest is imported
+    - Uploading the same file again changes nothing more
+    """
+    suffix = "." + (file.filename or "").rsplit(".", 1)[-1].lower() if "." in (file.filename or "") else ""
+    file_format = _IMPORT_FORMATS.get(suffix) or _IMPORT_FORMATS.get((file.content_type or "").split(";")[0].strip(), "")
+    service = ProductService(db)
+    return await service.import_products(
+        school_id=current_profile.school_id,
+        file=file.file,
+        file_format=file_format,
+        import_key=import_key,
+    )
+
+
 @router.get("/{product_id}", response_model=ProductOut, dependencies=[Depends(require_role("Admin"))])
 async def get_product(
     product_id: int,
@@ -5,16 +5,19 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.security import require_role
+from app.core.security import get_current_user_profile, require_role
 from app.db.session import get_db
+from app.models.profile import Profile
 from app.schemas.attendance_record_schema import (
     AttendanceRecordBulkCreate,
     AttendanceRecordCreate,
     AttendanceRecordOut,
     AttendanceRecordUpdate,
     ClassAttendanceSummaryOut,
+    ClassRosterAttendanceCreate,
+    ClassRosterAttendanceOut,
 )
-from app.services import attendance_record_service
+from app.services import attendance_record_service, class_service
 
 router = APIRouter()
 
@@ -125,6 +128,43 @@ async def create_bulk_attendance(attendance_in: AttendanceRecordBulkCreate, db:
     return records
 
 
+@router.post(
+    "/roster",
+    response_model=ClassRosterAttendanceOut,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_role("Admin", "Teacher"))],
+)
+async def create_roster_attendance(
+    roster_in: ClassRosterAttendanceCreate,
+    db: AsyncSession = Depends(get_db),
+    current_profile: Profile = Depends(get_current_user_profile),
+):
+    """
+    Record attendance for a class from a list of student names, roll numbers or IDs.
+    Unmatched, ambiguous and already-recorded rows are skipped and reported per row.
+    """
+    classes = await class_service.find_active_classes_by_name(db, school_id=current_profile.school_id, class_name=roster_in.class_name)
+    if not classes:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No active class named '{roster_in.class_name}' exists in your school.")
+    if len(classes) > 1:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Several active classes are named '{roster_in.class_name}'. Deactivate old academic years' classes first.")
+
+    teacher = getattr(current_profile, "teacher", None)
+    try:
+        return await attendance_record_service.record_class_roster_attendance(
+            db,
+            class_id=classes[0].class_id,
+            roster_in=roster_in,
+            teacher_id=teacher.teacher_id if teacher else None,
+        )
+    except IntegrityError as exc:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Roster attendance submission failed. Verify period_id and retry.",
+        ) from exc
+
+
 @router.get(
     "/class/{class_id}/range",
     response_model=list[AttendanceRecordOut],
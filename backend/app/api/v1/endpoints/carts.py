@@ -15,7 +15,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.security import get_current_user_profile, get_db
 from app.models.profile import Profile
-from app.schemas.cart_schema import CartItemIn, CartItemUpdateQuantity, CartOut
+from app.schemas.cart_schema import CartItemIn, CartItemUpdateQuantity, CartMutationBatch, CartOut, CartPackageIn
 from app.services.cart_service import CartService
 
 router = APIRouter(
@@ -82,6 +82,69 @@ async def add_item_to_cart(
     )
 
 
+@router.post(
+    "/me/items/batch",
+    response_model=CartOut,
+)
+async def apply_cart_mutations(
+    mutations: CartMutationBatch,
+    db: AsyncSession = Depends(get_db),
+    current_profile: Profile = Depends(get_current_user_profile),
+):
+    """
+    Add, update and remove many cart items in one atomic request.
+
+    Request Body:
+    - add: [{product_id, quantity}] - quantities are added to the cart
+    - update: [{product_id, quantity}] - quantities are set
+    - remove: [product_id] - products are removed
+
+    Returns:
+    - Updated cart with all items
+
+    Raises:
+    - 404: If a product doesn't exist
+    - 400: If a product is inactive or has insufficient stock (nothing is changed)
+    """
+    service = CartService(db)
+    return await service.apply_mutations(
+        user_id=current_profile.user_id,
+        mutations=mutations,
+    )
+
+
+@router.post(
+    "/me/packages",
+    response_model=CartOut,
+    status_code=status.HTTP_201_CREATED,
+)
+async def add_package_to_cart(
+    package_in: CartPackageIn,
+    db: AsyncSession = Depends(get_db),
+    current_profile: Profile = Depends(get_current_user_profile),
+):
+    """
+    Add every product of a package (kit) to the cart in one atomic request.
+
+    Request Body:
+    - package_id: ID of a package of the user's school
+    - quantity: Number of packages to add (1-100)
+
+    Returns:
+    - Updated cart with all items
+
+    Raises:
+    - 404: If the package doesn't exist or is inactive
+    - 400: If a product is inactive or has insufficient stock (nothing is added)
+    """
+    service = CartService(db)
+    return await service.add_package_to_cart(
+        user_id=current_profile.user_id,
+        school_id=current_profile.school_id,
+        package_in=package_in,
+    )
+
+
 @router.patch(
     "/me/items/{product_id}",
     response_model=CartOut,
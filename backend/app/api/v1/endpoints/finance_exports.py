@@ -0,0 +1,33 @@
+from datetime import date, datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from starlette.responses import StreamingResponse
+
+from app.core.security import get_current_user_profile, require_role
+from app.models.profile import Profile
+from app.schemas.enums import ExportFormat, FinanceExportDataset
+from app.services import finance_export_service
+
+router = APIRouter()
+
+
+@router.get("/{dataset}", dependencies=[Depends(require_role("Admin"))])
+async def export_finance_data(
+    dataset: FinanceExportDataset,
+    file_format: ExportFormat = Query(ExportFormat.CSV, alias="format"),
+    created_from: Optional[datetime] = Query(None),
+    created_to: Optional[datetime] = Query(None, description="Exclusive upper bound"),
+    current_user: Profile = Depends(get_current_user_profile),
+):
+    """
+    Download a school's invoices, payments, allocations or refunds as CSV or XLSX.
+    The file is streamed as it is read, so exports of any size start immediately.
+    """
+    # Note: No response_model for StreamingResponse
+    filename = f"{dataset.value}_{current_user.school_id}_{date.today().isoformat()}.{file_format.value}"
+    return StreamingResponse(
+        finance_export_service.stream_export(dataset, file_format, school_id=current_user.school_id, created_from=created_from, created_to=created_to),
+        media_type=finance_export_service.MEDIA_TYPES[file_format],
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
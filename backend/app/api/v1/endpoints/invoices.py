@@ -1,4 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload, selectinload
@@ -10,9 +13,10 @@ from app.models.class_model import Class
 from app.models.invoice import Invoice
 from app.models.student import Student
 from app.models.student_contact import StudentContact
-from app.schemas.invoice_schema import BulkInvoiceCreate, InvoiceCreate, InvoiceOut
+from app.schemas.invoice_schema import BulkInvoiceCreate, InvoiceCreate, InvoiceOut, SchoolInvoiceCreate, SchoolInvoiceJobOut
+from app.schemas.pagination_schema import Page
 from app.schemas.payment_schema import PaymentCreate, PaymentOut
-from app.services import invoice_service  # Import the service module
+from app.services import invoice_service, pagination  # Import the service modules
 
 router = APIRouter()
 
@@ -156,10 +160,45 @@ async def generate_class_invoices(bulk_invoice_in: BulkInvoiceCreate, db: AsyncS
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
 
-@router.get("/admin/all", response_model=list[InvoiceOut], dependencies=[Depends(require_role("Admin"))])  # Protect with Admin role
-async def list_all_school_invoices_admin(db: AsyncSession = Depends(get_db), current_user: Profile = Depends(get_current_user_profile)):  # Get authenticated admin user
+@router.post("/invoices/generate-for-school", response_model=SchoolInvoiceJobOut, status_code=202, dependencies=[Depends(require_role("Admin"))])
+async def generate_school_invoices(school_invoice_in: SchoolInvoiceCreate, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db), current_user: Profile = Depends(get_current_user_profile)):
+    """
+    Generate invoices for every class in the admin's school for a fee term.
+    Runs in the background; poll the returned job for progress.
     """
-    Admin endpoint to list all active invoices within their own school.
+    job = await invoice_service.create_school_invoice_job(db, school_id=current_user.school_id, fee_term_id=school_invoice_in.fee_term_id, user_id=current_user.user_id)
+    background_tasks.add_task(invoice_service.run_school_invoice_job, job.job_id)
+    return job
+
+
+@router.get("/invoices/generate-for-school/{job_id}", response_model=SchoolInvoiceJobOut, dependencies=[Depends(require_role("Admin"))])
+async def get_school_invoice_job(job_id: str, db: AsyncSession = Depends(get_db), current_user: Profile = Depends(get_current_user_profile)):
+    """
+    Progress of a school-wide invoice generation job.
+    """
+    job = await invoice_service.get_school_invoice_job(db, job_id, current_user.school_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Invoice generation job not found")
+    return job
+
+
+@router.get("/admin/all", response_model=Page[InvoiceOut], dependencies=[Depends(require_role("Admin"))])  # Protect with Admin role
+async def list_all_school_invoices_admin(
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    invoice_status: Optional[str] = Query(None, alias="status"),
+    payment_status: Optional[str] = None,
+    fee_term_id: Optional[int] = None,
+    class_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    include_items: bool = Query(False, description="Include each invoice's line items"),
+    db: AsyncSession = Depends(get_db),
+    current_user: Profile = Depends(get_current_user_profile),  # Get authenticated admin user
+):
+    """
+    Admin endpoint to list the active invoices within their own school, newest
+    first, one page at a time.
     School isolation is implicitly handled by fetching based on the admin's school_id.
     """
 
@@ -167,6 +206,19 @@ async def list_all_school_invoices_admin(db: AsyncSession = Depends(get_db), cur
     # We fetch invoices only for the school the logged-in admin belongs to.
     admin_school_id = current_user.school_id
 
-    invoices = await invoice_service.get_all_invoices_for_school(db=db, school_id=admin_school_id)
-
-    return invoices
+    try:
+        return await invoice_service.get_invoices_page_for_school(
+            db=db,
+            school_id=admin_school_id,
+            limit=limit,
+            cursor=cursor,
+            status=invoice_status,
+            payment_status=payment_status,
+            fee_term_id=fee_term_id,
+            class_id=class_id,
+            created_from=created_from,
+            created_to=created_to,
+            include_items=include_items,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
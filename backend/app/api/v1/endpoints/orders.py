@@ -11,6 +11,7 @@ Security:
 - Admins can access all orders in their school
 """
 
+from datetime import date, datetime, timedelta, timezone
 from typing import Optional
 
 from fastapi import APIRouter, Depends, Query, status
@@ -20,6 +21,8 @@ from app.core.security import get_current_user_profile, get_db, require_role
 from app.models.profile import Profile
 from app.schemas.enums import OrderStatus
 from app.schemas.order_schema import (
+    OrderBulkCancel,
+    OrderBulkCancelResult,
     OrderCancel,
     OrderCreateFromCart,
     OrderOut,
@@ -27,6 +30,7 @@ from app.schemas.order_schema import (
     OrderUpdate,
 )
 from app.schemas.payment_schema import PaymentInitiateRequest
+from app.services import order_cancellation_service
 from app.services.order_service import OrderService
 from app.services.payment_service import PaymentService
 
@@ -234,12 +238,17 @@ async def cancel_order(
     dependencies=[Depends(require_role("Admin"))],
 )
 async def get_order_statistics(
+    date_from: Optional[date] = Query(None, description="First day (inclusive) of orders to include"),
+    date_to: Optional[date] = Query(None, description="Last day (inclusive) of orders to include"),
     db: AsyncSession = Depends(get_db),
     current_profile: Profile = Depends(get_current_user_profile),
 ):
     """
     Get aggregated order statistics for admin dashboard.
 
+    Query Parameters:
+    - date_from / date_to: Optional date range; with both, a daily series is included
+
     Returns:
     - Total orders
     - Count by status
@@ -250,6 +259,8 @@ async def get_order_statistics(
     service = OrderService(db)
     stats = await service.get_order_statistics(
         school_id=current_profile.school_id,
+        date_from=date_from,
+        date_to=date_to,
     )
 
     return OrderStatistics(**stats)
@@ -284,6 +295,42 @@ async def admin_get_all_orders(
     )
 
 
+@router.post(
+    "/admin/bulk-cancel",
+    response_model=OrderBulkCancelResult,
+    dependencies=[Depends(require_role("Admin"))],
+)
+async def admin_bulk_cancel_orders(
+    cancel_data: OrderBulkCancel,
+    db: AsyncSession = Depends(get_db),
+    current_profile: Profile = Depends(get_current_user_profile),
+):
+    """
+    Cancel unpaid orders in bulk (Admin only).
+
+    Request Body:
+    - order_ids: Orders to cancel, or
+    - older_than_days: Cancel every unpaid order placed more than N days ago
+    - reason: Mandatory cancellation reason
+
+    Only pending_payment orders of the admin's school without an authorized or
+    captured payment are cancelled; their stock is restored. Orders are processed
+    in committed chunks and any order another operation is working on is skipped.
+    """
+    created_before = None
+    if cancel_data.older_than_days is not None:
+        created_before = datetime.now(timezone.utc) - timedelta(days=cancel_data.older_than_days)
+
+    result = await order_cancellation_service.cancel_unpaid_orders(
+        db,
+        school_id=current_profile.school_id,
+        order_ids=cancel_data.order_ids,
+        created_before=created_before,
+        reason=cancel_data.reason,
+    )
+    return OrderBulkCancelResult(**result)
+
+
 @router.get(
     "/admin/{order_id}",
     response_model=OrderOut,
@@ -1,4 +1,7 @@
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.security import get_current_user_profile, require_role
@@ -6,7 +9,10 @@ from app.db.session import get_db
 from app.dependencies import limiter
 from app.models.payment import Payment
 from app.models.profile import Profile
+from app.schemas.enums import PaymentStatus
+from app.schemas.pagination_schema import Page
 from app.schemas.payment_schema import PaymentHealthStats, PaymentInitiateRequest, PaymentInitiateResponse, PaymentOut, PaymentVerificationRequest, ReconciliationReportStats
+from app.services import pagination, webhook_queue_service
 from app.services.payment_service import PaymentService
 
 router = APIRouter()
@@ -107,17 +113,69 @@ async def trigger_authorized_reconciliation(
     return {"message": "Authorized payment reconciliation task started in the background.", "info": "This will attempt to capture authorized payments or mark expired ones."}
 
 
-@router.get("/failed-allocations", response_model=list[PaymentOut], summary="[ADMIN] Get Failed Payment Allocations", dependencies=[Depends(require_role("Admin"))])
+@router.post(
+    "/admin/process-webhooks",
+    include_in_schema=False,  # Hides this from public OpenAPI docs
+    dependencies=[Depends(require_role("Admin"))],
+)
+async def trigger_webhook_queue_processing(background_tasks: BackgroundTasks):
+    """
+    Triggers a background drain of queued webhook events, e.g. ones left
+    unprocessed by a restart. Admin-only; safe to run alongside other consumers.
+    """
+    background_tasks.add_task(webhook_queue_service.run_webhook_consumer)
+
+    return {"message": "Webhook queue processing started in the background."}
+
+
+@router.get("/", response_model=Page[PaymentOut], summary="[ADMIN] List Payments", dependencies=[Depends(require_role("Admin"))])
+async def list_school_payments(
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    payment_status: Optional[PaymentStatus] = Query(None, alias="status"),
+    fee_term_id: Optional[int] = None,
+    class_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: Profile = Depends(get_current_user_profile),
+):
+    """
+    Lists the payments of the admin's school, newest first, one page at a time.
+    """
+    service = PaymentService(db)
+    try:
+        return await service.list_payments(
+            db=db,
+            school_id=current_user.school_id,
+            limit=limit,
+            cursor=cursor,
+            status=payment_status.value if payment_status else None,
+            fee_term_id=fee_term_id,
+            class_id=class_id,
+            created_from=created_from,
+            created_to=created_to,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/failed-allocations", response_model=Page[PaymentOut], summary="[ADMIN] Get Failed Payment Allocations", dependencies=[Depends(require_role("Admin"))])
 async def get_failed_payment_allocations(
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
     db: AsyncSession = Depends(get_db),
+    current_user: Profile = Depends(get_current_user_profile),
 ):
     """
-    Retrieves a list of all payments that were successfully captured
-    but failed during the internal allocation process.
+    Retrieves the admin's school's payments that were successfully captured
+    but failed during the internal allocation process, newest first, one page at a time.
     """
     service = PaymentService(db)
-    payments = await service.get_failed_allocations(db=db)
-    return payments
+    try:
+        return await service.list_payments(db=db, school_id=current_user.school_id, limit=limit, cursor=cursor, status=PaymentStatus.CAPTURED_ALLOCATION_FAILED.value)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @router.post("/{payment_id}/retry-allocation", response_model=PaymentOut, summary="[ADMIN] Retry a Failed Payment Allocation", dependencies=[Depends(require_role("Admin"))])  # Return the updated payment
@@ -144,6 +202,20 @@ async def retry_failed_payment_allocation(
     return updated_payment
 
 
+@router.post("/admin/retry-allocations", summary="[ADMIN] Retry All Failed Payment Allocations", dependencies=[Depends(require_role("Admin"))])
+async def retry_all_failed_payment_allocations(
+    db: AsyncSession = Depends(get_db),
+    current_user: Profile = Depends(get_current_user_profile),
+):
+    """
+    Re-runs allocation for every payment of the admin's school stuck in the
+    'captured_allocation_failed' state in one batch, e.g. after a
+    reconciliation catch-up.
+    """
+    service = PaymentService(db)
+    return await service.retry_failed_allocations(db=db, school_id=current_user.school_id)
+
+
 @router.get("/analytics/payment-health", response_model=PaymentHealthStats, summary="[ADMIN] Get Payment Health Statistics", dependencies=[Depends(require_role("Admin"))])  # 3. Use the new response model
 async def get_payment_health_statistics(
     db: AsyncSession = Depends(get_db),
@@ -13,11 +13,13 @@ Security:
 
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.security import get_current_user_profile, get_db
-from app.schemas.product_schema import ProductOut
+from app.schemas.catalog_schema import SchoolCatalogOut
+from app.schemas.product_schema import ProductOut, ProductSearchPage
+from app.services import catalog_service
 from app.services.product_service import ProductService
 
 router = APIRouter(
@@ -61,6 +63,65 @@ async def browse_products(
     )
 
 
+@router.get(
+    "/school/{school_id}/search",
+    response_model=ProductSearchPage,
+)
+async def search_products(
+    school_id: int,
+    q: str = Query(..., min_length=2, max_length=100, description="Search text: product name, SKU, brand or description words"),
+    category_id: Optional[int] = Query(None, description="Restrict results to one category"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    db: AsyncSession = Depends(get_db),
+    current_profile=Depends(get_current_user_profile),
+):
+    """
+    Search the school store (Parent-facing).
+
+    Results are ranked best match first and tolerate typos and partial words.
+    Only active products are returned. The facets count the matches per
+    category, so the app can offer category chips for the query.
+    """
+    if current_profile.school_id != school_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You are not authorized to browse products for this school.",
+        )
+    service = ProductService(db)
+    return await service.search_products(school_id=school_id, query=q, category_id=category_id, limit=limit, cursor=cursor)
+
+
+@router.get(
+    "/school/{school_id}/catalog",
+    response_model=SchoolCatalogOut,
+    responses={304: {"description": "The catalog has not changed since the ETag in If-None-Match"}},
+)
+async def get_school_catalog(
+    school_id: int,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    current_profile=Depends(get_current_user_profile),
+):
+    """
+    Full store catalog of a school in one response (Parent-facing).
+
+    Returns the active products, categories and packages, precomputed and
+    cached per school. The response carries an ETag: send it back in
+    If-None-Match and an unchanged catalog is answered with 304 and no body.
+    """
+    if current_profile.school_id != school_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You are not authorized to browse products for this school.",
+        )
+    snapshot = await catalog_service.get_catalog(db, school_id)
+    headers = {"ETag": snapshot.etag, "Cache-Control": catalog_service.CATALOG_CACHE_CONTROL}
+    if catalog_service.etag_matches(if_none_match, snapshot.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+
 @router.get(
     "/{product_id}",
     response_model=ProductOut,
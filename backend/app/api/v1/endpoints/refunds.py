@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, BackgroundTasks, Depends, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.security import get_current_user_profile, require_role
 from app.db.session import get_db
 from app.models.profile import Profile  # Assuming your user model is named User
-from app.schemas.refund_schema import RefundCreate, RefundOut
+from app.schemas.enums import RefundBatchStatus
+from app.schemas.refund_schema import RefundBatchCreate, RefundBatchOut, RefundCreate, RefundOut
+from app.services import bulk_refund_service
 from app.services.refund_service import RefundService
 
 router = APIRouter()
@@ -29,3 +31,40 @@ async def create_refund(
         refund_in.processed_by_user_id = current_user.id
 
     return await service.process_refund(refund_data=refund_in)
+
+
+@router.post("/batches", response_model=RefundBatchOut, status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(require_role("Admin"))])
+async def create_refund_batch(
+    batch_in: RefundBatchCreate,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+    current_user: Profile = Depends(get_current_user_profile),
+):
+    """
+    Refund many payments at once: the listed payments and every refundable
+    payment of the listed orders and invoices. The refunds are queued now and
+    sent in the background; poll the batch for each refund's status.
+    """
+    batch = await bulk_refund_service.create_refund_batch(db, school_id=current_user.school_id, batch_in=batch_in, user_id=current_user.user_id)
+    background_tasks.add_task(bulk_refund_service.run_refund_batch_job, batch.id)
+    return await bulk_refund_service.get_refund_batch(db, batch.id, current_user.school_id)
+
+
+@router.get("/batches/{batch_id}", response_model=RefundBatchOut, dependencies=[Depends(require_role("Admin"))])
+async def get_refund_batch(batch_id: int, db: AsyncSession = Depends(get_db), current_user: Profile = Depends(get_current_user_profile)):
+    """A bulk refund job and the status of each of its refunds."""
+    return await bulk_refund_service.get_refund_batch(db, batch_id, current_user.school_id)
+
+
+@router.post("/batches/{batch_id}/resume", response_model=RefundBatchOut, status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(require_role("Admin"))])
+async def resume_refund_batch(
+    batch_id: int,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+    current_user: Profile = Depends(get_current_user_profile),
+):
+    """Send the refunds of a job that did not complete; refunds the gateway already has are not sent again."""
+    batch = await bulk_refund_service.get_refund_batch(db, batch_id, current_user.school_id)
+    if batch["status"] != RefundBatchStatus.COMPLETED.value:
+        background_tasks.add_task(bulk_refund_service.run_refund_batch_job, batch_id)
+    return batch
@@ -0,0 +1,65 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.security import get_current_user_profile, get_db, require_role
+from app.models.profile import Profile
+from app.schemas.enums import SalesInterval, SalesRanking
+from app.schemas.sales_analytics_schema import CategorySalesOut, SalesComparisonOut, SalesTimeSeriesOut, TopProductSalesOut
+from app.services import sales_analytics_service
+
+router = APIRouter()
+
+
+@router.get("/timeseries", response_model=SalesTimeSeriesOut, dependencies=[Depends(require_role("Admin"))])
+async def get_sales_time_series(
+    date_from: date = Query(..., description="First day (inclusive)"),
+    date_to: date = Query(..., description="Last day (inclusive)"),
+    interval: SalesInterval = Query(SalesInterval.DAY),
+    product_id: Optional[int] = Query(None),
+    category_id: Optional[int] = Query(None),
+    db: AsyncSession = Depends(get_db),
+    current_profile: Profile = Depends(get_current_user_profile),
+):
+    """Units and revenue sold (and cancelled after payment) per day, week or month, for the school or one product or category."""
+    return await sales_analytics_service.time_series(db, current_profile.school_id, date_from, date_to, interval=interval, product_id=product_id, category_id=category_id)
+
+
+@router.get("/top-products", response_model=list[TopProductSalesOut], dependencies=[Depends(require_role("Admin"))])
+async def get_top_products(
+    date_from: date = Query(..., description="First day (inclusive)"),
+    date_to: date = Query(..., description="Last day (inclusive)"),
+    limit: int = Query(10, ge=1, le=100),
+    rank_by: SalesRanking = Query(SalesRanking.REVENUE),
+    category_id: Optional[int] = Query(None),
+    db: AsyncSession = Depends(get_db),
+    current_profile: Profile = Depends(get_current_user_profile),
+):
+    """The best selling products of the range, ranked by net revenue or net units."""
+    return await sales_analytics_service.top_products(db, current_profile.school_id, date_from, date_to, limit=limit, rank_by=rank_by, category_id=category_id)
+
+
+@router.get("/categories", response_model=list[CategorySalesOut], dependencies=[Depends(require_role("Admin"))])
+async def get_category_sales(
+    date_from: date = Query(..., description="First day (inclusive)"),
+    date_to: date = Query(..., description="Last day (inclusive)"),
+    db: AsyncSession = Depends(get_db),
+    current_profile: Profile = Depends(get_current_user_profile),
+):
+    """Revenue and units per product category, by net revenue."""
+    return await sales_analytics_service.category_sales(db, current_profile.school_id, date_from, date_to)
+
+
+@router.get("/comparison", response_model=SalesComparisonOut, dependencies=[Depends(require_role("Admin"))])
+async def compare_sales_periods(
+    date_from: date = Query(..., description="First day (inclusive) of the period"),
+    date_to: date = Query(..., description="Last day (inclusive) of the period"),
+    previous_from: Optional[date] = Query(None, description="First day of the period to compare with (default: the same length, just before)"),
+    previous_to: Optional[date] = Query(None, description="Last day of the period to compare with"),
+    db: AsyncSession = Depends(get_db),
+    current_profile: Profile = Depends(get_current_user_profile),
+):
+    """Sales of a period (e.g. this term) against an earlier one (e.g. last term), in total and per category."""
+    return await sales_analytics_service.compare_periods(db, current_profile.school_id, date_from, date_to, previous_from=previous_from, previous_to=previous_to)
@@ -14,12 +14,15 @@ from app.models.profile import Profile
 from app.models.subject import Subject
 from app.models.teacher import Teacher
 from app.schemas.timetable_schema import (
+    FreeTeacherOut,
+    FreeTeachersResponse,
+    OccupancySlotOut,
     TimetableEntryCreate,
     TimetableEntryOut,
     TimetableEntryUpdate,
 )
 from app.schemas.timetable_schema import TimetableEntryOut as TimetableOut
-from app.services import timetable_service
+from app.services import timetable_occupancy_service, timetable_service
 
 router = APIRouter()
 
@@ -232,3 +235,65 @@ async def get_schedule(
         target_id=target_id,
         schedule_date=schedule_date,
     )
+
+
+# Admin/Teacher: Substitution planning - teachers without a class in a slot
+@router.get(
+    "/free-teachers",
+    response_model=FreeTeachersResponse,
+    dependencies=[Depends(require_role("Admin", "Teacher"))],
+)
+async def get_free_teachers(
+    day_of_week: int = Query(..., ge=1, le=7, description="1=Monday, 7=Sunday"),
+    period_number: int = Query(..., ge=1),
+    db: AsyncSession = Depends(get_db),
+    current_profile: Profile = Depends(get_current_user_profile),
+):
+    """
+    List the active teachers who have no timetable entry in the given day/period.
+    Served from the school's cached occupancy index.
+    """
+    occupancy = await timetable_occupancy_service.get_occupancy(db, current_profile.school_id)
+    free_teachers = occupancy.free_teachers(day_of_week, period_number)
+    return FreeTeachersResponse(
+        day_of_week=day_of_week,
+        period_number=period_number,
+        free_teachers=[
+            FreeTeacherOut(
+                teacher_id=teacher.teacher_id,
+                teacher_name=teacher.name,
+                department=teacher.department,
+                subject_specialization=teacher.subject_specialization,
+            )
+            for teacher in free_teachers
+        ],
+        busy_teacher_ids=sorted(occupancy.busy_teachers.get((day_of_week, period_number), ())),
+        total_free_teachers=len(free_teachers),
+    )
+
+
+# Admin/Teacher: The occupancy index itself (busy teachers per slot)
+@router.get(
+    "/occupancy",
+    response_model=list[OccupancySlotOut],
+    dependencies=[Depends(require_role("Admin", "Teacher"))],
+)
+async def get_timetable_occupancy(
+    day_of_week: int | None = Query(None, ge=1, le=7, description="Optional day filter (1=Monday, 7=Sunday)"),
+    db: AsyncSession = Depends(get_db),
+    current_profile: Profile = Depends(get_current_user_profile),
+):
+    """
+    Return the busy teachers of every scheduled (day, period) slot of the school.
+    """
+    occupancy = await timetable_occupancy_service.get_occupancy(db, current_profile.school_id)
+    return [
+        OccupancySlotOut(
+            day_of_week=day,
+            period_number=period_number,
+            busy_teacher_ids=sorted(busy),
+            free_teacher_count=len(occupancy.free_teacher_ids(day, period_number)),
+        )
+        for (day, period_number), busy in sorted(occupancy.busy_teachers.items())
+        if day_of_week is None or day == day_of_week
+    ]
@@ -1,10 +1,11 @@
 import logging
 from typing import Optional
 
-from fastapi import APIRouter, Depends, Header, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.session import get_db
+from app.services import webhook_queue_service
 from app.services.payment_service import PaymentService
 
 router = APIRouter()
@@ -34,11 +35,17 @@ def _get_client_ip(request: Request) -> str:
 @router.post("/razorpay")
 async def handle_razorpay_webhook(
     request: Request,
+    background_tasks: BackgroundTasks,
     x_razorpay_signature: Optional[str] = Header(None),
     service: PaymentService = Depends(get_payment_service),
 ):
     """
-    Receives and processes webhook notifications from Razorpay.
+    Receives webhook notifications from Razorpay.
+
+    The event is verified and queued, then acknowledged with 200 right away;
+    the capture is applied by the webhook queue consumer in the background
+    (see app.services.webhook_queue_service), so Razorpay never retries a
+    webhook because processing was slow.
 
     Security Note:
     - Uses raw_body from middleware for signature verification
@@ -66,6 +73,8 @@ async def handle_razorpay_webhook(
     payload = await request.json()
 
     # Pass client IP to service for security logging
-    await service.handle_webhook_event(payload=payload, raw_body=raw_body, signature=x_razorpay_signature, client_ip=client_ip)
+    queued = await service.handle_webhook_event(payload=payload, raw_body=raw_body, signature=x_razorpay_signature, client_ip=client_ip)
+    if queued:
+        background_tasks.add_task(webhook_queue_service.run_webhook_consumer)
 
     return {"status": "ok"}
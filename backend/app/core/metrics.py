@@ -1,5 +1,35 @@
-from prometheus_client import Counter
+from prometheus_client import Counter, Histogram
 
 PAYMENTS_COUNTER = Counter("payments_total", "Total number of payment attempts processed", ["status", "gateway"])  # e.g., status='captured', gateway='razorpay'
 
 ALLOCATION_FAILURES_COUNTER = Counter("payment_allocation_failures_total", "Total number of failed allocations", ["source"])  # e.g., source='verify_payment' or 'webhook'
+
+# --- Payment gateway (see app.services.razorpay_gateway) ---
+PAYMENT_GATEWAY_CALL_SECONDS = Histogram(
+    "payment_gateway_call_seconds", "Latency of a single Razorpay API attempt", ["operation", "outcome"], buckets=(0.05, 0.1, 0.25, 0.5, 0.75, 1, 2, 5, 10)
+)  # outcome: success / timeout / network_error / http_<code>
+
+PAYMENT_GATEWAY_RETRIES = Counter("payment_gateway_retries_total", "Razorpay API attempts that were retried", ["operation"])
+
+# --- Payment reconciliation (see app.services.payment_reconciliation_service) ---
+PAYMENT_RECONCILE_PAYMENTS = Counter("payment_reconcile_payments_total", "Payments examined by a reconciliation run", ["kind", "outcome"])  # kind: pending / authorized
+
+PAYMENT_RECONCILE_RUN_SECONDS = Histogram("payment_reconcile_run_seconds", "Duration of a reconciliation run", ["kind"], buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800))
+
+# --- Webhook queue (see app.services.webhook_queue_service) ---
+WEBHOOK_QUEUE_EVENTS = Counter("webhook_queue_events_total", "Webhook events applied by the queue consumer", ["outcome"])  # outcome: processed / failed
+
+WEBHOOK_QUEUE_LAG_SECONDS = Histogram("webhook_queue_lag_seconds", "Time from a webhook being queued to being applied", buckets=(0.1, 0.5, 1, 2, 5, 15, 60, 300, 1800))
+
+# --- Agents (see app.agents.tracing) ---
+AGENT_INVOCATION_SECONDS = Histogram("agent_invocation_seconds", "End-to-end latency of an agent invocation", ["agent", "outcome"])  # outcome: success / error / cached
+
+AGENT_LLM_CALL_SECONDS = Histogram("agent_llm_call_seconds", "Latency of a single LLM call made by an agent", ["agent", "provider", "model", "outcome"], buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60))
+
+AGENT_LLM_TOKENS = Counter("agent_llm_tokens_total", "Tokens reported by the LLM provider", ["agent", "provider", "model", "kind"])  # kind: prompt / completion
+
+AGENT_TOOL_CALL_SECONDS = Histogram("agent_tool_call_seconds", "Latency of a single agent tool call", ["agent", "tool", "outcome"])  # outcome: success / error / cached
+
+AGENT_TOOL_DB_QUERIES = Histogram("agent_tool_db_queries", "SQL statements executed by a single tool call", ["agent", "tool"], buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100))
+
+AGENT_TOOL_RESULT_BYTES = Histogram("agent_tool_result_bytes", "Size of the tool result handed back to the LLM", ["agent", "tool"], buckets=(256, 1024, 4096, 16384, 65536, 262144))
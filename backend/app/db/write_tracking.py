@@ -0,0 +1,100 @@
+# backend/app/db/write_tracking.py
+"""Commit-time notifications about which tables a session wrote to.
+
+In-process caches that mirror database state (agent responses, tool results,
+derived indexes) register a listener with :func:`on_tables_committed`. After
+every successful commit the listener receives a ``{table_name: {school_id, ...}}``
+mapping describing what changed. A ``None`` school id means the write could not
+be attributed to a single school (bulk statements, models without ``school_id``),
+and listeners should treat it as "every school".
+
+Writes are collected from the unit of work (``after_flush``) and from ORM-enabled
+``insert()/update()/delete()`` statements (``do_orm_execute``). Raw ``text()`` SQL
+is not tracked.
+
+A statement that knows which schools it writes passes them as the
+``written_school_ids`` execution option, and they are recorded instead of
+``None``. An empty tuple records nothing: the caller reports the schools itself
+with :func:`record_write` (e.g. from ``RETURNING school_id``).
+"""
+
+import logging
+from collections.abc import Callable
+from itertools import chain
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+TableWrites = dict[str, set[Optional[int]]]
+
+_PENDING_WRITES_KEY = "pending_table_writes"
+_listeners: list[Callable[[TableWrites], None]] = []
+
+
+def on_tables_committed(listener: Callable[[TableWrites], None]) -> Callable[[TableWrites], None]:
+    """Register ``listener`` to be called with the tables written by each commit."""
+    if listener not in _listeners:
+        _listeners.append(listener)
+    return listener
+
+
+def remove_listener(listener: Callable[[TableWrites], None]) -> None:
+    """Unregister a listener previously added with :func:`on_tables_committed`."""
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def record_write(session: Session | AsyncSession, table_name: str, school_id: Optional[int] = None) -> None:
+    """Mark ``table_name`` as written in the session's current transaction."""
+    pending: TableWrites = session.info.setdefault(_PENDING_WRITES_KEY, {})
+    pending.setdefault(table_name, set()).add(school_id)
+
+
+def notify_tables_committed(writes: TableWrites) -> None:
+    """Dispatch ``writes`` to every listener; listener failures are logged, never raised."""
+    for listener in list(_listeners):
+        try:
+            listener(writes)
+        except Exception:
+            logger.exception("Table write listener %r failed", listener)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed_writes(session: Session, flush_context) -> None:
+    # new/dirty/deleted still describe the pre-flush state at this point.
+    for obj in chain(session.new, session.dirty, session.deleted):
+        table_name = getattr(obj, "__tablename__", None)
+        if not table_name:
+            continue
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        record_write(session, table_name, getattr(obj, "school_id", None))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_statement_writes(orm_execute_state) -> None:
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    table_name = getattr(table, "name", None)
+    if table_name:
+        for school_id in orm_execute_state.execution_options.get("written_school_ids", (None,)):
+            record_write(orm_execute_state.session, table_name, school_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_committed_writes(session: Session) -> None:
+    writes = session.info.pop(_PENDING_WRITES_KEY, None)
+    if writes:
+        notify_tables_committed(writes)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back_writes(session: Session, previous_transaction) -> None:
+    # Savepoint rollbacks keep the outer transaction's writes pending; over-invalidating is harmless.
+    if previous_transaction.parent is None:
+        session.info.pop(_PENDING_WRITES_KEY, None)
@@ -13,6 +13,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from prometheus_fastapi_instrumentator import Instrumentator
 from sentry_sdk.integrations.fastapi import FastApiIntegration
+from sentry_sdk.integrations.langchain import LangchainIntegration
 from sentry_sdk.integrations.sqlalchemy import SqlalchemyIntegration
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
@@ -30,6 +31,7 @@ from app.db import base  # noqa: F401
 from app.db.session import init_engine
 from app.dependencies import limiter
 from app.middleware import RawBodyMiddleware
+from app.services.razorpay_gateway import close_http_client as close_razorpay_client
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
@@ -50,6 +52,9 @@ if SENTRY_DSN:
             FastApiIntegration(),
             SqlalchemyIntegration(),  # ✅ replaces SqlAlchemyIntegration
         ],
+        # Agent LLM/tool spans come from app.agents.tracing; the auto-enabled LangChain
+        # integration would duplicate them and leave tool spans open under LangGraph.
+        disabled_integrations=[LangchainIntegration()],
         traces_sample_rate=1.0,  # capture 100% of performance traces (tune in prod)
         profiles_sample_rate=1.0,  # capture 100% of profiling data
     )
@@ -115,6 +120,7 @@ async def startup_event():
 async def shutdown_event():
     """Actions to perform on application shutdown."""
     logger.info("Shutting down SchoolOS API")
+    await close_razorpay_client()
 
 
 if sys.platform.startswith("win"):
@@ -89,11 +89,18 @@ try:
     from app.models.order_item import OrderItem
     from app.models.payment import Payment
     from app.models.payment_allocation import PaymentAllocation
+    from app.models.payment_metrics_hourly import PaymentMetricsHourly
+    from app.models.payment_reconciliation_run import PaymentReconciliationRun
     from app.models.product import Product
     from app.models.product_album_link import ProductAlbumLink
     from app.models.product_category import ProductCategory
+    from app.models.product_import_adjustment import ProductImportAdjustment
     from app.models.product_package import ProductPackage
+    from app.models.product_sales_daily import ProductSalesDaily
     from app.models.refund import Refund
+    from app.models.refund_batch import RefundBatch
+    from app.models.school_invoice_job import SchoolInvoiceJob
+    from app.models.stock_reservation import StockReservation
     from app.models.student_fee_assignment import StudentFeeAssignment
     from app.models.student_fee_discount import StudentFeeDiscount
 except ImportError:
@@ -172,6 +179,8 @@ __all__ = [
     "InvoiceItem",
     "Payment",
     "Refund",
+    "RefundBatch",
+    "SchoolInvoiceJob",
     "FeeComponent",
     "FeeTemplate",
     "FeeTerm",
@@ -182,6 +191,11 @@ __all__ = [
     "AppliedDiscount",
     "GatewayWebhookEvent",
     "PaymentAllocation",
+    "PaymentMetricsHourly",
+    "PaymentReconciliationRun",
+    "StockReservation",
+    "ProductImportAdjustment",
+    "ProductSalesDaily",
     "ProductAlbumLink",
     # Communication & Media
     "Announcement",
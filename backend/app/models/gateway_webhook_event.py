@@ -1,4 +1,4 @@
-from sqlalchemy import TIMESTAMP, Column, Integer, String, Text
+from sqlalchemy import TIMESTAMP, Column, ForeignKey, Integer, String, Text
 from sqlalchemy.dialects.postgresql import JSONB
 
 from app.db.base_class import Base
@@ -14,3 +14,5 @@ class GatewayWebhookEvent(Base):
     status = Column(String(50), nullable=False)  # e.g., 'received', 'processed', 'failed'
     processing_error = Column(Text)
     received_at = Column(TIMESTAMP(timezone=True), server_default="now()")
+    event_created_at = Column(TIMESTAMP(timezone=True), index=True)  # Razorpay's ``created_at``; time-window reports filter on this
+    school_id = Column(Integer, ForeignKey("schools.school_id"), nullable=True)  # School of the payment the event is about, when known
@@ -5,6 +5,7 @@ from sqlalchemy import (
     Date,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     Numeric,
     String,
@@ -45,3 +46,5 @@ class Invoice(Base):
     fee_term = relationship("FeeTerm")
     payments = relationship("Payment", back_populates="invoice")
     items = relationship("InvoiceItem", back_populates="invoice", cascade="all, delete-orphan")
+
+    __table_args__ = (Index("ix_invoices_created_at_id", "created_at", "id"),)  # Keyset pagination of invoice listings
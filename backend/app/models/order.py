@@ -22,7 +22,7 @@ class Order(Base):
     order_id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("students.student_id"), nullable=False)
     parent_user_id = Column(UUID(as_uuid=True), ForeignKey("profiles.user_id"), nullable=False)
-    school_id = Column(Integer, ForeignKey("schools.school_id"), nullable=False)  # ADD IF MISSING
+    school_id = Column(Integer, ForeignKey("schools.school_id"), nullable=False)  # Denormalized from the student, see docs/ORDER_STATISTICS.md
 
     order_number = Column(String, unique=True, nullable=False, index=True)
     # NOTE: Generated in service layer as f"ORD-{school_id}-{timestamp}-{order_id}"
@@ -58,4 +58,6 @@ class Order(Base):
         Index("idx_orders_parent_user_id", "parent_user_id"),
         Index("idx_orders_student_id", "student_id"),
         Index("idx_orders_status", "status"),
+        Index("idx_orders_school_id_status_created_at", "school_id", "status", "created_at"),  # Bulk cancellation / unpaid order expiry
+        Index("idx_orders_school_id_created_at", "school_id", "created_at"),  # Dashboard statistics by date range
     )
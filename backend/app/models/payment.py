@@ -1,6 +1,6 @@
 # app/models/payment.py
 
-from sqlalchemy import TIMESTAMP, CheckConstraint, Column, ForeignKey, Integer, Numeric, String, Text
+from sqlalchemy import TIMESTAMP, CheckConstraint, Column, ForeignKey, Index, Integer, Numeric, String, Text
 from sqlalchemy.dialects.postgresql import ENUM, UUID
 from sqlalchemy.dialects.postgresql.json import JSONB
 from sqlalchemy.orm import relationship
@@ -45,4 +45,7 @@ class Payment(Base):
     student = relationship("Student")
     user = relationship("Profile")
 
-    __table_args__ = (CheckConstraint("(invoice_id IS NOT NULL AND order_id IS NULL) OR (invoice_id IS NULL AND order_id IS NOT NULL)", name="chk_payment_target"),)
+    __table_args__ = (
+        CheckConstraint("(invoice_id IS NOT NULL AND order_id IS NULL) OR (invoice_id IS NULL AND order_id IS NOT NULL)", name="chk_payment_target"),
+        Index("ix_payments_school_created_at_id", "school_id", "created_at", "id"),  # Keyset pagination of a school's payments
+    )
@@ -0,0 +1,31 @@
+from sqlalchemy import TIMESTAMP, Column, ForeignKey, Integer, UniqueConstraint
+
+from app.db.base_class import Base
+
+
+class PaymentMetricsHourly(Base):
+    """
+    Rolling payment and webhook counters per school and hour, maintained
+    incrementally as payments change status (see
+    app.services.payment_metrics_service). Health dashboards read the last 24
+    buckets instead of scanning payments and webhook events.
+
+    ``school_id`` is NULL for webhook events that could not be attributed to a
+    payment.
+    """
+
+    __tablename__ = "payment_metrics_hourly"
+
+    id = Column(Integer, primary_key=True)
+    school_id = Column(Integer, ForeignKey("schools.school_id", ondelete="CASCADE"), nullable=True)
+    hour_start = Column(TIMESTAMP(timezone=True), nullable=False, index=True)
+
+    payments_initiated = Column(Integer, nullable=False, default=0, server_default="0")
+    payments_captured = Column(Integer, nullable=False, default=0, server_default="0")
+    payments_failed = Column(Integer, nullable=False, default=0, server_default="0")
+    allocation_failures = Column(Integer, nullable=False, default=0, server_default="0")
+    payments_reconciled = Column(Integer, nullable=False, default=0, server_default="0")
+    webhooks_processed = Column(Integer, nullable=False, default=0, server_default="0")
+    webhooks_failed = Column(Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (UniqueConstraint("school_id", "hour_start", name="uq_payment_metrics_hourly_school_hour", postgresql_nulls_not_distinct=True),)
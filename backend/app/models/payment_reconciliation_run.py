@@ -0,0 +1,29 @@
+from sqlalchemy import TIMESTAMP, Column, Float, Integer, String
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.db.base_class import Base
+
+
+class PaymentReconciliationRun(Base):
+    """
+    One run of a payment reconciliation job (see
+    app.services.payment_reconciliation_service), recorded by whichever worker
+    ran it so the reconciliation report covers every worker's runs.
+    """
+
+    __tablename__ = "payment_reconciliation_runs"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(20), nullable=False)  # pending / authorized
+    started_at = Column(TIMESTAMP(timezone=True), nullable=False, index=True)
+    duration_seconds = Column(Float, nullable=False, default=0.0)
+    processed = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    batches = Column(Integer, nullable=False, default=0)
+    schools = Column(Integer, nullable=False, default=0)
+    gateway_calls = Column(Integer, nullable=False, default=0)
+    outcomes = Column(JSONB, nullable=False, default=dict)  # outcome -> payments
+
+    @property
+    def payments_per_second(self) -> float:
+        return round(self.processed / self.duration_seconds, 2) if self.duration_seconds > 0 else 0.0
@@ -6,6 +6,7 @@ from sqlalchemy import (
     Column,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     Numeric,
     String,
@@ -68,6 +69,9 @@ class Product(Base):
     __table_args__ = (
         CheckConstraint("stock_quantity >= 0", name="chk_product_stock_non_negative"),
         CheckConstraint("price > 0", name="chk_product_price_positive"),
+        # Typo-tolerant storefront search (needs pg_trgm; see docs/PRODUCT_SEARCH.md)
+        Index("idx_products_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("idx_products_sku_trgm", "sku", postgresql_using="gin", postgresql_ops={"sku": "gin_trgm_ops"}),
     )
 
     # --- Computed Properties ---
@@ -83,15 +87,20 @@ class Product(Base):
         - LOW_STOCK: Active with stock 1-10
         - IN_STOCK: Active with stock > 10
         """
+        return self.availability_for(self.is_active, self.stock_quantity)
+
+    @staticmethod
+    def availability_for(is_active: bool, stock_quantity: int):
+        """The availability status of a product with this active flag and stock, for rows read without the ORM."""
         from app.schemas.enums import ProductAvailability
 
-        if not self.is_active:
+        if not is_active:
             return ProductAvailability.DISCONTINUED
 
-        if self.stock_quantity == 0:
+        if stock_quantity == 0:
             return ProductAvailability.OUT_OF_STOCK
 
-        if self.stock_quantity <= 10:
+        if stock_quantity <= 10:
             return ProductAvailability.LOW_STOCK
 
         return ProductAvailability.IN_STOCK
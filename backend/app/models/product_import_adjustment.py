@@ -0,0 +1,23 @@
+from sqlalchemy import TIMESTAMP, Column, ForeignKey, Integer, String
+
+from app.db.base_class import Base
+
+
+class ProductImportAdjustment(Base):
+    """
+    A stock adjustment applied by a product import (see
+    app.services.product_import_service).
+
+    Keyed by the school, the import's ``import_key`` and the row's number in the
+    file, so uploading the same file again under the same key applies no
+    adjustment twice, and two schools choosing the same key never collide.
+    """
+
+    __tablename__ = "product_import_adjustments"
+
+    school_id = Column(Integer, ForeignKey("schools.school_id"), primary_key=True)
+    import_key = Column(String(100), primary_key=True)
+    row_number = Column(Integer, primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.product_id"), nullable=False, index=True)
+    adjustment = Column(Integer, nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), server_default="now()")
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Date, ForeignKey, Integer, Numeric
+
+from app.db.base_class import Base
+
+
+class ProductSalesDaily(Base):
+    """
+    Units and revenue per school, product and calendar day, maintained
+    incrementally as orders change status (see
+    app.services.sales_analytics_service). Sales analytics read these rows
+    instead of scanning order_items joined through orders.
+
+    A sale lands on the day its order became paid (``processing``); a
+    cancellation of a paid order lands on the day it was cancelled.
+    ``category_id`` is the product's category when it last sold that day.
+    """
+
+    __tablename__ = "product_sales_daily"
+
+    # Primary key order serves the (school, day range) scans of every report
+    school_id = Column(Integer, ForeignKey("schools.school_id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.product_id", ondelete="CASCADE"), primary_key=True)
+    category_id = Column(Integer, ForeignKey("product_categories.category_id", ondelete="SET NULL"), nullable=True)
+
+    units_sold = Column(Integer, nullable=False, default=0, server_default="0")
+    revenue = Column(Numeric(12, 2), nullable=False, default=0, server_default="0")
+    units_cancelled = Column(Integer, nullable=False, default=0, server_default="0")
+    revenue_cancelled = Column(Numeric(12, 2), nullable=False, default=0, server_default="0")
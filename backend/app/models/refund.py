@@ -1,4 +1,4 @@
-from sqlalchemy import TIMESTAMP, Column, ForeignKey, Integer, Numeric, String, Text
+from sqlalchemy import TIMESTAMP, Column, ForeignKey, Integer, Numeric, String, Text, UniqueConstraint
 from sqlalchemy.dialects.postgresql import ENUM, UUID
 from sqlalchemy.orm import relationship
 
@@ -7,6 +7,7 @@ from app.db.base_class import Base
 
 class Refund(Base):
     __tablename__ = "refunds"
+    __table_args__ = (UniqueConstraint("batch_id", "payment_id", name="uq_refunds_batch_payment"),)
 
     id = Column(Integer, primary_key=True)
     payment_id = Column(Integer, ForeignKey("payments.id"), nullable=False)
@@ -24,8 +25,15 @@ class Refund(Base):
     processed_by_user_id = Column(UUID(as_uuid=True), ForeignKey("profiles.user_id"))
     notes = Column(Text)
 
+    # Bulk refund jobs: a refund is queued (pending, without gateway_refund_id) before it is sent.
+    # submitted_at is set when a worker sends it; an old one means the outcome was lost and is looked up.
+    batch_id = Column(Integer, ForeignKey("refund_batches.id"), nullable=True)
+    submitted_at = Column(TIMESTAMP(timezone=True))
+    error_description = Column(Text)
+
     created_at = Column(TIMESTAMP(timezone=True), server_default="now()")
     updated_at = Column(TIMESTAMP(timezone=True), server_default="now()", onupdate="now()")
 
     # Relationship to the original payment
     payment = relationship("Payment")
+    batch = relationship("RefundBatch", back_populates="refunds")
@@ -0,0 +1,29 @@
+from sqlalchemy import TIMESTAMP, Column, ForeignKey, Integer, String, Text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+
+from app.db.base_class import Base
+
+
+class RefundBatch(Base):
+    """
+    A bulk refund job. Its refunds are queued as ``refunds`` rows (``batch_id``)
+    when the job is created and issued at the gateway by
+    app.services.bulk_refund_service, which can resume the job after a crash.
+    """
+
+    __tablename__ = "refund_batches"
+
+    id = Column(Integer, primary_key=True)
+    school_id = Column(Integer, ForeignKey("schools.school_id"), nullable=False, index=True)
+    reason = Column(Text, nullable=False)
+    notes = Column(Text)
+    status = Column(String(20), nullable=False, default="queued")  # see RefundBatchStatus
+
+    requested_by_user_id = Column(UUID(as_uuid=True), ForeignKey("profiles.user_id"))
+
+    created_at = Column(TIMESTAMP(timezone=True), server_default="now()")
+    updated_at = Column(TIMESTAMP(timezone=True), server_default="now()", onupdate="now()")
+    finished_at = Column(TIMESTAMP(timezone=True))
+
+    refunds = relationship("Refund", back_populates="batch", order_by="Refund.id")
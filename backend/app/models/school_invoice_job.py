@@ -0,0 +1,33 @@
+from sqlalchemy import TIMESTAMP, Column, ForeignKey, Integer, String, Text
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.db.base_class import Base
+
+
+class SchoolInvoiceJob(Base):
+    """
+    A school-wide invoice generation job (see
+    app.services.invoice_service.generate_invoices_for_school).
+
+    The job writes its progress here as it goes, so any API process can report
+    it, not only the one running the job.
+    """
+
+    __tablename__ = "school_invoice_jobs"
+
+    job_id = Column(String(32), primary_key=True)  # uuid4 hex
+    school_id = Column(Integer, ForeignKey("schools.school_id"), nullable=False, index=True)
+    fee_term_id = Column(Integer, ForeignKey("fee_terms.id"), nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # pending / running / completed / failed
+    classes_total = Column(Integer, nullable=False, default=0)
+    classes_done = Column(Integer, nullable=False, default=0)
+    students_total = Column(Integer, nullable=False, default=0)
+    invoices_created = Column(Integer, nullable=False, default=0)
+    students_skipped = Column(Integer, nullable=False, default=0)
+    error = Column(Text)
+
+    requested_by_user_id = Column(UUID(as_uuid=True), ForeignKey("profiles.user_id"))
+
+    created_at = Column(TIMESTAMP(timezone=True), server_default="now()")
+    started_at = Column(TIMESTAMP(timezone=True))
+    finished_at = Column(TIMESTAMP(timezone=True))
@@ -0,0 +1,28 @@
+from sqlalchemy import TIMESTAMP, Column, ForeignKey, Index, Integer, String
+
+from app.db.base_class import Base
+
+
+class StockReservation(Base):
+    """
+    Units of a product taken out of stock for an order that is awaiting payment
+    (see app.services.stock_reservation_service).
+
+    A reservation is ``held`` from checkout until the payment is captured
+    (``committed``), or until the payment fails or the hold expires, when the
+    units go back on the shelf (``released``).
+    """
+
+    __tablename__ = "stock_reservations"
+
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey("orders.order_id", ondelete="CASCADE"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.product_id"), nullable=False)
+    school_id = Column(Integer, ForeignKey("schools.school_id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    status = Column(String(20), nullable=False, default="held", server_default="held")  # 'held', 'committed', 'released'
+    expires_at = Column(TIMESTAMP(timezone=True), nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), server_default="now()")
+    released_at = Column(TIMESTAMP(timezone=True))
+
+    __table_args__ = (Index("ix_stock_reservations_held_expires_at", "expires_at", postgresql_where="status = 'held'"),)  # Expiry sweep
@@ -58,3 +58,36 @@ class ClassAttendanceSummaryOut(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+# --- Class roster attendance (one submission for many students, matched by name/roll number) ---
+class RosterAttendanceEntry(BaseModel):
+    student: str = Field(..., min_length=1, description="Student name, roll number or student ID")
+    status: AttendanceStatus = AttendanceStatus.present
+    notes: Optional[str] = None
+
+
+class ClassRosterAttendanceCreate(BaseModel):
+    class_name: str = Field(..., min_length=1, description="e.g. '10A'")
+    date: Date = Field(default_factory=Date.today)
+    period_id: Optional[int] = None
+    entries: list[RosterAttendanceEntry] = Field(..., min_length=1, max_length=200)
+
+
+class RosterAttendanceRowOut(BaseModel):
+    row: int
+    student: str
+    # 'recorded', 'not_found', 'ambiguous', 'duplicate_row' or 'already_recorded'
+    result: str
+    student_id: Optional[int] = None
+    student_name: Optional[str] = None
+    attendance_id: Optional[int] = None
+    candidates: list[str] = Field(default_factory=list)
+
+
+class ClassRosterAttendanceOut(BaseModel):
+    class_id: int
+    date: Date
+    recorded: int
+    skipped: int
+    rows: list[RosterAttendanceRowOut]
@@ -17,7 +17,7 @@ from decimal import Decimal
 from typing import Optional
 from uuid import UUID
 
-from pydantic import BaseModel, Field, computed_field
+from pydantic import BaseModel, Field, computed_field, model_validator
 
 from app.schemas.enums import ProductAvailability
 
@@ -55,6 +55,55 @@ class CartItemUpdateQuantity(BaseModel):
     quantity: int = Field(..., ge=1, le=100, description="New quantity (1-100)")
 
 
+class CartMutationBatch(BaseModel):
+    """
+    Schema for applying many cart changes in one request.
+
+    Business Rules:
+    - add: quantities are added to what is already in the cart
+    - update: quantities replace what is in the cart (the product is added if absent)
+    - remove: products are removed (ignored if not in the cart)
+    - Each product may appear only once across the three lists
+    - The whole batch is rejected if any product is unavailable or short of stock
+
+    Used by: POST /api/v1/carts/me/items/batch
+    """
+
+    add: list[CartItemIn] = Field(default_factory=list, max_length=100, description="Products to add to the cart")
+    update: list[CartItemIn] = Field(default_factory=list, max_length=100, description="Products whose cart quantity is set")
+    remove: list[int] = Field(default_factory=list, max_length=100, description="IDs of products to remove from the cart")
+
+    @model_validator(mode="after")
+    def validate_distinct_products(self):
+        product_ids = [item.product_id for item in self.add] + [item.product_id for item in self.update] + self.remove
+        if not product_ids:
+            raise ValueError("At least one cart change is required")
+        if len(product_ids) != len(set(product_ids)):
+            raise ValueError("Each product may appear only once per batch")
+        return self
+
+    class Config:
+        json_schema_extra = {"example": {"add": [{"product_id": 42, "quantity": 2}], "update": [{"product_id": 17, "quantity": 1}], "remove": [8]}}
+
+
+class CartPackageIn(BaseModel):
+    """
+    Schema for adding a product package (kit) to the cart.
+
+    Business Rules:
+    - Every product of the package is added, quantity x its package quantity
+    - Nothing is added if any product is unavailable or short of stock
+
+    Used by: POST /api/v1/carts/me/packages
+    """
+
+    package_id: int = Field(..., description="ID of the package to add to cart")
+    quantity: int = Field(1, ge=1, le=100, description="Number of packages to add (1-100)")
+
+    class Config:
+        json_schema_extra = {"example": {"package_id": 3, "quantity": 1}}
+
+
 # ============================================================================
 # OUTPUT SCHEMAS (API Responses)
 # ============================================================================
@@ -0,0 +1,27 @@
+# backend/app/schemas/catalog_schema.py
+"""
+Pydantic schema for the school store catalog snapshot.
+
+The catalog bundles everything the parent app needs to render the store
+(active products, categories and packages) into one response that is cached
+per school and served with an ETag (see app.services.catalog_service).
+"""
+
+from pydantic import BaseModel, Field
+
+from app.schemas.product_category_schema import ProductCategoryOut
+from app.schemas.product_package_schema import ProductPackageOut
+from app.schemas.product_schema import ProductOut
+
+
+class SchoolCatalogOut(BaseModel):
+    """
+    Active products, categories and packages of one school.
+
+    Used by: GET /api/v1/products/school/{school_id}/catalog
+    """
+
+    school_id: int
+    products: list[ProductOut] = Field(default_factory=list, description="Active products, ordered by name")
+    categories: list[ProductCategoryOut] = Field(default_factory=list, description="Active categories, in display order")
+    packages: list[ProductPackageOut] = Field(default_factory=list, description="Active packages, ordered by name")
@@ -65,6 +65,15 @@ class RefundStatus(str, enum.Enum):
     CANCELLED = "cancelled"
 
 
+class RefundBatchStatus(str, enum.Enum):
+    """Represents the progress of a bulk refund job."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    INCOMPLETE = "incomplete"  # Some refunds could not be confirmed yet; resume the job
+
+
 class AllocationStatus(str, enum.Enum):
     """Represents the status of a payment allocation to an invoice item."""
 
@@ -85,11 +94,42 @@ class InvoicePaymentStatus(str, enum.Enum):
     OVERDUE = "overdue"
 
 
+class FinanceExportDataset(str, enum.Enum):
+    """Finance tables that can be exported for accounting."""
+
+    INVOICES = "invoices"
+    PAYMENTS = "payments"
+    ALLOCATIONS = "allocations"
+    REFUNDS = "refunds"
+
+
+class ExportFormat(str, enum.Enum):
+    """File formats of the streaming exports."""
+
+    CSV = "csv"
+    XLSX = "xlsx"
+
+
 # ============================================================================
 # E-COMMERCE MODULE ENUMS
 # ============================================================================
 
 
+class SalesInterval(str, enum.Enum):
+    """Bucket size of the sales analytics time series."""
+
+    DAY = "day"
+    WEEK = "week"  # ISO weeks, starting on Monday
+    MONTH = "month"
+
+
+class SalesRanking(str, enum.Enum):
+    """What top-seller lists are ranked by (net of cancellations)."""
+
+    REVENUE = "revenue"
+    UNITS = "units"
+
+
 class OrderStatus(str, enum.Enum):
     """
     Valid statuses for an e-commerce order throughout its lifecycle.
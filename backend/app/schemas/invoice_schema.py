@@ -1,4 +1,4 @@
-from datetime import date
+from datetime import date, datetime
 from decimal import Decimal
 from typing import Optional
 
@@ -40,6 +40,29 @@ class BulkInvoiceCreate(BaseModel):
     fee_term_id: int
 
 
+class SchoolInvoiceCreate(BaseModel):
+    fee_term_id: int
+
+
+# Progress of a school-wide invoice generation job
+class SchoolInvoiceJobOut(BaseModel):
+    job_id: str
+    school_id: int
+    fee_term_id: int
+    status: str
+    classes_total: int
+    classes_done: int
+    students_total: int
+    invoices_created: int
+    students_skipped: int
+    error: Optional[str] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
 # Properties to return to the client
 class InvoiceOut(BaseModel):
     id: int
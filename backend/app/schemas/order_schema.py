@@ -13,12 +13,12 @@ Architectural Notes:
 - Full audit trail with timestamps and status transitions
 """
 
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 from typing import Optional
 from uuid import UUID
 
-from pydantic import BaseModel, Field, computed_field, field_validator
+from pydantic import BaseModel, Field, computed_field, field_validator, model_validator
 
 from app.schemas.enums import OrderItemStatus, OrderStatus, PaymentStatus
 
@@ -287,6 +287,34 @@ class OrderCancel(BaseModel):
         json_schema_extra = {"example": {"reason": "Parent requested cancellation - ordered wrong size", "refund_payment": True}}
 
 
+class OrderBulkCancel(BaseModel):
+    """
+    Schema for cancelling unpaid orders in bulk (Admin only).
+
+    Business Rules:
+    - Either a list of order_ids or older_than_days must be given (never "all orders")
+    - Only pending_payment orders without an authorized/captured payment are cancelled
+    - Stock is restored for every cancelled order
+
+    Used by: POST /api/v1/orders/admin/bulk-cancel
+    """
+
+    order_ids: Optional[list[int]] = Field(None, min_length=1, max_length=5000, description="Orders to cancel")
+
+    older_than_days: Optional[int] = Field(None, ge=1, le=365, description="Cancel every unpaid order placed more than this many days ago")
+
+    reason: str = Field(..., min_length=1, max_length=500, description="Reason for cancellation (mandatory)")
+
+    @model_validator(mode="after")
+    def validate_selection(self):
+        if (self.order_ids is None) == (self.older_than_days is None):
+            raise ValueError("Specify either order_ids or older_than_days")
+        return self
+
+    class Config:
+        json_schema_extra = {"example": {"older_than_days": 7, "reason": "Unpaid for over a week"}}
+
+
 # ============================================================================
 # OUTPUT SCHEMAS (API Responses)
 # ============================================================================
@@ -552,6 +580,15 @@ class OrderFilterParams(BaseModel):
 # ============================================================================
 
 
+class OrderDailyStatistics(BaseModel):
+    """One day of the order statistics series."""
+
+    date: date
+    orders: int = Field(..., description="Orders created that day")
+    revenue: Decimal = Field(..., description="Revenue of the day's orders that were delivered")
+    pending_revenue: Decimal = Field(..., description="Amount of the day's orders still awaiting payment")
+
+
 class OrderStatistics(BaseModel):
     """
     Aggregated order statistics for admin dashboard.
@@ -575,6 +612,8 @@ class OrderStatistics(BaseModel):
 
     average_order_value: Decimal = Field(..., description="Average amount per order (total_revenue / paid_orders)")
 
+    daily: Optional[list[OrderDailyStatistics]] = Field(None, description="Per-day series, when both date_from and date_to are given")
+
     class Config:
         json_schema_extra = {
             "example": {
@@ -589,3 +628,17 @@ class OrderStatistics(BaseModel):
                 "average_order_value": "2635.14",
             }
         }
+
+
+class OrderBulkCancelResult(BaseModel):
+    """
+    Outcome of a bulk cancellation.
+
+    Used by: POST /api/v1/orders/admin/bulk-cancel
+    """
+
+    orders_cancelled: int = Field(..., description="Number of orders cancelled")
+    units_restocked: int = Field(..., description="Product units put back in stock")
+    chunks: int = Field(..., description="Number of committed chunks the run was split into")
+    cancelled_order_ids: list[int] = Field(default_factory=list)
+    skipped_order_ids: list[int] = Field(default_factory=list, description="Requested orders left alone: paid, not pending, in another school or locked by another operation")
@@ -0,0 +1,12 @@
+from typing import Generic, Optional, TypeVar
+
+from pydantic import BaseModel
+
+T = TypeVar("T")
+
+
+# One page of a keyset-paginated listing (see app.services.pagination)
+class Page(BaseModel, Generic[T]):
+    items: list[T]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page; None on the last page
+    total: Optional[int] = None  # Rows matching the filters, from a short-lived cached count
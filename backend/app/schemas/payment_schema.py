@@ -24,7 +24,9 @@ class PaymentCreate(PaymentBase):
 
 class PaymentOut(PaymentBase):
     id: int
-    invoice_id: int
+    invoice_id: Optional[int] = None  # None for e-commerce order payments
+    order_id: Optional[int] = None
+    created_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -64,7 +66,22 @@ class PaymentHealthStats(BaseModel):
     failed_allocations_24h: int
 
 
+class ReconciliationRunStats(BaseModel):
+    kind: str  # "pending" or "authorized"
+    started_at: datetime
+    duration_seconds: float
+    processed: int
+    updated: int
+    batches: int
+    schools: int
+    gateway_calls: int
+    payments_per_second: float
+
+
 class ReconciliationReportStats(BaseModel):
     webhooks_processed_24h: int
     webhooks_failed_24h: int
     reconciled_via_task_24h: int
+    # Runs of the reconciliation jobs over the last 24 hours, newest first
+    recent_runs: list[ReconciliationRunStats] = []
+    payments_per_second_24h: Optional[float] = None
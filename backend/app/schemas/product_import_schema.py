@@ -0,0 +1,87 @@
+# backend/app/schemas/product_import_schema.py
+"""
+Schemas for bulk product import (supplier spreadsheets, term restocks).
+
+A file row becomes a :class:`ProductImportRow`. Blank cells mean "leave as is"
+for existing products. New products need at least ``name`` and ``price``.
+"""
+
+from decimal import Decimal
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+
+
+class ProductImportRow(BaseModel):
+    """One row of an import file, keyed by SKU."""
+
+    model_config = ConfigDict(extra="ignore", str_strip_whitespace=True)
+
+    sku: str = Field(..., min_length=1, max_length=100)
+    name: Optional[str] = Field(None, min_length=1, max_length=255)
+    price: Optional[Decimal] = Field(None, gt=0)
+    category_id: Optional[int] = None
+    stock_quantity: Optional[int] = Field(None, ge=0, description="New absolute stock level")
+    stock_adjustment: Optional[int] = Field(None, description="Units to add (or remove, if negative); applied once per import_key")
+    description: Optional[str] = Field(None, max_length=2000)
+    manufacturer: Optional[str] = Field(None, max_length=255)
+    image_url: Optional[str] = Field(None, max_length=500)
+    reorder_level: Optional[int] = Field(None, ge=0)
+    reorder_quantity: Optional[int] = Field(None, ge=1)
+    is_active: Optional[bool] = None
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def blank_is_missing(cls, v):
+        """Empty CSV cells are treated as not given."""
+        if isinstance(v, str) and not v.strip():
+            return None
+        return v
+
+    @field_validator("sku")
+    @classmethod
+    def validate_sku(cls, v: str) -> str:
+        """Ensure SKU is uppercase and alphanumeric, as on ProductCreate."""
+        v = v.upper()
+        if not v.replace("-", "").replace("_", "").isalnum():
+            raise ValueError("SKU must be alphanumeric (hyphens and underscores allowed)")
+        return v
+
+    @field_validator("price")
+    @classmethod
+    def validate_price(cls, v: Optional[Decimal]) -> Optional[Decimal]:
+        """Ensure price has at most 2 decimal places."""
+        if v is not None and v.as_tuple().exponent < -2:
+            raise ValueError("Price cannot have more than 2 decimal places")
+        return v
+
+    @model_validator(mode="after")
+    def one_kind_of_stock_change(self):
+        if self.stock_quantity is not None and self.stock_adjustment is not None:
+            raise ValueError("Give either stock_quantity or stock_adjustment, not both")
+        return self
+
+
+class ProductImportRowError(BaseModel):
+    """Why one row of the file was not imported (rows are numbered from 1, after the CSV header)."""
+
+    row: int
+    sku: Optional[str] = None
+    errors: list[str]
+
+
+class ProductImportResult(BaseModel):
+    """
+    Outcome of an import.
+
+    Used by: POST /api/v1/admin/products/import
+    """
+
+    rows: int = Field(..., description="Data rows read from the file")
+    created: int
+    updated: int
+    adjustments_applied: int
+    adjustments_already_applied: int = Field(..., description="Stock adjustments skipped because this import_key already applied them")
+    chunks: int = Field(..., description="Chunks committed; each chunk is committed on its own")
+    error_count: int
+    errors: list[ProductImportRowError] = Field(default_factory=list, description="Per-row errors (the first PRODUCT_IMPORT_MAX_REPORTED_ERRORS)")
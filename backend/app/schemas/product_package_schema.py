@@ -305,6 +305,7 @@ class ProductPackageOut(BaseModel):
 
     # Hydrated items list (with full product details)
     items: list[PackageItemOut] = Field(default_factory=list, description="List of products in this package with quantities and details")
+    available_quantity: Optional[int] = Field(None, description="How many packages the component stock covers: min(stock // quantity) over the items, 0 if any is discontinued")
 
     # Timestamps for audit trail
     created_at: datetime
@@ -430,6 +431,7 @@ class ProductPackageOut(BaseModel):
                 "savings_percentage": "12.50",
                 "all_items_available": True,
                 "is_purchasable": True,
+                "available_quantity": 22,
             }
         }
 
@@ -438,12 +440,13 @@ class ProductPackageListOut(BaseModel):
     """
     Minimal package representation for list endpoints.
 
-    Used by: GET /api/v1/product-packages (browsing catalog)
+    Used by: GET /api/v1/admin/product-packages/summaries
 
     Design Rationale:
     - Lighter payload than ProductPackageOut
     - Excludes individual item details (reduces bandwidth)
     - Includes enough info for "package card" UI component
+    - Totals and availability are aggregated by the database (no items are loaded)
     """
 
     id: int
@@ -454,13 +457,23 @@ class ProductPackageListOut(BaseModel):
     category: Optional[str] = None
     is_active: bool
 
+    item_count: int = Field(0, description="Total items in package")
+    unique_product_count: int = Field(0, description="Number of distinct products")
+    calculated_price: Decimal = Field(Decimal("0.00"), description="Sum of item subtotals (quantity x current price)")
+    all_items_available: bool = Field(True, description="No component product is discontinued")
+    available_quantity: Optional[int] = Field(None, description="How many packages the component stock covers (null for a package without items)")
+
     @computed_field
     @property
-    def item_count(self) -> int:
-        """Total items in package (computed in service layer from items list)."""
-        # Note: This will be populated by service layer using a subquery
-        # Format: SELECT COUNT(*) FROM package_items WHERE package_id = ...
-        return 0  # Placeholder, overridden by service layer
+    def effective_price(self) -> Decimal:
+        """Computed field: Actual price customer pays (package price, else sum of items)."""
+        return self.price if self.price is not None else self.calculated_price
+
+    @computed_field
+    @property
+    def is_purchasable(self) -> bool:
+        """Computed field: Whether package can be added to cart (active, no discontinued items)."""
+        return self.is_active and self.all_items_available
 
     class Config:
         from_attributes = True
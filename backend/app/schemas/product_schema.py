@@ -19,6 +19,7 @@ from typing import Optional
 from pydantic import BaseModel, Field, computed_field, field_validator
 
 from app.schemas.enums import ProductAvailability
+from app.schemas.pagination_schema import Page
 
 # ============================================================================
 # INPUT SCHEMAS (Request Bodies)
@@ -384,6 +385,24 @@ class ProductFilterParams(BaseModel):
     search: Optional[str] = Field(None, max_length=100, description="Search in product name and description")
 
 
+class ProductSearchFacet(BaseModel):
+    """Number of search matches in one category (category_id is None for uncategorized products)."""
+
+    category_id: Optional[int] = None
+    category_name: Optional[str] = None
+    count: int
+
+
+class ProductSearchPage(Page[ProductOut]):
+    """
+    One page of product search results, best match first.
+
+    Used by: GET /api/v1/products/school/{school_id}/search
+    """
+
+    facets: list[ProductSearchFacet] = Field(default_factory=list, description="Matches per category, over all pages and regardless of the category filter")
+
+
 # ============================================================================
 # BULK OPERATION SCHEMAS
 # ============================================================================
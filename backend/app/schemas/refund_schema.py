@@ -1,8 +1,11 @@
+from datetime import datetime
 from decimal import Decimal
 from typing import Optional
 from uuid import UUID
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
+
+from app.schemas.enums import RefundBatchStatus
 
 
 class RefundCreate(BaseModel):
@@ -20,6 +23,51 @@ class RefundOut(BaseModel):
     reason: str
     status: str
     gateway_refund_id: Optional[str] = None
+    batch_id: Optional[int] = None
+    error_description: Optional[str] = None
 
     class Config:
         from_attributes = True
+
+
+class RefundBatchCreate(BaseModel):
+    """
+    Payments to refund in full (what is left of them after earlier refunds):
+    the listed payments, plus every refundable payment of the listed orders and
+    invoices. Payments of other schools, or that are not captured, are ignored.
+    """
+
+    payment_ids: list[int] = Field(default_factory=list, max_length=1000)
+    order_ids: list[int] = Field(default_factory=list, max_length=1000)
+    invoice_ids: list[int] = Field(default_factory=list, max_length=1000)
+    reason: str = Field(..., min_length=1)
+    notes: Optional[str] = None
+
+    @model_validator(mode="after")
+    def require_a_selection(self) -> "RefundBatchCreate":
+        if not (self.payment_ids or self.order_ids or self.invoice_ids):
+            raise ValueError("Select at least one payment, order or invoice to refund.")
+        return self
+
+
+class RefundBatchOut(BaseModel):
+    """
+    A bulk refund job and the state of each of its refunds. ``queued`` refunds
+    have not been confirmed by the gateway yet; ``pending`` ones were accepted
+    and are settling.
+    """
+
+    id: int
+    school_id: int
+    reason: str
+    notes: Optional[str] = None
+    status: RefundBatchStatus
+    requested_by_user_id: Optional[UUID] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    queued: int = 0
+    pending: int = 0
+    processed: int = 0
+    failed: int = 0
+    amount_refunded: Decimal = Field(Decimal("0.00"), description="Accepted by the gateway (pending or processed)")
+    refunds: list[RefundOut] = Field(default_factory=list)
@@ -0,0 +1,111 @@
+# backend/app/schemas/sales_analytics_schema.py
+"""
+Schemas for the admin sales analytics.
+
+Every figure is read from the daily ``product_sales_daily`` rollup. "Sold"
+means the order was paid; cancellations of paid orders are reported next to
+the sales and subtracted in the ``net_*`` fields.
+"""
+
+from datetime import date
+from decimal import Decimal
+from typing import Optional
+
+from pydantic import BaseModel, Field, computed_field
+
+from app.schemas.enums import SalesInterval
+
+
+class SalesTotals(BaseModel):
+    """Units and revenue sold, and cancelled after payment."""
+
+    units_sold: int = 0
+    revenue: Decimal = Decimal("0.00")
+    units_cancelled: int = 0
+    revenue_cancelled: Decimal = Decimal("0.00")
+
+    @computed_field
+    @property
+    def net_units(self) -> int:
+        return self.units_sold - self.units_cancelled
+
+    @computed_field
+    @property
+    def net_revenue(self) -> Decimal:
+        return self.revenue - self.revenue_cancelled
+
+
+class SalesSeriesPoint(SalesTotals):
+    """One bucket of a time series; buckets without sales are zeros."""
+
+    period_start: date = Field(..., description="First day of the bucket (the Monday of a week, the 1st of a month)")
+
+
+class SalesTimeSeriesOut(BaseModel):
+    """
+    Sales per day, week or month.
+
+    Used by: GET /api/v1/admin/sales-analytics/timeseries
+    """
+
+    date_from: date
+    date_to: date
+    interval: SalesInterval
+    product_id: Optional[int] = None
+    category_id: Optional[int] = None
+    points: list[SalesSeriesPoint]
+
+
+class TopProductSalesOut(SalesTotals):
+    """
+    One product of a top-seller list.
+
+    Used by: GET /api/v1/admin/sales-analytics/top-products
+    """
+
+    product_id: int
+    product_name: str
+    sku: Optional[str] = None
+    category_id: Optional[int] = None
+
+
+class CategorySalesOut(SalesTotals):
+    """
+    Sales of one product category (null: products without a category).
+
+    Used by: GET /api/v1/admin/sales-analytics/categories
+    """
+
+    category_id: Optional[int] = None
+    category_name: Optional[str] = None
+
+
+class CategorySalesComparison(BaseModel):
+    category_id: Optional[int] = None
+    category_name: Optional[str] = None
+    current: SalesTotals
+    previous: SalesTotals
+
+
+class SalesComparisonOut(BaseModel):
+    """
+    Sales of a period against an earlier one (e.g. this term against last term).
+
+    Used by: GET /api/v1/admin/sales-analytics/comparison
+    """
+
+    current_from: date
+    current_to: date
+    previous_from: date
+    previous_to: date
+    current: SalesTotals
+    previous: SalesTotals
+    categories: list[CategorySalesComparison] = Field(default_factory=list, description="Per category, ordered by current net revenue")
+
+    @computed_field
+    @property
+    def net_revenue_change_percentage(self) -> Optional[Decimal]:
+        """Change of net revenue against the previous period; null when the previous period had none."""
+        if self.previous.net_revenue == 0:
+            return None
+        return ((self.current.net_revenue - self.previous.net_revenue) / self.previous.net_revenue * 100).quantize(Decimal("0.01"))
@@ -195,3 +195,39 @@ class TimetableSwapResponse(BaseModel):
     message: str
     swapped_entries: Optional[list[TimetableEntryOut]] = None
     conflict_details: Optional[str] = None
+
+
+# ============= OCCUPANCY INDEX SCHEMAS =============
+
+
+class FreeTeacherOut(BaseModel):
+    teacher_id: int
+    teacher_name: str
+    department: Optional[str] = None
+    subject_specialization: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class FreeTeachersResponse(BaseModel):
+    """
+    Teachers without a timetable entry in the requested slot (substitution planning).
+    """
+
+    day_of_week: int = Field(..., ge=1, le=7, description="1=Monday, 7=Sunday")
+    period_number: int
+    free_teachers: list[FreeTeacherOut]
+    busy_teacher_ids: list[int]
+    total_free_teachers: int
+
+
+class OccupancySlotOut(BaseModel):
+    """
+    Busy/free teacher counts for one (day, period) slot of the occupancy index.
+    """
+
+    day_of_week: int
+    period_number: int
+    busy_teacher_ids: list[int]
+    free_teacher_count: int
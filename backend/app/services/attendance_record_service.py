@@ -12,7 +12,11 @@ from app.schemas.attendance_record_schema import (
     AttendanceRecordBulkCreate,
     AttendanceRecordCreate,
     AttendanceRecordUpdate,
+    ClassRosterAttendanceCreate,
+    ClassRosterAttendanceOut,
+    RosterAttendanceRowOut,
 )
+from app.services import student_service
 
 
 async def create_attendance_record(db: AsyncSession, attendance_in: AttendanceRecordCreate) -> AttendanceRecord:
@@ -102,6 +106,79 @@ async def bulk_create_attendance_records(db: AsyncSession, *, attendance_data: A
     return db_records
 
 
+def _roster_student_name(student) -> Optional[str]:
+    profile = student.profile
+    return f"{profile.first_name or ''} {profile.last_name or ''}".strip() if profile else None
+
+
+async def record_class_roster_attendance(db: AsyncSession, *, class_id: int, roster_in: ClassRosterAttendanceCreate, teacher_id: Optional[int] = None) -> ClassRosterAttendanceOut:
+    """
+    Records attendance for many students of a class from a roster of names, roll numbers or IDs.
+    Students are resolved against the class roster in one query, rows already recorded for the
+    date/period are skipped, and the remaining rows are written in a single transaction.
+    """
+    matches = await student_service.match_class_roster(db, class_id=class_id, lookups=[entry.student for entry in roster_in.entries])
+    matched_ids = {match.student.student_id for match in matches if match.student is not None}
+
+    existing_ids: set[int] = set()
+    if matched_ids:
+        period_filter = AttendanceRecord.period_id.is_(None) if roster_in.period_id is None else AttendanceRecord.period_id == roster_in.period_id
+        stmt = select(AttendanceRecord.student_id).where(
+            AttendanceRecord.class_id == class_id,
+            AttendanceRecord.date == roster_in.date,
+            period_filter,
+            AttendanceRecord.student_id.in_(matched_ids),
+        )
+        existing_ids = set((await db.execute(stmt)).scalars().all())
+
+    rows: list[RosterAttendanceRowOut] = []
+    payloads: list[AttendanceRecordCreate] = []
+    pending: dict[int, RosterAttendanceRowOut] = {}
+    for index, (entry, match) in enumerate(zip(roster_in.entries, matches), start=1):
+        row = RosterAttendanceRowOut(row=index, student=entry.student, result=match.status)
+        rows.append(row)
+        if match.student is None:
+            row.candidates = [_roster_student_name(candidate) or str(candidate.student_id) for candidate in match.candidates]
+            continue
+
+        student = match.student
+        row.student_id = student.student_id
+        row.student_name = _roster_student_name(student)
+        if student.student_id in pending:
+            row.result = "duplicate_row"
+            continue
+        if student.student_id in existing_ids:
+            row.result = "already_recorded"
+            continue
+
+        pending[student.student_id] = row
+        payloads.append(
+            AttendanceRecordCreate(
+                student_id=student.student_id,
+                class_id=class_id,
+                status=entry.status,
+                period_id=roster_in.period_id,
+                teacher_id=teacher_id,
+                notes=entry.notes,
+                date=roster_in.date,
+            )
+        )
+
+    records = await bulk_create_attendance_records(db, attendance_data=payloads) if payloads else []
+    for record in records:
+        row = pending[record.student_id]
+        row.result = "recorded"
+        row.attendance_id = record.id
+
+    return ClassRosterAttendanceOut(
+        class_id=class_id,
+        date=roster_in.date,
+        recorded=len(records),
+        skipped=len(rows) - len(records),
+        rows=rows,
+    )
+
+
 async def get_class_attendance_for_date_range(db: AsyncSession, *, class_id: int, start_date: date, end_date: date) -> list[AttendanceRecord]:
     """
     Retrieves all raw attendance records for a specific class within a given date range.
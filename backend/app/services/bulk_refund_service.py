@@ -0,0 +1,230 @@
+# backend/app/services/bulk_refund_service.py
+"""
+Bulk refunds: many payments refunded by one job (e.g. the fees of a cancelled
+event), safe to resume after a crash.
+
+Creating a job queues one ``refunds`` row per payment in the same transaction
+(``batch_id`` set, status pending, no ``gateway_refund_id``) for what is left
+of the payment after earlier refunds. Running it works through the queue in
+chunks claimed with ``SELECT ... FOR UPDATE SKIP LOCKED``. Per chunk:
+
+- the refunds get ``submitted_at`` and are committed before any gateway call,
+  which leases them to this worker for ``REFUND_BATCH_LEASE_SECONDS``;
+- refunds are sent concurrently, bounded by ``REFUND_BATCH_GATEWAY_CONCURRENCY``,
+  with the internal refund id in the gateway notes;
+- the outcomes, the reversal of the refunded invoice allocations and the
+  payments' new status are written with set-based statements and committed
+  together.
+
+A refund is never sent twice. When a lease expires without an outcome (the
+worker crashed, or the gateway call timed out) the refund is first looked up
+among the payment's gateway refunds by its internal id, and only sent if the
+gateway has no such refund. A refund the gateway rejects is marked failed.
+Single refunds (refund_service) are sent and looked up the same way.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Optional
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import func, insert, literal, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.db.session import get_db
+from app.models.payment import Payment
+from app.models.refund import Refund
+from app.models.refund_batch import RefundBatch
+from app.schemas.enums import RefundBatchStatus
+from app.schemas.refund_schema import RefundBatchCreate
+from app.services import razorpay_gateway, refund_service
+from app.services.razorpay_gateway import RazorpayGateway
+
+logger = logging.getLogger(__name__)
+
+REFUND_BATCH_CHUNK_SIZE = int(os.getenv("REFUND_BATCH_CHUNK_SIZE", "50"))
+REFUND_BATCH_GATEWAY_CONCURRENCY = int(os.getenv("REFUND_BATCH_GATEWAY_CONCURRENCY", "8"))
+REFUND_BATCH_LEASE_SECONDS = int(os.getenv("REFUND_BATCH_LEASE_SECONDS", str(refund_service.REFUND_LEASE_SECONDS)))
+
+_QUEUED = refund_service.UNCONFIRMED
+
+
+async def create_refund_batch(db: AsyncSession, *, school_id: int, batch_in: RefundBatchCreate, user_id: Optional[UUID]) -> RefundBatch:
+    """
+    Queues a refund of what is left of every selected payment, and commits.
+    Payments with nothing left to refund (including those already queued by
+    another job) are skipped. The job is run separately (see run_refund_batch).
+    """
+    selection = []
+    if batch_in.payment_ids:
+        selection.append(Payment.id.in_(batch_in.payment_ids))
+    if batch_in.order_ids:
+        selection.append(Payment.order_id.in_(batch_in.order_ids))
+    if batch_in.invoice_ids:
+        selection.append(Payment.invoice_id.in_(batch_in.invoice_ids))
+    refundable = select(Payment.id).where(Payment.school_id == school_id, Payment.status.in_(refund_service.REFUNDABLE_STATUSES), Payment.gateway_payment_id.isnot(None), or_(*selection))
+
+    # Lock the payments first: a concurrent job waits here, then sees this job's refunds when it computes what is left.
+    payment_ids = list((await db.execute(refundable.order_by(Payment.id).with_for_update())).scalars().all())
+    if not payment_ids:
+        raise HTTPException(status_code=404, detail="No refundable payments match the selection.")
+
+    batch = RefundBatch(school_id=school_id, reason=batch_in.reason, notes=batch_in.notes, status=RefundBatchStatus.QUEUED.value, requested_by_user_id=user_id)
+    db.add(batch)
+    await db.flush()
+
+    refunded = select(func.coalesce(func.sum(Refund.amount), 0)).where(Refund.payment_id == Payment.id, Refund.status.in_(("pending", "processed"))).scalar_subquery()
+    remaining = Payment.amount_paid - refunded
+    queue = select(Payment.id, remaining, Payment.currency, literal(batch_in.reason), literal(batch_in.notes, Refund.notes.type), literal(user_id, Refund.processed_by_user_id.type), literal(batch.id)).where(Payment.id.in_(payment_ids), remaining > 0)
+    queued = await db.execute(insert(Refund).from_select(["payment_id", "amount", "currency", "reason", "notes", "processed_by_user_id", "batch_id"], queue))
+    if not queued.rowcount:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="The selected payments have nothing left to refund.")
+
+    await db.commit()
+    logger.info(f"Refund batch {batch.id} (school {school_id}): {queued.rowcount} refund(s) queued")
+    return batch
+
+
+async def _claim_chunk(db: AsyncSession, batch_id: int, after_id: int) -> list[tuple[Refund, str]]:
+    """Next queued refunds after ``after_id`` that no worker holds, with their gateway payment ids; leases them and commits."""
+    lease_expired = datetime.now(timezone.utc) - timedelta(seconds=REFUND_BATCH_LEASE_SECONDS)
+    stmt = (
+        select(Refund, Payment.gateway_payment_id)
+        .join(Payment, Payment.id == Refund.payment_id)
+        .where(Refund.batch_id == batch_id, Refund.id > after_id, *_QUEUED, or_(Refund.submitted_at.is_(None), Refund.submitted_at < lease_expired))
+        .order_by(Refund.id)
+        .limit(REFUND_BATCH_CHUNK_SIZE)
+        .with_for_update(of=Refund, skip_locked=True)
+    )
+    claimed = [(refund, gateway_payment_id) for refund, gateway_payment_id in (await db.execute(stmt)).all()]
+    if claimed:
+        await db.execute(update(Refund).where(Refund.id.in_([refund.id for refund, _ in claimed])).values(submitted_at=func.now()).execution_options(synchronize_session=False))
+    await db.commit()
+    return claimed
+
+
+async def _send(semaphore: asyncio.Semaphore, gateway: RazorpayGateway, refund: Refund, gateway_payment_id: str, resumed: bool) -> dict:
+    async with semaphore:
+        return await refund_service.send_refund(gateway, refund, gateway_payment_id, resumed=resumed)
+
+
+async def _record_outcomes(db: AsyncSession, batch: RefundBatch, claimed: list[tuple[Refund, str]], outcomes: list[dict]) -> None:
+    await refund_service.record_refund_outcomes(db, [refund for refund, _ in claimed], outcomes, user_id=batch.requested_by_user_id)
+    await db.commit()
+
+
+async def run_refund_batch(db: AsyncSession, batch_id: int) -> RefundBatch:
+    """
+    Sends the job's queued refunds. Safe to run again at any time - after a
+    crash, or while another worker runs the same job - and the job is
+    ``completed`` once no refund is left waiting for the gateway.
+    """
+    batch = await db.get(RefundBatch, batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Refund batch not found.")
+    if batch.status == RefundBatchStatus.COMPLETED.value:
+        return batch
+
+    gateway = await razorpay_gateway.get_school_gateway(db, batch.school_id)
+    batch.status = RefundBatchStatus.RUNNING.value
+    await db.commit()
+
+    semaphore = asyncio.Semaphore(max(REFUND_BATCH_GATEWAY_CONCURRENCY, 1))
+    after_id = 0
+    outcomes = Counter()
+    while True:
+        claimed = await _claim_chunk(db, batch.id, after_id)
+        if not claimed:
+            break
+        after_id = claimed[-1][0].id
+
+        chunk_outcomes = await asyncio.gather(*(_send(semaphore, gateway, refund, gateway_payment_id, resumed=refund.submitted_at is not None) for refund, gateway_payment_id in claimed))
+        try:
+            await _record_outcomes(db, batch, claimed, chunk_outcomes)
+        except Exception as exc:
+            # The gateway outcomes are lost with the rollback; the leases expire and the refunds are looked up on the next run.
+            logger.error(f"Refund batch {batch.id}: recording the chunk ending at Refund {after_id} failed: {exc}", exc_info=True)
+            await db.rollback()
+            continue
+        outcomes.update("queued" if not outcome["gateway_refund_id"] and outcome["status"] != "failed" else outcome["status"] for outcome in chunk_outcomes)
+
+        if len(claimed) < REFUND_BATCH_CHUNK_SIZE:
+            break
+
+    waiting = await db.scalar(select(func.count()).select_from(Refund).where(Refund.batch_id == batch.id, *_QUEUED))
+    batch.status = RefundBatchStatus.INCOMPLETE.value if waiting else RefundBatchStatus.COMPLETED.value
+    batch.finished_at = None if waiting else datetime.now(timezone.utc)
+    await db.commit()
+    logger.info(f"Refund batch {batch.id}: {dict(outcomes)}, {waiting} refund(s) still waiting for the gateway")
+    return batch
+
+
+async def get_refund_batch(db: AsyncSession, batch_id: int, school_id: int) -> dict:
+    """The job with its refunds and how many are in each state."""
+    stmt = select(RefundBatch).options(selectinload(RefundBatch.refunds)).where(RefundBatch.id == batch_id, RefundBatch.school_id == school_id)
+    batch = (await db.execute(stmt)).scalars().first()
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Refund batch not found.")
+
+    states = Counter("queued" if refund.status == "pending" and refund.gateway_refund_id is None else refund.status for refund in batch.refunds)
+    amount_refunded = sum((Decimal(refund.amount) for refund in batch.refunds if refund.gateway_refund_id and refund.status != "failed"), Decimal("0.00"))
+    return {
+        "id": batch.id,
+        "school_id": batch.school_id,
+        "reason": batch.reason,
+        "notes": batch.notes,
+        "status": batch.status,
+        "requested_by_user_id": batch.requested_by_user_id,
+        "created_at": batch.created_at,
+        "finished_at": batch.finished_at,
+        **{state: states[state] for state in ("queued", "pending", "processed", "failed")},
+        "amount_refunded": amount_refunded,
+        "refunds": batch.refunds,
+    }
+
+
+async def run_refund_batch_job(batch_id: int) -> None:
+    """Background-task entry point: runs the job in its own session."""
+    async for db in get_db():
+        try:
+            await run_refund_batch(db, batch_id)
+        except Exception as exc:
+            logger.error(f"Refund batch {batch_id} stopped: {exc}", exc_info=True)
+
+
+async def _resume_unfinished(database_url: str, batch_id: Optional[int] = None) -> dict:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    import app.db.base  # noqa: F401  (registers every model, so the mappers configure)
+
+    engine = create_async_engine(database_url)
+    try:
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            stmt = select(RefundBatch.id).where(RefundBatch.status != RefundBatchStatus.COMPLETED.value).order_by(RefundBatch.id)
+            if batch_id is not None:
+                stmt = stmt.where(RefundBatch.id == batch_id)
+            return {unfinished: (await run_refund_batch(db, unfinished)).status for unfinished in (await db.execute(stmt)).scalars().all()}
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resume the refund batches that have not completed (e.g. after a crash).")
+    parser.add_argument("--database-url")
+    parser.add_argument("--batch-id", type=int)
+    args = parser.parse_args()
+
+    if args.database_url is None:
+        from app.core.config import settings
+
+        args.database_url = settings.DATABASE_URL
+
+    print(asyncio.run(_resume_unfinished(args.database_url, batch_id=args.batch_id)))
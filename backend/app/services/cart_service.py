@@ -13,20 +13,29 @@ Security Architecture:
 Performance Optimization:
 - get_cart returns hydrated CartOut with single JOIN query (no N+1)
 - Cart persists across sessions (not session-based)
+- apply_mutations applies many adds/updates/removes in one transaction: one
+  upsert of the cart, one stock validation query, one
+  INSERT ... ON CONFLICT (cart_id, product_id) DO UPDATE, one DELETE, and the
+  hydrated cart read back with a single joined query before commit
+- clear_cart empties the cart with a single DELETE
+- add_package_to_cart checks the stock of every package component in one
+  locking read and adds them all with one upsert
 """
 
 from uuid import UUID
 
 from fastapi import HTTPException, status
-from sqlalchemy import and_, func
+from sqlalchemy import and_, delete, func
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload, raiseload, selectinload
 
 from app.models.cart import Cart
 from app.models.cart_item import CartItem
 from app.models.product import Product
-from app.schemas.cart_schema import CartItemIn
+from app.models.product_package import PackageItem, ProductPackage
+from app.schemas.cart_schema import CartItemIn, CartMutationBatch, CartPackageIn
 
 
 class CartService:
@@ -113,8 +122,6 @@ class CartService:
             HTTPException 404: If product doesn't exist
             HTTPException 400: If product is inactive or insufficient stock
         """
-        print("DEBUG: entering add_item_to_cart with", item_in)
-
         # Get or create cart
         cart = await self.get_or_create_cart(user_id)
 
@@ -295,21 +302,165 @@ class CartService:
         Returns:
             Empty Cart instance
         """
-        # Get cart
-        cart = await self.get_or_create_cart(user_id)
+        cart_id = await self._touch_cart(user_id)
 
-        # Delete all cart items
-        stmt = select(CartItem).where(CartItem.cart_id == cart.cart_id)
-        result = await self.db.execute(stmt)
-        cart_items = result.scalars().all()
+        # One DELETE for all items
+        await self.db.execute(delete(CartItem).where(CartItem.cart_id == cart_id))
+
+        cart = await self._load_cart(cart_id)
+        await self.db.commit()
+        return cart
 
-        for item in cart_items:
-            await self.db.delete(item)
+    async def apply_mutations(self, user_id: UUID, mutations: CartMutationBatch) -> Cart:
+        """
+        Apply a batch of cart changes atomically.
+
+        Business Rules (same as the single-item operations):
+        - Products added or updated must exist and be active
+        - Resulting quantities must not exceed available stock
+        - ``add`` quantities are added to what is already in the cart,
+          ``update`` quantities replace it (the product is added if absent)
+        - ``remove`` ignores products that are not in the cart
+
+        Transaction Steps (one round trip each):
+        1. Upsert the cart (created if missing, updated_at bumped)
+        2. Read products and current cart quantities for validation
+        3. INSERT ... ON CONFLICT (cart_id, product_id) DO UPDATE the resulting quantities
+        4. DELETE removed products
+        5. Read the hydrated cart, then commit
 
-        # Update cart timestamp
-        cart.updated_at = func.now()
+        Returns:
+            Updated Cart instance with hydrated items
 
+        Raises:
+            HTTPException 404: If a product doesn't exist
+            HTTPException 400: If a product is inactive or has insufficient stock
+        """
+        cart_id = await self._touch_cart(user_id)
+
+        changes = [(item, False) for item in mutations.add] + [(item, True) for item in mutations.update]
+        if changes:
+            stmt = (
+                select(Product.product_id, Product.name, Product.is_active, Product.stock_quantity, CartItem.quantity)
+                .outerjoin(CartItem, and_(CartItem.product_id == Product.product_id, CartItem.cart_id == cart_id))
+                .where(Product.product_id.in_([item.product_id for item, _ in changes]))
+            )
+            products = {row.product_id: row for row in (await self.db.execute(stmt)).all()}
+
+            missing = [str(item.product_id) for item, _ in changes if item.product_id not in products]
+            if missing:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Products not found: {', '.join(missing)}")
+
+            rows, validation_errors = [], []
+            for item, replace in changes:
+                product = products[item.product_id]
+                new_quantity = item.quantity if replace else (product.quantity or 0) + item.quantity
+                if not product.is_active:
+                    validation_errors.append(f"Product '{product.name}' is no longer available")
+                elif new_quantity > product.stock_quantity:
+                    validation_errors.append(f"Insufficient stock for '{product.name}'. Requested: {new_quantity}, Available: {product.stock_quantity}")
+                rows.append({"cart_id": cart_id, "product_id": item.product_id, "quantity": new_quantity})
+
+            if validation_errors:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Cart update failed: {'; '.join(validation_errors)}")
+
+            await self._upsert_items(rows)
+
+        if mutations.remove:
+            await self.db.execute(delete(CartItem).where(CartItem.cart_id == cart_id, CartItem.product_id.in_(mutations.remove)))
+
+        cart = await self._load_cart(cart_id)
         await self.db.commit()
+        return cart
 
-        # Return empty cart
-        return await self.get_hydrated_cart(user_id)
+    async def add_package_to_cart(self, user_id: UUID, school_id: int, package_in: CartPackageIn) -> Cart:
+        """
+        Add every product of a package to the cart, all or nothing.
+
+        Business Rules:
+        - The package must belong to the user's school and be active
+        - Each product is added package quantity x its quantity in the package,
+          on top of what is already in the cart
+        - Every product must be active and have stock for its resulting cart
+          quantity; otherwise nothing is added and every shortfall is reported
+        - The cart holds the package's products, priced at their current price
+          (carts and orders have no package lines)
+
+        Transaction Steps (one round trip each):
+        1. Upsert the cart (created if missing, updated_at bumped)
+        2. Read the package's items with their products and current cart
+           quantities, locking the products FOR SHARE so their stock cannot
+           change until commit
+        3. INSERT ... ON CONFLICT (cart_id, product_id) DO UPDATE every product
+        4. Read the hydrated cart, then commit
+
+        Returns:
+            Updated Cart instance with hydrated items
+
+        Raises:
+            HTTPException 404: If the package doesn't exist, is inactive or has no items
+            HTTPException 400: If a product is inactive or has insufficient stock
+        """
+        cart_id = await self._touch_cart(user_id)
+
+        stmt = (
+            select(PackageItem.quantity.label("per_package"), Product.product_id, Product.name, Product.is_active, Product.stock_quantity, CartItem.quantity)
+            .select_from(ProductPackage)
+            .join(PackageItem, PackageItem.package_id == ProductPackage.id)
+            .join(Product, Product.product_id == PackageItem.product_id)
+            .outerjoin(CartItem, and_(CartItem.product_id == Product.product_id, CartItem.cart_id == cart_id))
+            .where(ProductPackage.id == package_in.package_id, ProductPackage.school_id == school_id, ProductPackage.is_active.is_(True))
+            .with_for_update(read=True, of=Product)
+        )
+        components = (await self.db.execute(stmt)).all()
+
+        if not components:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Package with ID {package_in.package_id} not found")
+
+        rows, validation_errors = [], []
+        for product in components:
+            new_quantity = (product.quantity or 0) + product.per_package * package_in.quantity
+            if not product.is_active:
+                validation_errors.append(f"Product '{product.name}' is no longer available")
+            elif new_quantity > product.stock_quantity:
+                validation_errors.append(f"Insufficient stock for '{product.name}'. Requested: {new_quantity}, Available: {product.stock_quantity}")
+            rows.append({"cart_id": cart_id, "product_id": product.product_id, "quantity": new_quantity})
+
+        if validation_errors:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Cannot add package: {'; '.join(validation_errors)}")
+
+        await self._upsert_items(rows)
+
+        cart = await self._load_cart(cart_id)
+        await self.db.commit()
+        return cart
+
+    async def _upsert_items(self, rows: list[dict]) -> None:
+        """Set the quantities of many cart items with one INSERT ... ON CONFLICT (cart_id, product_id) DO UPDATE."""
+        upsert = insert(CartItem).values(rows)
+        await self.db.execute(upsert.on_conflict_do_update(index_elements=[CartItem.cart_id, CartItem.product_id], set_={"quantity": upsert.excluded.quantity}))
+
+    async def _touch_cart(self, user_id: UUID) -> int:
+        """Create the user's cart if needed and bump its updated_at, in one upsert; returns the cart_id."""
+        stmt = insert(Cart).values(user_id=user_id).on_conflict_do_update(index_elements=[Cart.user_id], set_={"updated_at": func.now()}).returning(Cart.cart_id)
+        return (await self.db.execute(stmt)).scalar_one()
+
+    async def _load_cart(self, cart_id: int) -> Cart:
+        """
+        The cart with items and products in a single joined query.
+
+        Only what CartOut renders is loaded; the products' other (selectin)
+        relationships - order items, package items, every cart holding the
+        product - are not.
+        """
+        stmt = (
+            select(Cart)
+            .where(Cart.cart_id == cart_id)
+            .options(
+                joinedload(Cart.items).joinedload(CartItem.product).raiseload("*"),
+                joinedload(Cart.items).raiseload("*"),
+                raiseload("*"),
+            )
+            .execution_options(populate_existing=True)
+        )
+        return (await self.db.execute(stmt)).unique().scalar_one()
@@ -0,0 +1,139 @@
+# backend/app/services/catalog_service.py
+"""Precomputed, ETag-versioned store catalog per school.
+
+Every launch of the parent app used to rebuild the full catalog from
+``get_all_products``, ``get_all_categories`` and ``get_all_packages``: three
+unpaginated listings whose ``selectin`` chains also loaded every product's
+cart items, order items and album links. The catalog only changes when admins
+edit it, so it is now built once per school:
+
+- three queries (categories, products with their category joined, packages
+  aggregated with their items by ``package_summary_query``), loading nothing
+  the response does not use;
+- serialized to JSON once, with a strong ETag derived from the bytes.
+
+Snapshots are cached per school and dropped as soon as a commit writes to a
+catalog table (see :mod:`app.db.write_tracking`). That includes checkout stock
+changes, so stock figures stay exact: stock is taken and put back with
+statements that record the schools of the products they change, so a checkout
+only drops its own school's snapshot. A TTL bounds staleness for writes made by
+other processes. Because the ETag hashes the content, a rebuild that produced
+the same catalog keeps its ETag and clients still get ``304 Not Modified``.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import joinedload, raiseload
+
+from app.db.write_tracking import TableWrites, on_tables_committed
+from app.models.product import Product
+from app.models.product_category import ProductCategory
+from app.schemas.catalog_schema import SchoolCatalogOut
+from app.schemas.product_category_schema import ProductCategoryOut
+from app.schemas.product_package_schema import ProductPackageOut
+from app.schemas.product_schema import ProductOut
+from app.services.product_package_service import ProductPackageService
+
+logger = logging.getLogger(__name__)
+
+CATALOG_CACHE_TTL_SECONDS = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "300"))
+CATALOG_CACHE_CONTROL = "private, no-cache"  # Clients keep the body and revalidate it with If-None-Match on every launch
+_CACHE_MAX_ENTRIES = 1024
+
+# Tables a snapshot is built from; a committed write to any of them drops the school's snapshot.
+SOURCE_TABLES = frozenset({"products", "product_categories", "product_packages", "package_items"})
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """The serialized catalog of one school and its ETag."""
+
+    school_id: int
+    body: bytes
+    etag: str
+    built_at: float = field(default_factory=time.monotonic)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an ``If-None-Match`` header value covers ``etag`` (weak comparison, as RFC 9110 requires)."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in (candidate.removeprefix("W/") for candidate in candidates)
+
+
+async def build_catalog(db: AsyncSession, school_id: int) -> CatalogSnapshot:
+    """Load and serialize the school's active categories, products and packages."""
+    categories = (
+        await db.execute(
+            select(ProductCategory).options(raiseload("*")).where(ProductCategory.school_id == school_id, ProductCategory.is_active.is_(True)).order_by(ProductCategory.display_order.asc().nulls_first(), ProductCategory.category_name.asc())
+        )
+    ).scalars()
+    products = (await db.execute(select(Product).options(joinedload(Product.category).raiseload("*"), raiseload("*")).where(Product.school_id == school_id, Product.is_active.is_(True)).order_by(Product.name.asc()))).scalars()
+    packages = await ProductPackageService(db).get_all_packages(school_id)
+
+    catalog = SchoolCatalogOut(
+        school_id=school_id,
+        categories=[ProductCategoryOut.model_validate(category) for category in categories.all()],
+        products=[ProductOut.model_validate(product) for product in products.all()],
+        packages=[ProductPackageOut.model_validate(package) for package in packages],
+    )
+    body = catalog.model_dump_json().encode()
+    return CatalogSnapshot(school_id=school_id, body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+
+_snapshots: dict[int, CatalogSnapshot] = {}
+_generations: dict[int, int] = defaultdict(int)
+_lock = threading.Lock()
+
+
+async def get_catalog(db: AsyncSession, school_id: int) -> CatalogSnapshot:
+    """Return the school's cached snapshot, building it on first use or after invalidation."""
+    with _lock:
+        cached = _snapshots.get(school_id)
+        if cached is not None and time.monotonic() - cached.built_at < CATALOG_CACHE_TTL_SECONDS:
+            return cached
+        generation = _generations[school_id]
+
+    snapshot = await build_catalog(db, school_id)
+
+    with _lock:
+        # A write committed while we were loading makes this snapshot stale; serve it once, don't cache it.
+        if _generations[school_id] == generation:
+            if len(_snapshots) >= _CACHE_MAX_ENTRIES:
+                _snapshots.clear()
+            _snapshots[school_id] = snapshot
+    logger.debug("Built store catalog for school %s", school_id)
+    return snapshot
+
+
+def invalidate_catalog(school_id: Optional[int] = None) -> None:
+    """Drop the cached snapshot of ``school_id``, or of every school when ``None``."""
+    with _lock:
+        schools = set(_generations) | set(_snapshots) if school_id is None else {school_id}
+        for school in schools:
+            _generations[school] += 1
+            _snapshots.pop(school, None)
+
+
+def _invalidate_on_write(writes: TableWrites) -> None:
+    affected: set[Optional[int]] = set()
+    for table in SOURCE_TABLES.intersection(writes):
+        affected.update(writes[table])
+    if None in affected:
+        invalidate_catalog()
+        return
+    for school_id in affected:
+        invalidate_catalog(school_id)
+
+
+on_tables_committed(_invalidate_on_write)
@@ -1,7 +1,8 @@
 # backend/app/services/class_service.py
+import re
 from typing import Optional
 
-from sqlalchemy import delete, insert, update
+from sqlalchemy import delete, func, insert, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import raiseload, selectinload
@@ -193,3 +194,37 @@ async def search_classes(db: AsyncSession, *, school_id: int, filters: dict) ->
 
     result = await db.execute(stmt)
     return list(result.scalars().all())
+
+
+def parse_class_name(class_name: str) -> Optional[tuple[int, str]]:
+    """
+    Splits names like '10A', '10 A', '10-B' or 'Grade 10 A' into (grade_level, section).
+    """
+    cleaned = re.sub(r"grade\s+", "", class_name.strip(), flags=re.IGNORECASE)
+    match = re.match(r"(?P<grade>\d{1,2})\s*[-/]?\s*(?P<section>[A-Za-z0-9 ]+)$", cleaned)
+    if not match:
+        return None
+    return int(match.group("grade")), match.group("section").strip()
+
+
+async def find_active_classes_by_name(db: AsyncSession, *, school_id: int, class_name: str) -> list[Class]:
+    """
+    Finds the active classes of a school matching a human-readable class name such as '10A'.
+    More than one result means the name exists in several academic years.
+    """
+    parsed = parse_class_name(class_name)
+    if not parsed:
+        return []
+    grade_level, section = parsed
+    stmt = (
+        select(Class)
+        .where(
+            Class.school_id == school_id,
+            Class.is_active,
+            Class.grade_level == grade_level,
+            func.lower(Class.section) == section.lower(),
+        )
+        .order_by(Class.academic_year_id.desc())
+    )
+    result = await db.execute(stmt)
+    return list(result.scalars().all())
@@ -0,0 +1,180 @@
+# backend/app/services/finance_export_service.py
+"""
+Streaming finance exports (invoices, payments, allocations, refunds) for accountants.
+
+Rows are read through a server-side cursor (``session.stream`` with
+``yield_per``) and encoded batch by batch into CSV or XLSX, so memory use stays
+flat however many rows a school has, and the download starts as soon as the
+first batch arrives.
+
+A ``StreamingResponse`` body runs after the request's ``get_db`` session has
+been closed, so each export opens a session of its own for the lifetime of the
+stream.
+"""
+
+import csv
+import io
+import os
+from collections.abc import AsyncIterator, Sequence
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from app.db.session import db_context
+from app.models.invoice import Invoice
+from app.models.invoice_item import InvoiceItem
+from app.models.payment import Payment
+from app.models.payment_allocation import PaymentAllocation
+from app.models.profile import Profile
+from app.models.refund import Refund
+from app.models.student import Student
+from app.schemas.enums import ExportFormat, FinanceExportDataset
+from app.services.xlsx_stream import XlsxStreamWriter
+
+FINANCE_EXPORT_BATCH_SIZE = int(os.getenv("FINANCE_EXPORT_BATCH_SIZE", "1000"))
+
+MEDIA_TYPES = {ExportFormat.CSV: "text/csv; charset=utf-8", ExportFormat.XLSX: "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"}
+
+# Spreadsheet applications evaluate CSV cells starting with these as formulas
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+_COLUMNS = {
+    FinanceExportDataset.INVOICES: [
+        ("invoice_id", Invoice.id),
+        ("invoice_number", Invoice.invoice_number),
+        ("student_id", Invoice.student_id),
+        ("fee_term_id", Invoice.fee_term_id),
+        ("status", Invoice.status),
+        ("payment_status", Invoice.payment_status),
+        ("amount_due", Invoice.amount_due),
+        ("amount_paid", Invoice.amount_paid),
+        ("late_fee_applied", Invoice.late_fee_applied),
+        ("fine_amount", Invoice.fine_amount),
+        ("due_date", Invoice.due_date),
+        ("payment_date", Invoice.payment_date),
+        ("created_at", Invoice.created_at),
+    ],
+    FinanceExportDataset.PAYMENTS: [
+        ("payment_id", Payment.id),
+        ("invoice_id", Payment.invoice_id),
+        ("order_id", Payment.order_id),
+        ("student_id", Payment.student_id),
+        ("amount_paid", Payment.amount_paid),
+        ("currency", Payment.currency),
+        ("status", Payment.status),
+        ("reconciliation_status", Payment.reconciliation_status),
+        ("method", Payment.method),
+        ("gateway_payment_id", Payment.gateway_payment_id),
+        ("gateway_order_id", Payment.gateway_order_id),
+        ("created_at", Payment.created_at),
+    ],
+    FinanceExportDataset.ALLOCATIONS: [
+        ("allocation_id", PaymentAllocation.id),
+        ("payment_id", PaymentAllocation.payment_id),
+        ("gateway_payment_id", Payment.gateway_payment_id),
+        ("invoice_id", InvoiceItem.invoice_id),
+        ("invoice_item_id", PaymentAllocation.invoice_item_id),
+        ("component_name", InvoiceItem.component_name),
+        ("amount_allocated", PaymentAllocation.amount_allocated),
+        ("notes", PaymentAllocation.notes),
+        ("created_at", PaymentAllocation.created_at),
+    ],
+    FinanceExportDataset.REFUNDS: [
+        ("refund_id", Refund.id),
+        ("payment_id", Refund.payment_id),
+        ("gateway_payment_id", Payment.gateway_payment_id),
+        ("gateway_refund_id", Refund.gateway_refund_id),
+        ("amount", Refund.amount),
+        ("currency", Refund.currency),
+        ("status", Refund.status),
+        ("reason", Refund.reason),
+        ("notes", Refund.notes),
+        ("created_at", Refund.created_at),
+    ],
+}
+
+
+def export_query(dataset: FinanceExportDataset, *, school_id: int, created_from: Optional[datetime] = None, created_to: Optional[datetime] = None) -> tuple[list[str], Select]:
+    """
+    Column headers and the school-scoped query of one export, in id order.
+    ``created_to`` is exclusive.
+    """
+    columns = _COLUMNS[dataset]
+    stmt = select(*(column for _, column in columns))
+
+    if dataset is FinanceExportDataset.INVOICES:
+        # Same scoping as the invoice listings: through the student's profile
+        stmt = stmt.join(Student, Invoice.student_id == Student.student_id).join(Profile, Student.user_id == Profile.user_id).where(Profile.school_id == school_id, Invoice.is_active.is_(True))
+        root = Invoice
+    elif dataset is FinanceExportDataset.PAYMENTS:
+        stmt = stmt.where(Payment.school_id == school_id)
+        root = Payment
+    elif dataset is FinanceExportDataset.ALLOCATIONS:
+        stmt = stmt.join(Payment, PaymentAllocation.payment_id == Payment.id).join(InvoiceItem, PaymentAllocation.invoice_item_id == InvoiceItem.id).where(Payment.school_id == school_id)
+        root = PaymentAllocation
+    else:
+        stmt = stmt.join(Payment, Refund.payment_id == Payment.id).where(Payment.school_id == school_id)
+        root = Refund
+
+    if created_from is not None:
+        stmt = stmt.where(root.created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(root.created_at < created_to)
+    return [header for header, _ in columns], stmt.order_by(root.id)
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class _CsvEncoder:
+    def __init__(self, headers: Sequence[str]) -> None:
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._headers = headers
+
+    def _drain(self) -> bytes:
+        data = self._buffer.getvalue().encode()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def start(self) -> bytes:
+        self._writer.writerow(self._headers)
+        return "\ufeff".encode() + self._drain()  # BOM, so Excel reads the file as UTF-8
+
+    def write_rows(self, rows: Sequence[Sequence[Any]]) -> bytes:
+        self._writer.writerows([_csv_value(value) for value in row] for row in rows)
+        return self._drain()
+
+    def close(self) -> bytes:
+        return b""
+
+
+def _open_session() -> AsyncSession:
+    SessionLocal = db_context.get("SessionLocal")
+    if SessionLocal is None:
+        raise RuntimeError("Database engine not initialized. Call init_engine() first.")
+    return SessionLocal()
+
+
+async def stream_export(dataset: FinanceExportDataset, file_format: ExportFormat, *, school_id: int, created_from: Optional[datetime] = None, created_to: Optional[datetime] = None) -> AsyncIterator[bytes]:
+    """Encoded export file, one chunk per ``FINANCE_EXPORT_BATCH_SIZE`` rows."""
+    headers, stmt = export_query(dataset, school_id=school_id, created_from=created_from, created_to=created_to)
+    encoder = XlsxStreamWriter(headers, sheet_name=dataset.value.capitalize()) if file_format is ExportFormat.XLSX else _CsvEncoder(headers)
+
+    yield encoder.start()
+    async with _open_session() as session:
+        result = await session.stream(stmt.execution_options(yield_per=FINANCE_EXPORT_BATCH_SIZE))
+        async for rows in result.partitions():
+            chunk = encoder.write_rows(rows)
+            if chunk:
+                yield chunk
+    chunk = encoder.close()
+    if chunk:
+        yield chunk
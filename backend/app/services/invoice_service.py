@@ -1,16 +1,21 @@
 import logging
-from datetime import date
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
 from decimal import Decimal
-from typing import Optional
-from uuid import UUID
+from typing import Any, Optional
+from uuid import UUID, uuid4
 
-from sqlalchemy import func, select
+from sqlalchemy import case, func, insert, literal, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import noload, selectinload
 
 from app.db.session import get_db
 from app.models.applied_discount import AppliedDiscount
 from app.models.class_fee_structure import ClassFeeStructure
+from app.models.class_model import Class
+from app.models.discount import Discount
 from app.models.fee_component import FeeComponent
 from app.models.fee_term import FeeTerm
 from app.models.invoice import Invoice
@@ -20,13 +25,16 @@ from app.models.invoice_item import InvoiceItem
 from app.models.payment import Payment
 from app.models.payment_allocation import PaymentAllocation
 from app.models.profile import Profile
+from app.models.refund import Refund
+from app.models.school_invoice_job import SchoolInvoiceJob
 from app.models.student import Student
+from app.models.student_fee_assignment import StudentFeeAssignment
 from app.models.student_fee_discount import StudentFeeDiscount
 from app.schemas.invoice_schema import BulkInvoiceCreate, InvoiceCreate, InvoiceUpdate
 from app.schemas.log_schema import LogCreate
 from app.schemas.payment_allocation_schema import PaymentAllocationCreate
 from app.schemas.payment_schema import PaymentCreate
-from app.services import logging_service
+from app.services import fee_engine, logging_service, pagination
 
 
 async def get_invoice(db: AsyncSession, invoice_id: int) -> Optional[Invoice]:
@@ -209,101 +217,315 @@ async def delete_invoice(db: AsyncSession, *, db_obj: Invoice):
 #     return final_invoice
 
 
+def _apply_invoice_totals(invoice: Invoice, total_paid: Decimal) -> None:
+    invoice.amount_paid = total_paid
+    if total_paid >= Decimal(invoice.amount_due):
+        invoice.payment_status = "paid"
+    elif total_paid > 0:
+        invoice.payment_status = "partially_paid"
+    else:
+        invoice.payment_status = "unpaid"
+
+
+async def allocate_payments_to_invoice_items(db: AsyncSession, *, payment_ids: list[int], user_id: Optional[UUID] = None) -> dict[int, list[PaymentAllocation]]:
+    """
+    Allocates many captured payments across their invoices' line items at once,
+    e.g. when reconciliation catches up on a backlog.
+
+    Reads are set-based: one query for the payments and their invoices, one for
+    every invoice item with the amount already allocated to it. Each payment is
+    then poured over its invoice's items in item order (payments in id order, so
+    several payments to one invoice fill it in sequence), and all allocations and
+    invoice totals are written in a single flush. The caller commits.
+
+    Payments without an invoice and payments that already have allocations are
+    skipped, so a catch-up can safely be re-run. ``user_id`` defaults to each
+    payment's own user. Returns the new allocations per payment id.
+    """
+    if not payment_ids:
+        return {}
+
+    allocated = select(PaymentAllocation.id).where(PaymentAllocation.payment_id == Payment.id).exists()
+    payment_stmt = select(Payment, Invoice, allocated).join(Invoice, Invoice.id == Payment.invoice_id).where(Payment.id.in_(payment_ids)).order_by(Payment.id)
+    payment_rows = (await db.execute(payment_stmt)).all()
+
+    payments = []
+    invoices = {}
+    for payment, invoice, already_allocated in payment_rows:
+        if already_allocated:
+            logger.warning(f"Allocation skipped: Payment {payment.id} is already allocated.")
+            continue
+        payments.append(payment)
+        invoices[invoice.id] = invoice
+    if not payments:
+        return {}
+
+    # Every item of the affected invoices with what earlier payments already covered, in one GROUP BY.
+    items_stmt = (
+        select(InvoiceItem, func.coalesce(func.sum(PaymentAllocation.amount_allocated), 0))
+        .outerjoin(PaymentAllocation, PaymentAllocation.invoice_item_id == InvoiceItem.id)
+        .where(InvoiceItem.invoice_id.in_(invoices))
+        .group_by(InvoiceItem.id)
+        .order_by(InvoiceItem.invoice_id, InvoiceItem.id)  # Pay in a predictable order
+    )
+    items_by_invoice: dict[int, list[InvoiceItem]] = {invoice_id: [] for invoice_id in invoices}
+    remaining: dict[int, Decimal] = {}
+    invoice_totals: dict[int, Decimal] = dict.fromkeys(invoices, Decimal("0.0"))
+    for item, already_paid in (await db.execute(items_stmt)).all():
+        items_by_invoice[item.invoice_id].append(item)
+        remaining[item.id] = Decimal(item.final_amount) - Decimal(already_paid)
+        invoice_totals[item.invoice_id] += Decimal(already_paid)
+
+    allocations: dict[int, list[PaymentAllocation]] = {}
+    for payment in payments:
+        amount_to_allocate = Decimal(payment.amount_paid)
+        payment_allocations = []
+        for item in items_by_invoice[payment.invoice_id]:
+            if amount_to_allocate <= 0:
+                break
+            if remaining[item.id] <= 0:
+                continue  # This item is already fully paid, skip to the next one
+
+            # Allocate the smaller of the two amounts: what's left of the payment, or what's needed for the item
+            allocation_amount = min(amount_to_allocate, remaining[item.id])
+            allocation_data = PaymentAllocationCreate(payment_id=payment.id, invoice_item_id=item.id, amount_allocated=allocation_amount, allocated_by_user_id=user_id or payment.user_id)
+            payment_allocations.append(PaymentAllocation(**allocation_data.model_dump()))
+            remaining[item.id] -= allocation_amount
+            amount_to_allocate -= allocation_amount
+
+        invoice_totals[payment.invoice_id] += Decimal(payment.amount_paid) - amount_to_allocate
+        allocations[payment.id] = payment_allocations
+
+    for invoice_id, invoice in invoices.items():
+        _apply_invoice_totals(invoice, invoice_totals[invoice_id])
+
+    new_allocations = [allocation for payment_allocations in allocations.values() for allocation in payment_allocations]
+    if new_allocations:
+        db.add_all(new_allocations)  # One multi-row INSERT on flush
+    # Flush, not commit: callers own the transaction (reconciliation allocates inside a savepoint).
+    await db.flush()
+    return allocations
+
+
 async def allocate_payment_to_invoice_items(db: AsyncSession, *, payment_id: int, user_id: UUID) -> list[PaymentAllocation]:
     """
     Allocates funds from a successful payment across its invoice's line items.
     This creates an immutable audit trail for how money was distributed.
     """
-    # Use selectinload to fetch the related invoice efficiently
-    payment_stmt = select(Payment).options(selectinload(Payment.invoice)).where(Payment.id == payment_id)
-    payment_result = await db.execute(payment_stmt)
-    payment = payment_result.scalars().first()
+    payment = await db.get(Payment, payment_id)
     if not payment or not payment.invoice_id:
         logger.error(f"Allocation failed: Payment {payment_id} or its invoice not found.")
         raise ValueError("Payment or associated invoice not found.")
 
-    invoice = payment.invoice
-    # Fetch the invoice items that need payment
-    stmt = select(InvoiceItem).where(InvoiceItem.invoice_id == payment.invoice_id).order_by(InvoiceItem.id)  # Pay in a predictable order
+    allocations = await allocate_payments_to_invoice_items(db, payment_ids=[payment_id], user_id=user_id)
+    return allocations.get(payment_id, [])
 
-    items_result = await db.execute(stmt)
-    invoice_items = items_result.scalars().all()
 
-    amount_to_allocate = Decimal(payment.amount_paid)
-    allocations_to_create = []
+async def reverse_payment_allocations(db: AsyncSession, *, refund_ids: list[int], user_id: Optional[UUID] = None) -> int:
+    """
+    Takes refunded money back off the invoice items its payment was allocated
+    to, for refunds the gateway has accepted.
+
+    Allocations are never edited: a reversal is a negative allocation of the
+    same payment and item, so the audit trail keeps both. A refund comes off
+    its payment's items last-paid first (the reverse of the allocation order)
+    and never takes more than the payment still has on an item. Both writes are
+    set-based - one INSERT ... SELECT for all the refunds, one UPDATE
+    recomputing the affected invoices' totals - and the caller commits, so the
+    reversal lands in the transaction that records the refund. Returns the
+    number of reversal rows.
+    """
+    if not refund_ids:
+        return 0
+
+    refunded = select(Refund.payment_id, func.sum(Refund.amount).label("amount")).where(Refund.id.in_(refund_ids)).group_by(Refund.payment_id).subquery("refunded")
+    net_allocated = func.sum(PaymentAllocation.amount_allocated)
+    on_items = (
+        select(PaymentAllocation.payment_id, PaymentAllocation.invoice_item_id, net_allocated.label("allocated"))
+        .where(PaymentAllocation.payment_id.in_(select(refunded.c.payment_id)))
+        .group_by(PaymentAllocation.payment_id, PaymentAllocation.invoice_item_id)
+        .having(net_allocated > 0)
+        .subquery("on_items")
+    )
+    # Running total, last-paid item first: how much of the payment the refund has reached once it is through this item
+    reached = func.sum(on_items.c.allocated).over(partition_by=on_items.c.payment_id, order_by=on_items.c.invoice_item_id.desc())
+    ranked = select(on_items, refunded.c.amount.label("refund_amount"), reached.label("reached")).join(refunded, refunded.c.payment_id == on_items.c.payment_id).subquery("ranked")
+    reversed_amount = func.least(ranked.c.allocated, ranked.c.refund_amount - (ranked.c.reached - ranked.c.allocated))
+    reversals = select(ranked.c.payment_id, ranked.c.invoice_item_id, -reversed_amount, literal(user_id, PaymentAllocation.allocated_by_user_id.type), literal("Reversed by refund")).where(reversed_amount > 0)
+    result = await db.execute(insert(PaymentAllocation).from_select(["payment_id", "invoice_item_id", "amount_allocated", "allocated_by_user_id", "notes"], reversals))
+    if not result.rowcount:
+        return 0
+
+    paid = select(func.coalesce(func.sum(PaymentAllocation.amount_allocated), 0)).join(InvoiceItem, InvoiceItem.id == PaymentAllocation.invoice_item_id).where(InvoiceItem.invoice_id == Invoice.id).scalar_subquery()
+    affected = select(Payment.invoice_id).join(Refund, Refund.payment_id == Payment.id).where(Refund.id.in_(refund_ids))
+    # Same rules as _apply_invoice_totals
+    payment_status = case((paid >= Invoice.amount_due, "paid"), (paid > 0, "partially_paid"), else_="unpaid")
+    await db.execute(update(Invoice).where(Invoice.id.in_(affected)).values(amount_paid=paid, payment_status=payment_status).execution_options(synchronize_session=False))
+    return result.rowcount
 
-    for item in invoice_items:
-        if amount_to_allocate <= 0:
-            break
 
-        # --- NEW: PARTIAL PAYMENT LOGIC ---
-        # 2. Calculate how much has already been paid on this specific item from previous payments
-        paid_stmt = select(func.sum(PaymentAllocation.amount_allocated)).where(PaymentAllocation.invoice_item_id == item.id)
-        paid_result = await db.execute(paid_stmt)
-        already_paid_on_item = paid_result.scalar_one_or_none() or Decimal("0.0")
+# --- PUBLIC WRAPPER FUNCTION (HANDLES COMMIT) ---
+async def generate_invoice_for_student(db: AsyncSession, *, obj_in: InvoiceCreate) -> Invoice:
+    """
+    Public-facing function for generating a single invoice.
+    Calls the core logic and handles the final commit and refresh.
+    """
+    db_obj = await _generate_invoice_for_student_core(db=db, obj_in=obj_in)
 
-        # 3. Determine the remaining amount needed for this item
-        amount_needed = Decimal(item.final_amount) - already_paid_on_item
-        if amount_needed <= 0:
-            continue  # This item is already fully paid, skip to the next one
+    new_invoice_id = db_obj.id
+    await db.commit()
 
-        # 4. Allocate the smaller of the two amounts: what's left of the payment, or what's needed for the item
-        allocation_amount = min(amount_to_allocate, amount_needed)
+    stmt = select(Invoice).options(selectinload(Invoice.items)).where(Invoice.id == new_invoice_id)
+    result = await db.execute(stmt)
+    final_invoice = result.scalars().first()
+    return final_invoice
 
-        allocation_data = PaymentAllocationCreate(payment_id=payment.id, invoice_item_id=item.id, amount_allocated=allocation_amount, allocated_by_user_id=user_id)
-        new_allocation = PaymentAllocation(**allocation_data.model_dump())
-        allocations_to_create.append(new_allocation)
 
-        amount_to_allocate -= allocation_amount
+logger = logging.getLogger(__name__)
 
-    if allocations_to_create:
-        db.add_all(allocations_to_create)
-        await db.commit()
+INVOICE_BULK_CHUNK_SIZE = int(os.getenv("INVOICE_BULK_CHUNK_SIZE", "500"))
+_SCHOOL_INVOICE_JOB_PROGRESS = ("status", "classes_total", "classes_done", "students_total", "invoices_created", "students_skipped", "error", "started_at", "finished_at")
 
-    # --- NEW: INVOICE STATUS UPDATE LOGIC ---
-    # 2. After allocations are saved, calculate the new total paid on the invoice
-    total_paid_stmt = select(func.sum(PaymentAllocation.amount_allocated)).join(PaymentAllocation.invoice_item).where(InvoiceItem.invoice_id == payment.invoice_id)
-    total_paid_result = await db.execute(total_paid_stmt)
-    # Get the sum of *previous* payments...
-    total_previously_paid = total_paid_result.scalar_one_or_none() or Decimal("0.0")
 
-    # ...and add what we just allocated in this pass.
-    total_paid_so_far = total_previously_paid + (Decimal(payment.amount_paid) - amount_to_allocate)
+@dataclass
+class _InvoiceDraft:
+    """One student's computed invoice; the row dicts are only built when it is written."""
 
-    invoice.amount_paid = total_paid_so_far
+    student_id: int
+    school_id: Optional[int]
+    fees: fee_engine.StudentInvoiceFees
 
-    if total_paid_so_far >= Decimal(invoice.amount_due):
-        invoice.payment_status = "paid"
-    elif total_paid_so_far > 0:
-        invoice.payment_status = "partially_paid"
-    else:
-        invoice.payment_status = "unpaid"
+    @property
+    def amount_due(self) -> Decimal:
+        return self.fees.amount_due
 
-    # await db.commit()
-    if allocations_to_create:
-        await db.flush()
+    def item_rows(self, component_names: dict[int, str], **columns: Any) -> list[dict]:
+        return [
+            {
+                "school_id": self.school_id,
+                "fee_component_id": component_id,
+                "component_name": component_names.get(component_id, "Unknown Fee"),
+                "original_amount": original_amount,
+                "discount_amount": discount_amount,
+                "final_amount": final_amount,
+                **columns,
+            }
+            for component_id, original_amount, discount_amount, final_amount in self.fees.iter_lines()
+        ]
 
-    return allocations_to_create
+    def discount_rows(self, **columns: Any) -> list[dict]:
+        return [{"discount_id": discount_id, "amount_discounted": amount, **columns} for discount_id, amount in self.fees.applied_discounts]
 
 
-# --- PUBLIC WRAPPER FUNCTION (HANDLES COMMIT) ---
-async def generate_invoice_for_student(db: AsyncSession, *, obj_in: InvoiceCreate) -> Invoice:
+def _draft_invoices(class_fees: dict[int, dict[int, Decimal]], students: list[fee_engine.StudentFees], *, schools: dict[int, int]) -> list[_InvoiceDraft]:
     """
-    Public-facing function for generating a single invoice.
-    Calls the core logic and handles the final commit and refresh.
+    Computes the invoices of many students in memory with the vectorized fee
+    engine: the class fees minus components switched off for each student, less
+    every active discount that applies.
     """
-    db_obj = await _generate_invoice_for_student_core(db=db, obj_in=obj_in)
+    return [_InvoiceDraft(student_id=student.student_id, school_id=schools.get(student.class_id), fees=fees) for student, fees in zip(students, fee_engine.compute_student_fees(class_fees, students))]
 
-    new_invoice_id = db_obj.id
-    await db.commit()
 
-    stmt = select(Invoice).options(selectinload(Invoice.items)).where(Invoice.id == new_invoice_id)
-    result = await db.execute(stmt)
-    final_invoice = result.scalars().first()
-    return final_invoice
+def _invoice_number(student_id: int, fee_term_id: int) -> str:
+    return f"INV-{date.today().year}-{student_id}-{fee_term_id}"
 
 
-logger = logging.getLogger(__name__)
+async def _get_fee_term(db: AsyncSession, fee_term_id: int) -> FeeTerm:
+    fee_term = await db.get(FeeTerm, fee_term_id)
+    if not fee_term:
+        logger.error(f"ERROR: Fee term not found for fee_term_id={fee_term_id}")
+        raise ValueError("Fee term not found.")
+    return fee_term
+
+
+async def _write_invoice_chunk(db: AsyncSession, chunk: list[_InvoiceDraft], *, numbers: dict[int, str], fee_term: FeeTerm, component_names: dict[int, str]) -> None:
+    """One multi-row ``INSERT ... RETURNING`` for the invoices, then one ``INSERT`` each for their items and applied discounts."""
+    invoice_rows = [
+        {
+            "student_id": draft.student_id,
+            "fee_term_id": fee_term.id,
+            "fee_structure_id": fee_term.fee_template_id,
+            "invoice_number": numbers[draft.student_id],
+            "due_date": fee_term.due_date,
+            "amount_due": draft.amount_due,
+            "status": "due",
+            "is_active": True,
+        }
+        for draft in chunk
+    ]
+    inserted = await db.execute(insert(Invoice).returning(Invoice.id, Invoice.student_id), invoice_rows)
+    invoice_ids = {student_id: invoice_id for invoice_id, student_id in inserted.all()}
+
+    item_rows = [row for draft in chunk for row in draft.item_rows(component_names, invoice_id=invoice_ids[draft.student_id])]
+    if item_rows:
+        await db.execute(insert(InvoiceItem), item_rows)
+    discount_rows = [row for draft in chunk for row in draft.discount_rows(invoice_id=invoice_ids[draft.student_id])]
+    if discount_rows:
+        await db.execute(insert(AppliedDiscount), discount_rows)
+
+
+async def _bulk_generate_invoices(db: AsyncSession, *, students: list[tuple[int, int]], fee_term: FeeTerm) -> dict[int, dict[str, int]]:
+    """
+    Generates invoices for many ``(student_id, class_id)`` pairs with a fixed
+    number of set-based reads (class fees, schools, component names, existing
+    invoices, fee overrides, discounts) and multi-row ``INSERT ... RETURNING``
+    writes. Students that already have this term's invoice are skipped.
+
+    Returns ``{class_id: {"created": n, "skipped": m}}``; the caller commits.
+    """
+    counts = {class_id: {"created": 0, "skipped": 0} for _, class_id in students}
+    if not students:
+        return counts
+    class_ids = list(counts)
+    student_ids = [student_id for student_id, _ in students]
+
+    class_fees: dict[int, dict[int, Decimal]] = {class_id: {} for class_id in class_ids}
+    for class_id, component_id, amount in (await db.execute(select(ClassFeeStructure.class_id, ClassFeeStructure.component_id, ClassFeeStructure.amount).where(ClassFeeStructure.class_id.in_(class_ids)))).all():
+        class_fees[class_id][component_id] = Decimal(amount)
+    schools = dict((await db.execute(select(Class.class_id, Class.school_id).where(Class.class_id.in_(class_ids)))).all())
+    component_ids = {component_id for fees in class_fees.values() for component_id in fees}
+    component_names = dict((await db.execute(select(FeeComponent.id, FeeComponent.component_name).where(FeeComponent.id.in_(component_ids)))).all()) if component_ids else {}
+
+    numbers = {student_id: _invoice_number(student_id, fee_term.id) for student_id in student_ids}
+    existing = set((await db.execute(select(Invoice.invoice_number).where(Invoice.invoice_number.in_(list(numbers.values()))))).scalars().all())
+
+    removed: dict[int, set[int]] = defaultdict(set)
+    for student_id, component_id in (await db.execute(select(StudentFeeAssignment.student_id, StudentFeeAssignment.fee_component_id).where(StudentFeeAssignment.student_id.in_(student_ids), StudentFeeAssignment.is_active.is_(False)))).all():
+        removed[student_id].add(component_id)
+    # One rule per discount row, shared by every student it is assigned to.
+    rules: dict[int, fee_engine.DiscountRule] = {}
+    discounts: dict[int, list[fee_engine.DiscountRule]] = defaultdict(list)
+    discount_stmt = select(StudentFeeDiscount.student_id, Discount).join(Discount, Discount.id == StudentFeeDiscount.discount_id).where(StudentFeeDiscount.student_id.in_(student_ids), Discount.is_active.is_(True))
+    for student_id, discount in (await db.execute(discount_stmt)).all():
+        if discount.id not in rules:
+            rules[discount.id] = fee_engine.DiscountRule.from_discount(discount)
+        discounts[student_id].append(rules[discount.id])
+
+    to_invoice = []
+    for student_id, class_id in students:
+        if numbers[student_id] in existing:
+            counts[class_id]["skipped"] += 1
+            continue
+        to_invoice.append(fee_engine.StudentFees(student_id=student_id, class_id=class_id, removed_component_ids=frozenset(removed[student_id]), discounts=tuple(discounts[student_id])))
+    drafts = _draft_invoices(class_fees, to_invoice, schools=schools)
+    classes_by_student = dict(students)
+
+    for start in range(0, len(drafts), INVOICE_BULK_CHUNK_SIZE):
+        chunk = drafts[start : start + INVOICE_BULK_CHUNK_SIZE]
+        await _write_invoice_chunk(db, chunk, numbers=numbers, fee_term=fee_term, component_names=component_names)
+        for draft in chunk:
+            counts[classes_by_student[draft.student_id]]["created"] += 1
+
+    return counts
+
+
+async def _log_bulk_failure(message: str, details: dict) -> None:
+    log_entry = LogCreate(log_level="CRITICAL", message=message, details=details)
+    try:
+        async for log_db in get_db():
+            await logging_service.create_log_entry(db=log_db, log_data=log_entry)
+    except Exception as logging_error:
+        logger.error(f"ERROR: Failed to log error to database: {str(logging_error)}")
 
 
 async def generate_invoices_for_class(db: AsyncSession, *, obj_in: BulkInvoiceCreate) -> dict:
@@ -313,187 +535,199 @@ async def generate_invoices_for_class(db: AsyncSession, *, obj_in: BulkInvoiceCr
     Works in BOTH production and test environments.
     """
     logger.info(f"START: generate_invoices_for_class called for class_id={obj_in.class_id}, fee_term_id={obj_in.fee_term_id}")
-    logger.info(f"DEBUG: db.in_transaction() = {db.in_transaction()}")
-
-    students_stmt = select(Student).options(selectinload(Student.profile)).where(Student.current_class_id == obj_in.class_id, Student.is_active.is_(True))  # LOAD profile to avoid lazy-load issues
-    students_result = await db.execute(students_stmt)
-    students = students_result.scalars().all()
 
-    logger.info(f"DEBUG: Found {len(students)} active students in class {obj_in.class_id}")
-    for idx, student in enumerate(students):
-        student_name = f"{student.profile.first_name} {student.profile.last_name}" if student.profile else "Unknown"
-        logger.info(f"  Student {idx+1}: ID={student.student_id}, Name={student_name}")
+    students_stmt = select(Student.student_id, Student.current_class_id).where(Student.current_class_id == obj_in.class_id, Student.is_active.is_(True)).order_by(Student.student_id)
+    students = [tuple(row) for row in (await db.execute(students_stmt)).all()]
 
     if not students:
         logger.error(f"ERROR: No active students found in class {obj_in.class_id}")
         raise ValueError("No active students found in the specified class.")
 
-    successful_invoices = 0
-
     try:
-        logger.info("DEBUG: Creating invoices without explicit transaction management")
         async with db.begin_nested():
-            for idx, student in enumerate(students):
-                try:
-                    logger.info(f"DEBUG: Creating invoice {idx+1}/{len(students)} for student_id={student.student_id}")
+            fee_term = await _get_fee_term(db, obj_in.fee_term_id)
+            counts = (await _bulk_generate_invoices(db, students=students, fee_term=fee_term))[obj_in.class_id]
+            # The caller (get_db dependency) commits
+            logger.info(f"SUCCESS: Created {counts['created']} invoices out of {len(students)} students ({counts['skipped']} already invoiced)")
+
+    except Exception as e:
+        logger.error(f"CRITICAL: Bulk invoice generation failed: {str(e)}", exc_info=True)
+
+        log_message = "Critical failure during bulk invoice generation. Operation rolled back."
+        await _log_bulk_failure(log_message, {"class_id": obj_in.class_id, "fee_term_id": obj_in.fee_term_id, "total_students_affected": len(students), "error_type": type(e).__name__, "error_message": str(e)})
+        raise ValueError(log_message)
 
-                    single_invoice_data = InvoiceCreate(student_id=student.student_id, fee_term_id=obj_in.fee_term_id)
+    return {"detail": "Bulk invoice generation complete.", "successful": counts["created"], "failed": 0, "skipped": counts["skipped"]}
 
-                    invoice = await _generate_invoice_for_student_core(db=db, obj_in=single_invoice_data)
-                    logger.info(f"DEBUG: Invoice created successfully - ID={invoice.id}, amount_due={invoice.amount_due}")
 
-                    successful_invoices += 1
+async def create_school_invoice_job(db: AsyncSession, *, school_id: int, fee_term_id: int, user_id: Optional[UUID] = None) -> SchoolInvoiceJob:
+    """Records a pending job and commits; it is run separately (see run_school_invoice_job)."""
+    job = SchoolInvoiceJob(job_id=uuid4().hex, school_id=school_id, fee_term_id=fee_term_id, status="pending", requested_by_user_id=user_id)
+    db.add(job)
+    await db.commit()
+    return job
 
-                except Exception as e:
-                    logger.error(f"ERROR: Failed to create invoice for student {student.student_id}: {str(e)}", exc_info=True)
-                    raise
 
-            # Flush to ensure all objects are written
-            logger.info("DEBUG: Flushing session to write objects")
-            await db.flush()
-            logger.info("DEBUG: Flush successful")
+async def get_school_invoice_job(db: AsyncSession, job_id: str, school_id: int) -> Optional[SchoolInvoiceJob]:
+    stmt = select(SchoolInvoiceJob).where(SchoolInvoiceJob.job_id == job_id, SchoolInvoiceJob.school_id == school_id)
+    return (await db.execute(stmt)).scalars().first()
 
-            # The caller (get_db dependency) will commit when exiting the async with block
-            logger.info(f"SUCCESS: Created {successful_invoices} invoices out of {len(students)} students")
 
-    except Exception as e:
-        logger.error(f"CRITICAL: Bulk invoice generation failed: {str(e)}", exc_info=True)
+async def _save_job_progress(job: SchoolInvoiceJob) -> None:
+    """
+    Writes ``job``'s progress in a session of its own: the invoices are written
+    in one transaction, which pollers cannot see until it commits.
+    """
+    values = {column: getattr(job, column) for column in _SCHOOL_INVOICE_JOB_PROGRESS}
+    async for progress_db in get_db():
+        await progress_db.execute(update(SchoolInvoiceJob).where(SchoolInvoiceJob.job_id == job.job_id).values(**values))
 
-        log_message = "Critical failure during bulk invoice generation. Operation rolled back."
-        log_details = {"class_id": obj_in.class_id, "fee_term_id": obj_in.fee_term_id, "total_students_affected": len(students), "error_type": type(e).__name__, "error_message": str(e)}
-        log_entry = LogCreate(log_level="CRITICAL", message=log_message, details=log_details)
 
-        try:
-            async for log_db in get_db():
-                await logging_service.create_log_entry(db=log_db, log_data=log_entry)
-                logger.info("DEBUG: Logged error to database")
-        except Exception as logging_error:
-            logger.error(f"ERROR: Failed to log error to database: {str(logging_error)}")
+async def generate_invoices_for_school(db: AsyncSession, *, job: SchoolInvoiceJob) -> SchoolInvoiceJob:
+    """
+    Generates this fee term's invoices for every active student of every active
+    class in the school, atomically. Classes are processed in chunks of about
+    ``INVOICE_BULK_CHUNK_SIZE`` students and ``job``'s row is updated after each
+    chunk, so progress can be polled while the job runs.
 
-        raise ValueError(log_message)
+    ``job`` must not belong to ``db``: its progress is saved outside ``db``'s
+    transaction, and a rollback must not expire it.
+    """
+    job.status = "running"
+    job.started_at = datetime.now(timezone.utc)
+    logger.info(f"START: generate_invoices_for_school called for school_id={job.school_id}, fee_term_id={job.fee_term_id}")
+
+    students_stmt = (
+        select(Student.student_id, Student.current_class_id)
+        .join(Class, Class.class_id == Student.current_class_id)
+        .where(Class.school_id == job.school_id, Class.is_active.is_(True), Student.is_active.is_(True))
+        .order_by(Student.current_class_id, Student.student_id)
+    )
+    by_class: dict[int, list[tuple[int, int]]] = defaultdict(list)
+    for student_id, class_id in (await db.execute(students_stmt)).all():
+        by_class[class_id].append((student_id, class_id))
+    job.classes_total = len(by_class)
+    job.students_total = sum(len(students) for students in by_class.values())
+    await _save_job_progress(job)
 
-    return {"detail": "Bulk invoice generation complete.", "successful": successful_invoices, "failed": 0}
+    try:
+        async with db.begin_nested():
+            fee_term = await _get_fee_term(db, job.fee_term_id)
+            chunk: list[tuple[int, int]] = []
+            chunk_classes = 0
+            for position, class_students in enumerate(by_class.values(), start=1):
+                chunk.extend(class_students)
+                chunk_classes += 1
+                if len(chunk) < INVOICE_BULK_CHUNK_SIZE and position < len(by_class):
+                    continue
+                counts = await _bulk_generate_invoices(db, students=chunk, fee_term=fee_term)
+                job.invoices_created += sum(class_counts["created"] for class_counts in counts.values())
+                job.students_skipped += sum(class_counts["skipped"] for class_counts in counts.values())
+                job.classes_done += chunk_classes
+                logger.info(f"School {job.school_id} invoices: {job.classes_done}/{job.classes_total} classes, {job.invoices_created} invoices created")
+                await _save_job_progress(job)
+                chunk, chunk_classes = [], 0
+        await db.commit()
+    except Exception as e:
+        logger.error(f"CRITICAL: School-wide invoice generation failed: {str(e)}", exc_info=True)
+        await db.rollback()
+        job.status = "failed"
+        job.error = "Critical failure during school-wide invoice generation. Operation rolled back."
+        job.invoices_created = 0
+        job.finished_at = datetime.now(timezone.utc)
+        await _save_job_progress(job)
+        await _log_bulk_failure(job.error, {"school_id": job.school_id, "fee_term_id": job.fee_term_id, "classes_done": job.classes_done, "error_type": type(e).__name__, "error_message": str(e)})
+        return job
+
+    job.status = "completed"
+    job.finished_at = datetime.now(timezone.utc)
+    await _save_job_progress(job)
+    return job
+
+
+async def run_school_invoice_job(job_id: str) -> None:
+    """Background-task entry point: runs the job in its own session."""
+    async for db in get_db():
+        job = await db.get(SchoolInvoiceJob, job_id)
+        if job is None:
+            logger.error(f"ERROR: School invoice job {job_id} not found")
+            return
+        db.expunge(job)
+        await generate_invoices_for_school(db, job=job)
 
 
 async def _generate_invoice_for_student_core(db: AsyncSession, *, obj_in: InvoiceCreate) -> Invoice:
     """
-    Core logic for generating an invoice with debug logging.
+    Core logic for generating a single student's invoice; the caller commits.
     """
-    logger.info(f"DEBUG: _generate_invoice_for_student_core called for student_id={obj_in.student_id}")
-
-    student_stmt = (
-        select(Student)
-        .options(selectinload(Student.current_class), selectinload(Student.profile), selectinload(Student.fee_assignments), selectinload(Student.fee_discounts).selectinload(StudentFeeDiscount.discount))  # LOAD profile
-        .where(Student.student_id == obj_in.student_id)
-    )
+    student_stmt = select(Student).options(selectinload(Student.current_class), selectinload(Student.fee_assignments), selectinload(Student.fee_discounts).selectinload(StudentFeeDiscount.discount)).where(Student.student_id == obj_in.student_id)
     student_result = await db.execute(student_stmt)
     student = student_result.scalars().first()
 
-    logger.info(f"DEBUG: Student found: {student.profile.first_name} {student.profile.last_name if student else 'NOT FOUND'}")
-
     if not student or not student.current_class:
         logger.error(f"ERROR: Student or class not found for student_id={obj_in.student_id}")
         raise ValueError("Student or student's class could not be found.")
 
-    logger.info(f"DEBUG: Student class: {student.current_class.section}")
-
     fees_stmt = select(ClassFeeStructure).where(ClassFeeStructure.class_id == student.current_class_id)
     fees_result = await db.execute(fees_stmt)
-    class_fees = fees_result.scalars().all()
-    billable_components = {fee.component_id: Decimal(fee.amount) for fee in class_fees}
-
-    logger.info(f"DEBUG: Found {len(billable_components)} fee components: {list(billable_components.values())}")
-
-    for override in student.fee_assignments:
-        if not override.is_active and override.fee_component_id in billable_components:
-            logger.info(f"DEBUG: Applying override - removing fee component {override.fee_component_id}")
-            del billable_components[override.fee_component_id]
-
-    logger.info(f"DEBUG: Fee components after overrides: {len(billable_components)}")
-    logger.info(f"DEBUG: Student has {len(student.fee_discounts)} discounts")
-
-    invoice_items_to_create = []
-    final_amount_due = Decimal("0.0")
-    applied_discounts_to_log = []
-
-    if billable_components:
-        component_ids = list(billable_components.keys())
-        components_result = await db.execute(select(FeeComponent).where(FeeComponent.id.in_(component_ids)))
-        components_map = {c.id: c.component_name for c in components_result.scalars().all()}
-
-        for component_id, original_amount in billable_components.items():
-            total_discount_for_item = Decimal("0.0")
-
-            for applied_discount in student.fee_discounts:
-                discount_template = applied_discount.discount
-                if not discount_template or not discount_template.is_active:
-                    continue
-
-                rules = discount_template.rules or {}
-                applicable_ids = rules.get("applicable_to_component_ids")
-
-                if applicable_ids is None or component_id in applicable_ids:
-                    if discount_template.type == "percentage":
-                        discount_value = original_amount * (Decimal(discount_template.value) / 100)
-                    else:
-                        discount_value = Decimal(discount_template.value)
-
-                    if discount_value > 0:
-                        logger.info(f"DEBUG: Discount applied - component={components_map.get(component_id)}, discount={discount_value}")
-                        total_discount_for_item += discount_value
-                        applied_discounts_to_log.append({"discount_id": discount_template.id, "amount_discounted": discount_value})
-
-            final_item_amount = original_amount - total_discount_for_item
-            if final_item_amount < 0:
-                final_item_amount = Decimal("0.0")
-
-            item = InvoiceItem(
-                school_id=student.current_class.school_id,
-                fee_component_id=component_id,
-                component_name=components_map.get(component_id, "Unknown Fee"),
-                original_amount=original_amount,
-                discount_amount=total_discount_for_item,
-                final_amount=final_item_amount,
-            )
-            invoice_items_to_create.append(item)
-            final_amount_due += final_item_amount
-
-    fee_term = await db.get(FeeTerm, obj_in.fee_term_id)
-    if not fee_term:
-        logger.error(f"ERROR: Fee term not found for fee_term_id={obj_in.fee_term_id}")
-        raise ValueError("Fee term not found.")
-
-    invoice_number = f"INV-{date.today().year}-{obj_in.student_id}-{obj_in.fee_term_id}"
+    class_fees = {fee.component_id: Decimal(fee.amount) for fee in fees_result.scalars().all()}
+
+    component_names = {}
+    if class_fees:
+        components_result = await db.execute(select(FeeComponent).where(FeeComponent.id.in_(list(class_fees))))
+        component_names = {c.id: c.component_name for c in components_result.scalars().all()}
+
+    student_fees = fee_engine.StudentFees(
+        student_id=student.student_id,
+        class_id=student.current_class_id,
+        removed_component_ids=frozenset(override.fee_component_id for override in student.fee_assignments if not override.is_active),
+        discounts=tuple(fee_engine.DiscountRule.from_discount(applied.discount) for applied in student.fee_discounts if applied.discount and applied.discount.is_active),
+    )
+    [draft] = _draft_invoices({student.current_class_id: class_fees}, [student_fees], schools={student.current_class_id: student.current_class.school_id})
 
-    logger.info(f"DEBUG: Creating invoice - number={invoice_number}, amount_due={final_amount_due}, items_count={len(invoice_items_to_create)}")
+    fee_term = await _get_fee_term(db, obj_in.fee_term_id)
 
     db_obj = Invoice(
         student_id=obj_in.student_id,
         fee_term_id=obj_in.fee_term_id,
         fee_structure_id=fee_term.fee_template_id,
-        invoice_number=invoice_number,
+        invoice_number=_invoice_number(obj_in.student_id, obj_in.fee_term_id),
         due_date=fee_term.due_date,
-        amount_due=final_amount_due,
+        amount_due=draft.amount_due,
         status="due",
         is_active=True,
-        items=invoice_items_to_create,
+        items=[InvoiceItem(**row) for row in draft.item_rows(component_names)],
     )
     db.add(db_obj)
     await db.flush()
 
-    logger.info(f"DEBUG: Invoice flushed - ID={db_obj.id}")
+    for row in draft.discount_rows(invoice_id=db_obj.id):
+        db.add(AppliedDiscount(**row))
 
-    for discount_log in applied_discounts_to_log:
-        audit_record = AppliedDiscount(invoice_id=db_obj.id, discount_id=discount_log["discount_id"], amount_discounted=discount_log["amount_discounted"])
-        db.add(audit_record)
-
-    logger.info(f"DEBUG: _generate_invoice_for_student_core completed for student_id={obj_in.student_id}")
     return db_obj
 
 
-async def get_all_invoices_for_school(db: AsyncSession, school_id: int) -> list[Invoice]:
+async def get_invoices_page_for_school(
+    db: AsyncSession,
+    *,
+    school_id: int,
+    limit: int = pagination.DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    payment_status: Optional[str] = None,
+    fee_term_id: Optional[int] = None,
+    class_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    include_items: bool = False,
+) -> dict:
     """
-    Retrieves all active invoices associated with a given school ID.
+    One page of a school's active invoices, newest first, keyset-paginated on
+    ``(created_at, id)``. Filters combine with AND; ``created_to`` is exclusive.
+    Line items are only loaded when ``include_items`` is set.
+
+    Returns ``{"items", "next_cursor", "total"}``; raises ValueError for a
+    malformed cursor.
 
     NOTE: This service function itself does *not* enforce RLS directly.
     RLS is applied at the database level based on the connection role
@@ -505,9 +739,24 @@ async def get_all_invoices_for_school(db: AsyncSession, school_id: int) -> list[
         .join(Profile, Student.user_id == Profile.user_id)  # Join through Student to Profile
         .where(Profile.school_id == school_id)  # Filter by the school_id on the Profile
         .where(Invoice.is_active.is_(True))
-        .options(selectinload(Invoice.items))  # Optionally load items
-        .order_by(Invoice.created_at.desc())  # Optional ordering
     )
-    result = await db.execute(stmt)
-    invoices = result.scalars().all()
-    return invoices
+    if status is not None:
+        stmt = stmt.where(Invoice.status == status)
+    if payment_status is not None:
+        stmt = stmt.where(Invoice.payment_status == payment_status)
+    if fee_term_id is not None:
+        stmt = stmt.where(Invoice.fee_term_id == fee_term_id)
+    if class_id is not None:
+        stmt = stmt.where(Student.current_class_id == class_id)
+    if created_from is not None:
+        stmt = stmt.where(Invoice.created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(Invoice.created_at < created_to)
+
+    filters = (school_id, status, payment_status, fee_term_id, class_id, created_from, created_to)
+    total = await pagination.cached_count(db, stmt, table=Invoice.__tablename__, key=filters)
+
+    # Without expansion, items are never loaded (and serialize as an empty list)
+    stmt = stmt.options(selectinload(Invoice.items) if include_items else noload(Invoice.items))
+    invoices, next_cursor = await pagination.keyset_page(db, stmt, created_at_column=Invoice.created_at, id_column=Invoice.id, limit=limit, cursor=cursor)
+    return {"items": invoices, "next_cursor": next_cursor, "total": total}
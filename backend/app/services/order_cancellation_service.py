@@ -0,0 +1,127 @@
+# backend/app/services/order_cancellation_service.py
+"""
+Bulk cancellation of unpaid e-commerce orders.
+
+Admins used to clear out "all unpaid orders older than N days" by hand, one
+cancel at a time. :func:`cancel_unpaid_orders` does it in chunks of
+``ORDER_BULK_CANCEL_CHUNK_SIZE``: each chunk locks its orders with
+``FOR UPDATE SKIP LOCKED`` (so an order a checkout, payment capture or another
+job is working on is skipped, not waited for), cancels them with one UPDATE,
+restocks all their units with one statement (see
+``stock_reservation_service.restore_stock``) and commits, so no lock is held
+for longer than one chunk.
+
+Only orders still ``pending_payment`` with no authorized or captured payment
+are ever cancelled here; paid orders need a refund and go through the
+single-order cancel.
+
+:func:`expire_unpaid_orders` runs the same cancellation for orders left
+unpaid longer than ``ORDER_PENDING_PAYMENT_EXPIRY_HOURS`` without a payment the
+reconciler is still resolving; it is called by the pending-payment
+reconciliation.
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.order import Order
+from app.models.payment import Payment
+from app.schemas.enums import OrderStatus
+from app.services import stock_reservation_service
+
+logger = logging.getLogger(__name__)
+
+ORDER_BULK_CANCEL_CHUNK_SIZE = int(os.getenv("ORDER_BULK_CANCEL_CHUNK_SIZE", "100"))
+ORDER_BULK_CANCEL_MAX_CHUNKS = int(os.getenv("ORDER_BULK_CANCEL_MAX_CHUNKS", "100"))  # Per criteria run; the next run picks up the rest
+ORDER_PENDING_PAYMENT_EXPIRY_HOURS = int(os.getenv("ORDER_PENDING_PAYMENT_EXPIRY_HOURS", "48"))
+
+
+def _payment_in(statuses):
+    return select(Payment.id).where(Payment.order_id == Order.order_id, Payment.status.in_(statuses)).exists()
+
+
+async def _cancel_chunk(db: AsyncSession, conditions: list, *, limit: int, now: datetime) -> tuple[list[int], int]:
+    """Locks, cancels and restocks up to ``limit`` matching orders, then commits; returns their ids and the units restocked."""
+    lock_stmt = select(Order.order_id).where(*conditions).order_by(Order.order_id).limit(limit).with_for_update(skip_locked=True)
+    order_ids = list((await db.execute(lock_stmt)).scalars().all())
+    if not order_ids:
+        return [], 0
+
+    await db.execute(update(Order).where(Order.order_id.in_(order_ids)).values(status=OrderStatus.CANCELLED).execution_options(synchronize_session=False))
+    units = await stock_reservation_service.restore_stock(db, order_ids, now=now)
+    await db.commit()
+    return order_ids, units
+
+
+async def cancel_unpaid_orders(
+    db: AsyncSession,
+    *,
+    school_id: Optional[int] = None,
+    order_ids: Optional[list[int]] = None,
+    created_before: Optional[datetime] = None,
+    exclude_payment_statuses=stock_reservation_service.PAID_PAYMENT_STATUSES,
+    chunk_size: int = ORDER_BULK_CANCEL_CHUNK_SIZE,
+    max_chunks: int = ORDER_BULK_CANCEL_MAX_CHUNKS,
+    reason: Optional[str] = None,
+    now: Optional[datetime] = None,
+) -> dict:
+    """
+    Cancels unpaid orders, either the given ``order_ids`` or every order
+    matching the criteria (at most ``max_chunks`` chunks of them), and restocks
+    their units, one committed chunk at a time.
+
+    ``school_id`` scopes the run to one school (None: all schools). Orders that
+    are locked elsewhere, already paid, not pending or outside the school are
+    left alone; for an ``order_ids`` run they are reported as skipped.
+
+    Returns ``{"orders_cancelled", "units_restocked", "chunks", "cancelled_order_ids", "skipped_order_ids"}``.
+    """
+    now = now or datetime.now(timezone.utc)
+    conditions = [Order.status == OrderStatus.PENDING_PAYMENT, ~_payment_in(exclude_payment_statuses)]
+    if school_id is not None:
+        conditions.append(Order.school_id == school_id)
+    if created_before is not None:
+        conditions.append(Order.created_at < created_before)
+
+    cancelled, units, chunks = [], 0, 0
+    if order_ids is not None:
+        requested = sorted(set(order_ids))
+        for start in range(0, len(requested), chunk_size):
+            chunk = requested[start : start + chunk_size]
+            chunk_ids, chunk_units = await _cancel_chunk(db, [*conditions, Order.order_id.in_(chunk)], limit=len(chunk), now=now)
+            cancelled.extend(chunk_ids)
+            units += chunk_units
+            chunks += 1
+        cancelled_set = set(cancelled)
+        skipped = [order_id for order_id in requested if order_id not in cancelled_set]
+    else:
+        # Cancelled orders stop matching and locked ones are skipped, so this ends once nothing unlocked is left
+        while chunks < max_chunks:
+            chunk_ids, chunk_units = await _cancel_chunk(db, conditions, limit=chunk_size, now=now)
+            if not chunk_ids:
+                break
+            cancelled.extend(chunk_ids)
+            units += chunk_units
+            chunks += 1
+        skipped = []
+
+    if cancelled:
+        logger.info(f"Cancelled {len(cancelled)} unpaid order(s) in {chunks} chunk(s), restocked {units} unit(s)" + (f" - reason: {reason}" if reason else ""))
+    return {"orders_cancelled": len(cancelled), "units_restocked": units, "chunks": chunks, "cancelled_order_ids": cancelled, "skipped_order_ids": skipped}
+
+
+async def expire_unpaid_orders(db: AsyncSession, *, now: Optional[datetime] = None) -> dict:
+    """
+    Cancels orders left in ``pending_payment`` for longer than
+    ``ORDER_PENDING_PAYMENT_EXPIRY_HOURS`` that have no pending, authorized or
+    captured payment, i.e. checkouts abandoned before (or after a failed)
+    payment attempt, and restocks them.
+    """
+    now = now or datetime.now(timezone.utc)
+    run = await cancel_unpaid_orders(db, created_before=now - timedelta(hours=ORDER_PENDING_PAYMENT_EXPIRY_HOURS), exclude_payment_statuses=stock_reservation_service.LIVE_PAYMENT_STATUSES, reason="unpaid order expired", now=now)
+    return {"unpaid_orders_expired": run["orders_cancelled"], "unpaid_units_restocked": run["units_restocked"]}
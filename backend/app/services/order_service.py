@@ -6,26 +6,30 @@ This service handles the critical transactional logic for order creation and man
 The checkout process is the most security-critical operation in the entire e-commerce flow.
 
 CRITICAL ARCHITECTURAL DECISION:
-The create_order_from_cart() function uses pessimistic locking (SELECT FOR UPDATE)
-to prevent race conditions when multiple users attempt to purchase the last available item.
-This is the same pattern used by Amazon, Flipkart, and other major e-commerce platforms.
+Checkout takes stock with atomic conditional decrements
+(UPDATE ... WHERE stock_quantity >= :q RETURNING) in sorted product order, as the
+last step before commit, and records them as time-limited reservations (see
+stock_reservation_service). Product rows are only locked between the decrement
+and the commit, so parallel checkouts of the same SKU during a sale do not
+serialize on the whole checkout, and the conditional decrement makes overselling
+impossible when several users race for the last available item.
 
 Security Architecture:
 - Atomic transactions with rollback on any failure
-- Pessimistic row-level locking on products (prevents overselling)
-- Stock validation happens AFTER acquiring locks (bulletproof concurrency)
+- Conditional stock decrements (stock can never go negative)
+- Held stock is released when the order's payment fails or the hold expires
 - Order creation and stock decrement happen in single transaction
 """
 
 import logging
 import uuid
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 from typing import Optional
 from uuid import UUID
 
 from fastapi import HTTPException, status
-from sqlalchemy import and_, func
+from sqlalchemy import and_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
@@ -40,9 +44,13 @@ from app.models.student import Student
 from app.models.student_contact import StudentContact
 from app.schemas.enums import OrderStatus
 from app.schemas.order_schema import OrderCancel, OrderCreateFromCart, OrderCreateManual, OrderUpdate
+from app.services import order_statistics_service, sales_analytics_service, stock_reservation_service  # noqa: F401  (sales_analytics_service: registers the order transition hook)
+from app.services.stock_reservation_service import StockUnavailableError
 
 logger = logging.getLogger(__name__)
 
+MAX_STATISTICS_RANGE_DAYS = 366
+
 
 class OrderService:
     """Service class for asynchronous order operations."""
@@ -90,30 +98,44 @@ class OrderService:
             ],
         }
 
+    async def _reserve_stock(self, order_id: int, school_id: int, quantities: dict[int, int], product_data: dict, error_prefix: str) -> None:
+        """Reserves the order's stock, turning a lost race for the last units into a 400."""
+        # Write everything else first, so only the reservations and the commit run while product rows are locked
+        await self.db.flush()
+        try:
+            await stock_reservation_service.reserve_stock(self.db, order_id=order_id, school_id=school_id, quantities=quantities)
+        except StockUnavailableError as e:
+            name = product_data[e.product_id]["name"]
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{error_prefix}: Insufficient stock for '{name}'. Requested: {e.quantity}, it sold out while the order was being placed.",
+            )
+
     async def create_order_from_cart(self, checkout_data: OrderCreateFromCart, current_profile: Profile) -> Order:
         """
         Create an order from user's cart (Parent checkout flow).
 
         CRITICAL SECURITY FIX:
-        - Validates product is_active status INSIDE transaction after lock acquisition
+        - Validates product is_active status INSIDE the checkout transaction
         - Prevents race condition where product is deactivated between cart addition and checkout
-        - Stock validation also moved INSIDE transaction for bulletproof consistency
+        - Stock is taken by a conditional decrement that re-checks is_active AND stock atomically
 
         Race Condition Prevention:
-        - Acquires pessimistic locks (SELECT FOR UPDATE)
-        - Re-validates BOTH is_active AND stock_quantity AFTER locks acquired
-        - Window for race condition: < 50ms (transaction duration only)
+        - No SELECT FOR UPDATE: products are read without locks for validation and prices
+        - Stock is reserved with UPDATE ... WHERE stock_quantity >= :q, in sorted product order,
+          immediately before commit (row locks are held for milliseconds, not the whole checkout)
+        - A checkout that loses the race for the last units is rejected with 400
 
         Transaction Steps (MUST execute in this order):
         1. Validate student belongs to parent
         2. Fetch cart with eager loading
-        3. Lock all products (SELECT FOR UPDATE) ← CRITICAL CONCURRENCY POINT
-        4. Re-validate is_active + stock for each item ← CRITICAL BUSINESS LOGIC
+        3. Read all products (no locks)
+        4. Validate is_active + stock for each item (fast, friendly rejection)
         5. Calculate total amount
         6. Create Order record (status: pending_payment)
         7. Create OrderItem records (snapshot prices)
-        8. Decrement stock for all products
-        9. Clear cart
+        8. Clear cart
+        9. Reserve stock (conditional decrements) ← CRITICAL CONCURRENCY POINT
         10. Commit transaction
 
         Args:
@@ -180,17 +202,16 @@ class OrderService:
                     detail="Your cart is empty. Add items before checkout.",
                 )
 
-            # Step 3: Lock all products (CRITICAL FOR CONCURRENCY SAFETY)
+            # Step 3: Read all products (no locks - stock is taken atomically in step 9)
             product_ids = list({item.product_id for item in cart.items})
-            stmt = select(Product).where(Product.product_id.in_(product_ids)).with_for_update()  # PESSIMISTIC LOCK - CRITICAL!
+            stmt = select(Product).where(Product.product_id.in_(product_ids))
             result = await self.db.execute(stmt)
-            locked_products = list(result.scalars().all())
+            products = list(result.scalars().all())
 
-            # Create product lookup dict and extract ALL data NOW to avoid lazy loads
-            products_dict = {p.product_id: p for p in locked_products}
-            product_data = {p.product_id: {"name": p.name, "is_active": p.is_active, "stock_quantity": p.stock_quantity, "price": p.price, "product_id": p.product_id} for p in locked_products}
+            # Extract ALL data NOW to avoid lazy loads
+            product_data = {p.product_id: {"name": p.name, "is_active": p.is_active, "stock_quantity": p.stock_quantity, "price": p.price, "product_id": p.product_id} for p in products}
 
-            # Step 4: CRITICAL VALIDATION - Re-validate BOTH is_active AND stock
+            # Step 4: CRITICAL VALIDATION - Validate BOTH is_active AND stock
             validation_errors = []
             for cart_item in cart.items:
                 pdata = product_data.get(cart_item.product_id)
@@ -253,18 +274,17 @@ class OrderService:
                 )
                 self.db.add(order_item)
 
-            # Step 8: Decrement stock using the actual ORM objects
-            for cart_item in cart.items:
-                product = products_dict[cart_item.product_id]
-                product.stock_quantity -= cart_item.quantity
-
-            # Step 9: Clear cart items
+            # Step 8: Clear cart items
+            quantities = stock_reservation_service.total_quantities(cart.items)
             for item in list(cart.items):
                 await self.db.delete(item)
 
             # Save order_id before commit
             order_id = db_order.order_id
 
+            # Step 9: Reserve stock - LAST before commit, the decremented rows stay locked until then
+            await self._reserve_stock(order_id, school_id_val, quantities, product_data, "Checkout validation failed")
+
             # Step 10: Commit transaction
             await self.db.commit()
 
@@ -367,6 +387,12 @@ class OrderService:
         # Fetch the ORM object internally
         db_order = await self._get_order_by_id_internal(order_id, user_id, is_admin)
 
+        # Lock the order row before its reservations, as a payment capture does (see
+        # stock_reservation_service.confirm_paid_order), and re-read its status under the lock:
+        # a capture that committed meanwhile is seen, and the two never deadlock.
+        lock_stmt = select(Order).where(Order.order_id == db_order.order_id).with_for_update().execution_options(populate_existing=True)
+        db_order = (await self.db.execute(lock_stmt)).scalars().first()
+
         # Validate order can be cancelled
         cancellable_statuses = [OrderStatus.PENDING_PAYMENT, OrderStatus.PROCESSING]
         if db_order.status not in cancellable_statuses:
@@ -376,19 +402,8 @@ class OrderService:
             )
 
         try:
-            # Restore stock for all order items
-            stmt = select(OrderItem).where(OrderItem.order_id == db_order.order_id)
-            result = await self.db.execute(stmt)
-            order_items = list(result.scalars().all())
-
-            for order_item in order_items:
-                # Lock product for update
-                stmt = select(Product).where(Product.product_id == order_item.product_id).with_for_update()
-                result = await self.db.execute(stmt)
-                product = result.scalars().first()
-
-                if product:
-                    product.stock_quantity += order_item.quantity
+            # Held units are released, other orders put their items back - one restock statement either way
+            await stock_reservation_service.restore_stock(self.db, [db_order.order_id])
 
             # Update order status
             db_order.status = OrderStatus.CANCELLED
@@ -417,85 +432,31 @@ class OrderService:
                 detail=f"Order cancellation failed: {str(e)}",
             )
 
-    async def get_order_statistics(self, school_id: int) -> dict:
+    async def get_order_statistics(self, school_id: int, date_from: Optional[date] = None, date_to: Optional[date] = None) -> dict:
         """
         Get aggregated order statistics for admin dashboard.
 
+        One conditional-aggregation scan of the school's orders, cached for a
+        short TTL and invalidated on order writes (see order_statistics_service).
+
         Args:
             school_id: School ID
+            date_from: Optional first day (inclusive) of orders to include
+            date_to: Optional last day (inclusive); with date_from, adds a daily series
 
         Returns:
             Dictionary with order counts and revenue metrics
-        """
-        # Total orders
-        stmt = select(func.count(Order.order_id)).join(Student, Order.student_id == Student.student_id).join(Profile, Student.user_id == Profile.user_id).where(Profile.school_id == school_id)
-        result = await self.db.execute(stmt)
-        total_orders = result.scalar()
-
-        # Count by status
-        status_counts = {}
-        for order_status in OrderStatus:
-            stmt = (
-                select(func.count(Order.order_id))
-                .join(Student, Order.student_id == Student.student_id)
-                .join(Profile, Student.user_id == Profile.user_id)
-                .where(
-                    and_(
-                        Profile.school_id == school_id,
-                        Order.status == order_status,
-                    )
-                )
-            )
-            result = await self.db.execute(stmt)
-            count = result.scalar()
-            status_counts[order_status.value] = count
-
-        # Total revenue (delivered orders only)
-        stmt = (
-            select(func.sum(Order.total_amount))
-            .join(Student, Order.student_id == Student.student_id)
-            .join(Profile, Student.user_id == Profile.user_id)
-            .where(
-                and_(
-                    Profile.school_id == school_id,
-                    Order.status == OrderStatus.DELIVERED,
-                )
-            )
-        )
-        result = await self.db.execute(stmt)
-        total_revenue = result.scalar() or Decimal("0.00")
-
-        # Pending revenue
-        stmt = (
-            select(func.sum(Order.total_amount))
-            .join(Student, Order.student_id == Student.student_id)
-            .join(Profile, Student.user_id == Profile.user_id)
-            .where(
-                and_(
-                    Profile.school_id == school_id,
-                    Order.status == OrderStatus.PENDING_PAYMENT,
-                )
-            )
-        )
-        result = await self.db.execute(stmt)
-        pending_revenue = result.scalar() or Decimal("0.00")
 
-        # Average order value
-        average_order_value = Decimal("0.00")
-        if total_orders > 0:
-            average_order_value = total_revenue / total_orders
+        Raises:
+            HTTPException 400: If the date range is reversed or too long
+        """
+        if date_from and date_to:
+            if date_from > date_to:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="date_from must not be after date_to")
+            if (date_to - date_from).days >= MAX_STATISTICS_RANGE_DAYS:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Date range cannot exceed {MAX_STATISTICS_RANGE_DAYS} days")
 
-        return {
-            "total_orders": total_orders,
-            "pending_payment_count": status_counts.get("pending_payment", 0),
-            "processing_count": status_counts.get("processing", 0),
-            "shipped_count": status_counts.get("shipped", 0),
-            "delivered_count": status_counts.get("delivered", 0),
-            "cancelled_count": status_counts.get("cancelled", 0),
-            "total_revenue": total_revenue,
-            "pending_revenue": pending_revenue,
-            "average_order_value": average_order_value,
-        }
+        return await order_statistics_service.get_snapshot(self.db, school_id, date_from=date_from, date_to=date_to)
 
     # ADD THESE METHODS TO OrderService CLASS IN order_service.py
 
@@ -547,11 +508,11 @@ class OrderService:
         Transaction Steps:
         1. Validate parent belongs to same school
         2. Validate student belongs to parent
-        3. Lock all products
+        3. Read all products (no locks)
         4. Validate products are active and have stock
         5. Create order record
         6. Create order items
-        7. Decrement stock
+        7. Reserve stock (conditional decrements, see create_order_from_cart)
         8. Commit transaction
 
         Args:
@@ -601,19 +562,18 @@ class OrderService:
             if not parent_link:
                 raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Student does not belong to the specified parent")
 
-            # Step 3: Lock all products
+            # Step 3: Read all products
             product_ids = [item.product_id for item in order_data.items if item.product_id]
 
             if not product_ids:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Order must contain at least one product")
 
-            stmt = select(Product).where(Product.product_id.in_(product_ids)).with_for_update()
+            stmt = select(Product).where(Product.product_id.in_(product_ids))
             result = await self.db.execute(stmt)
-            locked_products = list(result.scalars().all())
+            products = list(result.scalars().all())
 
             # Create product lookup
-            products_dict = {p.product_id: p for p in locked_products}
-            product_data = {p.product_id: {"name": p.name, "is_active": p.is_active, "stock_quantity": p.stock_quantity, "price": p.price, "product_id": p.product_id} for p in locked_products}
+            product_data = {p.product_id: {"name": p.name, "is_active": p.is_active, "stock_quantity": p.stock_quantity, "price": p.price, "product_id": p.product_id} for p in products}
 
             # Step 4: Validate all products
             validation_errors = []
@@ -672,15 +632,12 @@ class OrderService:
                     order_item = OrderItem(order_id=db_order.order_id, product_id=item.product_id, quantity=item.quantity, price_at_time_of_order=pdata["price"], status="pending")
                     self.db.add(order_item)
 
-            # Step 8: Decrement stock
-            for item in order_data.items:
-                if item.product_id:
-                    product = products_dict[item.product_id]
-                    product.stock_quantity -= item.quantity
-
             # Save order_id before commit
             order_id = db_order.order_id
 
+            # Step 8: Reserve stock
+            await self._reserve_stock(order_id, admin_school_id, stock_reservation_service.total_quantities(order_data.items), product_data, "Order validation failed")
+
             # Step 9: Commit transaction
             await self.db.commit()
 
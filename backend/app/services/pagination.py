@@ -0,0 +1,97 @@
+# backend/app/services/pagination.py
+"""
+Keyset (cursor) pagination for the finance listings.
+
+Listings are ordered newest first on ``(created_at, id)``. A page is fetched
+with ``WHERE (created_at, id) < (:cursor_created_at, :cursor_id) ORDER BY
+created_at DESC, id DESC LIMIT :limit + 1`` - the extra row only tells whether
+another page exists - so page 100 costs the same as page 1, and rows inserted
+while a client is paging never shift or repeat entries. The cursor handed to
+clients is an opaque, URL-safe encoding of the last row's ``(created_at, id)``.
+
+Totals are exact ``COUNT(*)`` queries over the same filters, cached per filter
+set for ``FINANCE_COUNT_CACHE_TTL_SECONDS`` and dropped when a commit writes to
+the listed table (see app.db.write_tracking), so paging through a listing
+counts once rather than on every page.
+"""
+
+import base64
+import json
+import os
+import threading
+import time
+from collections.abc import Hashable, Sequence
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from app.db.write_tracking import TableWrites, on_tables_committed
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+FINANCE_COUNT_CACHE_TTL_SECONDS = float(os.getenv("FINANCE_COUNT_CACHE_TTL_SECONDS", "60"))
+_COUNT_CACHE_MAX_ENTRIES = 1024
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Inverse of :func:`encode_cursor`; raises ValueError for anything it did not produce."""
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid pagination cursor.") from e
+
+
+async def keyset_page(db: AsyncSession, stmt: Select, *, created_at_column: Any, id_column: Any, limit: int, cursor: Optional[str] = None) -> tuple[Sequence[Any], Optional[str]]:
+    """
+    One page of ``stmt`` (a ``select`` of ORM entities) newest first, and the
+    cursor of the next page (None on the last page).
+    """
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(created_at_column, id_column) < tuple_(cursor_created_at, cursor_id))
+    stmt = stmt.order_by(created_at_column.desc(), id_column.desc()).limit(limit + 1)
+    rows = (await db.execute(stmt)).scalars().all()
+
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, created_at_column.key), getattr(last, id_column.key))
+
+
+_counts: dict[tuple, tuple[int, float]] = {}
+_counts_lock = threading.Lock()
+
+
+async def cached_count(db: AsyncSession, stmt: Select, *, table: str, key: Hashable) -> int:
+    """``COUNT(*)`` of ``stmt``'s rows, cached under ``(table, key)`` until it expires or ``table`` is written."""
+    cache_key = (table, key)
+    with _counts_lock:
+        cached = _counts.get(cache_key)
+        if cached is not None and time.monotonic() - cached[1] < FINANCE_COUNT_CACHE_TTL_SECONDS:
+            return cached[0]
+
+    count_stmt = select(func.count()).select_from(stmt.order_by(None).subquery())
+    total = (await db.execute(count_stmt)).scalar_one()
+
+    with _counts_lock:
+        if len(_counts) >= _COUNT_CACHE_MAX_ENTRIES:
+            _counts.clear()
+        _counts[cache_key] = (total, time.monotonic())
+    return total
+
+
+@on_tables_committed
+def _invalidate_counts(writes: TableWrites) -> None:
+    with _counts_lock:
+        for cache_key in [cache_key for cache_key in _counts if cache_key[0] in writes]:
+            del _counts[cache_key]
@@ -4,6 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.core import crypto_service
 from app.models.school import School
 from app.schemas.payment_gateway_schema import GatewayCredentialsCreate
+from app.services import razorpay_gateway
 
 
 class PaymentGatewayService:
@@ -24,6 +25,8 @@ class PaymentGatewayService:
         school.razorpay_webhook_secret_encrypted = crypto_service.encrypt_value(credentials.razorpay_webhook_secret)
 
         await self.db.commit()
+        # Drop the cached decrypted keys so the new ones are used from the next request on.
+        razorpay_gateway.invalidate_school_credentials(school_id)
         await self.db.refresh(school)
 
         return school
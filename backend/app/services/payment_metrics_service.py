@@ -0,0 +1,128 @@
+# backend/app/services/payment_metrics_service.py
+"""
+Incrementally maintained payment health counters.
+
+Instead of scanning ``payments`` and ``gateway_webhook_events`` over 24 hours
+on every dashboard request, every status change bumps a per-school, per-hour
+row in ``payment_metrics_hourly``; the dashboards sum the last 24 buckets.
+
+Counting happens in an ``after_flush`` hook, so every code path that changes a
+payment's status through the ORM (checkout verification, the webhook consumer,
+reconciliation, allocation retries) is covered without having to remember to
+call anything. The counters are upserted on the flushing transaction's own
+connection: they commit with the status change and roll back with it,
+savepoints included. Core ``INSERT``/``UPDATE`` statements bypass the hook; the
+webhook intake records its own rows with :func:`increment`.
+
+Set ``PAYMENT_METRICS_ROLLUP_ENABLED=false`` to switch the hook off, e.g.
+against a database that does not have the rollup table yet.
+"""
+
+import logging
+import os
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.gateway_webhook_event import GatewayWebhookEvent
+from app.models.payment import Payment
+from app.models.payment_metrics_hourly import PaymentMetricsHourly
+from app.schemas.enums import PaymentStatus
+
+logger = logging.getLogger(__name__)
+
+PAYMENT_METRICS_ROLLUP_ENABLED = os.getenv("PAYMENT_METRICS_ROLLUP_ENABLED", "true").lower() == "true"
+
+COUNTERS = ("payments_initiated", "payments_captured", "payments_failed", "allocation_failures", "payments_reconciled", "webhooks_processed", "webhooks_failed")
+
+_PAYMENT_STATUS_COUNTERS = {PaymentStatus.CAPTURED.value: "payments_captured", PaymentStatus.FAILED.value: "payments_failed", PaymentStatus.CAPTURED_ALLOCATION_FAILED.value: "allocation_failures"}
+_WEBHOOK_STATUS_COUNTERS = {"processed": "webhooks_processed", "failed": "webhooks_failed"}
+_RECONCILED_MARKER = "Reconciled:"  # error_description prefix written by the reconciliation jobs
+
+Deltas = dict[tuple[Optional[int], datetime], Counter]
+
+
+def hour_bucket(moment: datetime) -> datetime:
+    return moment.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _status(value: Any) -> Optional[str]:
+    return getattr(value, "value", value)
+
+
+def _new_status(obj: Any) -> Optional[str]:
+    """The status ``obj`` moves to in this flush, or None if it does not change."""
+    history = inspect(obj).attrs.status.history
+    if not history.added:
+        return None
+    new, old = _status(history.added[0]), _status(history.deleted[0]) if history.deleted else None
+    return new if new != old else None
+
+
+def collect_deltas(session: Session, now: Optional[datetime] = None) -> Deltas:
+    """Counter increments for the payments and webhook events ``session`` is about to flush."""
+    bucket = hour_bucket(now or datetime.now(timezone.utc))
+    deltas: Deltas = defaultdict(Counter)
+
+    for obj in session.new:
+        if isinstance(obj, Payment):
+            counts = deltas[(obj.school_id, bucket)]
+            counts["payments_initiated"] += 1
+            if _status(obj.status) in _PAYMENT_STATUS_COUNTERS:
+                counts[_PAYMENT_STATUS_COUNTERS[_status(obj.status)]] += 1
+        elif isinstance(obj, GatewayWebhookEvent) and obj.status in _WEBHOOK_STATUS_COUNTERS:
+            deltas[(obj.school_id, bucket)][_WEBHOOK_STATUS_COUNTERS[obj.status]] += 1
+
+    for obj in session.dirty:
+        if not isinstance(obj, (Payment, GatewayWebhookEvent)):
+            continue
+        status = _new_status(obj)
+        if status is None:
+            continue
+        if isinstance(obj, Payment):
+            if status in _PAYMENT_STATUS_COUNTERS:
+                deltas[(obj.school_id, bucket)][_PAYMENT_STATUS_COUNTERS[status]] += 1
+            if status in (PaymentStatus.CAPTURED.value, PaymentStatus.FAILED.value) and (obj.error_description or "").startswith(_RECONCILED_MARKER):
+                deltas[(obj.school_id, bucket)]["payments_reconciled"] += 1
+        elif status in _WEBHOOK_STATUS_COUNTERS:
+            deltas[(obj.school_id, bucket)][_WEBHOOK_STATUS_COUNTERS[status]] += 1
+
+    return {key: counts for key, counts in deltas.items() if counts}
+
+
+def upsert_statement(deltas: Deltas):
+    """One multi-row ``INSERT ... ON CONFLICT DO UPDATE`` adding ``deltas`` to their buckets (rows sorted to keep lock order stable)."""
+    rows = [{"school_id": school_id, "hour_start": hour_start, **{name: counts.get(name, 0) for name in COUNTERS}} for (school_id, hour_start), counts in sorted(deltas.items(), key=lambda item: (item[0][0] or 0, item[0][1]))]
+    stmt = pg_insert(PaymentMetricsHourly).values(rows)
+    return stmt.on_conflict_do_update(index_elements=[PaymentMetricsHourly.school_id, PaymentMetricsHourly.hour_start], set_={name: getattr(PaymentMetricsHourly, name) + getattr(stmt.excluded, name) for name in COUNTERS})
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flushed_transitions(session: Session, flush_context) -> None:
+    # new/dirty and attribute history still describe the pre-flush state at this point.
+    if not PAYMENT_METRICS_ROLLUP_ENABLED:
+        return
+    deltas = collect_deltas(session)
+    if deltas:
+        session.connection().execute(upsert_statement(deltas))
+
+
+async def increment(db: AsyncSession, *, school_id: Optional[int], **counts: int) -> None:
+    """Adds ``counts`` to the current hour's bucket, for writes that do not go through the unit of work."""
+    if PAYMENT_METRICS_ROLLUP_ENABLED and counts:
+        await db.execute(upsert_statement({(school_id, hour_bucket(datetime.now(timezone.utc))): Counter(counts)}))
+
+
+async def window_totals(db: AsyncSession, *, hours: int = 24, school_id: Optional[int] = None) -> dict[str, int]:
+    """Counter totals over the last ``hours`` hourly buckets (the current, partial hour included)."""
+    since = hour_bucket(datetime.now(timezone.utc)) - timedelta(hours=hours - 1)
+    stmt = select(*(func.coalesce(func.sum(getattr(PaymentMetricsHourly, name)), 0).label(name) for name in COUNTERS)).where(PaymentMetricsHourly.hour_start >= since)
+    if school_id is not None:
+        stmt = stmt.where(PaymentMetricsHourly.school_id == school_id)
+    totals = (await db.execute(stmt)).mappings().one()
+    return {name: int(totals[name]) for name in COUNTERS}
@@ -0,0 +1,426 @@
+# backend/app/services/payment_reconciliation_service.py
+"""
+Batched reconciliation of pending and authorized payments against Razorpay.
+
+Both jobs claim payments in keyset-ordered batches with ``SELECT ... FOR UPDATE
+SKIP LOCKED``, so several workers (or overlapping admin triggers) can run at
+once without touching the same rows. Per batch:
+
+- payments are grouped by school and each school's cached gateway client is
+  loaded once (see ``razorpay_gateway.get_school_gateway``);
+- gateway calls run concurrently, bounded by
+  ``PAYMENT_RECONCILE_GATEWAY_CONCURRENCY``. Pending payments are resolved from
+  one paginated ``payment.all`` listing per school over the batch's time window;
+  orders the listing does not settle fall back to ``order.fetch`` /
+  ``order.payments``;
+- status changes are applied in one transaction, committed once per batch.
+  Each payment's change runs in a savepoint, and so does an invoice allocation
+  inside it: a failure undoes only that payment's change (a failing allocation
+  marks its payment ``CAPTURED_ALLOCATION_FAILED``), never a capture Razorpay
+  has already made for another payment of the batch. A capture whose commit is
+  lost is rejected by Razorpay as already captured on the next run; the payment
+  is then fetched and, being captured, recorded as such.
+
+Every run is recorded (payments processed, gateway calls, payments/s) in
+``payment_reconciliation_runs``, read by the reconciliation report, and exported
+as Prometheus metrics (see app.core.metrics).
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from fastapi import HTTPException
+from razorpay.errors import BadRequestError, GatewayError, ServerError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from app.core.metrics import PAYMENT_RECONCILE_PAYMENTS, PAYMENT_RECONCILE_RUN_SECONDS
+from app.models.payment import Payment
+from app.models.payment_reconciliation_run import PaymentReconciliationRun
+from app.schemas.enums import PaymentStatus
+from app.services import invoice_service, razorpay_gateway, stock_reservation_service
+from app.services.razorpay_gateway import RazorpayGateway, RazorpayNetworkError
+
+logger = logging.getLogger(__name__)
+
+PAYMENT_RECONCILE_BATCH_SIZE = int(os.getenv("PAYMENT_RECONCILE_BATCH_SIZE", "100"))
+PAYMENT_RECONCILE_MAX_BATCHES = int(os.getenv("PAYMENT_RECONCILE_MAX_BATCHES", "50"))
+PAYMENT_RECONCILE_GATEWAY_CONCURRENCY = int(os.getenv("PAYMENT_RECONCILE_GATEWAY_CONCURRENCY", "8"))
+PAYMENT_RECONCILE_LIST_MAX_PAGES = int(os.getenv("PAYMENT_RECONCILE_LIST_MAX_PAGES", "10"))
+PAYMENT_RECONCILE_LIST_SLACK_SECONDS = int(os.getenv("PAYMENT_RECONCILE_LIST_SLACK_SECONDS", "900"))
+PAYMENT_RECONCILE_RUN_HISTORY = int(os.getenv("PAYMENT_RECONCILE_RUN_HISTORY", "200"))
+
+PENDING_THRESHOLD_HOURS = 1  # Pending payments younger than this are left to the checkout flow
+ABANDONED_AFTER_HOURS = 24  # Orders without a single attempt after this are marked FAILED
+AUTHORIZATION_EXPIRY_HOURS = 120  # Razorpay's authorization validity (5 days)
+_LIST_PAGE_SIZE = 100  # Razorpay's maximum ``count`` per listing page
+
+
+@dataclass
+class ReconciliationRun:
+    kind: str  # "pending" / "authorized"
+    started_at: datetime
+    duration_seconds: float = 0.0
+    processed: int = 0
+    batches: int = 0
+    schools: int = 0
+    gateway_calls: int = 0
+    outcomes: Counter = field(default_factory=Counter)
+
+    @property
+    def updated(self) -> int:
+        return sum(count for outcome, count in self.outcomes.items() if outcome not in ("unchanged", "skipped"))
+
+    @property
+    def payments_per_second(self) -> float:
+        return round(self.processed / self.duration_seconds, 2) if self.duration_seconds > 0 else 0.0
+
+
+async def recent_runs(db: AsyncSession, since: Optional[datetime] = None) -> list[PaymentReconciliationRun]:
+    """Runs recorded by any worker, newest first (at most ``PAYMENT_RECONCILE_RUN_HISTORY``)."""
+    stmt = select(PaymentReconciliationRun).order_by(PaymentReconciliationRun.started_at.desc()).limit(PAYMENT_RECONCILE_RUN_HISTORY)
+    if since is not None:
+        stmt = stmt.where(PaymentReconciliationRun.started_at >= since)
+    return list((await db.execute(stmt)).scalars().all())
+
+
+async def _record_run(db: AsyncSession, run: ReconciliationRun) -> None:
+    db.add(
+        PaymentReconciliationRun(
+            kind=run.kind,
+            started_at=run.started_at,
+            duration_seconds=run.duration_seconds,
+            processed=run.processed,
+            updated=run.updated,
+            batches=run.batches,
+            schools=run.schools,
+            gateway_calls=run.gateway_calls,
+            outcomes={outcome: count for outcome, count in run.outcomes.items() if count},
+        )
+    )
+    try:
+        await db.commit()
+    except Exception as exc:
+        # The payments are settled already; only the report loses this run
+        logger.error(f"Recording the {run.kind} reconciliation run failed: {exc}", exc_info=True)
+        await db.rollback()
+    PAYMENT_RECONCILE_RUN_SECONDS.labels(kind=run.kind).observe(run.duration_seconds)
+    for outcome, count in run.outcomes.items():
+        PAYMENT_RECONCILE_PAYMENTS.labels(kind=run.kind, outcome=outcome).inc(count)
+
+
+class _GatewayLimiter:
+    """Bounds the gateway calls in flight for one run and counts them."""
+
+    def __init__(self, run: ReconciliationRun, concurrency: int):
+        self._run = run
+        self._semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def call(self, fn, *args) -> Any:
+        async with self._semaphore:
+            self._run.gateway_calls += 1
+            return await fn(*args)
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def _age_hours(payment: Payment, now: datetime) -> float:
+    return (now - _as_utc(payment.created_at)).total_seconds() / 3600
+
+
+async def _claim_batch(db: AsyncSession, stmt: Select, after_id: int, batch_size: int) -> list[Payment]:
+    """Next batch after ``after_id``; rows locked by another worker are skipped, not waited on."""
+    result = await db.execute(stmt.where(Payment.id > after_id).order_by(Payment.id).limit(batch_size).with_for_update(skip_locked=True))
+    return list(result.scalars().all())
+
+
+async def _school_gateways(db: AsyncSession, payments: list[Payment]) -> dict[int, RazorpayGateway]:
+    gateways = {}
+    for school_id in sorted({payment.school_id for payment in payments}):
+        try:
+            gateways[school_id] = await razorpay_gateway.get_school_gateway(db=db, school_id=school_id)
+        except HTTPException as exc:
+            # Gateway not configured or credentials unreadable; leave the school's payments for a later run.
+            logger.error(f"Skipping reconciliation for school {school_id}: {exc.detail}")
+    return gateways
+
+
+async def _apply_in_savepoint(db: AsyncSession, payment: Payment, apply, *args) -> str:
+    """One payment's status change, in a savepoint: an error undoes this payment's change only, and it is retried next cycle."""
+    try:
+        async with db.begin_nested():
+            return await apply(db, payment, *args)
+    except Exception as exc:
+        logger.error(f"Reconciling payment {payment.id} failed, will retry in next cycle: {exc}", exc_info=True)
+        return "skipped"
+
+
+async def _release_failed_orders(db: AsyncSession, payments: list[Payment]) -> None:
+    """Orders whose payment definitively failed are cancelled and their held stock returned."""
+    order_ids = [payment.order_id for payment in payments if payment.order_id and payment.status == PaymentStatus.FAILED]
+    try:
+        async with db.begin_nested():
+            await stock_reservation_service.release_reservations(db, order_ids, cancel_orders=True)
+    except Exception as exc:
+        # Not worth losing the batch's captures over: the expired-hold sweep returns the stock
+        logger.error(f"Releasing the held stock of orders {order_ids} failed: {exc}", exc_info=True)
+
+
+async def _run_batches(db: AsyncSession, run: ReconciliationRun, stmt: Select, apply_batch, batch_size: int, max_batches: int) -> None:
+    """Claim, resolve and commit batches until the backlog (or ``max_batches``) is exhausted."""
+    after_id = 0
+    schools = set()
+    while run.batches < max_batches:
+        payments = await _claim_batch(db, stmt, after_id, batch_size)
+        if not payments:
+            break
+        run.batches += 1
+        run.processed += len(payments)
+        after_id = payments[-1].id
+        schools.update(payment.school_id for payment in payments)
+
+        outcomes = Counter()
+        try:
+            await apply_batch(payments, outcomes)
+            await _release_failed_orders(db, payments)
+            await db.commit()
+        except Exception as exc:
+            logger.error(f"{run.kind.capitalize()} reconciliation batch ending at Payment {after_id} failed: {exc}", exc_info=True)
+            await db.rollback()
+            outcomes = Counter({"skipped": len(payments)})
+        run.outcomes.update(outcomes)
+
+        if len(payments) < batch_size:
+            break
+    run.schools = len(schools)
+
+
+async def _list_school_payments(limiter: _GatewayLimiter, gateway: RazorpayGateway, since: datetime, until: datetime) -> tuple[dict[str, list[dict]], bool]:
+    """Gateway payments created in the window, grouped by order id, and whether the listing is complete."""
+    by_order = defaultdict(list)
+    params = {"from": int(since.timestamp()), "to": int(until.timestamp()), "count": _LIST_PAGE_SIZE}
+    for page in range(PAYMENT_RECONCILE_LIST_MAX_PAGES):
+        collection = await limiter.call(gateway.payment.all, {**params, "skip": page * _LIST_PAGE_SIZE})
+        items = collection.get("items", [])
+        for item in items:
+            if item.get("order_id"):
+                by_order[item["order_id"]].append(item)
+        if len(items) < _LIST_PAGE_SIZE:
+            return by_order, True
+    return by_order, False
+
+
+async def _resolve_order(limiter: _GatewayLimiter, gateway: RazorpayGateway, gateway_order_id: str, listing: Optional[tuple[dict, bool]]) -> tuple[str, list[dict]]:
+    """(order status, payment attempts) of a Razorpay order, from the school listing when it settles the order."""
+    if listing is not None:
+        by_order, complete = listing
+        attempts = by_order.get(gateway_order_id)
+        # A truncated listing can still prove a capture, but not that every attempt failed.
+        if attempts and (complete or any(attempt.get("status") == "captured" for attempt in attempts)):
+            return ("paid" if any(attempt.get("status") == "captured" for attempt in attempts) else "attempted"), attempts
+
+    order = await limiter.call(gateway.order.fetch, gateway_order_id)
+    order_status = order.get("status")
+    attempts = []
+    if order_status in ("paid", "attempted"):
+        attempts = (await limiter.call(gateway.order.payments, gateway_order_id)).get("items", [])
+    return order_status, attempts
+
+
+async def _allocate(db: AsyncSession, payment: Payment) -> bool:
+    """Allocate a captured payment to its invoice or confirm its order, inside a savepoint; False if its order was no longer payable."""
+    async with db.begin_nested():
+        if payment.invoice_id:
+            await invoice_service.allocate_payment_to_invoice_items(db=db, payment_id=payment.id, user_id=payment.user_id)
+        elif payment.order_id:
+            return await stock_reservation_service.confirm_paid_order(db, payment, source="reconciliation")
+    return True
+
+
+async def _capture_and_allocate(db: AsyncSession, payment: Payment, error_prefix: str) -> str:
+    try:
+        return "captured" if await _allocate(db, payment) else "allocation_failed"
+    except Exception as exc:
+        logger.critical(f"RECONCILIATION_ALLOCATION_FAILURE: Payment {payment.id} captured but FAILED allocation. Error: {exc}", exc_info=True)
+        payment.status = PaymentStatus.CAPTURED_ALLOCATION_FAILED
+        payment.error_description = f"{error_prefix}: {str(exc)[:255]}"
+        logger.info(f"ALERT_PAYMENT_ALLOCATION_FAILURE: payment_id={payment.id}")
+        return "allocation_failed"
+
+
+def _fail(payment: Payment, description: str) -> str:
+    payment.status = PaymentStatus.FAILED
+    payment.error_description = description
+    return "failed"
+
+
+async def _apply_pending(db: AsyncSession, payment: Payment, order_status: str, attempts: list[dict], now: datetime) -> str:
+    """Apply the gateway's view of a pending payment's order; returns the outcome."""
+    if order_status == "paid":
+        captured = next((attempt for attempt in attempts if attempt.get("status") == "captured"), None)
+        if captured is None:
+            logger.error(f"Data inconsistency: Order {payment.gateway_order_id} marked paid but no captured payment found")
+            return _fail(payment, "Reconciled: Order marked paid but no captured payment found.")
+        logger.warning(f"Forward Reconciliation: Found CAPTURED gateway payment for PENDING internal Payment ID {payment.id}.")
+        payment.status = PaymentStatus.CAPTURED
+        payment.gateway_payment_id = captured.get("id")
+        outcome = await _capture_and_allocate(db, payment, "Recon allocation fail")
+        return "reconciled" if outcome == "captured" else outcome
+
+    if order_status == "attempted":
+        if attempts and not all(attempt.get("status") == "failed" for attempt in attempts):
+            # Some attempts are still pending/authorized - keep monitoring
+            return "unchanged"
+        logger.warning(f"Reverse Reconciliation: Payment {payment.id} has failed attempts. Marking as FAILED.")
+        return _fail(payment, f"Reconciled: All {len(attempts)} payment attempt(s) failed at gateway.")
+
+    if order_status == "created":
+        age_hours = _age_hours(payment, now)
+        if age_hours <= ABANDONED_AFTER_HOURS:
+            return "unchanged"
+        logger.warning(f"Reverse Reconciliation: Payment {payment.id} is {age_hours:.1f} hours old with no payment attempt. Marking as FAILED (abandoned).")
+        return _fail(payment, f"Reconciled: No payment attempt made within {int(age_hours)} hours. Likely abandoned.")
+
+    logger.warning(f"Payment {payment.id}: Unexpected Razorpay order status '{order_status}'. Marking as FAILED for safety.")
+    return _fail(payment, f"Reconciled: Unexpected gateway order status: {order_status}")
+
+
+async def reconcile_pending(db: AsyncSession, *, batch_size: int = PAYMENT_RECONCILE_BATCH_SIZE, max_batches: int = PAYMENT_RECONCILE_MAX_BATCHES) -> ReconciliationRun:
+    """
+    Forward and reverse reconciliation of payments left 'pending' for more than
+    an hour: captured orders are marked CAPTURED and allocated, orders whose
+    attempts all failed or that were abandoned are marked FAILED.
+    """
+    now = datetime.now(timezone.utc)
+    run = ReconciliationRun(kind="pending", started_at=now)
+    limiter = _GatewayLimiter(run, PAYMENT_RECONCILE_GATEWAY_CONCURRENCY)
+    started = time.perf_counter()
+    stmt = select(Payment).where(Payment.status == PaymentStatus.PENDING).where(Payment.created_at < now - timedelta(hours=PENDING_THRESHOLD_HOURS)).where(Payment.gateway_order_id.isnot(None))
+
+    async def apply_batch(payments: list[Payment], outcomes: Counter) -> None:
+        gateways = await _school_gateways(db, payments)
+        by_school = defaultdict(list)
+        for payment in payments:
+            if payment.school_id in gateways:
+                by_school[payment.school_id].append(payment)
+        outcomes["skipped"] += len(payments) - sum(len(school_payments) for school_payments in by_school.values())
+
+        school_ids = list(by_school)
+        window_starts = [min(_as_utc(payment.created_at) for payment in by_school[school_id]) - timedelta(seconds=PAYMENT_RECONCILE_LIST_SLACK_SECONDS) for school_id in school_ids]
+        listings = await asyncio.gather(*(_list_school_payments(limiter, gateways[school_id], since, now) for school_id, since in zip(school_ids, window_starts)), return_exceptions=True)
+        listing_by_school = {}
+        for school_id, listing in zip(school_ids, listings):
+            if isinstance(listing, Exception):
+                logger.warning(f"Payment listing failed for school {school_id}, falling back to per-order lookups: {listing}")
+            else:
+                listing_by_school[school_id] = listing
+
+        claimed = [payment for school_payments in by_school.values() for payment in school_payments]
+        resolutions = await asyncio.gather(
+            *(_resolve_order(limiter, gateways[payment.school_id], payment.gateway_order_id, listing_by_school.get(payment.school_id)) for payment in claimed),
+            return_exceptions=True,
+        )
+        for payment, resolution in zip(claimed, resolutions):
+            if isinstance(resolution, Exception):
+                # Skip this payment, will retry next time
+                logger.error(f"Failed to fetch Razorpay order {payment.gateway_order_id}: {resolution}")
+                outcomes["skipped"] += 1
+                continue
+            outcomes[await _apply_in_savepoint(db, payment, _apply_pending, *resolution, now)] += 1
+
+    await _run_batches(db, run, stmt, apply_batch, batch_size, max_batches)
+    run.duration_seconds = time.perf_counter() - started
+    await _record_run(db, run)
+    return run
+
+
+async def _capture(limiter: _GatewayLimiter, gateway: RazorpayGateway, gateway_payment_id: str, amount_in_paise: int) -> dict:
+    """
+    The captured payment. A payment captured earlier - by a capture whose
+    answer or commit was lost - is rejected as already captured; it is fetched
+    and returned like a fresh capture.
+    """
+    try:
+        return await limiter.call(gateway.payment.capture, gateway_payment_id, amount_in_paise)
+    except BadRequestError:
+        # If the fetch fails too, its error is applied instead (a network error leaves the payment for the next run)
+        payment = await limiter.call(gateway.payment.fetch, gateway_payment_id)
+        if payment.get("status") != "captured":
+            raise
+        logger.warning(f"Payment {gateway_payment_id} was already captured at the gateway; recording the capture.")
+        return payment
+
+
+async def _apply_capture(db: AsyncSession, payment: Payment, result: Any) -> str:
+    """Apply a capture response (or the error it raised); returns the outcome."""
+    if isinstance(result, BadRequestError):
+        # Common reasons: authorization cancelled or expired, invalid amount (an already captured payment is fetched by _capture)
+        error_msg = str(result)
+        logger.warning(f"Capture failed for payment {payment.id}: {error_msg}")
+        if "expired" in error_msg.lower() or "cannot be captured" in error_msg.lower():
+            _fail(payment, f"Authorization expired: {error_msg[:200]}")
+            return "expired"
+        return _fail(payment, f"Capture failed: {error_msg[:200]}")
+
+    if isinstance(result, (GatewayError, ServerError, RazorpayNetworkError)):
+        logger.error(f"Gateway error while capturing payment {payment.id}: {result}. Will retry in next cycle.")
+        return "unchanged"
+    if isinstance(result, Exception):
+        logger.error(f"Unexpected error capturing payment {payment.id}: {result}", exc_info=result)
+        return "unchanged"
+
+    if result.get("status") != "captured":
+        logger.error(f"Capture API returned unexpected status '{result.get('status')}' for payment {payment.id}")
+        return _fail(payment, f"Capture returned unexpected status: {result.get('status')}")
+
+    logger.info(f"Successfully captured authorized payment {payment.id}. Amount: ₹{payment.amount_paid}")
+    payment.status = PaymentStatus.CAPTURED
+    payment.gateway_signature = result.get("id")  # Store captured payment ID
+    return await _capture_and_allocate(db, payment, "Capture allocation fail")
+
+
+async def reconcile_authorized(db: AsyncSession, *, batch_size: int = PAYMENT_RECONCILE_BATCH_SIZE, max_batches: int = PAYMENT_RECONCILE_MAX_BATCHES) -> ReconciliationRun:
+    """
+    Captures 'authorized' payments still inside Razorpay's authorization window
+    and marks older ones FAILED (expired).
+    """
+    now = datetime.now(timezone.utc)
+    run = ReconciliationRun(kind="authorized", started_at=now)
+    limiter = _GatewayLimiter(run, PAYMENT_RECONCILE_GATEWAY_CONCURRENCY)
+    started = time.perf_counter()
+    stmt = select(Payment).where(Payment.status == PaymentStatus.AUTHORIZED).where(Payment.gateway_payment_id.isnot(None))
+
+    async def apply_batch(payments: list[Payment], outcomes: Counter) -> None:
+        live = []
+        for payment in payments:
+            age_hours = _age_hours(payment, now)
+            if age_hours >= AUTHORIZATION_EXPIRY_HOURS:
+                logger.warning(f"Authorized Payment {payment.id} is {age_hours:.1f} hours old (threshold: {AUTHORIZATION_EXPIRY_HOURS} hours). Marking as FAILED (expired).")
+                _fail(payment, f"Authorization expired after {int(age_hours)} hours. Funds were held but never captured.")
+                outcomes["expired"] += 1
+            else:
+                live.append(payment)
+
+        gateways = await _school_gateways(db, live)
+        to_capture = [payment for payment in live if payment.school_id in gateways]
+        outcomes["skipped"] += len(live) - len(to_capture)
+        results = await asyncio.gather(
+            *(_capture(limiter, gateways[payment.school_id], payment.gateway_payment_id, int(payment.amount_paid * 100)) for payment in to_capture),
+            return_exceptions=True,
+        )
+        for payment, result in zip(to_capture, results):
+            outcomes[await _apply_in_savepoint(db, payment, _apply_capture, result)] += 1
+
+    await _run_batches(db, run, stmt, apply_batch, batch_size, max_batches)
+    run.duration_seconds = time.perf_counter() - started
+    await _record_run(db, run)
+    return run
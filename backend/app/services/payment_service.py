@@ -4,17 +4,16 @@ import os
 import time
 from datetime import datetime, timedelta, timezone
 from decimal import Decimal
+from typing import Optional
 
-import razorpay
-import requests  # Add import
 import sentry_sdk
 from fastapi import HTTPException
-from razorpay.errors import BadRequestError, GatewayError, ServerError
-from sqlalchemy import case, func, select, update
+from razorpay.errors import BadRequestError, GatewayError, ServerError, SignatureVerificationError
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.core import crypto_service
 from app.core.metrics import ALLOCATION_FAILURES_COUNTER, PAYMENTS_COUNTER
 from app.models.gateway_webhook_event import GatewayWebhookEvent
 from app.models.invoice import Invoice
@@ -22,25 +21,16 @@ from app.models.order import Order
 from app.models.payment import Payment
 from app.models.school import School
 from app.models.student import Student
-from app.schemas.enums import OrderStatus, PaymentStatus
-from app.schemas.payment_schema import PaymentHealthStats, PaymentInitiateRequest, PaymentVerificationRequest, ReconciliationReportStats
-from app.services import invoice_service
+from app.schemas.enums import PaymentStatus
+from app.schemas.payment_schema import PaymentHealthStats, PaymentInitiateRequest, PaymentVerificationRequest, ReconciliationReportStats, ReconciliationRunStats
+from app.services import invoice_service, order_cancellation_service, pagination, payment_metrics_service, payment_reconciliation_service, razorpay_gateway, stock_reservation_service, webhook_queue_service
+from app.services.razorpay_gateway import RazorpayNetworkError
 
 logger = logging.getLogger(__name__)
 
 
-async def _get_razorpay_client(db: AsyncSession, school_id: int) -> razorpay.Client:
-    """
-    Fetches a school's credentials, decrypts them, and returns an initialized Razorpay client.
-    """
-    school = await db.get(School, school_id)
-    if not school or not school.razorpay_key_id_encrypted or not school.razorpay_key_secret_encrypted:
-        raise HTTPException(status_code=503, detail="Payment gateway is not configured for this school.")
-
-    key_id = crypto_service.decrypt_value(school.razorpay_key_id_encrypted)
-    key_secret = crypto_service.decrypt_value(school.razorpay_key_secret_encrypted)
-
-    return razorpay.Client(auth=(key_id, key_secret))
+def _run_throughput(run: payment_reconciliation_service.ReconciliationRun) -> dict:
+    return {"batches": run.batches, "schools": run.schools, "gateway_calls": run.gateway_calls, "duration_seconds": round(run.duration_seconds, 3), "payments_per_second": run.payments_per_second}
 
 
 class PaymentService:
@@ -74,17 +64,17 @@ class PaymentService:
             student_id = target_obj.student_id
             description = f"Payment for Order #{target_obj.order_number}"
 
-        # 2. Retrieve and decrypt school's Razorpay credentials BEFORE creating payment
+        # 2. Retrieve the school's (cached, decrypted) Razorpay credentials BEFORE creating payment
         school = await self.db.get(School, school_id)
-        if not school or not school.razorpay_key_id_encrypted or not school.razorpay_key_secret_encrypted:
+        credentials = await razorpay_gateway.get_school_credentials(self.db, school_id)
+        if not school or not credentials.configured:
             raise HTTPException(status_code=503, detail="Payment gateway is not configured for this school.")
 
-        key_id = crypto_service.decrypt_value(school.razorpay_key_id_encrypted)
-        key_secret = crypto_service.decrypt_value(school.razorpay_key_secret_encrypted)
+        key_id = credentials.key_id
 
         # 3. Call Razorpay's Orders API BEFORE creating our payment record
         try:
-            client = razorpay.Client(auth=(key_id, key_secret))
+            client = credentials.gateway
 
             timestamp = int(time.time()) % 1000000  # Last 6 digits of timestamp
             receipt = f"SCHOOS_PAY_{timestamp}"[:40]  # Ensure max 40 chars
@@ -98,8 +88,8 @@ class PaymentService:
                     "target_order_id": request_data.order_id,
                 },
             }
-            razorpay_order = client.order.create(data=order_payload)
-        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as net_err:
+            razorpay_order = await client.order.create(data=order_payload)
+        except RazorpayNetworkError as net_err:
             logger.error(f"Razorpay API network error during order creation: {net_err}")
             # Raise 504 Gateway Timeout or 503 Service Unavailable
             raise HTTPException(status_code=504, detail="Payment gateway timed out. Please try again later.")
@@ -165,18 +155,16 @@ class PaymentService:
             logger.warning(f"Payment {payment.id} is in non-verifiable state: {payment.status}")
             raise HTTPException(status_code=400, detail=f"Payment not in a verifiable state (status: {payment.status}).")
 
-        # 2. Retrieve and decrypt the school's Razorpay secret
-        school = await self.db.get(School, payment.school_id)
-        if not school or not school.razorpay_key_secret_encrypted:
+        # 2. Retrieve the school's (cached, decrypted) Razorpay secret
+        credentials = await razorpay_gateway.get_school_credentials(self.db, payment.school_id)
+        if not credentials.key_secret:
             raise HTTPException(status_code=503, detail="Payment gateway secret is not configured.")
 
-        key_secret = crypto_service.decrypt_value(school.razorpay_key_secret_encrypted)
-
         # 3. Perform the cryptographic signature verification
         try:
-            client = razorpay.Client(auth=("", key_secret))  # Key ID is not needed for verification
+            client = credentials.gateway  # Only the key secret is needed for verification
             client.utility.verify_payment_signature({"razorpay_order_id": verification_data.razorpay_order_id, "razorpay_payment_id": verification_data.razorpay_payment_id, "razorpay_signature": verification_data.razorpay_signature})
-        except razorpay.errors.SignatureVerificationError:
+        except SignatureVerificationError:
             # This is a critical security event. The signature is invalid.
             PAYMENTS_COUNTER.labels(status="failed_signature", gateway="razorpay").inc()
             payment_id_log = payment.id
@@ -199,11 +187,10 @@ class PaymentService:
         PAYMENTS_COUNTER.labels(status="captured", gateway="razorpay").inc()
 
         try:
-            razorpay_client = await _get_razorpay_client(db=self.db, school_id=payment.school_id)
-            payment_details = razorpay_client.payment.fetch(payment.gateway_payment_id)
+            payment_details = await client.payment.fetch(payment.gateway_payment_id)
             payment.method = payment_details.get("method")  # e.g., 'card', 'upi'
             payment.metadata = payment_details.get("notes")  # Razorpay uses 'notes' for metadata
-        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as net_err:
+        except RazorpayNetworkError as net_err:
             # Log the error but continue - verification succeeded, details are secondary
             logger.warning(f"Network error fetching Razorpay payment details for {payment.gateway_payment_id}: {net_err}")
         except (BadRequestError, ServerError, GatewayError) as rzp_err:
@@ -240,28 +227,8 @@ class PaymentService:
                     logger.info(f"DEBUG: Flush complete - invoice.payment_status={invoice.payment_status}")  # ✅ FLUSH invoice changes
 
             elif payment.order_id:
-                order_stmt = select(Order).where(Order.order_id == payment.order_id)
-                order_result = await self.db.execute(order_stmt)
-                order = order_result.scalar_one_or_none()
-
-                if order:
-                    if order.status not in ["pending_payment"]:  # Only update if pending
-                        logger.warning(f"Payment verification for payment {payment.id}: Associated order {order.order_id} has non-pending status '{order.status}'. Cannot update order status.")
-                        # Option 1: Just log and continue (payment captured, order untouched)
-                        # Option 2: Raise an error (might be better for consistency)
-                        # raise HTTPException(status_code=400, detail=f"Cannot verify payment for order with status '{order.status}'.")
-                        pass  # Let's just pass for now, payment is verified, order is left alone.
-                    else:
-                        order.status = "processing"
-                        await self.db.flush()  # Update order status only if it was pending
-                else:
-                    # Order not found after successful signature verification - this is an issue!
-                    logger.error(f"Payment verification for payment {payment.id}: Associated order {payment.order_id} not found!")
-                    # Should we fail the payment here? Or just log? Let's raise for clarity.
-                    payment.status = "failed"  # Mark payment as failed if order is missing
-                    payment.error_description = f"Associated order {payment.order_id} not found during verification."
-                    # Don't raise HTTPException here, let the commit happen below to save 'failed' status
-                    # raise HTTPException(status_code=404, detail="Associated order not found")
+                # A cancelled (or missing) order is left alone and the payment is marked for refund
+                await stock_reservation_service.confirm_paid_order(self.db, payment, source="verify_payment")
 
             payment_id_final = payment.id
             payment_status_final = payment.status
@@ -324,9 +291,26 @@ class PaymentService:
 
         return payment
 
-    async def handle_webhook_event(self, *, payload: dict, raw_body: bytes, signature: str, client_ip: str = "unknown") -> None:
+    async def _webhook_secret(self, school_id: int) -> str:
+        credentials = await razorpay_gateway.get_school_credentials(self.db, school_id)
+        webhook_secret = credentials.webhook_secret
+
+        if webhook_secret:
+            # Production: Decrypted from database
+            return webhook_secret
+
+        # Development fallback: Use environment variable
+        webhook_secret = os.getenv("RAZORPAY_WEBHOOK_SECRET")
+        if not webhook_secret:
+            raise ValueError(f"Webhook secret not configured for school_id={school_id}. " "Please either:\n" "1. Set RAZORPAY_WEBHOOK_SECRET in .env (development)\n" "2. Configure via API: PUT /api/v1/finance/gateway/credentials (production)")
+        logger.warning(f"⚠️ Using webhook secret from .env (DEVELOPMENT MODE) for school_id={school_id}. " f"Configure via /api/v1/finance/gateway/credentials for production.")
+        return webhook_secret
+
+    async def handle_webhook_event(self, *, payload: dict, raw_body: bytes, signature: str, client_ip: str = "unknown") -> bool:
         """
-        Handles incoming Razorpay webhooks, verifying signature and idempotency.
+        Phase one of webhook handling: verifies the signature and durably queues
+        the event, so the endpoint can acknowledge immediately. The capture itself
+        is applied by the queue consumer (see app.services.webhook_queue_service).
 
         SECURITY CRITICAL:
         - Uses raw_body (exact bytes sent by Razorpay) for signature verification
@@ -339,6 +323,10 @@ class PaymentService:
             raw_body: Raw request body bytes (for signature verification)
             signature: X-Razorpay-Signature header value
             client_ip: Client IP address for security logging
+
+        Returns:
+            True if a new event was queued for processing; False for a duplicate
+            delivery or an event that could not be attributed to a payment.
         """
         event_type = payload.get("event")
 
@@ -348,7 +336,7 @@ class PaymentService:
         # Razorpay webhooks don't have a unique event ID at root level
         # We need to construct one from the payment ID and timestamp for idempotency
         if event_type == "payment.captured":
-            payment_entity = payload.get("payload", {}).get("payment", {}).get("entity", {})
+            payment_entity = webhook_queue_service.payment_entity(payload)
             payment_id = payment_entity.get("id")
             created_at = payload.get("created_at")
 
@@ -361,159 +349,62 @@ class PaymentService:
             # For other event types, construct event ID differently
             raise HTTPException(status_code=400, detail=f"Unsupported event type: {event_type}")
 
-        # 1. Idempotency Check: Has this event already been processed?
-        existing_event = await self.db.execute(select(GatewayWebhookEvent).where(GatewayWebhookEvent.event_id == event_id))
-        if existing_event.scalars().first():
-            # We've seen this before, do nothing.
-            logger.info(f"Duplicate webhook event received: {event_id} from IP: {client_ip} (idempotency check passed)")
-            return
+        # The webhook secret is per school, found through the payment the event is about
+        gateway_order_id = payment_entity.get("order_id")
+        school_id = None
+        if gateway_order_id:
+            school_id = (await self.db.execute(select(Payment.school_id).where(Payment.gateway_order_id == gateway_order_id))).scalar_one_or_none()
 
-        # 2. Create the event log entry (but don't commit yet!)
-        new_event = GatewayWebhookEvent(event_id=event_id, payload=payload, status="received")
-        self.db.add(new_event)
-
-        # We are only interested in successful payment events for now
-        if event_type == "payment.captured":
-            try:
-                # Find the payment record by matching gateway_order_id
-                gateway_order_id = payment_entity.get("order_id")
-
-                if not gateway_order_id:
-                    raise ValueError("Gateway order ID not found in webhook payload.")
-
-                # 2. Find our internal payment record using gateway_order_id
-                # RACE CONDITION FIX: Use SELECT ... FOR UPDATE to acquire exclusive row lock
-                # This prevents concurrent updates from verify_payment endpoint and webhook handler
-                # ensuring atomic payment status transitions
-                payment_stmt = select(Payment).where(Payment.gateway_order_id == gateway_order_id).with_for_update()  # Acquire exclusive lock - blocks until verify_payment releases lock
-                payment_result = await self.db.execute(payment_stmt)
-                payment = payment_result.scalar_one_or_none()
-
-                if not payment:
-                    raise ValueError(f"Payment record with gateway_order_id {gateway_order_id} not found.")
-
-                # 3. Signature Verification - Decrypt webhook secret from database
-                school = await self.db.get(School, payment.school_id)
-
-                # Try to get webhook secret from encrypted database field
-                if school.razorpay_webhook_secret_encrypted:
-                    # Production: Decrypt from database
-                    webhook_secret = crypto_service.decrypt_value(school.razorpay_webhook_secret_encrypted)
-                    logger.info(f"Using encrypted webhook secret from database for school_id={payment.school_id}")
-                else:
-                    # Development fallback: Use environment variable
-                    webhook_secret = os.getenv("RAZORPAY_WEBHOOK_SECRET")
-                    if not webhook_secret:
-                        raise ValueError(
-                            f"Webhook secret not configured for school_id={payment.school_id}. " "Please either:\n" "1. Set RAZORPAY_WEBHOOK_SECRET in .env (development)\n" "2. Configure via API: PUT /api/v1/finance/gateway/credentials (production)"
-                        )
-                    logger.warning(f"⚠️ Using webhook secret from .env (DEVELOPMENT MODE) for school_id={payment.school_id}. " f"Configure via /api/v1/finance/gateway/credentials for production.")
-
-                # SECURITY CRITICAL: Use raw_body for signature verification
-                # Convert bytes to string as required by Razorpay SDK
-                try:
-                    client = razorpay.Client(auth=("", ""))  # No auth needed for this utility
-                    client.utility.verify_webhook_signature(raw_body.decode("utf-8"), signature, webhook_secret)  # Use raw body instead of str(payload)
-                    logger.info(f"✅ Webhook signature verified successfully for payment {gateway_order_id} from IP: {client_ip}")
-                except razorpay.errors.SignatureVerificationError:
-                    # 🚨 CRITICAL SECURITY EVENT: Invalid signature
-                    PAYMENTS_COUNTER.labels(status="failed_signature", gateway="razorpay_webhook").inc()
-                    logger.warning(
-                        f"🚨 SECURITY ALERT: Invalid webhook signature for payment {gateway_order_id}. "
-                        f"Source IP: {client_ip}. "
-                        f"This could indicate:\n"
-                        f"  1. Attack attempt (someone trying to forge webhooks)\n"
-                        f"  2. Webhook secret mismatch between Razorpay dashboard and database\n"
-                        f"  3. Request tampering during transmission\n"
-                        f"Action Required: Review logs for repeated failures from this IP."
-                    )
-                    await self.db.commit()
-                    raise HTTPException(status_code=400, detail="Invalid webhook signature.")
-
-                # 4. Process the event if signature is valid (backup logic)
-                if payment.status != "captured":
-                    payment.status = "captured"
-                    payment.gateway_payment_id = payment_entity.get("id")
-
-                    # ✅ Update Invoice/Order status atomically
-                    if payment.invoice_id:
-                        await invoice_service.allocate_payment_to_invoice_items(db=self.db, payment_id=payment.id, user_id=payment.user_id)
-                    elif payment.order_id:
-                        order_stmt = select(Order).where(Order.order_id == payment.order_id)
-                        order_result = await self.db.execute(order_stmt)
-                        order = order_result.scalar_one_or_none()
-
-                        if order:
-                            order.status = OrderStatus.PROCESSING
-
-                new_event.status = "processed"
-
-                PAYMENTS_COUNTER.labels(status="captured", gateway="razorpay_webhook").inc()
-
-            except Exception as e:
-                # Any processing error - log it and mark as failed
-                ALLOCATION_FAILURES_COUNTER.labels(source="webhook").inc()
-                logger.error(f"Webhook processing failed for event {event_id}: {e}", exc_info=True)
-                await self.db.rollback()
-                try:
-                    # STEP 2: Start a new transaction to log the failure
-                    new_event.status = "failed"
-                    new_event.processing_error = str(e)[:255]  # Truncate error
-                    self.db.add(new_event)  # STEP 3: Re-add the event object
-                    await self.db.commit()  # STEP 4: Commit *only* the failure log
-
-                    #
-                    # <<<====== BLOCK 1: ADD SENTRY ALERT HERE ======>>>
-                    # (This alert is for a allocation/signature failure)
-                    #
-                    with sentry_sdk.push_scope() as scope:
-                        scope.set_level("error")
-                        scope.set_tag("event_id", event_id)
-                        # Try to get payment_id for better tagging
-                        try:
-                            internal_payment_id = payload.get("payload", {}).get("payment", {}).get("entity", {}).get("notes", {}).get("internal_payment_id")
-                            if internal_payment_id:
-                                scope.set_tag("payment_id", internal_payment_id)
-                        except Exception:
-                            pass  # Don't fail the logger if payload is weird
-
-                        sentry_sdk.capture_message(f"Webhook Processing Failed: {event_id}", level="error")
-                    # <<<====== END BLOCK 1 ======>>>
-                except Exception as inner_e:
-                    logger.critical(f"FATAL: Could not log failed webhook {event_id}: {inner_e}", exc_info=True)
-
-                    #
-                    # <<<====== BLOCK 2: ADD SENTRY ALERT HERE ======>>>
-                    # (This alert is for the absolute worst-case scenario)
-                    #
-                    with sentry_sdk.push_scope() as scope:
-                        scope.set_level("fatal")
-                        scope.set_tag("event_id", event_id)
-                        sentry_sdk.capture_exception(inner_e)
-                    # <<<====== END BLOCK 2 ======>>>
-                    #
-
-                    await self.db.rollback()
-
-        # 10. SINGLE COMMIT - All or nothing transaction
+        status, processing_error = "received", None
+        try:
+            if not gateway_order_id:
+                raise ValueError("Gateway order ID not found in webhook payload.")
+            if school_id is None:
+                raise ValueError(f"Payment record with gateway_order_id {gateway_order_id} not found.")
+            webhook_secret = await self._webhook_secret(school_id)
+        except ValueError as e:
+            # Nothing to verify against: record the event as failed, as the consumer would
+            ALLOCATION_FAILURES_COUNTER.labels(source="webhook").inc()
+            logger.error(f"Webhook event {event_id} cannot be processed: {e}")
+            status, processing_error = "failed", str(e)[:255]
         else:
+            # SECURITY CRITICAL: Signatures are computed over the decoded raw body
             try:
-                await self.db.commit()  # This commits the event AND all payment changes
-                logger.info(f"Webhook event {event_id} committed with status '{new_event.status}'")
-            except Exception as commit_error:
-                logger.error(f"Failed to commit *successful* webhook event {event_id}: {commit_error}", exc_info=True)
-                #
-                # <<<====== BLOCK 3: ADD SENTRY ALERT HERE ======>>>
-                # (This is an edge case: processing was OK, but the final commit failed!)
-                #
-                with sentry_sdk.push_scope() as scope:
-                    scope.set_level("fatal")
-                    scope.set_tag("event_id", event_id)
-                    sentry_sdk.capture_exception(commit_error)
-                # <<<====== END BLOCK 3 ======>>>
-                #
-                await self.db.rollback()
-                raise
+                razorpay_gateway.verify_signature(raw_body.decode("utf-8"), signature, webhook_secret)
+                logger.info(f"✅ Webhook signature verified successfully for payment {gateway_order_id} from IP: {client_ip}")
+            except SignatureVerificationError:
+                # 🚨 CRITICAL SECURITY EVENT: Invalid signature. Nothing is stored, so a
+                # forged delivery can't claim the event id of the genuine one.
+                PAYMENTS_COUNTER.labels(status="failed_signature", gateway="razorpay_webhook").inc()
+                logger.warning(
+                    f"🚨 SECURITY ALERT: Invalid webhook signature for payment {gateway_order_id}. "
+                    f"Source IP: {client_ip}. "
+                    f"This could indicate:\n"
+                    f"  1. Attack attempt (someone trying to forge webhooks)\n"
+                    f"  2. Webhook secret mismatch between Razorpay dashboard and database\n"
+                    f"  3. Request tampering during transmission\n"
+                    f"Action Required: Review logs for repeated failures from this IP."
+                )
+                raise HTTPException(status_code=400, detail="Invalid webhook signature.")
+
+        # Idempotency: Razorpay retries deliver the same event id, which the unique index turns into a no-op
+        stmt = (
+            pg_insert(GatewayWebhookEvent)
+            .values(event_id=event_id, payload=payload, status=status, processing_error=processing_error, school_id=school_id, event_created_at=datetime.fromtimestamp(created_at, tz=timezone.utc))
+            .on_conflict_do_nothing(index_elements=[GatewayWebhookEvent.event_id])
+            .returning(GatewayWebhookEvent.id)
+        )
+        inserted = (await self.db.execute(stmt)).scalar_one_or_none()
+        if inserted is not None and status == "failed":
+            # Core INSERT, so the rollup hook doesn't see it
+            await payment_metrics_service.increment(self.db, school_id=school_id, webhooks_failed=1)
+        await self.db.commit()
+
+        if inserted is None:
+            logger.info(f"Duplicate webhook event received: {event_id} from IP: {client_ip} (idempotency check passed)")
+            return False
+        logger.info(f"Webhook event {event_id} queued with status '{status}'")
+        return status == "received"
 
     async def reconcile_pending_payments(self, db: AsyncSession):
         """
@@ -523,141 +414,27 @@ class PaymentService:
         - Forward: Captures payments that succeeded but weren't verified
         - Reverse: Marks abandoned/failed payments as FAILED or EXPIRED
         This ensures database consistency with payment gateway reality.
+
+        The whole backlog is worked through in SKIP LOCKED batches with bounded
+        gateway concurrency (see payment_reconciliation_service).
         """
         logger.info("Starting pending payment reconciliation task...")
-
-        # 1. Find payments pending for more than 1 hour (configurable)
-        reconciliation_threshold = datetime.now(timezone.utc) - timedelta(hours=1)
-
-        stmt = select(Payment).where(Payment.status == PaymentStatus.PENDING).where(Payment.created_at < reconciliation_threshold).where(Payment.gateway_order_id.isnot(None)).limit(100)  # Process in batches
-        result = await db.execute(stmt)
-        pending_payments = result.scalars().all()
-
-        processed = 0
-        reconciled = 0
-        failed = 0
-        expired = 0
-
-        for payment in pending_payments:
-            processed += 1
-            payment_id = payment.id  # Store ID before any transaction operations
-            try:
-                # 2. Get Razorpay client for the payment's school
-                razorpay_client = await _get_razorpay_client(db=db, school_id=payment.school_id)
-
-                # 3. Fetch the Razorpay order details first to check order status
-                try:
-                    razorpay_order = razorpay_client.order.fetch(payment.gateway_order_id)
-                except Exception as order_fetch_err:
-                    logger.error(f"Failed to fetch Razorpay order {payment.gateway_order_id}: {order_fetch_err}")
-                    # Skip this payment, will retry next time
-                    continue
-
-                # 4. Check if the order itself has expired or been paid
-                order_status = razorpay_order.get("status")
-                # If order is paid at gateway level, look for captured payment
-                if order_status == "paid":
-                    # Fetch payment attempts for this order
-                    order_payments = razorpay_client.order.payments(payment.gateway_order_id)
-                    captured_payment_entity = None
-                    for p in order_payments.get("items", []):
-                        if p.get("status") == "captured":
-                            captured_payment_entity = p
-                            break  # Found it
-
-                    if captured_payment_entity:
-                        # 5. PAYMENT WAS CAPTURED! Reconcile it (Forward Reconciliation).
-                        logger.warning(f"✅ Forward Reconciliation: Found CAPTURED gateway payment for " f"PENDING internal Payment ID {payment.id}.")
-
-                        payment.status = PaymentStatus.CAPTURED
-                        payment.gateway_payment_id = captured_payment_entity.get("id")
-
-                        # 6. --- ATTEMPT ALLOCATION ---
-                        # We re-use the *same* logic block
-                        try:
-                            if payment.invoice_id:
-                                await invoice_service.allocate_payment_to_invoice_items(
-                                    db=db,
-                                    payment_id=payment.id,
-                                    user_id=payment.user_id,  # Or a system user ID
-                                )
-                            elif payment.order_id:
-                                await db.execute(update(Order).where(Order.order_id == payment.order_id).where(Order.status == OrderStatus.PENDING_PAYMENT).values(status=OrderStatus.PROCESSING))
-
-                            await db.commit()  # Commit this one payment's success
-                            reconciled += 1
-
-                        except Exception as e:
-                            logger.critical(f"RECONCILIATION_ALLOCATION_FAILURE: Payment {payment.id} reconciled but FAILED allocation. Error: {e}", exc_info=True)
-                            await db.rollback()
-                            # Mark as failed in a new session
-                            payment.status = PaymentStatus.CAPTURED_ALLOCATION_FAILED
-                            payment.error_description = f"Recon allocation fail: {str(e)[:255]}"
-                            db.add(payment)
-                            await db.commit()
-                            logger.info(f"ALERT_PAYMENT_ALLOCATION_FAILURE: payment_id={payment.id}")
-                    else:
-                        # Order is marked paid but no captured payment found - data inconsistency
-                        logger.error(f"Data inconsistency: Order {payment.gateway_order_id} marked paid but no captured payment found")
-                        payment.status = PaymentStatus.FAILED
-                        payment.error_description = "Reconciled: Order marked paid but no captured payment found."
-                        await db.commit()
-                        failed += 1
-
-                # 7. REVERSE RECONCILIATION: Handle abandoned/failed payments
-                elif order_status == "attempted":
-                    # Order has payment attempts but none succeeded
-                    # Fetch all payment attempts to verify they all failed
-                    order_payments = razorpay_client.order.payments(payment.gateway_order_id)
-                    payment_items = order_payments.get("items", [])
-
-                    # Check if ALL payment attempts failed
-                    all_failed = all(p.get("status") == "failed" for p in payment_items) if payment_items else True
-
-                    if all_failed:
-                        logger.warning(f"❌ Reverse Reconciliation: Payment {payment.id} has failed attempts. " f"Marking as FAILED.")
-                        payment.status = PaymentStatus.FAILED
-                        payment.error_description = f"Reconciled: All {len(payment_items)} payment attempt(s) failed at gateway."
-                        await db.commit()
-                        failed += 1
-                    else:
-                        # Some attempts are still pending/authorized - keep monitoring
-                        logger.info(f"Payment {payment.id} has mixed statuses. Keeping as PENDING for next cycle.")
-                elif order_status == "created":
-                    # Order created but no payment attempt made by user
-                    # This is the "abandoned cart" scenario
-
-                    # Check how old the payment is - if it's very old (e.g., > 24 hours), mark as failed
-                    # Handle both timezone-aware and timezone-naive created_at
-                    payment_created = payment.created_at
-                    if payment_created.tzinfo is None:
-                        payment_created = payment_created.replace(tzinfo=timezone.utc)
-
-                    age_hours = (datetime.now(timezone.utc) - payment_created).total_seconds() / 3600
-                    if age_hours > 24:  # Configurable threshold
-                        logger.warning(f"🧹 Reverse Reconciliation: Payment {payment.id} is {age_hours:.1f} hours old " f"with no payment attempt. Marking as FAILED (abandoned).")
-                        payment.status = PaymentStatus.FAILED
-                        payment.error_description = f"Reconciled: No payment attempt made within {int(age_hours)} hours. Likely abandoned."
-                        await db.commit()
-                        failed += 1
-                    else:
-                        # Still within grace period, keep as pending
-                        logger.info(f"Payment {payment.id} is {age_hours:.1f} hours old. Within grace period.")
-                else:
-                    # Any other unexpected status from Razorpay
-                    logger.warning(f"⚠️ Payment {payment.id}: Unexpected Razorpay order status '{order_status}'. " f"Marking as FAILED for safety.")
-                    payment.status = PaymentStatus.FAILED
-                    payment.error_description = f"Reconciled: Unexpected gateway order status: {order_status}"
-                    await db.commit()
-                    failed += 1
-
-            except Exception as e:
-                logger.error(f"Reconciliation error for Payment {payment_id}: {e}", exc_info=True)
-                await db.rollback()
-                # Don't change status, just log. Will retry next time.
-
-        logger.info(f"Reconciliation complete. Processed: {processed}, " f"Reconciled (captured): {reconciled}, Marked Failed: {failed}, Marked Expired: {expired}.")
-        return {"processed": processed, "reconciled": reconciled, "failed": failed, "expired": expired}
+        run = await payment_reconciliation_service.reconcile_pending(db)
+        # Unpaid orders whose stock hold ran out give their stock back
+        expiry = await stock_reservation_service.release_expired_reservations(db)
+        await db.commit()
+        # Orders abandoned without a live payment are cancelled and restocked
+        expiry.update(await order_cancellation_service.expire_unpaid_orders(db))
+        summary = {
+            "processed": run.processed,
+            "reconciled": run.outcomes["reconciled"],
+            "failed": run.outcomes["failed"],
+            "expired": run.outcomes["expired"],
+            **expiry,
+            **_run_throughput(run),
+        }
+        logger.info(f"Reconciliation complete. Processed: {run.processed}, Reconciled (captured): {summary['reconciled']}, Marked Failed: {summary['failed']}, Marked Expired: {summary['expired']}, Throughput: {run.payments_per_second} payments/s.")
+        return summary
 
     async def reconcile_authorized_payments(self, db: AsyncSession):
         """
@@ -676,145 +453,64 @@ class PaymentService:
         Razorpay Authorization Window: 5 days (120 hours)
         """
         logger.info("Starting authorized payment reconciliation task...")
-
-        # Razorpay's authorization validity is typically 5 days (120 hours)
-        EXPIRY_THRESHOLD_HOURS = 120  # 5 days in hours
-
-        # Find all authorized payments
-        stmt = select(Payment).where(Payment.status == PaymentStatus.AUTHORIZED).where(Payment.gateway_payment_id.isnot(None)).limit(100)  # Must have a gateway payment ID to capture  # Process in batches
-        result = await db.execute(stmt)
-        authorized_payments = result.scalars().all()
-
-        processed = 0
-        captured = 0
-        expired = 0
-        failed = 0
-
-        for payment in authorized_payments:
-            processed += 1
-            payment_id = payment.id  # Store ID before any transaction operations
-
-            # Calculate payment age - handle both timezone-aware and naive datetimes
-            payment_created = payment.created_at
-            if payment_created.tzinfo is None:
-                payment_created = payment_created.replace(tzinfo=timezone.utc)
-
-            age_hours = (datetime.now(timezone.utc) - payment_created).total_seconds() / 3600
-
-            try:
-                # Get Razorpay client for the payment's school
-                razorpay_client = await _get_razorpay_client(db=db, school_id=payment.school_id)
-
-                # Check if authorization has expired
-                if age_hours >= EXPIRY_THRESHOLD_HOURS:
-                    logger.warning(f"⏰ Authorized Payment {payment_id} is {age_hours:.1f} hours old " f"(threshold: {EXPIRY_THRESHOLD_HOURS} hours). Marking as FAILED (expired).")
-                    payment.status = PaymentStatus.FAILED  # Use FAILED instead of EXPIRED for DB compatibility
-                    payment.error_description = f"Authorization expired after {int(age_hours)} hours. " f"Funds were held but never captured."
-                    await db.commit()
-                    expired += 1
-                    continue
-
-                # Authorization is still valid - attempt to capture
-                logger.info(f"💰 Attempting to capture authorized payment {payment.id} " f"(gateway_payment_id: {payment.gateway_payment_id}, age: {age_hours:.1f} hours)")
-
-                try:
-                    # Call Razorpay's capture API
-                    # Amount must be in paise (smallest currency unit)
-                    amount_in_paise = int(payment.amount_paid * 100)
-
-                    captured_payment = razorpay_client.payment.capture(payment.gateway_payment_id, amount_in_paise)
-
-                    # Verify the capture was successful
-                    if captured_payment.get("status") == "captured":
-                        logger.info(f"✅ Successfully captured authorized payment {payment.id}. " f"Amount: ₹{payment.amount_paid}")
-
-                        # Update payment status to captured
-                        payment.status = PaymentStatus.CAPTURED
-                        payment.gateway_signature = captured_payment.get("id")  # Store captured payment ID
-
-                        # Perform allocation (same logic as verify_payment and reconcile_pending_payments)
-                        try:
-                            if payment.invoice_id:
-                                await invoice_service.allocate_payment_to_invoice_items(
-                                    db=db,
-                                    payment_id=payment.id,
-                                    user_id=payment.user_id,
-                                )
-                                logger.info(f"Allocated captured payment {payment.id} to invoice {payment.invoice_id}")
-                            elif payment.order_id:
-                                await db.execute(update(Order).where(Order.order_id == payment.order_id).where(Order.status == OrderStatus.PENDING_PAYMENT).values(status=OrderStatus.PROCESSING))
-                                logger.info(f"Updated order {payment.order_id} status to PROCESSING")
-
-                            await db.commit()
-                            captured += 1
-
-                        except Exception as allocation_error:
-                            logger.critical(f"CAPTURE_ALLOCATION_FAILURE: Payment {payment.id} captured but " f"FAILED allocation. Error: {allocation_error}", exc_info=True)
-                            await db.rollback()
-                            # Mark as captured but allocation failed
-                            payment.status = PaymentStatus.CAPTURED_ALLOCATION_FAILED
-                            payment.error_description = f"Capture allocation fail: {str(allocation_error)[:255]}"
-                            db.add(payment)
-                            await db.commit()
-                            logger.info(f"ALERT_CAPTURE_ALLOCATION_FAILURE: payment_id={payment.id}")
-
-                    else:
-                        # Capture API returned but status is not 'captured'
-                        logger.error(f"Capture API returned unexpected status '{captured_payment.get('status')}' " f"for payment {payment.id}")
-                        payment.status = PaymentStatus.FAILED
-                        payment.error_description = f"Capture returned unexpected status: {captured_payment.get('status')}"
-                        await db.commit()
-                        failed += 1
-
-                except BadRequestError as bad_req_err:
-                    # Common reasons: authorization already captured, authorization cancelled, invalid amount
-                    error_msg = str(bad_req_err)
-                    logger.warning(f"❌ Capture failed for payment {payment_id}: {error_msg}")
-
-                    # Check if it's an expiry-related error
-                    if "expired" in error_msg.lower() or "cannot be captured" in error_msg.lower():
-                        payment.status = PaymentStatus.FAILED  # Use FAILED for DB compatibility
-                        payment.error_description = f"Authorization expired: {error_msg[:200]}"
-                        expired += 1
-                    else:
-                        payment.status = PaymentStatus.FAILED
-                        payment.error_description = f"Capture failed: {error_msg[:200]}"
-                        failed += 1
-
-                    await db.commit()
-
-                except (GatewayError, ServerError) as gateway_err:
-                    # Gateway/server errors - don't change status, will retry later
-                    logger.error(f"Gateway error while capturing payment {payment.id}: {gateway_err}. " f"Will retry in next cycle.")
-                    await db.rollback()
-                    # Don't increment counters - this payment will be retried
-
-                except Exception as capture_err:
-                    logger.error(f"Unexpected error capturing payment {payment.id}: {capture_err}", exc_info=True)
-                    await db.rollback()
-                    # Don't change status - will retry later
-
-            except HTTPException as http_err:
-                # School gateway not configured or decryption failed
-                logger.error(f"Cannot process payment {payment.id}: {http_err.detail}. " f"School ID: {payment.school_id}")
-                await db.rollback()
-
-            except Exception as e:
-                logger.error(f"Authorized payment reconciliation error for Payment {payment_id}: {e}", exc_info=True)
-                await db.rollback()
-
-        logger.info(f"Authorized payment reconciliation complete. " f"Processed: {processed}, Captured: {captured}, " f"Expired: {expired}, Failed: {failed}")
-        return {"processed": processed, "captured": captured, "expired": expired, "failed": failed}
-
-    async def get_failed_allocations(self, *, db: AsyncSession) -> list[Payment]:
+        run = await payment_reconciliation_service.reconcile_authorized(db)
+        summary = {
+            "processed": run.processed,
+            "captured": run.outcomes["captured"],
+            "expired": run.outcomes["expired"],
+            "failed": run.outcomes["failed"],
+            **_run_throughput(run),
+        }
+        logger.info(f"Authorized payment reconciliation complete. Processed: {run.processed}, Captured: {summary['captured']}, Expired: {summary['expired']}, Failed: {summary['failed']}, Throughput: {run.payments_per_second} payments/s.")
+        return summary
+
+    async def get_failed_allocations(self, *, db: AsyncSession, school_id: int) -> list[Payment]:
         """
-        Fetches all payments stuck in the 'captured_allocation_failed' state.
+        Fetches the school's payments stuck in the 'captured_allocation_failed' state.
         """
-        stmt = select(Payment).where(Payment.status == PaymentStatus.CAPTURED_ALLOCATION_FAILED).order_by(Payment.updated_at.desc())  # Show newest failures first
+        stmt = select(Payment).where(Payment.school_id == school_id, Payment.status == PaymentStatus.CAPTURED_ALLOCATION_FAILED).order_by(Payment.updated_at.desc())  # Show newest failures first
         result = await db.execute(stmt)
         payments = result.scalars().all()
         return payments
 
+    async def list_payments(
+        self,
+        *,
+        db: AsyncSession,
+        school_id: int,
+        limit: int = pagination.DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        status: Optional[str] = None,
+        fee_term_id: Optional[int] = None,
+        class_id: Optional[int] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ) -> dict:
+        """
+        One page of a school's payments, newest first, keyset-paginated on
+        ``(created_at, id)``. ``fee_term_id`` matches through the paid invoice and
+        ``class_id`` through the paying student; ``created_to`` is exclusive.
+
+        Returns ``{"items", "next_cursor", "total"}``; raises ValueError for a
+        malformed cursor.
+        """
+        stmt = select(Payment).where(Payment.school_id == school_id)
+        if status is not None:
+            stmt = stmt.where(Payment.status == status)
+        if fee_term_id is not None:
+            stmt = stmt.join(Invoice, Invoice.id == Payment.invoice_id).where(Invoice.fee_term_id == fee_term_id)
+        if class_id is not None:
+            stmt = stmt.join(Student, Student.student_id == Payment.student_id).where(Student.current_class_id == class_id)
+        if created_from is not None:
+            stmt = stmt.where(Payment.created_at >= created_from)
+        if created_to is not None:
+            stmt = stmt.where(Payment.created_at < created_to)
+
+        filters = (school_id, status, fee_term_id, class_id, created_from, created_to)
+        total = await pagination.cached_count(db, stmt, table=Payment.__tablename__, key=filters)
+        payments, next_cursor = await pagination.keyset_page(db, stmt, created_at_column=Payment.created_at, id_column=Payment.id, limit=limit, cursor=cursor)
+        return {"items": payments, "next_cursor": next_cursor, "total": total}
+
     async def retry_allocation(self, *, db: AsyncSession, payment: Payment) -> Payment:
         """
         Attempts to re-run the allocation logic for a payment that is
@@ -866,82 +562,81 @@ class PaymentService:
         await db.refresh(payment)
         return payment
 
+    async def retry_failed_allocations(self, *, db: AsyncSession, school_id: int) -> dict:
+        """
+        Re-runs allocation for every payment of the school stuck in
+        'captured_allocation_failed' in one transaction, using the batch allocator.
+        """
+        payments = await self.get_failed_allocations(db=db, school_id=school_id)
+        if not payments:
+            return {"retried": 0, "allocations_created": 0}
+
+        try:
+            allocations = await invoice_service.allocate_payments_to_invoice_items(db, payment_ids=[payment.id for payment in payments if payment.invoice_id])
+            for payment in payments:
+                payment.status = PaymentStatus.CAPTURED
+                payment.error_description = f"Allocation retried in bulk and succeeded at {datetime.utcnow()}" if payment.invoice_id else "Manually retried (no invoice)."
+            await db.commit()
+        except Exception as e:
+            logger.error(f"ADMIN: Bulk allocation retry FAILED for {len(payments)} payments: {e}", exc_info=True)
+            await db.rollback()
+            with sentry_sdk.push_scope() as scope:
+                scope.set_level("error")
+                scope.set_tag("admin_retry", True)
+                sentry_sdk.capture_exception(e)
+            raise HTTPException(status_code=500, detail=f"Bulk allocation retry failed: {e}") from e
+
+        created = sum(len(payment_allocations) for payment_allocations in allocations.values())
+        logger.info(f"ADMIN: Bulk retry SUCCESS for {len(payments)} payments, {created} allocations created.")
+        return {"retried": len(payments), "allocations_created": created}
+
     async def get_payment_health_stats(self, *, db: AsyncSession) -> PaymentHealthStats:
         """
         Calculates and returns key health statistics for the payment system
-        over the last 24 hours.
+        over the last 24 hours, from the hourly rollup (24 rows per school, see
+        app.services.payment_metrics_service) rather than a scan of payments.
         """
-        # Define the 24-hour window
-        twenty_four_hours_ago = datetime.utcnow() - timedelta(hours=24)
-
-        # 1. We'll use a single query with conditional aggregation
-        stmt = select(
-            # Count all payments
-            func.count(Payment.id).label("total_payments_24h"),
-            # Count successful payments
-            func.count(
-                case(
-                    (Payment.status == PaymentStatus.CAPTURED, 1),
-                )
-            ).label("successful_payments_24h"),
-            # Count failed allocations
-            func.count(
-                case(
-                    (Payment.status == PaymentStatus.CAPTURED_ALLOCATION_FAILED, 1),
-                )
-            ).label("failed_allocations_24h"),
-        ).where(Payment.created_at >= twenty_four_hours_ago)
+        totals = await payment_metrics_service.window_totals(db, hours=24)
+        total_payments = totals["payments_initiated"]
 
-        result = await db.execute(stmt)
-        stats = result.one_or_none()
-
-        if not stats or stats.total_payments_24h == 0:
+        if total_payments == 0:
             # No payments, return zeroed-out stats
-            return PaymentHealthStats(total_payments_24h=0, successful_payments_24h=0, success_rate_24h=0.0, failed_allocations_24h=0)
+            return PaymentHealthStats(total_payments_24h=0, successful_payments_24h=0, success_rate_24h=0.0, failed_allocations_24h=totals["allocation_failures"])
 
-        # Calculate success rate
-        success_rate = 0.0
-        if stats.total_payments_24h > 0:
-            success_rate = round((stats.successful_payments_24h / stats.total_payments_24h) * 100, 2)
+        # Captures in the window can include payments initiated just before it
+        success_rate = round(min(totals["payments_captured"] / total_payments, 1.0) * 100, 2)
 
-        return PaymentHealthStats(total_payments_24h=stats.total_payments_24h, successful_payments_24h=stats.successful_payments_24h, success_rate_24h=success_rate, failed_allocations_24h=stats.failed_allocations_24h)
+        return PaymentHealthStats(total_payments_24h=total_payments, successful_payments_24h=totals["payments_captured"], success_rate_24h=success_rate, failed_allocations_24h=totals["allocation_failures"])
 
     async def get_reconciliation_report(self, *, db: AsyncSession) -> ReconciliationReportStats:
         """
         Calculates and returns a report on webhook processing and
-        reconciliation tasks over the last 24 hours.
+        reconciliation tasks over the last 24 hours, from the hourly rollup.
         """
-        twenty_four_hours_ago = datetime.utcnow() - timedelta(hours=24)
-        twenty_four_hours_ago_unix = int((datetime.utcnow() - timedelta(hours=24)).timestamp())
-
-        # 1. Query the GatewayWebhookEvent table
-        webhook_stmt = select(
-            # Count processed webhooks
-            func.count(
-                case(
-                    (GatewayWebhookEvent.status == "processed", 1),
-                )
-            ).label("webhooks_processed_24h"),
-            # Count failed webhooks
-            func.count(
-                case(
-                    (GatewayWebhookEvent.status == "failed", 1),
-                )
-            ).label("webhooks_failed_24h"),
-        ).where(GatewayWebhookEvent.payload["created_at"].as_integer() >= twenty_four_hours_ago_unix)
+        totals = await payment_metrics_service.window_totals(db, hours=24)
 
-        webhook_result = await db.execute(webhook_stmt)
-        webhook_stats = webhook_result.one_or_none()
-
-        # 2. Query the Payment table for reconciliation task updates
-        # We check for payments that were updated by the task
-        recon_stmt = select(func.count(Payment.id)).where(
-            Payment.status.in_([PaymentStatus.CAPTURED, PaymentStatus.FAILED]), Payment.error_description.like("Reconciled:%"), Payment.updated_at >= twenty_four_hours_ago  # Check for our "Reconciled:" marker
-        )
-
-        recon_result = await db.execute(recon_stmt)
-        reconciled_via_task_24h = recon_result.scalar_one_or_none() or 0
+        # 3. Throughput of the reconciliation runs recorded by every worker
+        runs = await payment_reconciliation_service.recent_runs(db, since=datetime.now(timezone.utc) - timedelta(hours=24))
+        run_seconds = sum(run.duration_seconds for run in runs)
+        payments_per_second_24h = round(sum(run.processed for run in runs) / run_seconds, 2) if run_seconds > 0 else None
 
         return ReconciliationReportStats(
-            webhooks_processed_24h=webhook_stats.webhooks_processed_24h if webhook_stats else 0, webhooks_failed_24h=webhook_stats.webhooks_failed_24h if webhook_stats else 0, reconciled_via_task_24h=reconciled_via_task_24h
+            webhooks_processed_24h=totals["webhooks_processed"],
+            webhooks_failed_24h=totals["webhooks_failed"],
+            reconciled_via_task_24h=totals["payments_reconciled"],
+            recent_runs=[
+                ReconciliationRunStats(
+                    kind=run.kind,
+                    started_at=run.started_at,
+                    duration_seconds=round(run.duration_seconds, 3),
+                    processed=run.processed,
+                    updated=run.updated,
+                    batches=run.batches,
+                    schools=run.schools,
+                    gateway_calls=run.gateway_calls,
+                    payments_per_second=run.payments_per_second,
+                )
+                for run in runs
+            ],
+            payments_per_second_24h=payments_per_second_24h,
         )
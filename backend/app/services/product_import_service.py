@@ -0,0 +1,253 @@
+# backend/app/services/product_import_service.py
+"""
+Bulk product import: create/update products and restock from a file.
+
+Before every term hundreds of products are loaded and restocked from a
+supplier spreadsheet. Doing that through the per-product endpoints means one
+request and several queries per product. An import instead reads the file as a
+stream (CSV, or JSON Lines - one object per line), validates each row and
+processes the valid ones in chunks of ``PRODUCT_IMPORT_CHUNK_SIZE``. Each chunk
+is one transaction:
+
+1. one ``SELECT ... FOR UPDATE`` of the chunk's existing SKUs (in product_id
+   order, as checkout and restock lock them), plus one lookup each for
+   categories and conflicting names;
+2. one ``INSERT ... ON CONFLICT (sku) DO UPDATE`` upserting every product of
+   the chunk. Rows are merged with the product's current values first, so a
+   blank cell leaves the column as it is. The conflict update is limited to the
+   school's own products; a SKU owned by another school is reported, never
+   overwritten;
+3. one statement applying every stock adjustment of the chunk: the adjustments
+   are recorded in ``product_import_adjustments`` keyed by
+   ``(import_key, row_number)`` with ``ON CONFLICT DO NOTHING``, and only the
+   newly recorded ones are added to ``products.stock_quantity``;
+4. commit.
+
+Memory is bounded by one chunk whatever the file size (the upload itself is
+spooled to disk by the framework). Uploading the same file again is
+idempotent: product values are absolute, and adjustments already recorded under
+the same ``import_key`` are skipped.
+
+Rows that fail validation (bad values, unknown category, new product without
+name or price, stock going negative, ...) are reported with their row number
+and skipped; the rest of the file is still imported.
+"""
+
+import csv
+import io
+import json
+import logging
+import os
+from collections.abc import Iterable, Iterator
+from typing import BinaryIO, Optional, Union
+
+from pydantic import ValidationError
+from sqlalchemy import func, literal_column, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.product import Product
+from app.models.product_category import ProductCategory
+from app.models.product_import_adjustment import ProductImportAdjustment
+from app.schemas.product_import_schema import ProductImportRow
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_IMPORT_CHUNK_SIZE = int(os.getenv("PRODUCT_IMPORT_CHUNK_SIZE", "500"))
+PRODUCT_IMPORT_MAX_REPORTED_ERRORS = int(os.getenv("PRODUCT_IMPORT_MAX_REPORTED_ERRORS", "1000"))
+
+# Product columns an import row can set; new products start from these defaults
+IMPORT_FIELDS = ("name", "price", "category_id", "stock_quantity", "description", "manufacturer", "image_url", "reorder_level", "reorder_quantity", "is_active")
+_NEW_PRODUCT_DEFAULTS = {"stock_quantity": 0, "is_active": True}
+
+_products = Product.__table__
+
+Record = Union[dict, str]  # a parsed row, or why it could not be parsed
+
+
+# ---------------------------------------------------------------------------
+# Readers
+# ---------------------------------------------------------------------------
+
+
+def read_csv_rows(file: BinaryIO) -> Iterator[tuple[int, Record]]:
+    """The data rows of a UTF-8 CSV file with a header row, numbered from 1."""
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        for number, record in enumerate(csv.DictReader(text), start=1):
+            yield number, {key.strip().lower(): value for key, value in record.items() if key}
+    finally:
+        text.detach()  # The upload's file belongs to the framework
+
+
+def read_jsonl_rows(file: BinaryIO) -> Iterator[tuple[int, Record]]:
+    """The objects of a JSON Lines file (one object per line), numbered from 1; blank lines are skipped."""
+    text = io.TextIOWrapper(file, encoding="utf-8-sig")
+    try:
+        number = 0
+        for line in text:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield number, f"Invalid JSON: {e}"
+                continue
+            yield number, record if isinstance(record, dict) else "Each line must be a JSON object"
+    finally:
+        text.detach()
+
+
+# ---------------------------------------------------------------------------
+# Import
+# ---------------------------------------------------------------------------
+
+
+def _report(summary: dict, row: int, sku: Optional[str], errors: list[str]) -> None:
+    summary["error_count"] += 1
+    if len(summary["errors"]) < PRODUCT_IMPORT_MAX_REPORTED_ERRORS:
+        summary["errors"].append({"row": row, "sku": sku, "errors": errors})
+
+
+def _validation_messages(error: ValidationError) -> list[str]:
+    return [f"{'.'.join(str(part) for part in e['loc']) or 'row'}: {e['msg']}" for e in error.errors()]
+
+
+async def import_products(db: AsyncSession, school_id: int, rows: Iterable[tuple[int, Record]], *, import_key: Optional[str] = None, chunk_size: int = PRODUCT_IMPORT_CHUNK_SIZE) -> dict:
+    """
+    Imports ``rows`` (see :func:`read_csv_rows` / :func:`read_jsonl_rows`) into
+    the school's products, one committed chunk at a time.
+
+    ``import_key`` identifies the upload for stock adjustments; rows with a
+    ``stock_adjustment`` are rejected without one.
+
+    Returns ``{"rows", "created", "updated", "adjustments_applied",
+    "adjustments_already_applied", "chunks", "error_count", "errors"}``.
+    """
+    summary = {"rows": 0, "created": 0, "updated": 0, "adjustments_applied": 0, "adjustments_already_applied": 0, "chunks": 0, "error_count": 0, "errors": []}
+    chunk: list[tuple[int, ProductImportRow]] = []
+    rows = iter(rows)
+    while True:
+        try:
+            number, record = next(rows)
+        except StopIteration:
+            break
+        except (UnicodeDecodeError, csv.Error) as e:
+            _report(summary, summary["rows"] + 1, None, [f"File could not be read from here on: {e}"])
+            break
+
+        summary["rows"] += 1
+        if isinstance(record, str):
+            _report(summary, number, None, [record])
+            continue
+        try:
+            row = ProductImportRow.model_validate(record)
+        except ValidationError as e:
+            sku = record.get("sku")
+            _report(summary, number, sku if isinstance(sku, str) and sku else None, _validation_messages(e))
+            continue
+        if row.stock_adjustment is not None and not import_key:
+            _report(summary, number, row.sku, ["stock_adjustment needs an import_key, so that uploading the file again does not apply it twice"])
+            continue
+
+        chunk.append((number, row))
+        if len(chunk) >= chunk_size:
+            await _import_chunk(db, school_id, chunk, import_key, summary)
+            chunk = []
+    if chunk:
+        await _import_chunk(db, school_id, chunk, import_key, summary)
+    summary["errors"].sort(key=lambda error: error["row"])  # Chunk checks report after the rows validated while reading
+
+    logger.info(f"Product import for school {school_id}: {summary['rows']} row(s), {summary['created']} created, {summary['updated']} updated, " f"{summary['adjustments_applied']} adjustment(s) applied, {summary['error_count']} error(s)")
+    return summary
+
+
+async def _import_chunk(db: AsyncSession, school_id: int, chunk: list[tuple[int, ProductImportRow]], import_key: Optional[str], summary: dict) -> None:
+    """Validates ``chunk`` against the database, upserts its products, applies its adjustments and commits."""
+    skus = sorted({row.sku for _, row in chunk})
+    existing = {r.sku: r for r in (await db.execute(select(Product.product_id, Product.sku, Product.school_id, *(getattr(Product, f) for f in IMPORT_FIELDS)).where(Product.sku.in_(skus)).order_by(Product.product_id).with_for_update())).all()}
+    category_ids = {row.category_id for _, row in chunk if row.category_id is not None}
+    valid_categories = set((await db.execute(select(ProductCategory.category_id).where(ProductCategory.category_id.in_(category_ids), ProductCategory.school_id == school_id))).scalars().all()) if category_ids else set()
+    names = {row.name.lower() for _, row in chunk if row.name}
+    taken_names = dict((await db.execute(select(func.lower(Product.name), Product.sku).where(Product.school_id == school_id, Product.is_active.is_(True), func.lower(Product.name).in_(names)))).all()) if names else {}
+
+    # Merge the rows of each SKU in file order (later cells win) on top of the product's current values
+    products: dict[str, dict] = {}
+    adjustments: list[tuple[int, str, int]] = []
+    for number, row in chunk:
+        current = existing.get(row.sku)
+        errors = []
+        if current is not None and current.school_id != school_id:
+            errors.append("SKU is already used by another school")
+        if row.category_id is not None and row.category_id not in valid_categories:
+            errors.append(f"category_id: category {row.category_id} not found in your school")
+        if row.name and taken_names.get(row.name.lower(), row.sku) != row.sku:
+            errors.append(f"name: product '{row.name}' already exists in your school")
+        values = products.get(row.sku) or ({f: getattr(current, f) for f in IMPORT_FIELDS} if current is not None else dict.fromkeys(IMPORT_FIELDS) | _NEW_PRODUCT_DEFAULTS)
+        merged = values | row.model_dump(include=set(IMPORT_FIELDS), exclude_none=True)
+        if merged["name"] is None or merged["price"] is None:
+            errors.append("name and price are required to create a product")
+        if errors:
+            _report(summary, number, row.sku, errors)
+            continue
+        products[row.sku] = merged
+        if row.name:
+            taken_names[row.name.lower()] = row.sku
+        if row.stock_adjustment:
+            adjustments.append((number, row.sku, row.stock_adjustment))
+
+    if not products:
+        await db.rollback()  # Release the row locks
+        return
+
+    stmt = insert(Product).values([{"sku": sku, "school_id": school_id, **values} for sku, values in products.items()])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Product.sku],
+        set_={**{f: getattr(stmt.excluded, f) for f in IMPORT_FIELDS}, "updated_at": func.now()},
+        where=Product.school_id == stmt.excluded.school_id,
+    ).returning(Product.product_id, Product.sku, Product.stock_quantity, literal_column("xmax = 0").label("created"))
+    upserted = {r.sku: r for r in (await db.execute(stmt)).all()}
+    for number, row in chunk:
+        if row.sku in products and row.sku not in upserted:  # Inserted by another school since the lookup
+            _report(summary, number, row.sku, ["SKU is already used by another school"])
+    summary["created"] += sum(1 for r in upserted.values() if r.created)
+    summary["updated"] += sum(1 for r in upserted.values() if not r.created)
+
+    if adjustments:
+        await _apply_adjustments(db, school_id, import_key, [(number, upserted[sku], adjustment) for number, sku, adjustment in adjustments if sku in upserted], summary)
+
+    await db.commit()
+    summary["chunks"] += 1
+
+
+async def _apply_adjustments(db: AsyncSession, school_id: int, import_key: str, adjustments: list, summary: dict) -> None:
+    """Records and applies the adjustments not yet applied under the school's ``import_key``, in one statement."""
+    recorded = ProductImportAdjustment.__table__
+    already_stmt = select(recorded.c.row_number).where(recorded.c.school_id == school_id, recorded.c.import_key == import_key, recorded.c.row_number.in_([number for number, _, _ in adjustments]))
+    already = set((await db.execute(already_stmt)).scalars().all())
+
+    stock = {product.product_id: product.stock_quantity for _, product, _ in adjustments}
+    to_apply = []
+    for number, product, adjustment in adjustments:
+        if number in already:
+            summary["adjustments_already_applied"] += 1
+        elif stock[product.product_id] + adjustment < 0:
+            _report(summary, number, product.sku, [f"stock_adjustment: {adjustment} would take stock below zero (current: {stock[product.product_id]})"])
+        else:
+            stock[product.product_id] += adjustment
+            to_apply.append({"import_key": import_key, "row_number": number, "product_id": product.product_id, "school_id": school_id, "adjustment": adjustment})
+    if not to_apply:
+        return
+
+    # WITH applied AS (INSERT ... ON CONFLICT DO NOTHING RETURNING ...),
+    #      totals AS (SELECT product_id, sum(adjustment) FROM applied GROUP BY product_id),
+    #      restocked AS (UPDATE products SET stock_quantity = stock_quantity + totals.adjustment FROM totals ...)
+    # SELECT row_number FROM applied
+    applied = insert(recorded).values(to_apply).on_conflict_do_nothing(index_elements=[recorded.c.school_id, recorded.c.import_key, recorded.c.row_number]).returning(recorded.c.row_number, recorded.c.product_id, recorded.c.adjustment).cte("applied")
+    totals = select(applied.c.product_id, func.sum(applied.c.adjustment).label("adjustment")).group_by(applied.c.product_id).cte("totals")
+    restocked = update(_products).where(_products.c.product_id == totals.c.product_id).values(stock_quantity=_products.c.stock_quantity + totals.c.adjustment).returning(_products.c.product_id).cte("restocked")
+    applied_rows = set((await db.execute(select(applied.c.row_number).add_cte(restocked))).scalars().all())
+
+    summary["adjustments_applied"] += len(applied_rows)
+    summary["adjustments_already_applied"] += len(to_apply) - len(applied_rows)  # Recorded by a concurrent upload of the same key
@@ -1,13 +1,22 @@
 # backend/app/services/product_package_service.py (FIXED)
 """
 Product Package Service Layer - With Proper Response Transformation
+
+Performance Optimization:
+- Packages are read with one aggregate query over package_items joined to
+  products (see package_summary_query): the items come back as one JSON array
+  per package, and the totals and component availability are computed by the
+  database, so listing a school's packages never hydrates a package, item or
+  product object
 """
 
+from typing import Optional
+
 from fastapi import HTTPException, status
-from sqlalchemy import and_, func
+from sqlalchemy import JSON, String, and_, case, cast, func, literal_column
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
 
 from app.models.product import Product
 from app.models.product_package import PackageItem, ProductPackage
@@ -19,44 +28,87 @@ from app.schemas.product_package_schema import (
 )
 
 
+def package_summary_query(school_id: int, *, include_inactive: bool = False, package_id: Optional[int] = None, with_items: bool = True):
+    """
+    The school's packages with their items, totals and availability, in one query.
+
+    Each row holds the package columns plus:
+    - items (unless with_items is False): JSON array of the items with their
+      product's name, price, SKU, image, stock and active flag (prices as
+      strings, so no float rounding)
+    - item_count / unique_product_count / calculated_price: sums over the items
+    - all_items_available: no component is discontinued
+    - available_quantity: how many packages the component stock covers,
+      min(stock // quantity) over the items, 0 if a component is discontinued
+      and NULL for a package without items
+    """
+    has_item = PackageItem.product_id.isnot(None)
+    item_fields = {
+        "product_id": PackageItem.product_id,
+        "quantity": PackageItem.quantity,
+        "product_name": Product.name,
+        "product_price": cast(Product.price, String),
+        "product_image_url": Product.image_url,
+        "product_sku": Product.sku,
+        "stock_quantity": Product.stock_quantity,
+        "is_active": Product.is_active,
+    }
+    # Keys are inlined: json_build_object takes "any" arguments, so bound keys would have no type
+    item = func.json_build_object(*(part for key, column in item_fields.items() for part in (literal_column(f"'{key}'"), column)))
+    items = [func.coalesce(func.json_agg(aggregate_order_by(item, PackageItem.product_id)).filter(has_item), literal_column("'[]'::json"), type_=JSON).label("items")] if with_items else []
+    stmt = (
+        select(
+            *ProductPackage.__table__.columns,
+            *items,
+            func.coalesce(func.sum(PackageItem.quantity), 0).label("item_count"),
+            func.count(PackageItem.product_id).label("unique_product_count"),
+            func.coalesce(func.sum(PackageItem.quantity * Product.price), 0).label("calculated_price"),
+            func.coalesce(func.bool_and(Product.is_active), True).label("all_items_available"),
+            func.min(case((Product.is_active.is_(True), Product.stock_quantity // PackageItem.quantity), else_=0)).label("available_quantity"),
+        )
+        .select_from(ProductPackage)
+        .outerjoin(PackageItem, PackageItem.package_id == ProductPackage.id)
+        .outerjoin(Product, Product.product_id == PackageItem.product_id)
+        .where(ProductPackage.school_id == school_id)
+        .group_by(ProductPackage.id)
+        .order_by(ProductPackage.name.asc())
+    )
+
+    if not include_inactive:
+        stmt = stmt.where(ProductPackage.is_active.is_(True))
+    if package_id is not None:
+        stmt = stmt.where(ProductPackage.id == package_id)
+
+    return stmt
+
+
 class ProductPackageService:
     """Service class for asynchronous product package operations."""
 
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    def _transform_package_to_dict(self, package: ProductPackage) -> dict:
+    def _transform_package_to_dict(self, row) -> dict:
         """
-        Transform ProductPackage model to dict with flattened item structure.
+        Transform a package_summary_query row to a dict with flattened item structure.
 
-        This solves the Pydantic validation issue by manually flattening
-        the nested PackageItem->Product relationship.
+        The items are already flat (one JSON object per item); only their
+        availability status, which the product model defines, is added here.
         """
         return {
-            "id": package.id,
-            "school_id": package.school_id,
-            "name": package.name,
-            "description": package.description,
-            "price": package.price,
-            "image_url": package.image_url,
-            "category": package.category,
-            "academic_year": package.academic_year,
-            "is_active": package.is_active,
-            "created_at": package.created_at,
-            "updated_at": package.updated_at,
-            "items": [
-                {
-                    "product_id": item.product_id,
-                    "quantity": item.quantity,
-                    "product_name": item.product.name,
-                    "product_price": item.product.price,
-                    "product_image_url": item.product.image_url,
-                    "product_sku": item.product.sku,
-                    "stock_quantity": item.product.stock_quantity,
-                    "availability": item.product.availability,
-                }
-                for item in package.items
-            ],
+            "id": row.id,
+            "school_id": row.school_id,
+            "name": row.name,
+            "description": row.description,
+            "price": row.price,
+            "image_url": row.image_url,
+            "category": row.category,
+            "academic_year": row.academic_year,
+            "is_active": row.is_active,
+            "created_at": row.created_at,
+            "updated_at": row.updated_at,
+            "available_quantity": row.available_quantity,
+            "items": [{**item, "availability": Product.availability_for(item["is_active"], item["stock_quantity"])} for item in row.items],
         }
 
     async def create_package(self, package_in: ProductPackageCreate, current_profile: Profile) -> dict:
@@ -117,51 +169,33 @@ class ProductPackageService:
 
         await self.db.commit()
 
-        # Reload with relationships
-        stmt = select(ProductPackage).options(selectinload(ProductPackage.items).selectinload(PackageItem.product)).where(ProductPackage.id == db_package.id)
-        result = await self.db.execute(stmt)
-        db_package = result.scalars().first()
-
-        return self._transform_package_to_dict(db_package)
+        return await self.get_package_by_id(db_package.id, current_profile.school_id)
 
     async def get_package_by_id(self, package_id: int, school_id: int) -> dict:
         """Get a single package by ID with items."""
 
-        stmt = (
-            select(ProductPackage)
-            .options(selectinload(ProductPackage.items).selectinload(PackageItem.product))
-            .where(
-                and_(
-                    ProductPackage.id == package_id,
-                    ProductPackage.school_id == school_id,
-                )
-            )
-        )
-        result = await self.db.execute(stmt)
-        db_package = result.scalars().first()
+        result = await self.db.execute(package_summary_query(school_id, include_inactive=True, package_id=package_id))
+        row = result.first()
 
-        if not db_package:
+        if not row:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Package with ID {package_id} not found",
             )
 
-        return self._transform_package_to_dict(db_package)
+        return self._transform_package_to_dict(row)
 
     async def get_all_packages(self, school_id: int, include_inactive: bool = False) -> list[dict]:
-        """Get all packages for a school."""
+        """Get all packages for a school, with items and totals, in one query."""
 
-        stmt = select(ProductPackage).options(selectinload(ProductPackage.items).selectinload(PackageItem.product)).where(ProductPackage.school_id == school_id)
+        result = await self.db.execute(package_summary_query(school_id, include_inactive=include_inactive))
+        return [self._transform_package_to_dict(row) for row in result.all()]
 
-        if not include_inactive:
-            stmt = stmt.where(ProductPackage.is_active.is_(True))
+    async def get_package_summaries(self, school_id: int, include_inactive: bool = False) -> list[dict]:
+        """Get all packages for a school with totals and availability but no items, in one query."""
 
-        stmt = stmt.order_by(ProductPackage.name.asc())
-
-        result = await self.db.execute(stmt)
-        packages = list(result.scalars().all())
-
-        return [self._transform_package_to_dict(pkg) for pkg in packages]
+        result = await self.db.execute(package_summary_query(school_id, include_inactive=include_inactive, with_items=False))
+        return [dict(row._mapping) for row in result.all()]
 
     async def update_package(self, package_id: int, school_id: int, package_update: ProductPackageUpdate) -> dict:
         """Update package header (metadata only)."""
@@ -189,12 +223,7 @@ class ProductPackageService:
 
         await self.db.commit()
 
-        # Reload with relationships and transform
-        stmt = select(ProductPackage).options(selectinload(ProductPackage.items).selectinload(PackageItem.product)).where(ProductPackage.id == db_package.id)
-        result = await self.db.execute(stmt)
-        db_package = result.scalars().first()
-
-        return self._transform_package_to_dict(db_package)
+        return await self.get_package_by_id(db_package.id, school_id)
 
     async def delete_package(self, package_id: int, school_id: int) -> dict:
         """Soft-delete a package."""
@@ -218,12 +247,7 @@ class ProductPackageService:
         db_package.is_active = False
         await self.db.commit()
 
-        # Reload with relationships and transform
-        stmt = select(ProductPackage).options(selectinload(ProductPackage.items).selectinload(PackageItem.product)).where(ProductPackage.id == db_package.id)
-        result = await self.db.execute(stmt)
-        db_package = result.scalars().first()
-
-        return self._transform_package_to_dict(db_package)
+        return await self.get_package_by_id(db_package.id, school_id)
 
     async def add_items_to_package(self, package_id: int, school_id: int, items_in: ProductPackageAddItems) -> dict:
         """Add new items to an existing package."""
@@ -289,12 +313,7 @@ class ProductPackageService:
 
         await self.db.commit()
 
-        # Reload with relationships and transform
-        stmt = select(ProductPackage).options(selectinload(ProductPackage.items).selectinload(PackageItem.product)).where(ProductPackage.id == package_id)
-        result = await self.db.execute(stmt)
-        db_package = result.scalars().first()
-
-        return self._transform_package_to_dict(db_package)
+        return await self.get_package_by_id(package_id, school_id)
 
     async def remove_item_from_package(self, package_id: int, school_id: int, product_id: int) -> dict:
         """Remove an item from a package."""
@@ -346,12 +365,7 @@ class ProductPackageService:
         await self.db.delete(item)
         await self.db.commit()
 
-        # Reload with relationships and transform
-        stmt = select(ProductPackage).options(selectinload(ProductPackage.items).selectinload(PackageItem.product)).where(ProductPackage.id == package_id)
-        result = await self.db.execute(stmt)
-        db_package = result.scalars().first()
-
-        return self._transform_package_to_dict(db_package)
+        return await self.get_package_by_id(package_id, school_id)
 
     async def update_item_quantity(self, package_id: int, school_id: int, product_id: int, new_quantity: int) -> dict:
         """Update quantity of an item in package."""
@@ -392,9 +406,4 @@ class ProductPackageService:
         item.quantity = new_quantity
         await self.db.commit()
 
-        # Reload with relationships and transform
-        stmt = select(ProductPackage).options(selectinload(ProductPackage.items).selectinload(PackageItem.product)).where(ProductPackage.id == package_id)
-        result = await self.db.execute(stmt)
-        db_package = result.scalars().first()
-
-        return self._transform_package_to_dict(db_package)
+        return await self.get_package_by_id(package_id, school_id)
@@ -0,0 +1,319 @@
+# backend/app/services/product_search_service.py
+"""
+Product search for the parent storefront.
+
+Parents used to list a category and filter it on the device, which does not
+scale to thousands of SKUs (every size of every item). A search ranks the
+school's active products against the query and returns one keyset page of
+them, plus per-category facet counts over all matches.
+
+On PostgreSQL with ``pg_trgm`` and the generated ``products.search_vector``
+column (see docs/PRODUCT_SEARCH.md) it runs in the database:
+
+- a product matches when its ``search_vector`` matches
+  ``websearch_to_tsquery('simple', :q)``, or when the query is trigram-similar
+  to a word of its name or SKU (``:q <% name``), which tolerates typos and
+  partial words ("shrt", "TSHIRT-BL");
+- rank = ``ts_rank_cd`` + the best trigram word similarity of name and SKU;
+- GIN indexes on ``search_vector`` and on ``name``/``sku`` (``gin_trgm_ops``)
+  serve every branch, so nothing scans the table.
+
+Databases without the extension or the column (test databases, the SQLite
+stand-in of the agent benchmarks) get an in-memory index instead. It is built
+per school from the same columns, ranks with the same two signals, and is
+dropped when a commit writes to ``products`` or ``product_categories`` (see
+app.db.write_tracking). Both paths return the same page shape and cursors.
+
+Pages are ordered by ``(rank DESC, product_id ASC)``. The cursor is the last
+hit's ``(rank, product_id)``.
+"""
+
+import base64
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy import Float, and_, cast, func, literal, literal_column, or_, select, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, raiseload
+
+from app.db.write_tracking import TableWrites, on_tables_committed
+from app.models.product import Product
+from app.models.product_category import ProductCategory
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_SEARCH_BACKEND = os.getenv("PRODUCT_SEARCH_BACKEND", "auto")  # auto | postgres | memory
+PRODUCT_SEARCH_INDEX_TTL_SECONDS = float(os.getenv("PRODUCT_SEARCH_INDEX_TTL_SECONDS", "300"))
+SEARCH_TEXT_CONFIG = "simple"  # Product names, sizes and SKUs are not natural-language text; no stemming
+TRIGRAM_WORD_SIMILARITY_THRESHOLD = 0.6  # pg_trgm.word_similarity_threshold default
+_INDEX_MAX_SCHOOLS = 256
+
+# Tables the in-memory index is built from
+SOURCE_TABLES = frozenset({"products", "product_categories"})
+
+_search_vector = literal_column("products.search_vector", TSVECTOR)  # Generated column, not mapped on Product (see module docstring)
+
+
+def encode_cursor(rank: float, product_id: int) -> str:
+    raw = json.dumps([rank, product_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[float, int]:
+    """Inverse of :func:`encode_cursor`; raises ValueError for anything it did not produce."""
+    try:
+        rank, product_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return float(rank), int(product_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid pagination cursor.") from e
+
+
+# ---------------------------------------------------------------------------
+# PostgreSQL
+# ---------------------------------------------------------------------------
+
+_postgres_available: Optional[bool] = None
+
+
+async def _use_postgres(db: AsyncSession) -> bool:
+    """Whether this database has pg_trgm and products.search_vector; probed once per process."""
+    global _postgres_available
+    if PRODUCT_SEARCH_BACKEND != "auto":
+        return PRODUCT_SEARCH_BACKEND == "postgres"
+    if _postgres_available is None:
+        if db.get_bind().dialect.name != "postgresql":
+            _postgres_available = False
+        else:
+            probe = text("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')" " AND EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name = 'products' AND column_name = 'search_vector')")
+            _postgres_available = bool((await db.execute(probe)).scalar())
+        if not _postgres_available:
+            logger.info("Product search: pg_trgm or products.search_vector missing, using the in-memory index")
+    return _postgres_available
+
+
+def _match_and_rank(query: str):
+    tsquery = func.websearch_to_tsquery(SEARCH_TEXT_CONFIG, query)
+    # On the bare columns so the gin_trgm_ops indexes apply; greatest() skips the NULL of a product without SKU
+    match = or_(_search_vector.op("@@")(tsquery), literal(query).op("<%")(Product.name), literal(query).op("<%")(Product.sku))
+    rank = cast(func.ts_rank_cd(_search_vector, tsquery) + func.greatest(func.word_similarity(query, Product.name), func.word_similarity(query, Product.sku)), Float)
+    return match, rank
+
+
+def _scope(school_id: int):
+    return [Product.school_id == school_id, Product.is_active.is_(True)]
+
+
+def facets_query(school_id: int, query: str):
+    """Matching products per category (null category included), largest first."""
+    match, _ = _match_and_rank(query)
+    return (
+        select(Product.category_id, ProductCategory.category_name, func.count().label("count"))
+        .outerjoin(ProductCategory, ProductCategory.category_id == Product.category_id)
+        .where(*_scope(school_id), match)
+        .group_by(Product.category_id, ProductCategory.category_name)
+        .order_by(func.count().desc(), ProductCategory.category_name.asc())
+    )
+
+
+def page_query(school_id: int, query: str, *, category_id: Optional[int], limit: int, after: Optional[tuple[float, int]]):
+    """One page of matching products with their rank, best first (``limit + 1`` rows; the extra one flags a next page)."""
+    match, rank = _match_and_rank(query)
+    filters = [*_scope(school_id), match]
+    if category_id is not None:
+        filters.append(Product.category_id == category_id)
+    ranked = select(Product.product_id, rank.label("rank")).where(*filters).subquery("ranked")
+
+    stmt = select(Product, ranked.c.rank).join(ranked, ranked.c.product_id == Product.product_id).options(joinedload(Product.category).raiseload("*"), raiseload("*"))
+    if after is not None:
+        after_rank, after_id = after
+        stmt = stmt.where(or_(ranked.c.rank < after_rank, and_(ranked.c.rank == after_rank, Product.product_id > after_id)))
+    return stmt.order_by(ranked.c.rank.desc(), Product.product_id.asc()).limit(limit + 1)
+
+
+async def _search_postgres(db: AsyncSession, school_id: int, query: str, category_id: Optional[int], limit: int, after: Optional[tuple[float, int]]) -> tuple[list, list[dict]]:
+    facets = [{"category_id": row.category_id, "category_name": row.category_name, "count": row.count} for row in (await db.execute(facets_query(school_id, query))).all()]
+    rows = (await db.execute(page_query(school_id, query, category_id=category_id, limit=limit, after=after))).all()
+    return [(product, rank) for product, rank in rows], facets
+
+
+# ---------------------------------------------------------------------------
+# In-memory fallback
+# ---------------------------------------------------------------------------
+
+_WORD = re.compile(r"[0-9a-z]+")
+
+
+def _words(value: Optional[str]) -> list[str]:
+    return _WORD.findall((value or "").lower())
+
+
+def _trigrams(word: str) -> set[str]:
+    # pg_trgm pads each word with two spaces in front and one behind
+    padded = f"  {word} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def _word_similarity(query_trigrams: set[str], words: list[str]) -> float:
+    """Best trigram similarity between the query and a run of consecutive words (pg_trgm's word_similarity, closely)."""
+    best = 0.0
+    for start in range(len(words)):
+        extent: set[str] = set()
+        for word in words[start:]:
+            extent |= _trigrams(word)
+            shared = len(query_trigrams & extent)
+            best = max(best, shared / len(query_trigrams))
+            if shared == len(query_trigrams):
+                break
+    return best
+
+
+@dataclass(frozen=True)
+class _IndexedProduct:
+    product_id: int
+    category_id: Optional[int]
+    category_name: Optional[str]
+    name_words: tuple[str, ...]
+    sku_words: tuple[str, ...]
+    weighted_words: dict  # word -> weight, as setweight() in the generated column: name/SKU 1.0, manufacturer 0.4, description 0.2
+
+
+@dataclass
+class ProductSearchIndex:
+    """Active products of one school, tokenized for :func:`search`."""
+
+    school_id: int
+    products: list[_IndexedProduct] = field(default_factory=list)
+    built_at: float = field(default_factory=time.monotonic)
+
+    def rank(self, query: str) -> list[tuple[_IndexedProduct, float]]:
+        """Matching products and their rank, best first."""
+        query_words = _words(query)
+        if not query_words:
+            return []
+        query_trigrams = set().union(*(_trigrams(word) for word in query_words))
+        hits = []
+        for product in self.products:
+            # Every word must occur, as with websearch_to_tsquery's implicit AND
+            weights = [product.weighted_words.get(word, 0.0) for word in query_words]
+            text_rank = sum(weights) / len(weights) if all(weights) else 0.0
+            similarity = max(_word_similarity(query_trigrams, list(product.name_words)), _word_similarity(query_trigrams, list(product.sku_words)))
+            if text_rank > 0 or similarity >= TRIGRAM_WORD_SIMILARITY_THRESHOLD:
+                hits.append((product, round(text_rank + similarity, 6)))
+        hits.sort(key=lambda hit: (-hit[1], hit[0].product_id))
+        return hits
+
+
+async def build_index(db: AsyncSession, school_id: int) -> ProductSearchIndex:
+    """Load the searchable columns of the school's active products into an index."""
+    rows = await db.execute(
+        select(Product.product_id, Product.category_id, ProductCategory.category_name, Product.name, Product.sku, Product.manufacturer, Product.description)
+        .outerjoin(ProductCategory, ProductCategory.category_id == Product.category_id)
+        .where(*_scope(school_id))
+    )
+    index = ProductSearchIndex(school_id=school_id)
+    for product_id, category_id, category_name, name, sku, manufacturer, description in rows.all():
+        weighted_words: dict[str, float] = {}
+        for words, weight in ((_words(description), 0.2), (_words(manufacturer), 0.4), (_words(name) + _words(sku), 1.0)):
+            for word in words:
+                weighted_words[word] = max(weighted_words.get(word, 0.0), weight)
+        index.products.append(_IndexedProduct(product_id, category_id, category_name, tuple(_words(name)), tuple(_words(sku)), weighted_words))
+    return index
+
+
+_indexes: dict[int, ProductSearchIndex] = {}
+_generations: dict[int, int] = defaultdict(int)
+_lock = threading.Lock()
+
+
+async def get_index(db: AsyncSession, school_id: int) -> ProductSearchIndex:
+    """Return the school's cached index, building it on first use or after invalidation."""
+    with _lock:
+        cached = _indexes.get(school_id)
+        if cached is not None and time.monotonic() - cached.built_at < PRODUCT_SEARCH_INDEX_TTL_SECONDS:
+            return cached
+        generation = _generations[school_id]
+
+    index = await build_index(db, school_id)
+
+    with _lock:
+        # A write committed while we were loading makes this index stale; serve it once, don't cache it.
+        if _generations[school_id] == generation:
+            if len(_indexes) >= _INDEX_MAX_SCHOOLS:
+                _indexes.clear()
+            _indexes[school_id] = index
+    return index
+
+
+def invalidate_index(school_id: Optional[int] = None) -> None:
+    """Drop the cached index of ``school_id``, or of every school when ``None``."""
+    with _lock:
+        schools = set(_generations) | set(_indexes) if school_id is None else {school_id}
+        for school in schools:
+            _generations[school] += 1
+            _indexes.pop(school, None)
+
+
+def _invalidate_on_write(writes: TableWrites) -> None:
+    affected: set[Optional[int]] = set()
+    for table in SOURCE_TABLES.intersection(writes):
+        affected.update(writes[table])
+    if None in affected:
+        invalidate_index()
+        return
+    for school_id in affected:
+        invalidate_index(school_id)
+
+
+on_tables_committed(_invalidate_on_write)
+
+
+async def _search_memory(db: AsyncSession, school_id: int, query: str, category_id: Optional[int], limit: int, after: Optional[tuple[float, int]]) -> tuple[list, list[dict]]:
+    hits = (await get_index(db, school_id)).rank(query)
+
+    counts = Counter((product.category_id, product.category_name) for product, _ in hits)
+    facets = [{"category_id": facet_category_id, "category_name": category_name, "count": count} for (facet_category_id, category_name), count in sorted(counts.items(), key=lambda item: (-item[1], item[0][1] or ""))]
+
+    if category_id is not None:
+        hits = [hit for hit in hits if hit[0].category_id == category_id]
+    if after is not None:
+        hits = [(product, rank) for product, rank in hits if (-rank, product.product_id) > (-after[0], after[1])]
+    page, extra = hits[:limit], hits[limit : limit + 1]
+    if not page:
+        return [], facets
+
+    # Hydrate the page in one query, in rank order; the extra hit only flags a next page and is never returned
+    loaded = (await db.execute(select(Product).options(joinedload(Product.category).raiseload("*"), raiseload("*")).where(Product.product_id.in_([product.product_id for product, _ in page])))).scalars().all()
+    by_id = {product.product_id: product for product in loaded}
+    return [(by_id[product.product_id], rank) for product, rank in page if product.product_id in by_id] + extra, facets
+
+
+# ---------------------------------------------------------------------------
+
+
+async def search(db: AsyncSession, school_id: int, query: str, *, category_id: Optional[int] = None, limit: int = 20, cursor: Optional[str] = None) -> dict:
+    """
+    One page of the school's active products matching ``query``, best match
+    first, optionally restricted to ``category_id``.
+
+    Returns ``{"items", "next_cursor", "total", "facets"}``: ``facets`` counts
+    the matches per category regardless of ``category_id``; ``total`` counts the
+    matches the page is drawn from. Raises ValueError for a malformed cursor.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    run = _search_postgres if await _use_postgres(db) else _search_memory
+    hits, facets = await run(db, school_id, query, category_id, limit, after)
+
+    next_cursor = None
+    if len(hits) > limit:
+        hits = hits[:limit]
+        next_cursor = encode_cursor(hits[-1][1], hits[-1][0].product_id)
+    total = sum(facet["count"] for facet in facets if category_id is None or facet["category_id"] == category_id)
+    return {"items": [product for product, _ in hits], "next_cursor": next_cursor, "total": total, "facets": facets}
@@ -11,6 +11,8 @@ Security Architecture:
 - RLS policies provide defense-in-depth at database layer
 """
 
+from typing import BinaryIO
+
 from fastapi import HTTPException, status
 from sqlalchemy import and_, func
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -21,6 +23,7 @@ from app.models.product import Product
 from app.models.product_category import ProductCategory
 from app.models.profile import Profile
 from app.schemas.product_schema import ProductCreate, ProductStockAdjustment, ProductUpdate
+from app.services import product_import_service, product_search_service
 
 
 class ProductService:
@@ -189,6 +192,32 @@ class ProductService:
         result = await self.db.execute(stmt)
         return list(result.scalars().all())
 
+    async def search_products(self, school_id: int, query: str, category_id: int = None, limit: int = 20, cursor: str = None) -> dict:
+        """
+        Search the school's active products (parent storefront).
+
+        Ranked full-text and trigram search over name, SKU, manufacturer and
+        description, tolerant of typos and partial words. See
+        app.services.product_search_service.
+
+        Args:
+            school_id: School ID
+            query: Search text
+            category_id: Optional category filter (facets still cover every category)
+            limit: Page size
+            cursor: next_cursor of the previous page
+
+        Returns:
+            {"items", "next_cursor", "total", "facets"}
+
+        Raises:
+            HTTPException 400: If the cursor is malformed
+        """
+        try:
+            return await product_search_service.search(self.db, school_id, query.strip(), category_id=category_id, limit=limit, cursor=cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+
     async def update_product(self, db_product: Product, product_update: ProductUpdate) -> Product:
         """
         Update an existing product.
@@ -405,8 +434,34 @@ class ProductService:
 
         await self.db.commit()
 
-        # Refresh all
-        for product in products:
-            await self.db.refresh(product)
+        # Reload all in one query (updated_at is set by the database)
+        stmt = select(Product).options(selectinload(Product.category)).where(Product.product_id.in_(product_ids)).order_by(Product.product_id).execution_options(populate_existing=True)
+        result = await self.db.execute(stmt)
+        return list(result.scalars().all())
+
+    async def import_products(self, school_id: int, file: BinaryIO, file_format: str, import_key: str = None) -> dict:
+        """
+        Bulk create/update products and restock them from a file (Admin only).
+
+        Rows are keyed by SKU and upserted in chunks; see
+        app.services.product_import_service.
+
+        Args:
+            school_id: School ID (for security)
+            file: The uploaded file (binary)
+            file_format: "csv" or "jsonl"
+            import_key: Identifies the upload; stock adjustments are applied once per key
 
-        return products
+        Returns:
+            Import summary with a per-row error report
+
+        Raises:
+            HTTPException 400: If the file format is not supported
+        """
+        readers = {"csv": product_import_service.read_csv_rows, "jsonl": product_import_service.read_jsonl_rows}
+        if file_format not in readers:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Upload a .csv file (with a header row) or a .jsonl file (one JSON object per line)",
+            )
+        return await product_import_service.import_products(self.db, school_id, readers[file_format](file), import_key=import_key)
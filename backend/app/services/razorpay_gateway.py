@@ -0,0 +1,321 @@
+# backend/app/services/razorpay_gateway.py
+"""Non-blocking Razorpay API adapter.
+
+The official ``razorpay.Client`` is built on ``requests`` and blocks the event
+loop for the whole gateway round trip. :class:`RazorpayGateway` talks to the
+same REST API through a pooled ``httpx.AsyncClient`` instead, while keeping the
+SDK's shape (``gateway.order.create(data=...)``, ``gateway.payment.capture(...)``)
+and its exception types (``BadRequestError``, ``GatewayError``, ``ServerError``,
+``SignatureVerificationError``), so call sites only gain an ``await``.
+
+- Every call has connect/read timeouts and is recorded in the
+  ``payment_gateway_call_seconds`` histogram.
+- Reads are retried on network errors, 429 and 5xx responses with exponential
+  backoff and full jitter. Writes (order creation, capture, refund) are only
+  retried when the request never reached Razorpay (connect errors) or was
+  rejected with 429, so a payment is never captured or refunded twice.
+- When retries are exhausted on a network error :class:`RazorpayNetworkError`
+  is raised.
+
+Decrypted per-school credentials and their gateway clients are cached in
+memory (see :func:`get_school_credentials`), bounded by a TTL and dropped when a
+commit writes to the school's row, e.g. when keys are reconfigured.
+
+``RAZORPAY_API_URL`` points the adapter at another server, e.g. the fake one in
+``tests/utils/fake_razorpay.py``.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from collections import defaultdict
+from typing import Any, Optional
+
+import httpx
+from fastapi import HTTPException
+from razorpay.errors import BadRequestError, GatewayError, ServerError, SignatureVerificationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import crypto_service
+from app.core.metrics import PAYMENT_GATEWAY_CALL_SECONDS, PAYMENT_GATEWAY_RETRIES
+from app.db.write_tracking import TableWrites, on_tables_committed
+from app.models.school import School
+
+logger = logging.getLogger(__name__)
+
+RAZORPAY_API_URL = os.getenv("RAZORPAY_API_URL", "https://api.razorpay.com/v1")
+RAZORPAY_CONNECT_TIMEOUT_SECONDS = float(os.getenv("RAZORPAY_CONNECT_TIMEOUT_SECONDS", "3"))
+RAZORPAY_READ_TIMEOUT_SECONDS = float(os.getenv("RAZORPAY_READ_TIMEOUT_SECONDS", "10"))
+RAZORPAY_MAX_RETRIES = int(os.getenv("RAZORPAY_MAX_RETRIES", "2"))
+RAZORPAY_RETRY_BASE_SECONDS = float(os.getenv("RAZORPAY_RETRY_BASE_SECONDS", "0.25"))
+RAZORPAY_RETRY_MAX_SECONDS = float(os.getenv("RAZORPAY_RETRY_MAX_SECONDS", "2"))
+RAZORPAY_MAX_CONNECTIONS = int(os.getenv("RAZORPAY_MAX_CONNECTIONS", "50"))
+GATEWAY_CREDENTIALS_TTL_SECONDS = float(os.getenv("GATEWAY_CREDENTIALS_TTL_SECONDS", "900"))
+
+# Statuses worth retrying for reads; writes only retry 429 (the request was not processed).
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+class RazorpayNetworkError(Exception):
+    """Razorpay could not be reached (timeout or connection failure) after all retries."""
+
+
+# One pooled client per event loop: agent tools run their coroutines on short-lived loops,
+# and an httpx client must not be shared across loops.
+_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def _build_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=RAZORPAY_API_URL,
+        timeout=httpx.Timeout(RAZORPAY_READ_TIMEOUT_SECONDS, connect=RAZORPAY_CONNECT_TIMEOUT_SECONDS),
+        limits=httpx.Limits(max_connections=RAZORPAY_MAX_CONNECTIONS, max_keepalive_connections=RAZORPAY_MAX_CONNECTIONS // 2),
+        headers={"Content-Type": "application/json"},
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """The shared Razorpay HTTP client of the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None or client.is_closed:
+        client = _build_http_client()
+        _http_clients[loop] = client
+    return client
+
+
+async def close_http_client() -> None:
+    """Close the running loop's pooled client (called on application shutdown)."""
+    client = _http_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def _retry_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(RAZORPAY_RETRY_MAX_SECONDS, RAZORPAY_RETRY_BASE_SECONDS * 2**attempt))
+
+
+def _gateway_error(response: httpx.Response) -> Exception:
+    """Map an error response to the exception the Razorpay SDK would raise."""
+    try:
+        error = response.json().get("error") or {}
+    except ValueError:
+        error = {}
+    description = error.get("description") or f"Razorpay returned HTTP {response.status_code}"
+    code = str(error.get("code", "")).upper()
+    if code == "BAD_REQUEST_ERROR":
+        return BadRequestError(description)
+    if code == "GATEWAY_ERROR":
+        return GatewayError(description)
+    return ServerError(description)
+
+
+def verify_signature(body: str, signature: str, secret: str) -> None:
+    """HMAC-SHA256 check used for payment and webhook signatures."""
+    expected = hmac.new(secret.encode(), body.encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected, signature or ""):
+        raise SignatureVerificationError("Razorpay Signature Verification Failed")
+
+
+class _Utility:
+    def __init__(self, key_secret: str):
+        self._key_secret = key_secret
+
+    def verify_payment_signature(self, parameters: dict) -> bool:
+        verify_signature(f"{parameters['razorpay_order_id']}|{parameters['razorpay_payment_id']}", parameters["razorpay_signature"], self._key_secret)
+        return True
+
+    def verify_webhook_signature(self, body: str, signature: str, secret: str) -> bool:
+        verify_signature(body, signature, secret)
+        return True
+
+
+class _Orders:
+    def __init__(self, gateway: "RazorpayGateway"):
+        self._gateway = gateway
+
+    async def create(self, data: dict) -> dict:
+        return await self._gateway.request("order.create", "POST", "/orders", json=data, idempotent=False)
+
+    async def fetch(self, order_id: str) -> dict:
+        return await self._gateway.request("order.fetch", "GET", f"/orders/{order_id}")
+
+    async def payments(self, order_id: str) -> dict:
+        return await self._gateway.request("order.payments", "GET", f"/orders/{order_id}/payments")
+
+
+class _Payments:
+    def __init__(self, gateway: "RazorpayGateway"):
+        self._gateway = gateway
+
+    async def all(self, params: Optional[dict] = None) -> dict:
+        """List payments, filtered with Razorpay's ``from``/``to`` (unix seconds), ``count`` (max 100) and ``skip``."""
+        return await self._gateway.request("payment.all", "GET", "/payments", params=params)
+
+    async def fetch(self, payment_id: str) -> dict:
+        return await self._gateway.request("payment.fetch", "GET", f"/payments/{payment_id}")
+
+    async def capture(self, payment_id: str, amount: int, data: Optional[dict] = None) -> dict:
+        body = {"currency": "INR", **(data or {}), "amount": amount}
+        return await self._gateway.request("payment.capture", "POST", f"/payments/{payment_id}/capture", json=body, idempotent=False)
+
+    async def refund(self, payment_id: str, data: Optional[dict] = None) -> dict:
+        return await self._gateway.request("payment.refund", "POST", f"/payments/{payment_id}/refund", json=data or {}, idempotent=False)
+
+    async def refunds(self, payment_id: str, params: Optional[dict] = None) -> dict:
+        """List a payment's refunds (``count`` max 100, ``skip``), e.g. to find one whose creation response was lost."""
+        return await self._gateway.request("payment.refunds", "GET", f"/payments/{payment_id}/refunds", params=params)
+
+
+class RazorpayGateway:
+    """Async Razorpay client for one school's API keys."""
+
+    def __init__(self, key_id: str, key_secret: str, *, http_client: Optional[httpx.AsyncClient] = None):
+        self._auth = (key_id, key_secret)
+        self._http_client = http_client
+        self.order = _Orders(self)
+        self.payment = _Payments(self)
+        self.utility = _Utility(key_secret)
+
+    async def request(self, operation: str, method: str, path: str, *, json: Optional[dict] = None, params: Optional[dict] = None, idempotent: bool = True) -> Any:
+        client = self._http_client or get_http_client()
+        for attempt in range(RAZORPAY_MAX_RETRIES + 1):
+            retries_left = attempt < RAZORPAY_MAX_RETRIES
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                response = await client.request(method, path, json=json, params=params, auth=self._auth)
+            except httpx.TransportError as exc:
+                outcome = "timeout" if isinstance(exc, httpx.TimeoutException) else "network_error"
+                # A write that may have reached Razorpay must not be replayed.
+                never_sent = isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+                if not (retries_left and (idempotent or never_sent)):
+                    raise RazorpayNetworkError(f"Razorpay {operation} failed: {exc!r}") from exc
+                logger.warning("Razorpay %s attempt %d failed (%r); retrying", operation, attempt + 1, exc)
+            else:
+                if response.status_code < 300:
+                    outcome = "success"
+                    return response.json() if response.content else {}
+                outcome = f"http_{response.status_code}"
+                retryable = response.status_code == 429 or (idempotent and response.status_code in RETRYABLE_STATUS_CODES)
+                if not (retries_left and retryable):
+                    raise _gateway_error(response)
+                logger.warning("Razorpay %s attempt %d returned HTTP %d; retrying", operation, attempt + 1, response.status_code)
+            finally:
+                PAYMENT_GATEWAY_CALL_SECONDS.labels(operation=operation, outcome=outcome).observe(time.perf_counter() - started)
+
+            PAYMENT_GATEWAY_RETRIES.labels(operation=operation).inc()
+            await asyncio.sleep(_retry_delay(attempt))
+        raise AssertionError("unreachable")  # pragma: no cover
+
+
+class SchoolGatewayCredentials:
+    """
+    A school's Razorpay credentials as stored on ``School``, decrypted on first use.
+
+    Each secret is decrypted at most once per cache entry, and the plaintext only
+    ever lives in process memory.
+    """
+
+    def __init__(self, school_id: int, school: Optional[School]):
+        self.school_id = school_id
+        self.loaded_at = time.monotonic()
+        self._encrypted = {
+            "key_id": getattr(school, "razorpay_key_id_encrypted", None),
+            "key_secret": getattr(school, "razorpay_key_secret_encrypted", None),
+            "webhook_secret": getattr(school, "razorpay_webhook_secret_encrypted", None),
+        }
+        self._decrypted: dict[str, str] = {}
+        self._gateway: Optional[RazorpayGateway] = None
+
+    def __repr__(self) -> str:
+        return f"SchoolGatewayCredentials(school_id={self.school_id}, configured={self.configured})"
+
+    def _secret(self, name: str) -> Optional[str]:
+        if name not in self._decrypted:
+            if not self._encrypted[name]:
+                return None
+            self._decrypted[name] = crypto_service.decrypt_value(self._encrypted[name])
+        return self._decrypted[name]
+
+    @property
+    def configured(self) -> bool:
+        return bool(self._encrypted["key_id"] and self._encrypted["key_secret"])
+
+    @property
+    def key_id(self) -> Optional[str]:
+        return self._secret("key_id")
+
+    @property
+    def key_secret(self) -> Optional[str]:
+        return self._secret("key_secret")
+
+    @property
+    def webhook_secret(self) -> Optional[str]:
+        return self._secret("webhook_secret")
+
+    @property
+    def gateway(self) -> RazorpayGateway:
+        if self._gateway is None:
+            self._gateway = RazorpayGateway(self.key_id or "", self.key_secret or "")
+        return self._gateway
+
+
+_credentials: dict[int, SchoolGatewayCredentials] = {}
+_generations: dict[int, int] = defaultdict(int)
+_credentials_lock = threading.Lock()
+
+
+def invalidate_school_credentials(school_id: Optional[int] = None) -> None:
+    """Drop the cached credentials of ``school_id``, or of every school when ``None``."""
+    with _credentials_lock:
+        schools = set(_generations) | set(_credentials) if school_id is None else {school_id}
+        for school in schools:
+            _generations[school] += 1
+            _credentials.pop(school, None)
+
+
+def _invalidate_on_write(writes: TableWrites) -> None:
+    school_ids = writes.get("schools", set())
+    if None in school_ids:
+        invalidate_school_credentials()
+        return
+    for school_id in school_ids:
+        invalidate_school_credentials(school_id)
+
+
+on_tables_committed(_invalidate_on_write)
+
+
+async def get_school_credentials(db: AsyncSession, school_id: int) -> SchoolGatewayCredentials:
+    """Return the school's cached credentials, loading them on first use or after invalidation."""
+    with _credentials_lock:
+        cached = _credentials.get(school_id)
+        if cached is not None and time.monotonic() - cached.loaded_at < GATEWAY_CREDENTIALS_TTL_SECONDS:
+            return cached
+        generation = _generations[school_id]
+
+    credentials = SchoolGatewayCredentials(school_id, await db.get(School, school_id))
+
+    with _credentials_lock:
+        # Credentials changed while we were loading; use this snapshot once, don't cache it.
+        if _generations[school_id] == generation:
+            _credentials[school_id] = credentials
+    return credentials
+
+
+async def get_school_gateway(db: AsyncSession, school_id: int) -> RazorpayGateway:
+    """
+    Returns the gateway client for a school's Razorpay keys (cached per school).
+    """
+    credentials = await get_school_credentials(db, school_id)
+    if not credentials.configured:
+        raise HTTPException(status_code=503, detail="Payment gateway is not configured for this school.")
+    return credentials.gateway
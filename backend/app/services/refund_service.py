@@ -1,36 +1,172 @@
+import logging
+import os
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
+from typing import Optional
+from uuid import UUID
 
 from fastapi import HTTPException
-from sqlalchemy import func, select
+from razorpay.errors import BadRequestError, GatewayError, ServerError
+from sqlalchemy import case, cast, func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 # Import all necessary models and schemas
 from app.models.payment import Payment
 from app.models.refund import Refund
+from app.schemas.enums import PaymentStatus
 from app.schemas.refund_schema import RefundCreate
+from app.services import invoice_service, razorpay_gateway
+from app.services.razorpay_gateway import RazorpayGateway, RazorpayNetworkError
+
+logger = logging.getLogger(__name__)
+
+# A refund sent this long ago without an outcome was lost (crash, timeout) and is looked up at the gateway
+REFUND_LEASE_SECONDS = int(os.getenv("REFUND_LEASE_SECONDS", "600"))  # Well above the gateway client's timeouts and retries
+
+_LIST_PAGE_SIZE = 100  # Razorpay's maximum ``count`` per listing page
+# Saved and sent, but the gateway's answer is not recorded yet
+UNCONFIRMED = (Refund.status == "pending", Refund.gateway_refund_id.is_(None))
+
+# captured_allocation_failed: money taken for an invoice or order it could not be applied to (e.g. an order cancelled before the capture)
+REFUNDABLE_STATUSES = (PaymentStatus.CAPTURED.value, PaymentStatus.PARTIALLY_REFUNDED.value, PaymentStatus.CAPTURED_ALLOCATION_FAILED.value)
+
+
+async def mark_refunded_payments(db: AsyncSession, payment_ids: list[int]) -> None:
+    """
+    Sets ``refunded`` / ``partially_refunded`` on the payments from the refunds
+    the gateway has accepted (pending or processed), in one UPDATE. The caller
+    commits.
+    """
+    if not payment_ids:
+        return
+    accepted = select(func.coalesce(func.sum(Refund.amount), 0)).where(Refund.payment_id == Payment.id, Refund.gateway_refund_id.isnot(None), Refund.status.in_(("pending", "processed"))).scalar_subquery()
+    status = case((accepted >= Payment.amount_paid, PaymentStatus.REFUNDED.value), else_=PaymentStatus.PARTIALLY_REFUNDED.value)
+    await db.execute(update(Payment).where(Payment.id.in_(payment_ids), accepted > 0).values(status=cast(status, Payment.status.type)).execution_options(synchronize_session=False))
+
+
+async def find_gateway_refund(gateway: RazorpayGateway, gateway_payment_id: str, refund_id: int) -> Optional[dict]:
+    """The payment's gateway refund carrying this internal refund id, if the gateway created one."""
+    skip = 0
+    while True:
+        items = (await gateway.payment.refunds(gateway_payment_id, {"count": _LIST_PAGE_SIZE, "skip": skip})).get("items", [])
+        found = next((item for item in items if str((item.get("notes") or {}).get("internal_refund_id")) == str(refund_id)), None)
+        if found is not None or len(items) < _LIST_PAGE_SIZE:
+            return found
+        skip += _LIST_PAGE_SIZE
+
+
+def refund_outcome(refund: Refund, *, gateway_refund: Optional[dict] = None, status: str = "pending", error: Optional[str] = None) -> dict:
+    """Parameters of the refund's UPDATE; every outcome has the same keys, so many run as one executemany."""
+    if gateway_refund is not None:
+        # Razorpay reports 'pending' until the refund settles and 'processed' once it has.
+        status = "processed" if gateway_refund.get("status") == "processed" else "pending"
+    return {"id": refund.id, "gateway_refund_id": gateway_refund.get("id") if gateway_refund else None, "status": status, "error_description": error[:255] if error else None}
+
+
+async def send_refund(gateway: RazorpayGateway, refund: Refund, gateway_payment_id: str, *, resumed: bool = False) -> dict:
+    """
+    Sends a saved refund to the gateway with its internal id in the notes, and
+    returns its outcome (see refund_outcome). A ``resumed`` refund, whose
+    earlier attempt has no recorded outcome, is looked up first and only sent
+    if the gateway has no such refund. When the answer to the send is lost
+    (timeout, 5xx) the refund is looked up too; if it still cannot be found it
+    stays unconfirmed, to be looked up again once its lease expires.
+    """
+    try:
+        if resumed:
+            existing = await find_gateway_refund(gateway, gateway_payment_id, refund.id)
+            if existing is not None:
+                logger.warning(f"Refund {refund.id}: found gateway refund {existing.get('id')} from an earlier attempt; not sending it again.")
+                return refund_outcome(refund, gateway_refund=existing)
+        notes = {"internal_payment_id": refund.payment_id, "internal_refund_id": refund.id, "reason": refund.reason[:250]}
+        if refund.batch_id is not None:
+            notes["refund_batch_id"] = refund.batch_id
+        return refund_outcome(refund, gateway_refund=await gateway.payment.refund(gateway_payment_id, {"amount": int(refund.amount * 100), "notes": notes}))
+    except BadRequestError as rzp_err:
+        logger.warning(f"Razorpay rejected refund {refund.id} of payment {refund.payment_id}: {rzp_err}")
+        return refund_outcome(refund, status="failed", error=f"Refund rejected by payment gateway: {rzp_err}")
+    except (RazorpayNetworkError, ServerError, GatewayError) as exc:
+        logger.error(f"Razorpay error during refund {refund.id} of payment {refund.payment_id}: {exc}")
+        error = exc
+
+    # The refund may have reached Razorpay
+    try:
+        existing = await find_gateway_refund(gateway, gateway_payment_id, refund.id)
+    except (RazorpayNetworkError, BadRequestError, ServerError, GatewayError) as exc:
+        logger.error(f"Razorpay error looking up refund {refund.id} of payment {refund.payment_id}: {exc}")
+        existing = None
+    if existing is not None:
+        return refund_outcome(refund, gateway_refund=existing)
+    return refund_outcome(refund, error=f"Gateway outcome unknown, will be looked up: {error}")
+
+
+async def record_refund_outcomes(db: AsyncSession, refunds: list[Refund], outcomes: list[dict], *, user_id: Optional[UUID]) -> None:
+    """
+    Writes the refunds' outcomes, takes the accepted ones off the invoices they
+    paid and sets the payments' refunded status, with set-based statements.
+    The caller commits.
+    """
+    if not outcomes:
+        return
+    await db.execute(update(Refund), outcomes)  # Bulk UPDATE by primary key
+    accepted = {outcome["id"] for outcome in outcomes if outcome["gateway_refund_id"]}
+    await invoice_service.reverse_payment_allocations(db, refund_ids=sorted(accepted), user_id=user_id)
+    await mark_refunded_payments(db, sorted({refund.payment_id for refund in refunds if refund.id in accepted}))
 
 
 class RefundService:
     def __init__(self, db: AsyncSession):
         self.db = db
 
+    async def _settle_lost_refunds(self, gateway: RazorpayGateway, payment: Payment) -> None:
+        """
+        Earlier single refunds of the payment whose outcome was lost and whose
+        lease has expired: recorded if the gateway has them, failed if it does
+        not. Ones the gateway cannot be asked about stay unconfirmed.
+        """
+        lease_expired = datetime.now(timezone.utc) - timedelta(seconds=REFUND_LEASE_SECONDS)
+        stmt = select(Refund).where(Refund.payment_id == payment.id, Refund.batch_id.is_(None), *UNCONFIRMED, Refund.submitted_at < lease_expired).order_by(Refund.id)
+        lost = list((await self.db.execute(stmt)).scalars().all())
+        outcomes = []
+        for refund in lost:
+            try:
+                existing = await find_gateway_refund(gateway, payment.gateway_payment_id, refund.id)
+            except (RazorpayNetworkError, BadRequestError, ServerError, GatewayError) as exc:
+                logger.error(f"Razorpay error looking up refund {refund.id} of payment {payment.id}: {exc}")
+                continue
+            if existing is None:
+                outcomes.append(refund_outcome(refund, status="failed", error="The payment gateway has no record of this refund."))
+            else:
+                outcomes.append(refund_outcome(refund, gateway_refund=existing))
+        await record_refund_outcomes(self.db, lost, outcomes, user_id=None)
+
     async def process_refund(self, refund_data: RefundCreate) -> Refund:
         """
         Processes a refund against a successful payment, including validation checks.
+
+        The refund is saved (pending) and committed before it is sent, so an
+        answer lost to a timeout is looked up by its id instead of the refund
+        being sent twice; such a refund is returned still unconfirmed.
         """
-        # 1. Fetch the original payment to ensure it can be refunded.
-        payment_stmt = select(Payment).where(Payment.id == refund_data.payment_id)
+        # 1. Lock the original payment: concurrent refunds of it are checked one after the other.
+        payment_stmt = select(Payment).where(Payment.id == refund_data.payment_id).with_for_update()
         payment_result = await self.db.execute(payment_stmt)
         payment = payment_result.scalars().first()
 
         if not payment:
             raise HTTPException(status_code=404, detail="Original payment transaction not found.")
 
-        if payment.status != "captured":
-            raise HTTPException(status_code=400, detail=f"Cannot refund a payment with status '{payment.status}'. Only 'captured' payments are refundable.")
+        if payment.status not in REFUNDABLE_STATUSES:
+            raise HTTPException(status_code=400, detail=f"Cannot refund a payment with status '{payment.status}'. Only captured (or partially refunded) payments are refundable.")
+
+        if not payment.gateway_payment_id:
+            raise HTTPException(status_code=400, detail="Payment has no gateway payment ID to refund against.")
+
+        client = await razorpay_gateway.get_school_gateway(self.db, payment.school_id)
+        await self._settle_lost_refunds(client, payment)
 
-        # 2. Calculate the total amount already refunded for this payment.
-        refunded_stmt = select(func.sum(Refund.amount)).where(Refund.payment_id == refund_data.payment_id, Refund.status == "processed")
+        # 2. Calculate the total amount already refunded, still settling at the gateway, or not confirmed yet.
+        refunded_stmt = select(func.sum(Refund.amount)).where(Refund.payment_id == refund_data.payment_id, Refund.status.in_(("pending", "processed")))
         refunded_result = await self.db.execute(refunded_stmt)
         already_refunded_amount = refunded_result.scalar_one_or_none() or Decimal("0.0")
 
@@ -41,12 +177,19 @@ class RefundService:
         if refund_data.amount > refundable_amount:
             raise HTTPException(status_code=400, detail=f"Refund amount ({refund_data.amount}) exceeds the refundable amount ({refundable_amount}).")
 
-        # 5. Create the new refund record with a 'pending' status.
-        # In the full Razorpay integration, this is where you would call the Razorpay API.
-        # If the API call is successful, you would then save this record with a 'processed' status.
-        new_refund = Refund(**refund_data.model_dump())
+        # 5. Save the refund before the gateway sees it; committing releases the payment.
+        new_refund = Refund(**refund_data.model_dump(), status="pending", submitted_at=datetime.now(timezone.utc))
         self.db.add(new_refund)
         await self.db.commit()
+
+        # 6. Issue the refund at Razorpay. The refunded amount comes off the invoice and the payment in the same transaction as the outcome.
+        outcome = await send_refund(client, new_refund, payment.gateway_payment_id)
+        await record_refund_outcomes(self.db, [new_refund], [outcome], user_id=refund_data.processed_by_user_id)
+        await self.db.commit()
+        if outcome["status"] == "failed":
+            raise HTTPException(status_code=400, detail=outcome["error_description"])
+        if not outcome["gateway_refund_id"]:
+            logger.warning(f"Refund {new_refund.id} of payment {payment.id}: gateway outcome unknown; it is looked up before the payment is refunded again.")
         await self.db.refresh(new_refund)
 
         return new_refund
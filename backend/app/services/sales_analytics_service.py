@@ -0,0 +1,406 @@
+# backend/app/services/sales_analytics_service.py
+"""
+Sales analytics from incrementally maintained daily rollups.
+
+Top sellers, revenue by category and period comparisons would otherwise scan
+``order_items`` joined through ``orders`` for every request. Instead, every
+order status transition adds its lines to ``product_sales_daily``, one row per
+(school, day, product), and every report reads only that table (joined to
+products or categories for the labels of the rows it returns).
+
+Counted transitions:
+
+- an order becomes paid (moves into ``processing``, ``shipped`` or
+  ``delivered`` from an unpaid status): its units and line totals are added to
+  ``units_sold`` / ``revenue`` on the day of the transition;
+- a paid order is cancelled: they are added to ``units_cancelled`` /
+  ``revenue_cancelled`` on the day of the cancellation.
+
+Cancelling an unpaid order (including the bulk and expiry cancellations, which
+only touch ``pending_payment`` orders) never sold anything and is not counted.
+
+Transitions are picked up by an ``after_flush`` hook, as for the payment
+health rollup (see payment_metrics_service): every ORM status change is
+counted, and the rollup is upserted on the flushing transaction's connection,
+so it commits and rolls back with the order. The hook cannot see Core
+``UPDATE`` statements, so code that moves orders with one (e.g. a capture
+confirming its order with a conditional UPDATE) passes the orders it moved to
+:func:`record_transitions`. Either way the rollup rows are computed by one
+``INSERT ... SELECT`` over the orders' items.
+
+:func:`backfill` rebuilds the rollup of past days from the orders table; run
+it with ``python -m app.services.sales_analytics_service``. Set
+``SALES_ROLLUP_ENABLED=false`` to switch the hook off, e.g. against a
+database that does not have the rollup table yet.
+
+Days are calendar days in ``ORDER_STATS_TIMEZONE``, as in the order statistics.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Optional
+from zoneinfo import ZoneInfo
+
+from fastapi import HTTPException, status
+from sqlalchemy import Date, and_, cast, delete, event, false, func, inspect, literal, literal_column, or_, select, true
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.order import Order
+from app.models.order_item import OrderItem
+from app.models.payment import Payment
+from app.models.product import Product
+from app.models.product_category import ProductCategory
+from app.models.product_sales_daily import ProductSalesDaily
+from app.schemas.enums import OrderStatus, PaymentStatus, SalesInterval, SalesRanking
+from app.services.order_statistics_service import ORDER_STATS_TIMEZONE
+
+logger = logging.getLogger(__name__)
+
+SALES_ROLLUP_ENABLED = os.getenv("SALES_ROLLUP_ENABLED", "true").lower() == "true"
+SALES_ANALYTICS_MAX_RANGE_DAYS = int(os.getenv("SALES_ANALYTICS_MAX_RANGE_DAYS", "731"))  # Two years, so a term can be compared with the same term last year
+
+COUNTERS = ("units_sold", "revenue", "units_cancelled", "revenue_cancelled")
+
+# Statuses of an order that has been paid for
+SOLD_STATUSES = frozenset({OrderStatus.PROCESSING, OrderStatus.SHIPPED, OrderStatus.DELIVERED})
+# A cancelled order was paid if it has one of these payments (refunds keep the payment row)
+_PAID_OR_REFUNDED = tuple(status.value for status in (PaymentStatus.AUTHORIZED, PaymentStatus.CAPTURED, PaymentStatus.CAPTURED_ALLOCATION_FAILED, PaymentStatus.REFUNDED, PaymentStatus.PARTIALLY_REFUNDED))
+
+_ZERO = Decimal("0.00")
+
+
+def sales_day(moment: Optional[datetime] = None) -> date:
+    """The calendar day a transition at ``moment`` (default: now) is counted on."""
+    return (moment or datetime.now(timezone.utc)).astimezone(ZoneInfo(ORDER_STATS_TIMEZONE)).date()
+
+
+def _status(value: Any) -> Optional[str]:
+    return getattr(value, "value", value)
+
+
+def collect_transitions(session: Session) -> tuple[list[int], list[int]]:
+    """The ids of the orders ``session`` is flushing that become paid, and of paid orders being cancelled."""
+    sold, cancelled = [], []
+    for obj in session.new:
+        if isinstance(obj, Order) and _status(obj.status) in SOLD_STATUSES:
+            sold.append(obj.order_id)
+
+    for obj in session.dirty:
+        if not isinstance(obj, Order):
+            continue
+        history = inspect(obj).attrs.status.history
+        if not history.added:
+            continue
+        new, old = _status(history.added[0]), _status(history.deleted[0]) if history.deleted else None
+        if new in SOLD_STATUSES and old not in SOLD_STATUSES:
+            sold.append(obj.order_id)
+        elif new == OrderStatus.CANCELLED.value and old in SOLD_STATUSES:
+            cancelled.append(obj.order_id)
+
+    return sold, cancelled
+
+
+def _line_sums(sold, cancelled) -> list:
+    line_total = OrderItem.quantity * OrderItem.price_at_time_of_order
+    return [
+        func.coalesce(func.sum(OrderItem.quantity).filter(sold), 0),
+        func.coalesce(func.sum(line_total).filter(sold), _ZERO),
+        func.coalesce(func.sum(OrderItem.quantity).filter(cancelled), 0),
+        func.coalesce(func.sum(line_total).filter(cancelled), _ZERO),
+    ]
+
+
+def _upsert_from(lines):
+    """``INSERT INTO product_sales_daily SELECT ...`` adding the selected counters to existing rows."""
+    stmt = pg_insert(ProductSalesDaily).from_select(["school_id", "day", "product_id", "category_id", *COUNTERS], lines)
+    set_ = {name: getattr(ProductSalesDaily, name) + getattr(stmt.excluded, name) for name in COUNTERS}
+    return stmt.on_conflict_do_update(index_elements=[ProductSalesDaily.school_id, ProductSalesDaily.day, ProductSalesDaily.product_id], set_={**set_, "category_id": stmt.excluded.category_id})
+
+
+def rollup_statement(sold_order_ids: list[int], cancelled_order_ids: list[int], day: date):
+    """One ``INSERT ... SELECT ... ON CONFLICT DO UPDATE`` adding the orders' lines to ``day`` (rows sorted to keep lock order stable)."""
+    sold = OrderItem.order_id.in_(sold_order_ids) if sold_order_ids else false()
+    cancelled = OrderItem.order_id.in_(cancelled_order_ids) if cancelled_order_ids else false()
+    lines = (
+        select(Order.school_id, literal(day, Date), OrderItem.product_id, Product.category_id, *_line_sums(sold, cancelled))
+        .join(Order, Order.order_id == OrderItem.order_id)
+        .join(Product, Product.product_id == OrderItem.product_id)
+        .where(OrderItem.order_id.in_([*sold_order_ids, *cancelled_order_ids]))
+        .group_by(Order.school_id, OrderItem.product_id, Product.category_id)
+        .order_by(Order.school_id, OrderItem.product_id)
+    )
+    return _upsert_from(lines)
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flushed_transitions(session: Session, flush_context) -> None:
+    # new/dirty and attribute history still describe the pre-flush state at this point.
+    if not SALES_ROLLUP_ENABLED:
+        return
+    sold, cancelled = collect_transitions(session)
+    if sold or cancelled:
+        session.connection().execute(rollup_statement(sold, cancelled, sales_day()))
+
+
+async def record_transitions(db: AsyncSession, sold_order_ids: list[int], cancelled_order_ids: Optional[list[int]] = None) -> None:
+    """Adds orders moved by a Core UPDATE (which the hook does not see) to the rollup, on ``db``'s transaction."""
+    cancelled_order_ids = cancelled_order_ids or []
+    if SALES_ROLLUP_ENABLED and (sold_order_ids or cancelled_order_ids):
+        await db.execute(rollup_statement(list(sold_order_ids), list(cancelled_order_ids), sales_day()))
+
+
+# ============================================================================
+# REPORTS (read only the rollup)
+# ============================================================================
+
+
+def validate_range(date_from: date, date_to: date) -> None:
+    if date_from > date_to:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="date_from must not be after date_to")
+    if (date_to - date_from).days + 1 > SALES_ANALYTICS_MAX_RANGE_DAYS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Date range cannot exceed {SALES_ANALYTICS_MAX_RANGE_DAYS} days")
+
+
+def _totals(*, prefix: str = "") -> list:
+    return [func.coalesce(func.sum(getattr(ProductSalesDaily, name)), 0).label(f"{prefix}{name}") for name in COUNTERS]
+
+
+def _in_range(school_id: int, date_from: date, date_to: date) -> list:
+    return [ProductSalesDaily.school_id == school_id, ProductSalesDaily.day >= date_from, ProductSalesDaily.day <= date_to]
+
+
+def _counters(row, *, prefix: str = "") -> dict:
+    return {name: getattr(row, f"{prefix}{name}") for name in COUNTERS} if row is not None else {name: 0 for name in COUNTERS}
+
+
+def _bucket_start(day: date, interval: SalesInterval) -> date:
+    if interval == SalesInterval.WEEK:
+        return day - timedelta(days=day.weekday())
+    if interval == SalesInterval.MONTH:
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(start: date, interval: SalesInterval) -> date:
+    if interval == SalesInterval.WEEK:
+        return start + timedelta(days=7)
+    if interval == SalesInterval.MONTH:
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+async def time_series(
+    db: AsyncSession,
+    school_id: int,
+    date_from: date,
+    date_to: date,
+    *,
+    interval: SalesInterval = SalesInterval.DAY,
+    product_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+) -> dict:
+    """Sales per day, week or month of the range (the first and last buckets may be partial), optionally of one product or category."""
+    validate_range(date_from, date_to)
+    # Inlined, not bound: the GROUP BY must repeat the exact expression of the SELECT
+    bucket = cast(func.date_trunc(literal_column(f"'{interval.value}'"), ProductSalesDaily.day), Date).label("period_start")
+    stmt = select(bucket, *_totals()).where(*_in_range(school_id, date_from, date_to)).group_by(bucket).order_by(bucket)
+    if product_id is not None:
+        stmt = stmt.where(ProductSalesDaily.product_id == product_id)
+    if category_id is not None:
+        stmt = stmt.where(ProductSalesDaily.category_id == category_id)
+    by_bucket = {row.period_start: row for row in (await db.execute(stmt)).all()}
+
+    points, start = [], _bucket_start(date_from, interval)
+    while start <= date_to:
+        points.append({"period_start": start, **_counters(by_bucket.get(start))})
+        start = _next_bucket(start, interval)
+    return {"date_from": date_from, "date_to": date_to, "interval": interval, "product_id": product_id, "category_id": category_id, "points": points}
+
+
+async def top_products(
+    db: AsyncSession,
+    school_id: int,
+    date_from: date,
+    date_to: date,
+    *,
+    limit: int = 10,
+    rank_by: SalesRanking = SalesRanking.REVENUE,
+    category_id: Optional[int] = None,
+) -> list[dict]:
+    """The ``limit`` best selling products of the range, by net revenue or net units."""
+    validate_range(date_from, date_to)
+    per_product = select(ProductSalesDaily.product_id, *_totals()).where(*_in_range(school_id, date_from, date_to)).group_by(ProductSalesDaily.product_id)
+    if category_id is not None:
+        per_product = per_product.where(ProductSalesDaily.category_id == category_id)
+    ranked = per_product.subquery("ranked")
+    net = ranked.c.revenue - ranked.c.revenue_cancelled if rank_by == SalesRanking.REVENUE else ranked.c.units_sold - ranked.c.units_cancelled
+
+    stmt = select(ranked, Product.name.label("product_name"), Product.sku, Product.category_id).join(Product, Product.product_id == ranked.c.product_id).order_by(net.desc(), ranked.c.product_id).limit(limit)
+    return [{"product_id": row.product_id, "product_name": row.product_name, "sku": row.sku, "category_id": row.category_id, **_counters(row)} for row in (await db.execute(stmt)).all()]
+
+
+async def category_sales(db: AsyncSession, school_id: int, date_from: date, date_to: date) -> list[dict]:
+    """Sales per product category of the range, by net revenue."""
+    validate_range(date_from, date_to)
+    per_category = select(ProductSalesDaily.category_id, *_totals()).where(*_in_range(school_id, date_from, date_to)).group_by(ProductSalesDaily.category_id).subquery("per_category")
+    stmt = (
+        select(per_category, ProductCategory.category_name)
+        .outerjoin(ProductCategory, ProductCategory.category_id == per_category.c.category_id)
+        .order_by((per_category.c.revenue - per_category.c.revenue_cancelled).desc(), per_category.c.category_id.asc().nulls_last())
+    )
+    return [{"category_id": row.category_id, "category_name": row.category_name, **_counters(row)} for row in (await db.execute(stmt)).all()]
+
+
+async def compare_periods(
+    db: AsyncSession,
+    school_id: int,
+    date_from: date,
+    date_to: date,
+    *,
+    previous_from: Optional[date] = None,
+    previous_to: Optional[date] = None,
+) -> dict:
+    """
+    Sales of ``date_from``..``date_to`` against an earlier period, in total and
+    per category, in one scan of both periods. The earlier period defaults to
+    the one of the same length that ends the day before ``date_from``.
+    """
+    validate_range(date_from, date_to)
+    if (previous_from is None) != (previous_to is None):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Give both previous_from and previous_to, or neither")
+    if previous_from is None:
+        previous_to = date_from - timedelta(days=1)
+        previous_from = previous_to - (date_to - date_from)
+    validate_range(previous_from, previous_to)
+    if previous_to >= date_from:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="The previous period must end before date_from")
+
+    in_current = and_(ProductSalesDaily.day >= date_from, ProductSalesDaily.day <= date_to)
+    in_previous = and_(ProductSalesDaily.day >= previous_from, ProductSalesDaily.day <= previous_to)
+    per_category = (
+        select(
+            ProductSalesDaily.category_id,
+            *(func.coalesce(func.sum(getattr(ProductSalesDaily, name)).filter(in_current), 0).label(f"current_{name}") for name in COUNTERS),
+            *(func.coalesce(func.sum(getattr(ProductSalesDaily, name)).filter(in_previous), 0).label(f"previous_{name}") for name in COUNTERS),
+        )
+        .where(ProductSalesDaily.school_id == school_id, or_(in_current, in_previous))
+        .group_by(ProductSalesDaily.category_id)
+        .subquery("per_category")
+    )
+    stmt = (
+        select(per_category, ProductCategory.category_name)
+        .outerjoin(ProductCategory, ProductCategory.category_id == per_category.c.category_id)
+        .order_by((per_category.c.current_revenue - per_category.c.current_revenue_cancelled).desc(), per_category.c.category_id.asc().nulls_last())
+    )
+    rows = (await db.execute(stmt)).all()
+
+    categories = [{"category_id": row.category_id, "category_name": row.category_name, "current": _counters(row, prefix="current_"), "previous": _counters(row, prefix="previous_")} for row in rows]
+    return {
+        "current_from": date_from,
+        "current_to": date_to,
+        "previous_from": previous_from,
+        "previous_to": previous_to,
+        "current": {name: sum((category["current"][name] for category in categories), 0) for name in COUNTERS},
+        "previous": {name: sum((category["previous"][name] for category in categories), 0) for name in COUNTERS},
+        "categories": categories,
+    }
+
+
+# ============================================================================
+# BACKFILL
+# ============================================================================
+
+
+def _local_day(column):
+    return func.date(func.timezone(ORDER_STATS_TIMEZONE, column))
+
+
+def _start_of(day: date) -> datetime:
+    return datetime.combine(day, datetime.min.time(), tzinfo=ZoneInfo(ORDER_STATS_TIMEZONE))
+
+
+def _historic_lines(day_column, order_filter, *, cancelled: bool, school_id: Optional[int], date_from: Optional[date], date_to: date):
+    """The rollup rows of historic orders matching ``order_filter``, counted on the local day of ``day_column``."""
+    day = literal_column("day")  # the output column, so the bound time zone is not repeated
+    lines = (
+        select(Order.school_id, _local_day(day_column).label("day"), OrderItem.product_id, Product.category_id, *_line_sums(false() if cancelled else true(), true() if cancelled else false()))
+        .join(Order, Order.order_id == OrderItem.order_id)
+        .join(Product, Product.product_id == OrderItem.product_id)
+        .where(order_filter, day_column < _start_of(date_to + timedelta(days=1)))
+        .group_by(Order.school_id, day, OrderItem.product_id, Product.category_id)
+        .order_by(Order.school_id, day, OrderItem.product_id)
+    )
+    if school_id is not None:
+        lines = lines.where(Order.school_id == school_id)
+    if date_from is not None:
+        lines = lines.where(day_column >= _start_of(date_from))
+    return lines
+
+
+async def backfill(db: AsyncSession, *, school_id: Optional[int] = None, date_from: Optional[date] = None, date_to: Optional[date] = None) -> dict:
+    """
+    Rebuild the rollup rows of ``date_from``..``date_to`` (default: all days up
+    to yesterday) from the orders table, in one transaction; running it again
+    gives the same rows.
+
+    Historic transitions have no timestamp of their own, so a paid order is
+    counted as sold on the day it was created and a cancelled paid order as
+    cancelled on the day it was last updated. Today is left to the hook by
+    default, so a backfill does not race live transitions.
+    """
+    date_to = date_to or sales_day() - timedelta(days=1)
+    if date_from is not None and date_from > date_to:
+        raise ValueError("date_from must not be after date_to")
+
+    scope = [ProductSalesDaily.day <= date_to]
+    if date_from is not None:
+        scope.append(ProductSalesDaily.day >= date_from)
+    if school_id is not None:
+        scope.append(ProductSalesDaily.school_id == school_id)
+    deleted = (await db.execute(delete(ProductSalesDaily).where(*scope))).rowcount
+
+    paid = select(Payment.id).where(Payment.order_id == Order.order_id, Payment.status.in_(_PAID_OR_REFUNDED)).exists()
+    cancelled_after_payment = and_(Order.status == OrderStatus.CANCELLED, paid)
+    window = {"school_id": school_id, "date_from": date_from, "date_to": date_to}
+    sold = await db.execute(_upsert_from(_historic_lines(Order.created_at, or_(Order.status.in_(sorted(SOLD_STATUSES, key=str)), cancelled_after_payment), cancelled=False, **window)))
+    cancelled = await db.execute(_upsert_from(_historic_lines(Order.updated_at, cancelled_after_payment, cancelled=True, **window)))
+    await db.commit()
+
+    summary = {"rows_deleted": deleted, "sale_rows_written": sold.rowcount, "cancellation_rows_written": cancelled.rowcount, "date_from": date_from, "date_to": date_to}
+    logger.info(f"Sales rollup backfill (school {school_id or 'all'}): {summary}")
+    return summary
+
+
+async def _run_backfill(database_url: str, **options) -> dict:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    import app.db.base  # noqa: F401  (registers every model, so the mappers configure)
+
+    engine = create_async_engine(database_url)
+    try:
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            return await backfill(db, **options)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the product_sales_daily rollup of past days from the orders table.")
+    parser.add_argument("--database-url")
+    parser.add_argument("--school-id", type=int)
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, help="First day to rebuild (default: the first order)")
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, help="Last day to rebuild (default: yesterday)")
+    args = parser.parse_args()
+
+    if args.database_url is None:
+        from app.core.config import settings
+
+        args.database_url = settings.DATABASE_URL
+
+    print(asyncio.run(_run_backfill(args.database_url, school_id=args.school_id, date_from=args.date_from, date_to=args.date_to)))
@@ -0,0 +1,264 @@
+# backend/app/services/stock_reservation_service.py
+"""
+Stock reservations for e-commerce checkout.
+
+Checkout used to ``SELECT ... FOR UPDATE`` every product in the cart and hold
+those row locks for the whole transaction, so when a uniform or book-kit sale
+opened, every parent's checkout queued behind the same few product rows.
+
+Stock is now taken with one conditional decrement per product::
+
+    UPDATE products SET stock_quantity = stock_quantity - :q
+    WHERE product_id = :id AND is_active AND stock_quantity >= :q
+    RETURNING product_id
+
+issued as the last step before the checkout commits, in ascending product order
+(so two checkouts never wait on each other's rows in opposite order and
+deadlock). A row is therefore locked for the few milliseconds between the
+decrement and the commit, and stock can never go negative: a checkout that
+loses the race for the last units gets no row back and is rejected.
+
+The units taken are recorded as ``held`` reservations that expire after
+``STOCK_RESERVATION_TTL_MINUTES``:
+
+- payment captured -> :func:`confirm_paid_order` moves the order to
+  ``processing`` and :func:`commit_reservations` keeps the stock sold
+- payment failed or expired at the gateway -> :func:`release_reservations`
+  cancels the order and puts the units back
+- hold expired with the order still unpaid and no payment in flight ->
+  :func:`release_expired_reservations` (run with the pending-payment
+  reconciliation)
+- order cancelled -> :func:`restore_stock` (held units are released, orders
+  without a hold put their items back)
+
+Units go back on the shelf with one ``UPDATE ... FROM (VALUES ...)`` statement
+per transaction (:func:`restock`), whatever the number of products.
+"""
+
+import logging
+import os
+from collections import Counter
+from collections.abc import Iterable, Mapping
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import Integer, column, func, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.metrics import ALLOCATION_FAILURES_COUNTER
+from app.db.write_tracking import record_write
+from app.models.order import Order
+from app.models.order_item import OrderItem
+from app.models.payment import Payment
+from app.models.product import Product
+from app.models.stock_reservation import StockReservation
+from app.schemas.enums import OrderStatus, PaymentStatus
+from app.services import sales_analytics_service
+
+logger = logging.getLogger(__name__)
+
+STOCK_RESERVATION_TTL_MINUTES = int(os.getenv("STOCK_RESERVATION_TTL_MINUTES", "30"))
+STOCK_RESERVATION_SWEEP_BATCH_SIZE = int(os.getenv("STOCK_RESERVATION_SWEEP_BATCH_SIZE", "200"))
+
+# Orders whose payment reached one of these states are never expired
+PAID_PAYMENT_STATUSES = (PaymentStatus.AUTHORIZED.value, PaymentStatus.CAPTURED.value, PaymentStatus.CAPTURED_ALLOCATION_FAILED.value)
+# A pending payment may still be captured; the reconciler resolves it (and cancels the order if it failed)
+LIVE_PAYMENT_STATUSES = (PaymentStatus.PENDING.value, *PAID_PAYMENT_STATUSES)
+
+_products = Product.__table__
+
+
+class StockUnavailableError(Exception):
+    """A product is inactive or no longer has the requested units."""
+
+    def __init__(self, product_id: int, quantity: int):
+        super().__init__(f"Product {product_id} does not have {quantity} unit(s) available.")
+        self.product_id = product_id
+        self.quantity = quantity
+
+
+def total_quantities(items: Iterable) -> dict[int, int]:
+    """Units per product for items with ``product_id`` and ``quantity`` (package lines are skipped)."""
+    quantities = Counter()
+    for item in items:
+        if item.product_id:
+            quantities[item.product_id] += item.quantity
+    return dict(quantities)
+
+
+async def reserve_stock(db: AsyncSession, *, order_id: int, school_id: int, quantities: Mapping[int, int], now: Optional[datetime] = None) -> list[StockReservation]:
+    """
+    Takes ``quantities`` out of stock for ``order_id`` and records held reservations.
+
+    Raises StockUnavailableError for the first product that cannot be taken;
+    the decrements already made are undone when the caller's transaction rolls
+    back, as it must on this error. Call it as late as possible in the
+    checkout transaction: each decremented row stays locked until the commit.
+    """
+    now = now or datetime.now(timezone.utc)
+    for product_id in sorted(quantities):
+        quantity = quantities[product_id]
+        stmt = (
+            update(Product)
+            .where(Product.product_id == product_id, Product.is_active.is_(True), Product.stock_quantity >= quantity)
+            .values(stock_quantity=Product.stock_quantity - quantity)
+            .returning(Product.product_id)
+            .execution_options(written_school_ids=(school_id,))
+        )
+        if (await db.execute(stmt)).scalar_one_or_none() is None:
+            raise StockUnavailableError(product_id, quantity)
+
+    expires_at = now + timedelta(minutes=STOCK_RESERVATION_TTL_MINUTES)
+    reservations = [StockReservation(order_id=order_id, product_id=product_id, school_id=school_id, quantity=quantities[product_id], status="held", expires_at=expires_at) for product_id in sorted(quantities)]
+    db.add_all(reservations)
+    return reservations
+
+
+async def restock(db: AsyncSession, quantities: Mapping[int, int]) -> None:
+    """
+    Puts units back on the shelf with a single statement::
+
+        WITH locked AS (SELECT product_id FROM products WHERE product_id IN (...) ORDER BY product_id FOR UPDATE)
+        UPDATE products SET stock_quantity = stock_quantity + restock.quantity
+        FROM (VALUES (:id, :q), ...) AS restock (product_id, quantity)
+        WHERE products.product_id = restock.product_id AND products.product_id IN (SELECT product_id FROM locked)
+        RETURNING products.school_id
+
+    The rows are locked in ascending product order first, the order checkout
+    decrements them in, so a restock and a checkout never deadlock. The schools
+    of the restocked products are recorded as written, so only their catalogs
+    are rebuilt.
+    """
+    quantities = {product_id: quantity for product_id, quantity in quantities.items() if quantity}
+    if not quantities:
+        return
+    restock_values = values(column("product_id", Integer), column("quantity", Integer), name="restock").data(sorted(quantities.items()))
+    locked = select(_products.c.product_id).where(_products.c.product_id.in_(select(restock_values.c.product_id))).order_by(_products.c.product_id).with_for_update().cte("locked_products")
+    stmt = update(_products).where(_products.c.product_id == restock_values.c.product_id, _products.c.product_id.in_(select(locked.c.product_id))).values(stock_quantity=_products.c.stock_quantity + restock_values.c.quantity)
+    stmt = stmt.returning(_products.c.school_id).execution_options(written_school_ids=())
+    for school_id in set((await db.execute(stmt)).scalars().all()):
+        record_write(db, "products", school_id)
+
+
+async def commit_reservations(db: AsyncSession, order_ids: Iterable[int]) -> None:
+    """Marks the orders' held units as sold once their payment is captured."""
+    order_ids = list(order_ids)
+    if order_ids:
+        await db.execute(update(StockReservation).where(StockReservation.order_id.in_(order_ids), StockReservation.status == "held").values(status="committed").execution_options(synchronize_session=False))
+
+
+async def confirm_paid_order(db: AsyncSession, payment: Payment, *, source: str) -> bool:
+    """
+    Moves the order of a just-captured ``payment`` from ``pending_payment`` to
+    ``processing`` and keeps its held stock sold; returns whether it did.
+
+    The status is set with a conditional ``UPDATE ... RETURNING``, never through
+    a loaded order. A capture that waited on the row lock of a cancellation
+    (hold expiry, bulk or admin cancel) therefore sees the committed
+    ``cancelled`` and leaves it, instead of overwriting it after the stock was
+    put back. Such a payment took money for an order that will not ship: it is
+    marked ``captured_allocation_failed`` for an admin to refund.
+    """
+    confirm_stmt = update(Order).where(Order.order_id == payment.order_id, Order.status == OrderStatus.PENDING_PAYMENT).values(status=OrderStatus.PROCESSING).returning(Order.order_id).execution_options(synchronize_session=False)
+    if (await db.execute(confirm_stmt)).scalar_one_or_none() is not None:
+        await commit_reservations(db, [payment.order_id])
+        await sales_analytics_service.record_transitions(db, [payment.order_id])
+        return True
+
+    order_status = (await db.execute(select(Order.status).where(Order.order_id == payment.order_id))).scalar_one_or_none()
+    reason = f"in status '{getattr(order_status, 'value', order_status)}'" if order_status is not None else "not found"
+    payment.status = PaymentStatus.CAPTURED_ALLOCATION_FAILED
+    payment.error_description = f"Captured for order {payment.order_id} {reason}; refund required."
+    ALLOCATION_FAILURES_COUNTER.labels(source=source).inc()
+    logger.critical(f"Payment {payment.id} captured for order {payment.order_id} {reason}: the order was not confirmed and the payment needs a refund.")
+    logger.info(f"ALERT_PAYMENT_ALLOCATION_FAILURE: payment_id={payment.id}")
+    return False
+
+
+async def _release_held(db: AsyncSession, order_ids: list[int], now: datetime) -> tuple[Counter, set[int]]:
+    """Marks the orders' held units released; returns the units per product and the orders that had a hold."""
+    release_stmt = (
+        update(StockReservation)
+        .where(StockReservation.order_id.in_(order_ids), StockReservation.status == "held")
+        .values(status="released", released_at=now)
+        .returning(StockReservation.order_id, StockReservation.product_id, StockReservation.quantity)
+        .execution_options(synchronize_session=False)
+    )
+    quantities, held_order_ids = Counter(), set()
+    for order_id, product_id, quantity in (await db.execute(release_stmt)).all():
+        quantities[product_id] += quantity
+        held_order_ids.add(order_id)
+    return quantities, held_order_ids
+
+
+async def restore_stock(db: AsyncSession, order_ids: Iterable[int], *, now: Optional[datetime] = None) -> int:
+    """
+    Puts the stock of cancelled orders back; returns the number of units restocked.
+
+    Held units are released. Orders without a hold (paid orders, whose units
+    were committed, and orders placed before reservations existed) put their
+    product items back instead. Everything is restocked in one statement.
+
+    The caller has locked the order rows and re-checked their status first
+    (e.g. with a conditional ``UPDATE``), so a concurrent capture, which locks
+    the order before its reservations, is serialized with the cancellation.
+    """
+    order_ids = list(order_ids)
+    if not order_ids:
+        return 0
+    quantities, held_order_ids = await _release_held(db, order_ids, now or datetime.now(timezone.utc))
+
+    unheld_order_ids = [order_id for order_id in order_ids if order_id not in held_order_ids]
+    if unheld_order_ids:
+        items_stmt = select(OrderItem.product_id, func.sum(OrderItem.quantity)).where(OrderItem.order_id.in_(unheld_order_ids), OrderItem.product_id.is_not(None)).group_by(OrderItem.product_id)
+        for product_id, quantity in (await db.execute(items_stmt)).all():
+            quantities[product_id] += int(quantity)
+
+    await restock(db, quantities)
+    return sum(quantities.values())
+
+
+async def release_reservations(db: AsyncSession, order_ids: Iterable[int], *, cancel_orders: bool = False, now: Optional[datetime] = None) -> int:
+    """
+    Returns the held units of ``order_ids`` to stock; returns the number of units released.
+
+    With ``cancel_orders`` only orders still awaiting payment are touched, and
+    they are cancelled first: the order row is locked before its reservations,
+    the same order the payment capture paths use (see :func:`confirm_paid_order`),
+    so a capture and a release of the same order serialize instead of
+    deadlocking, and exactly one of them wins. Their stock is then restored
+    with :func:`restore_stock`, so unpaid orders placed without a hold get
+    their items back too.
+    """
+    order_ids = list(order_ids)
+    if cancel_orders and order_ids:
+        cancel_stmt = update(Order).where(Order.order_id.in_(order_ids), Order.status == OrderStatus.PENDING_PAYMENT).values(status=OrderStatus.CANCELLED).returning(Order.order_id)
+        order_ids = list((await db.execute(cancel_stmt)).scalars().all())
+        return await restore_stock(db, order_ids, now=now)
+    if not order_ids:
+        return 0
+
+    quantities, _ = await _release_held(db, order_ids, now or datetime.now(timezone.utc))
+    await restock(db, quantities)
+    return sum(quantities.values())
+
+
+async def release_expired_reservations(db: AsyncSession, *, now: Optional[datetime] = None, limit: int = STOCK_RESERVATION_SWEEP_BATCH_SIZE) -> dict:
+    """
+    Cancels up to ``limit`` unpaid orders whose stock hold has expired and
+    returns their units; orders being processed elsewhere are skipped (SKIP LOCKED).
+
+    Orders with a pending payment are left alone too: it may still be captured,
+    and the pending-payment reconciliation cancels the order (releasing its
+    hold) once the gateway reports the payment failed or abandoned.
+    """
+    now = now or datetime.now(timezone.utc)
+    expired = select(StockReservation.order_id).where(StockReservation.status == "held", StockReservation.expires_at <= now)
+    live = select(Payment.id).where(Payment.order_id == Order.order_id, Payment.status.in_(LIVE_PAYMENT_STATUSES)).exists()
+    stmt = select(Order.order_id).where(Order.order_id.in_(expired), Order.status == OrderStatus.PENDING_PAYMENT, ~live).order_by(Order.order_id).limit(limit).with_for_update(skip_locked=True)
+    order_ids = list((await db.execute(stmt)).scalars().all())
+
+    units = await release_reservations(db, order_ids, cancel_orders=True, now=now)
+    if order_ids:
+        logger.info(f"Released {units} reserved unit(s) of {len(order_ids)} expired unpaid order(s)")
+    return {"orders_expired": len(order_ids), "units_released": units}
@@ -1,3 +1,4 @@
+import dataclasses
 from typing import Optional
 
 from sqlalchemy import and_, func, or_, select, update
@@ -91,6 +92,61 @@ async def get_all_students_for_class(db: AsyncSession, class_id: int) -> list[St
     return list(result.scalars().all())
 
 
+@dataclasses.dataclass
+class RosterMatch:
+    """How one roster lookup (name, roll number or student id) resolved against a class."""
+
+    lookup: str
+    student: Optional[Student] = None
+    candidates: list[Student] = dataclasses.field(default_factory=list)
+
+    @property
+    def status(self) -> str:
+        if self.student is not None:
+            return "matched"
+        return "ambiguous" if self.candidates else "not_found"
+
+
+def _roster_name(student: Student) -> str:
+    profile = student.profile
+    if not profile:
+        return ""
+    return " ".join(f"{profile.first_name or ''} {profile.last_name or ''}".lower().split())
+
+
+def _match_roster_entry(lookup: str, roster: list[Student], names: dict[int, str]) -> RosterMatch:
+    cleaned = lookup.strip()
+    wanted = " ".join(cleaned.lower().split())
+
+    by_roll_number = [student for student in roster if student.roll_number and student.roll_number.strip().lower() == wanted]
+    if len(by_roll_number) == 1:
+        return RosterMatch(lookup=lookup, student=by_roll_number[0])
+    if cleaned.isdigit():
+        by_id = [student for student in roster if student.student_id == int(cleaned)]
+        if by_id:
+            return RosterMatch(lookup=lookup, student=by_id[0])
+
+    for matches in (
+        [student for student in roster if names[student.student_id] == wanted],
+        [student for student in roster if wanted and wanted in names[student.student_id]],
+    ):
+        if len(matches) == 1:
+            return RosterMatch(lookup=lookup, student=matches[0])
+        if matches:
+            return RosterMatch(lookup=lookup, candidates=matches)
+    return RosterMatch(lookup=lookup, candidates=by_roll_number)
+
+
+async def match_class_roster(db: AsyncSession, *, class_id: int, lookups: list[str]) -> list[RosterMatch]:
+    """
+    Resolves a list of student names, roll numbers or student ids against a class roster.
+    The roster is loaded with a single query; the result has one RosterMatch per lookup, in order.
+    """
+    roster = await get_all_students_for_class(db, class_id)
+    names = {student.student_id: _roster_name(student) for student in roster}
+    return [_match_roster_entry(lookup, roster, names) for lookup in lookups]
+
+
 async def update_student(db: AsyncSession, *, db_obj: Student, student_in: StudentUpdate) -> Student:
     update_data = student_in.model_dump(exclude_unset=True)
     for field, value in update_data.items():
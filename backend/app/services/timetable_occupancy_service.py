@@ -0,0 +1,250 @@
+# backend/app/services/timetable_occupancy_service.py
+"""Precomputed per-school timetable occupancy index.
+
+Substitution planning asks the same questions over and over ("who is free in
+period 3 on Tuesday?", "what is 10A doing right now?"). Instead of scanning the
+timetable for each question, the active timetable of a school is loaded once
+into a :class:`TimetableOccupancy`:
+
+- ``busy_teachers`` maps ``(day_of_week, period_number)`` to the set of teacher
+  ids teaching in that slot, so free teachers are a set difference against the
+  school's active teachers;
+- ``class_slots`` / ``teacher_slots`` hold each class's and teacher's entries
+  sorted by day and period.
+
+Indexes are cached per school and dropped as soon as a commit writes to one of
+the tables they are built from (see :mod:`app.db.write_tracking`). A TTL bounds
+staleness for writes made by other processes.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from datetime import time as time_of_day
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db.write_tracking import TableWrites, on_tables_committed
+from app.models.class_model import Class
+from app.models.period import Period
+from app.models.profile import Profile
+from app.models.subject import Subject
+from app.models.teacher import Teacher
+from app.models.timetable import Timetable
+
+logger = logging.getLogger(__name__)
+
+OCCUPANCY_TTL_SECONDS = float(os.getenv("TIMETABLE_OCCUPANCY_TTL_SECONDS", "300"))
+
+# Tables an index is built from; a committed write to any of them drops the school's index.
+SOURCE_TABLES = frozenset({"timetable", "periods", "teachers", "profiles", "subjects", "classes"})
+
+DAY_NAMES = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+
+@dataclass(frozen=True)
+class TimetableSlot:
+    """One active timetable entry, denormalized for lookups."""
+
+    entry_id: int
+    day_of_week: int
+    period_number: int
+    period_id: int
+    start_time: Optional[time_of_day]
+    end_time: Optional[time_of_day]
+    class_id: int
+    subject_id: Optional[int]
+    teacher_id: Optional[int]
+
+
+@dataclass(frozen=True)
+class TeacherSummary:
+    teacher_id: int
+    name: str
+    department: Optional[str] = None
+    subject_specialization: Optional[str] = None
+
+
+@dataclass
+class TimetableOccupancy:
+    """The occupancy index of one school."""
+
+    school_id: int
+    teachers: dict[int, TeacherSummary] = field(default_factory=dict)
+    subjects: dict[int, str] = field(default_factory=dict)
+    classes: dict[int, str] = field(default_factory=dict)
+    busy_teachers: dict[tuple[int, int], frozenset[int]] = field(default_factory=dict)
+    class_slots: dict[int, list[TimetableSlot]] = field(default_factory=dict)
+    teacher_slots: dict[int, list[TimetableSlot]] = field(default_factory=dict)
+    period_numbers: tuple[int, ...] = ()
+    built_at: float = field(default_factory=time.monotonic)
+
+    def free_teacher_ids(self, day_of_week: int, period_number: int) -> set[int]:
+        return set(self.teachers) - self.busy_teachers.get((day_of_week, period_number), frozenset())
+
+    def free_teachers(self, day_of_week: int, period_number: int) -> list[TeacherSummary]:
+        """Active teachers without an entry in the slot, sorted by name."""
+        return sorted((self.teachers[teacher_id] for teacher_id in self.free_teacher_ids(day_of_week, period_number)), key=lambda teacher: teacher.name.lower())
+
+    def class_schedule(self, class_id: int, day_of_week: Optional[int] = None) -> list[TimetableSlot]:
+        slots = self.class_slots.get(class_id, [])
+        return [slot for slot in slots if slot.day_of_week == day_of_week] if day_of_week else list(slots)
+
+    def teacher_schedule(self, teacher_id: int, day_of_week: Optional[int] = None) -> list[TimetableSlot]:
+        slots = self.teacher_slots.get(teacher_id, [])
+        return [slot for slot in slots if slot.day_of_week == day_of_week] if day_of_week else list(slots)
+
+    def slot_at(self, class_id: int, moment: datetime) -> Optional[TimetableSlot]:
+        """The class's entry running at ``moment``, if any."""
+        current = moment.time()
+        for slot in self.class_schedule(class_id, moment.isoweekday()):
+            if slot.start_time and slot.end_time and slot.start_time <= current < slot.end_time:
+                return slot
+        return None
+
+    def find_class_id(self, class_name: str) -> Optional[int]:
+        """Resolve names like '10A', '10 A' or 'Grade 10 A' to a class id."""
+        wanted = normalize_class_name(class_name)
+        for class_id, name in self.classes.items():
+            if normalize_class_name(name) == wanted:
+                return class_id
+        return None
+
+    def find_teachers(self, teacher_name: str) -> list[TeacherSummary]:
+        """Teachers whose full name matches exactly, or otherwise contains ``teacher_name``."""
+        wanted = " ".join(teacher_name.lower().replace(".", " ").split())
+        for title in ("mr ", "mrs ", "ms ", "dr "):
+            if wanted.startswith(title):
+                wanted = wanted[len(title) :]
+        exact = [teacher for teacher in self.teachers.values() if teacher.name.lower() == wanted]
+        if exact:
+            return exact
+        return sorted((teacher for teacher in self.teachers.values() if wanted in teacher.name.lower()), key=lambda teacher: teacher.name.lower())
+
+
+def normalize_class_name(class_name: str) -> str:
+    cleaned = re.sub(r"\bgrade\b", "", class_name, flags=re.IGNORECASE)
+    return re.sub(r"[\s\-/]+", "", cleaned).lower()
+
+
+def day_number(day_name: str) -> Optional[int]:
+    """'Tuesday' -> 2 (ISO weekday, matching ``Timetable.day_of_week``)."""
+    normalized = day_name.strip().lower()
+    for index, name in enumerate(DAY_NAMES, start=1):
+        if name.lower() == normalized or name.lower()[:3] == normalized:
+            return index
+    return None
+
+
+_indexes: dict[int, TimetableOccupancy] = {}
+_generations: dict[int, int] = defaultdict(int)
+_lock = threading.Lock()
+
+
+def invalidate_occupancy(school_id: Optional[int] = None) -> None:
+    """Drop the cached index of ``school_id``, or of every school when ``None``."""
+    with _lock:
+        schools = set(_generations) | set(_indexes) if school_id is None else {school_id}
+        for school in schools:
+            _generations[school] += 1
+            _indexes.pop(school, None)
+
+
+def _invalidate_on_write(writes: TableWrites) -> None:
+    affected: set[Optional[int]] = set()
+    for table in SOURCE_TABLES.intersection(writes):
+        affected.update(writes[table])
+    if None in affected:
+        invalidate_occupancy()
+        return
+    for school_id in affected:
+        invalidate_occupancy(school_id)
+
+
+on_tables_committed(_invalidate_on_write)
+
+
+async def build_occupancy(db: AsyncSession, school_id: int) -> TimetableOccupancy:
+    """Load the school's active timetable, teachers, subjects and classes into an index."""
+    slot_rows = await db.execute(
+        select(
+            Timetable.id,
+            Timetable.day_of_week,
+            Period.period_number,
+            Period.id,
+            Period.start_time,
+            Period.end_time,
+            Timetable.class_id,
+            Timetable.subject_id,
+            Timetable.teacher_id,
+        )
+        .join(Period, Period.id == Timetable.period_id)
+        .where(Timetable.school_id == school_id, Timetable.is_active.is_(True))
+        .order_by(Timetable.day_of_week, Period.period_number)
+    )
+    teacher_rows = await db.execute(
+        select(Teacher.teacher_id, Profile.first_name, Profile.last_name, Teacher.department, Teacher.subject_specialization).join(Profile, Profile.user_id == Teacher.user_id).where(Teacher.school_id == school_id, Teacher.is_active.is_(True))
+    )
+    subject_rows = await db.execute(select(Subject.subject_id, Subject.name).where(Subject.school_id == school_id))
+    class_rows = await db.execute(select(Class.class_id, Class.grade_level, Class.section).where(Class.school_id == school_id, Class.is_active.is_(True)))
+
+    occupancy = TimetableOccupancy(school_id=school_id)
+    occupancy.teachers = {
+        teacher_id: TeacherSummary(teacher_id=teacher_id, name=f"{first_name or ''} {last_name or ''}".strip() or f"Teacher #{teacher_id}", department=department, subject_specialization=specialization)
+        for teacher_id, first_name, last_name, department, specialization in teacher_rows.all()
+    }
+    occupancy.subjects = dict(subject_rows.all())
+    occupancy.classes = {class_id: f"{grade_level}{(section or '').strip()}" for class_id, grade_level, section in class_rows.all()}
+
+    busy: dict[tuple[int, int], set[int]] = defaultdict(set)
+    class_slots: dict[int, list[TimetableSlot]] = defaultdict(list)
+    teacher_slots: dict[int, list[TimetableSlot]] = defaultdict(list)
+    period_numbers: set[int] = set()
+    for row in slot_rows.all():
+        slot = TimetableSlot(*row)
+        period_numbers.add(slot.period_number)
+        class_slots[slot.class_id].append(slot)
+        if slot.teacher_id is not None:
+            busy[(slot.day_of_week, slot.period_number)].add(slot.teacher_id)
+            teacher_slots[slot.teacher_id].append(slot)
+
+    occupancy.busy_teachers = {key: frozenset(teacher_ids) for key, teacher_ids in busy.items()}
+    occupancy.class_slots = dict(class_slots)
+    occupancy.teacher_slots = dict(teacher_slots)
+    occupancy.period_numbers = tuple(sorted(period_numbers))
+    return occupancy
+
+
+async def get_occupancy(db: AsyncSession, school_id: int) -> TimetableOccupancy:
+    """Return the school's cached index, building it on first use or after invalidation."""
+    with _lock:
+        cached = _indexes.get(school_id)
+        if cached is not None and time.monotonic() - cached.built_at < OCCUPANCY_TTL_SECONDS:
+            return cached
+        generation = _generations[school_id]
+
+    occupancy = await build_occupancy(db, school_id)
+
+    with _lock:
+        # A write committed while we were loading makes this snapshot stale; serve it once, don't cache it.
+        if _generations[school_id] == generation:
+            _indexes[school_id] = occupancy
+    logger.debug("Built timetable occupancy index for school %s", school_id)
+    return occupancy
+
+
+async def find_free_teachers(db: AsyncSession, *, school_id: int, day_of_week: int, period_number: int) -> list[TeacherSummary]:
+    occupancy = await get_occupancy(db, school_id)
+    return occupancy.free_teachers(day_of_week, period_number)
+
+
+async def find_current_slot(db: AsyncSession, *, school_id: int, class_id: int, moment: Optional[datetime] = None) -> Optional[TimetableSlot]:
+    occupancy = await get_occupancy(db, school_id)
+    return occupancy.slot_at(class_id, moment or datetime.now())
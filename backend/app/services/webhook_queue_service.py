@@ -0,0 +1,141 @@
+# backend/app/services/webhook_queue_service.py
+"""
+Two-phase processing of Razorpay webhooks.
+
+Phase one (``PaymentService.handle_webhook_event``) runs inside the HTTP
+request: it verifies the signature against the raw body, durably queues the
+event as a ``received`` row in ``gateway_webhook_events`` (``INSERT ... ON
+CONFLICT (event_id) DO NOTHING`` deduplicates retries) and lets the endpoint
+acknowledge with 200 straight away, so Razorpay never retries a slow webhook.
+
+Phase two (this module) is the consumer. It claims queued events in id order
+with ``SELECT ... FOR UPDATE SKIP LOCKED``, so several workers can drain the
+queue at once, and never claims an event while an older one for the same
+gateway order is still queued: events for one payment are applied in the
+order they arrived. Each event takes the same ``SELECT ... FOR UPDATE`` on its
+payment as ``verify_payment``, applies the capture (invoice allocation or order
+update) in a savepoint and is marked ``processed`` or ``failed``; the batch is
+committed once.
+
+Every accepted webhook schedules :func:`run_webhook_consumer` as a background
+task; ``POST /payments/admin/process-webhooks`` drains anything left queued,
+e.g. after a restart.
+"""
+
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+import sentry_sdk
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.metrics import ALLOCATION_FAILURES_COUNTER, PAYMENTS_COUNTER, WEBHOOK_QUEUE_EVENTS, WEBHOOK_QUEUE_LAG_SECONDS
+from app.db.session import get_db
+from app.models.gateway_webhook_event import GatewayWebhookEvent
+from app.models.payment import Payment
+from app.services import invoice_service, stock_reservation_service
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_QUEUE_BATCH_SIZE = int(os.getenv("WEBHOOK_QUEUE_BATCH_SIZE", "50"))
+WEBHOOK_QUEUE_MAX_BATCHES = int(os.getenv("WEBHOOK_QUEUE_MAX_BATCHES", "20"))
+
+
+def payment_entity(payload: dict) -> dict:
+    return (payload or {}).get("payload", {}).get("payment", {}).get("entity", {})
+
+
+def _gateway_order_id(event):
+    return event.payload["payload"]["payment"]["entity"]["order_id"].astext
+
+
+async def _claim_batch(db: AsyncSession, batch_size: int) -> list[GatewayWebhookEvent]:
+    """Oldest queued events whose gateway order has no older event still queued, locked for this worker."""
+    older = aliased(GatewayWebhookEvent)
+    waiting_behind = select(older.id).where(older.status == "received", older.id < GatewayWebhookEvent.id, _gateway_order_id(older) == _gateway_order_id(GatewayWebhookEvent)).exists()
+    stmt = select(GatewayWebhookEvent).where(GatewayWebhookEvent.status == "received", ~waiting_behind).order_by(GatewayWebhookEvent.id).limit(batch_size).with_for_update(skip_locked=True)
+    return list((await db.execute(stmt)).scalars().all())
+
+
+async def _apply_capture(db: AsyncSession, entity: dict) -> None:
+    gateway_order_id = entity.get("order_id")
+    if not gateway_order_id:
+        raise ValueError("Gateway order ID not found in webhook payload.")
+
+    # Same row lock as verify_payment, so the two never race on a status transition
+    payment_stmt = select(Payment).where(Payment.gateway_order_id == gateway_order_id).with_for_update()
+    payment = (await db.execute(payment_stmt)).scalar_one_or_none()
+    if not payment:
+        raise ValueError(f"Payment record with gateway_order_id {gateway_order_id} not found.")
+
+    if payment.status != "captured":
+        payment.status = "captured"
+        payment.gateway_payment_id = entity.get("id")
+
+        if payment.invoice_id:
+            await invoice_service.allocate_payment_to_invoice_items(db=db, payment_id=payment.id, user_id=payment.user_id)
+        elif payment.order_id:
+            await stock_reservation_service.confirm_paid_order(db, payment, source="webhook")
+
+
+async def process_event(db: AsyncSession, event: GatewayWebhookEvent) -> str:
+    """Applies one claimed event in a savepoint and records its outcome on the event row."""
+    event_id, payload, received_at = event.event_id, event.payload, event.received_at
+    try:
+        async with db.begin_nested():
+            await _apply_capture(db, payment_entity(payload))
+        event.status = "processed"
+        PAYMENTS_COUNTER.labels(status="captured", gateway="razorpay_webhook").inc()
+    except Exception as e:
+        ALLOCATION_FAILURES_COUNTER.labels(source="webhook").inc()
+        logger.error(f"Webhook processing failed for event {event_id}: {e}", exc_info=True)
+        event.status = "failed"
+        event.processing_error = str(e)[:255]
+        with sentry_sdk.push_scope() as scope:
+            scope.set_level("error")
+            scope.set_tag("event_id", event_id)
+            internal_payment_id = payment_entity(payload).get("notes", {}).get("internal_payment_id")
+            if internal_payment_id:
+                scope.set_tag("payment_id", internal_payment_id)
+            sentry_sdk.capture_message(f"Webhook Processing Failed: {event_id}", level="error")
+
+    WEBHOOK_QUEUE_EVENTS.labels(outcome=event.status).inc()
+    if received_at is not None:
+        WEBHOOK_QUEUE_LAG_SECONDS.observe(max((datetime.now(timezone.utc) - received_at).total_seconds(), 0))
+    return event.status
+
+
+async def process_webhook_queue(db: AsyncSession, *, batch_size: Optional[int] = None, max_batches: Optional[int] = None) -> dict:
+    """Drains queued webhook events batch by batch, committing after each batch."""
+    batch_size = batch_size or WEBHOOK_QUEUE_BATCH_SIZE
+    max_batches = max_batches or WEBHOOK_QUEUE_MAX_BATCHES
+    summary = {"processed": 0, "failed": 0, "batches": 0}
+    started = time.perf_counter()
+
+    for _ in range(max_batches):
+        events = await _claim_batch(db, batch_size)
+        if not events:
+            break
+        for event in events:
+            summary[await process_event(db, event)] += 1
+        await db.commit()
+        summary["batches"] += 1
+
+    summary["duration_seconds"] = round(time.perf_counter() - started, 3)
+    if summary["batches"]:
+        logger.info(f"Webhook queue drained: {summary}")
+    return summary
+
+
+async def run_webhook_consumer() -> None:
+    """Background-task entry point: drains the queue in its own session."""
+    async for db in get_db():
+        try:
+            await process_webhook_queue(db)
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Webhook consumer run failed: {e}", exc_info=True)
@@ -0,0 +1,145 @@
+# backend/scripts/fee_engine_benchmark.py
+"""
+Benchmark: drafting a school's invoices with the vectorized fee engine.
+
+Compares, end to end and in memory, the per-student ``Decimal`` loop the bulk
+invoice generator used before the engine (``_draft_invoice`` below, kept as it
+was) with the path it uses now: ``Discount`` rows to shared rules, the engine
+pass, and the invoice item and applied discount rows handed to the INSERTs.
+Both sides start from the same ``Discount`` rows and end with the same row
+dicts (the old loop's amounts not yet rounded to paise), so the timing covers
+everything between the reads and the writes. The old loop lives only here, as
+the reference the engine is timed and checked against. Run from ``backend/``::
+
+    python -m scripts.fee_engine_benchmark --students 5000 --components 12
+
+Each strategy runs ``--repeat`` times and the best run is reported.
+"""
+
+import argparse
+import random
+import time
+from decimal import Decimal
+
+from app.models.discount import Discount
+from app.services import fee_engine, invoice_service
+
+
+def _draft_invoice(*, student_id: int, school_id: int, class_fees: dict[int, Decimal], removed_component_ids: set[int], discounts: list[Discount], component_names: dict[int, str]) -> tuple:
+    """The per-student loop of the generator before the fee engine."""
+    billable_components = {component_id: amount for component_id, amount in class_fees.items() if component_id not in removed_component_ids}
+
+    items = []
+    applied_discounts = []
+    amount_due = Decimal("0.0")
+    for component_id, original_amount in billable_components.items():
+        total_discount_for_item = Decimal("0.0")
+
+        for discount_template in discounts:
+            if not discount_template or not discount_template.is_active:
+                continue
+
+            rules = discount_template.rules or {}
+            applicable_ids = rules.get("applicable_to_component_ids")
+
+            if applicable_ids is None or component_id in applicable_ids:
+                if discount_template.type == "percentage":
+                    discount_value = original_amount * (Decimal(discount_template.value) / 100)
+                else:
+                    discount_value = Decimal(discount_template.value)
+
+                if discount_value > 0:
+                    total_discount_for_item += discount_value
+                    applied_discounts.append({"discount_id": discount_template.id, "amount_discounted": discount_value})
+
+        final_item_amount = max(original_amount - total_discount_for_item, Decimal("0.0"))
+        items.append(
+            {
+                "school_id": school_id,
+                "fee_component_id": component_id,
+                "component_name": component_names.get(component_id, "Unknown Fee"),
+                "original_amount": original_amount,
+                "discount_amount": total_discount_for_item,
+                "final_amount": final_item_amount,
+            }
+        )
+        amount_due += final_item_amount
+
+    return student_id, amount_due, items, applied_discounts
+
+
+def synthetic_school(students: int, components: int, classes: int = 40, seed: int = 0) -> dict:
+    """Fee matrix, overrides and ``Discount`` rows shaped like the generator's reads."""
+    rng = random.Random(seed)
+    class_fees = {class_id: {component_id: Decimal(rng.randrange(50_000, 5_000_000)) / 100 for component_id in range(1, components + 1) if rng.random() < 0.9} for class_id in range(1, classes + 1)}
+    templates = [
+        Discount(id=1, type="percentage", value=Decimal("10"), rules=None, is_active=True),
+        Discount(id=2, type="fixed", value=Decimal("500"), rules=None, is_active=True),
+        Discount(id=3, type="percentage", value=Decimal("12.5"), rules={"applicable_to_component_ids": [1, 2]}, is_active=True),
+    ]
+    roster = [(student_id, rng.randrange(1, classes + 1)) for student_id in range(1, students + 1)]
+    return {
+        "students": roster,
+        "class_fees": class_fees,
+        "schools": {class_id: 1 for class_id in class_fees},
+        "component_names": {component_id: f"Component {component_id}" for component_id in range(1, components + 1)},
+        "removed": {student_id: set(rng.sample(range(1, components + 1), rng.choice((0, 0, 0, 1, 2)))) for student_id, _ in roster},
+        "discount_rows": [(student_id, discount) for student_id, _ in roster for discount in rng.sample(templates, rng.choice((0, 0, 1, 2)))],
+    }
+
+
+def decimal_loop(school: dict) -> tuple[list[dict], list[dict]]:
+    """Item and applied discount rows, drafted student by student."""
+    discounts: dict[int, list[Discount]] = {}
+    for student_id, discount in school["discount_rows"]:
+        discounts.setdefault(student_id, []).append(discount)
+    item_rows, discount_rows = [], []
+    for invoice_id, (student_id, class_id) in enumerate(school["students"], start=1):
+        _, _, items, applied = _draft_invoice(
+            student_id=student_id,
+            school_id=school["schools"].get(class_id),
+            class_fees=school["class_fees"][class_id],
+            removed_component_ids=school["removed"][student_id],
+            discounts=discounts.get(student_id, []),
+            component_names=school["component_names"],
+        )
+        item_rows.extend({**item, "invoice_id": invoice_id} for item in items)
+        discount_rows.extend({**discount, "invoice_id": invoice_id} for discount in applied)
+    return item_rows, discount_rows
+
+
+def fee_engine_path(school: dict) -> tuple[list[dict], list[dict]]:
+    """The same rows through the generator's current path."""
+    rules: dict[int, fee_engine.DiscountRule] = {}
+    discounts: dict[int, list[fee_engine.DiscountRule]] = {}
+    for student_id, discount in school["discount_rows"]:
+        if discount.id not in rules:
+            rules[discount.id] = fee_engine.DiscountRule.from_discount(discount)
+        discounts.setdefault(student_id, []).append(rules[discount.id])
+    students = [fee_engine.StudentFees(student_id=student_id, class_id=class_id, removed_component_ids=frozenset(school["removed"][student_id]), discounts=tuple(discounts.get(student_id, ()))) for student_id, class_id in school["students"]]
+    drafts = invoice_service._draft_invoices(school["class_fees"], students, schools=school["schools"])
+    item_rows = [row for invoice_id, draft in enumerate(drafts, start=1) for row in draft.item_rows(school["component_names"], invoice_id=invoice_id)]
+    discount_rows = [row for invoice_id, draft in enumerate(drafts, start=1) for row in draft.discount_rows(invoice_id=invoice_id)]
+    return item_rows, discount_rows
+
+
+def benchmark(students: int = 5_000, components: int = 12, *, repeat: int = 5, seed: int = 0) -> dict[str, float]:
+    """Best-of-``repeat`` seconds for each strategy on one synthetic school."""
+    school = synthetic_school(students, components, seed=seed)
+    timings: dict[str, float] = {}
+    for _ in range(repeat):
+        for strategy in (decimal_loop, fee_engine_path):
+            started = time.perf_counter()
+            strategy(school)
+            timings[strategy.__name__] = min(timings.get(strategy.__name__, float("inf")), time.perf_counter() - started)
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=5_000)
+    parser.add_argument("--components", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    for strategy, seconds in benchmark(args.students, args.components, repeat=args.repeat).items():
+        print(f"{strategy:>16}: {seconds * 1000:8.1f} ms")
@@ -0,0 +1,141 @@
+# backend/scripts/stock_reservation_benchmark.py
+"""
+Concurrency benchmark: N parallel checkouts of one SKU.
+
+Compares the old checkout (``SELECT ... FOR UPDATE`` on the product, then the
+rest of the checkout, then the decrement; kept below only as the reference)
+with the reservation engine: the rest of the checkout, then
+``stock_reservation_service.reserve_stock`` right before commit. It reports
+throughput, lock-wait time and whether any unit was oversold.
+
+Both flows run against one product seeded in ``--school-id`` and deleted
+afterwards. The product is active while the benchmark runs, so point it at a
+development or staging database, never production. The hold rows
+``reserve_stock`` returns are not written, since they need a real order; the
+product decrement, which is what holds the row lock, is the service's own
+statement. Run from ``backend/``::
+
+    python -m scripts.stock_reservation_benchmark --school-id 1 --checkouts 500 --concurrency 50 --stock 300
+
+``--database-url`` defaults to the application's DATABASE_URL.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from decimal import Decimal
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import app.models  # noqa: F401  (configures every mapper the Product relationships name)
+from app.models.product import Product
+from app.services import stock_reservation_service
+from app.services.stock_reservation_service import StockUnavailableError
+
+_ORDER_ID = 0  # the hold rows are never flushed, so no order is needed
+
+
+async def _checkout_for_update(sessions: async_sessionmaker, product: Product, work_seconds: float) -> tuple[bool, float]:
+    """The checkout before reservations: the product stays locked for the whole transaction."""
+    async with sessions() as db:
+        started = time.perf_counter()
+        stock = (await db.execute(select(Product.stock_quantity).where(Product.product_id == product.product_id).with_for_update())).scalar_one()
+        lock_wait = time.perf_counter() - started
+        await asyncio.sleep(work_seconds)  # validation, order + item inserts, cart cleanup - all under the lock
+        if stock < 1:
+            await db.rollback()
+            return False, lock_wait
+        await db.execute(update(Product).where(Product.product_id == product.product_id).values(stock_quantity=Product.stock_quantity - 1))
+        await db.commit()
+        return True, lock_wait
+
+
+async def _checkout_reservation(sessions: async_sessionmaker, product: Product, work_seconds: float) -> tuple[bool, float]:
+    async with sessions() as db:
+        await asyncio.sleep(work_seconds)  # the same work, before any product row is locked
+        started = time.perf_counter()
+        try:
+            reservations = await stock_reservation_service.reserve_stock(db, order_id=_ORDER_ID, school_id=product.school_id, quantities={product.product_id: 1})
+        except StockUnavailableError:
+            await db.rollback()
+            return False, time.perf_counter() - started
+        lock_wait = time.perf_counter() - started
+        for reservation in reservations:
+            db.expunge(reservation)
+        await db.commit()
+        return True, lock_wait
+
+
+async def _run(sessions: async_sessionmaker, product: Product, checkout, *, checkouts: int, concurrency: int, stock: int, work_seconds: float) -> dict:
+    async with sessions() as db:
+        await db.execute(update(Product).where(Product.product_id == product.product_id).values(stock_quantity=stock))
+        await db.commit()
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> tuple[bool, float]:
+        async with semaphore:
+            return await checkout(sessions, product, work_seconds)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one() for _ in range(checkouts)))
+    elapsed = time.perf_counter() - started
+
+    async with sessions() as db:
+        remaining = (await db.execute(select(Product.stock_quantity).where(Product.product_id == product.product_id))).scalar_one()
+    waits = sorted(wait for _, wait in results)
+    sold = sum(1 for succeeded, _ in results if succeeded)
+    return {
+        "checkouts_per_second": round(checkouts / elapsed, 1),
+        "sold": sold,
+        "rejected": checkouts - sold,
+        "oversold": sold - stock if sold > stock else 0,
+        "stock_consistent": remaining == stock - sold,
+        "lock_wait_ms_p50": round(statistics.median(waits) * 1000, 2),
+        "lock_wait_ms_p95": round(waits[int(len(waits) * 0.95) - 1] * 1000, 2),
+        "lock_wait_ms_total": round(sum(waits) * 1000, 1),
+    }
+
+
+async def benchmark(database_url: str, *, school_id: int, checkouts: int = 200, concurrency: int = 50, stock: int = 150, work_ms: float = 20.0) -> dict[str, dict]:
+    """Runs both checkout strategies against a seeded product; returns their reports."""
+    engine = create_async_engine(database_url, pool_size=concurrency, max_overflow=0)
+    sessions = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+    product = Product(school_id=school_id, name="Stock reservation benchmark", price=Decimal("1.00"), stock_quantity=0, is_active=True)
+    try:
+        async with sessions() as db:
+            db.add(product)
+            await db.commit()
+        options = {"checkouts": checkouts, "concurrency": concurrency, "stock": stock, "work_seconds": work_ms / 1000}
+        return {
+            "select_for_update": await _run(sessions, product, _checkout_for_update, **options),
+            "reserve_stock": await _run(sessions, product, _checkout_reservation, **options),
+        }
+    finally:
+        if product.product_id is not None:
+            async with sessions() as db:
+                await db.execute(delete(Product).where(Product.product_id == product.product_id))
+                await db.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url")
+    parser.add_argument("--school-id", type=int, required=True, help="School the benchmark product is created in")
+    parser.add_argument("--checkouts", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--stock", type=int, default=150)
+    parser.add_argument("--work-ms", type=float, default=20.0, help="Time a checkout spends on everything besides the stock update")
+    args = parser.parse_args()
+
+    if args.database_url is None:
+        from app.core.config import settings
+
+        args.database_url = settings.DATABASE_URL
+
+    reports = asyncio.run(benchmark(args.database_url, school_id=args.school_id, checkouts=args.checkouts, concurrency=args.concurrency, stock=args.stock, work_ms=args.work_ms))
+    for strategy, report in reports.items():
+        print(f"{strategy:>17}: " + ", ".join(f"{key}={value}" for key, value in report.items()))
@@ -13,7 +13,7 @@ import uuid
 from collections.abc import AsyncGenerator
 from datetime import date
 from typing import Any, Generator
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 from uuid import UUID
 
 import pytest
@@ -44,6 +44,7 @@ from app.models.role_definition import RoleDefinition
 from app.models.school import School
 from app.models.student import Student
 from app.models.user_roles import UserRole
+from app.services.razorpay_gateway import invalidate_school_credentials
 
 app.include_router(teachers, prefix="/v1/teachers", tags=["teachers"])
 app.include_router(student_contacts, prefix="/v1/student-contacts", tags=["student-contacts"])
@@ -499,11 +500,18 @@ def load_env():
 @pytest.fixture
 def mock_razorpay_client(mocker) -> MagicMock:  # Use 'mocker' fixture
     """
-    Mocks the razorpay.Client to avoid hitting the real API in tests.
+    Mocks the RazorpayGateway to avoid hitting the real API in tests.
     Returns predefined data for order creation.
     """
-    # Create a mock object for the Razorpay client instance
+    # Create a mock object for the gateway instance; API calls are coroutines, signature checks are not
     mock_instance = MagicMock()
+    mock_instance.order.create = AsyncMock()
+    mock_instance.order.fetch = AsyncMock()
+    mock_instance.order.payments = AsyncMock()
+    mock_instance.payment.all = AsyncMock(return_value={"entity": "collection", "count": 0, "items": []})
+    mock_instance.payment.fetch = AsyncMock()
+    mock_instance.payment.capture = AsyncMock()
+    mock_instance.payment.refund = AsyncMock()
 
     # Configure the mock 'order.create' method to return specific data
     mock_instance.order.create.return_value = {"id": "order_MOCK123456789", "amount": 1500000, "currency": "INR", "status": "created"}  # A predictable mock order ID  # Example amount in paise
@@ -518,8 +526,8 @@ def mock_razorpay_client(mocker) -> MagicMock:  # Use 'mocker' fixture
     # Configure the mock 'utility.verify_webhook_signature'
     mock_instance.utility.verify_webhook_signature.return_value = None
 
-    # Patch the razorpay.Client class to return our mock instance when called
-    mocker.patch("razorpay.Client", return_value=mock_instance)
+    # Patch the RazorpayGateway class to return our mock instance when called
+    mocker.patch("app.services.razorpay_gateway.RazorpayGateway", return_value=mock_instance)
 
     # Return the mock instance itself so tests can make assertions on it
     return mock_instance
@@ -558,3 +566,10 @@ def mock_normal_user_profile() -> Profile:
         is_active=True,
         roles=[UserRole(role_definition=RoleDefinition(role_id=3, role_name="Student"))],
     )
+
+
+@pytest.fixture(autouse=True)
+def clear_gateway_credentials():
+    """Decrypted gateway credentials are cached per school; start every test without them."""
+    invalidate_school_credentials()
+    yield
@@ -333,21 +333,22 @@ async def test_generate_invoices_for_class_atomic_rollback(clean_class_invoices,
     # Import the actual function we'll wrap
     from app.services import invoice_service
 
-    original_core = invoice_service._generate_invoice_for_student_core
+    original_write = invoice_service._write_invoice_chunk
 
     # Track call count and fail on the second call
     call_count = [0]
 
-    async def failing_core_wrapper(db, *, obj_in):
-        """Wrapper that fails on second call"""
+    async def failing_write_wrapper(db, chunk, **kwargs):
+        """Wrapper that fails on second student"""
         call_count[0] += 1
         if call_count[0] == 2:
             raise Exception("Simulated database error on second student")
         # Call the original function
-        return await original_core(db=db, obj_in=obj_in)
+        return await original_write(db, chunk, **kwargs)
 
-    # Patch the function
-    mocker.patch.object(invoice_service, "_generate_invoice_for_student_core", side_effect=failing_core_wrapper)
+    # One student per chunk, so the first student's invoice is written before the failure
+    mocker.patch.object(invoice_service, "INVOICE_BULK_CHUNK_SIZE", 1)
+    mocker.patch.object(invoice_service, "_write_invoice_chunk", side_effect=failing_write_wrapper)
 
     bulk_data = BulkInvoiceCreate(class_id=class_id_to_test, fee_term_id=1)
 
@@ -0,0 +1,119 @@
+"""
+Unit tests for the offline agent benchmark harness.
+
+Runs every leaf agent with the scripted fake LLM against the seeded SQLite
+stand-in, so it needs neither provider API keys nor a database server.
+"""
+
+from unittest.mock import MagicMock
+
+import pytest
+from langchain_core.messages import AIMessage
+from sqlalchemy import JSON
+
+from app.agents.benchmark import DEFAULT_SCENARIOS, AgentBenchmark, AgentScenario, ScriptedChatModel, answer_turn, format_report, tool_call, tool_turn
+from app.agents.benchmark import __main__ as benchmark_cli
+from app.agents.benchmark.database import sqlite_metadata
+from app.agents.utils import llm_router
+from app.agents.utils.llm_router import get_llm, use_llm_override
+
+
+@pytest.fixture(scope="module")
+def benchmark_results():
+    with AgentBenchmark(students=8) as benchmark:
+        results = benchmark.run(iterations=2)
+    return {result.scenario: result for result in results}
+
+
+def test_scripted_model_replays_tool_calls_then_reports_exhaustion():
+    model = ScriptedChatModel(script=[tool_turn(tool_call("get_class_details", class_name="10A")), answer_turn("Done.")])
+
+    first = model.invoke("anything")
+    second = model.invoke("anything")
+    third = model.invoke("anything")
+
+    assert first.tool_calls[0]["name"] == "get_class_details"
+    assert first.tool_calls[0]["args"] == {"class_name": "10A"}
+    assert second.content == "Done."
+    assert third.content == model.exhausted_reply
+    assert model.calls == 3
+
+
+def test_scripted_model_bind_tools_returns_itself():
+    model = ScriptedChatModel(script=[])
+    tool = MagicMock()
+    tool.name = "list_subjects_for_class"
+
+    assert model.bind_tools([tool]) is model
+    assert model.bound_tool_names == ["list_subjects_for_class"]
+
+
+def test_llm_override_is_used_and_restored():
+    fake = ScriptedChatModel(script=[])
+    with use_llm_override(lambda tier: fake):
+        assert get_llm("power") is fake
+    assert llm_router._llm_override is None
+
+
+def test_llm_connection_invokes_the_model():
+    with use_llm_override(lambda tier: ScriptedChatModel(script=[AIMessage(content="Hello")])):
+        assert llm_router.test_llm_connection("power") is True
+    with use_llm_override(lambda tier: ScriptedChatModel(script=[AIMessage(content="")], exhausted_reply="")):
+        assert llm_router.test_llm_connection("power") is False
+
+
+def test_sqlite_metadata_replaces_postgres_only_types():
+    metadata = sqlite_metadata()
+    assert isinstance(metadata.tables["schools"].c.configuration.type, JSON)
+    assert str(metadata.tables["attendance_records"].c.recorded_at.server_default.arg) == "CURRENT_TIMESTAMP"
+
+
+def test_benchmark_covers_every_leaf_agent(benchmark_results):
+    agents = {result.agent for result in benchmark_results.values()}
+    assert agents == {"mark", "attendance", "class", "exam", "subject", "timetable"}
+    assert len(benchmark_results) == len(DEFAULT_SCENARIOS)
+    for result in benchmark_results.values():
+        assert len(result.runs) == 2
+        assert all(run.success and run.tool_failures == 0 for run in result.runs), result.scenario
+        assert result.last_run.llm_calls >= 2
+
+
+def test_a_failed_tool_call_fails_the_run_and_the_exit_code(monkeypatch):
+    # The agent still answers, but its only tool call finds no such class.
+    unknown_class = AgentScenario("class.unknown", "class", "Give me the details of 99Z.", lambda seed: [tool_turn(tool_call("get_class_details", class_name="99Z")), answer_turn("Here are the details.")])
+    monkeypatch.setattr(benchmark_cli, "DEFAULT_SCENARIOS", (unknown_class,))
+
+    with AgentBenchmark(students=2) as benchmark:
+        run = benchmark.run_scenario(unknown_class).last_run
+    assert (run.tool_failures, run.success) == (1, False)
+    assert benchmark_cli.main(["--iterations", "1", "--students", "2"]) == 1
+
+
+def test_benchmark_records_db_queries_and_message_sizes(benchmark_results):
+    run = benchmark_results["mark.class_performance"].last_run
+
+    tool_steps = [step for step in run.steps if step.node == "tools"]
+    assert [step.node for step in run.steps] == ["llm", "tools", "llm"]
+    assert tool_steps[0].db_queries > 0
+    assert tool_steps[0].tool_message_bytes[0] > 0
+    assert run.tool_failures == 0
+
+
+def test_benchmark_records_tool_fan_out(benchmark_results):
+    run = benchmark_results["mark.student_marks_fan_out"].last_run
+    assert run.max_fan_out == 3
+    assert run.tool_calls == 3
+    assert run.tool_failures == 0
+
+
+def test_benchmark_serves_http_tools_in_process(benchmark_results):
+    run = benchmark_results["attendance.sequential_lookups"].last_run
+    assert run.http_requests == 3
+    assert run.db_queries > 0
+    assert run.tool_failures == 0
+
+
+def test_format_report_lists_every_scenario(benchmark_results):
+    report = format_report(list(benchmark_results.values()))
+    for name in benchmark_results:
+        assert name in report
@@ -0,0 +1,227 @@
+"""
+Unit tests for the agent response / tool result caches.
+
+Covers TTL expiry, table-based invalidation, cache scoping by school and role,
+and the BaseAgent integration that decides which runs are cacheable.
+"""
+
+import uuid
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from app.agents.base_agent import BaseAgent
+from app.agents.response_cache import (
+    AgentResponseCache,
+    agent_response_cache,
+    build_tool_key,
+    normalize_query,
+    read_only,
+    resolve_cache_scope,
+    tool_result_cache,
+)
+from app.agents.tool_context import ToolRuntimeContext, use_tool_context
+from app.db.write_tracking import notify_tables_committed
+
+
+def _profile(*roles: str, school_id: int = 1):
+    return SimpleNamespace(
+        user_id=uuid.uuid4(),
+        school_id=school_id,
+        roles=[SimpleNamespace(role_definition=SimpleNamespace(role_name=role)) for role in roles],
+    )
+
+
+def _agent(read_only_tools=None) -> BaseAgent:
+    with patch("app.agents.base_agent.get_llm", return_value=MagicMock()):
+        return BaseAgent(tools=[], read_only_tools=read_only_tools)
+
+
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    agent_response_cache.clear()
+    tool_result_cache.clear()
+    yield
+    agent_response_cache.clear()
+    tool_result_cache.clear()
+
+
+def test_normalize_query_collapses_case_whitespace_and_punctuation():
+    assert normalize_query("  Class 10A   average in MATH midterm? ") == "class 10a average in math midterm"
+
+
+def test_cache_entry_expires_after_ttl():
+    cache = AgentResponseCache("test", ttl_seconds=10)
+    with patch("app.agents.response_cache.time.monotonic", return_value=100.0):
+        cache.set("key", "value", school_id=1, tables=["marks"])
+        assert cache.get("key") == "value"
+    with patch("app.agents.response_cache.time.monotonic", return_value=111.0):
+        assert cache.get("key") is None
+    assert len(cache) == 0
+
+
+def test_cache_evicts_least_recently_used_entry():
+    cache = AgentResponseCache("test", max_entries=2)
+    cache.set("a", 1, school_id=1)
+    cache.set("b", 2, school_id=1)
+    cache.get("a")
+    cache.set("c", 3, school_id=1)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_invalidation_only_drops_matching_school_and_table():
+    cache = AgentResponseCache("test")
+    cache.set("marks-1", "x", school_id=1, tables=["marks"])
+    cache.set("marks-2", "y", school_id=2, tables=["marks"])
+    cache.set("timetable-1", "z", school_id=1, tables=["timetable"])
+
+    removed = cache.invalidate_writes({"marks": {1}})
+
+    assert removed == 1
+    assert cache.get("marks-1") is None
+    assert cache.get("marks-2") == "y"
+    assert cache.get("timetable-1") == "z"
+
+
+def test_unattributed_write_invalidates_every_school():
+    cache = AgentResponseCache("test")
+    cache.set("a", 1, school_id=1, tables=["attendance_records"])
+    cache.set("b", 2, school_id=2, tables=["attendance_records"])
+
+    cache.invalidate_writes({"attendance_records": {None}})
+
+    assert len(cache) == 0
+
+
+def test_global_caches_listen_for_committed_writes():
+    agent_response_cache.set("k", "v", school_id=5, tables=["marks"])
+    notify_tables_committed({"marks": {5}})
+    assert agent_response_cache.get("k") is None
+
+
+def test_scope_is_shared_by_teachers_of_the_same_school():
+    with use_tool_context(ToolRuntimeContext(current_profile=_profile("Teacher"))):
+        first = resolve_cache_scope()
+    with use_tool_context(ToolRuntimeContext(current_profile=_profile("Teacher"))):
+        second = resolve_cache_scope()
+
+    assert first == second
+    assert first.user_id is None
+
+
+def test_scope_is_per_user_for_parents():
+    parent = _profile("Parent")
+    with use_tool_context(ToolRuntimeContext(current_profile=parent)):
+        scope = resolve_cache_scope()
+
+    assert scope.role == "Parent"
+    assert scope.user_id == str(parent.user_id)
+
+
+def test_scope_is_none_without_context():
+    assert resolve_cache_scope() is None
+
+
+def test_tool_key_ignores_argument_case_and_order():
+    scope = SimpleNamespace(school_id=1, role="Teacher", user_id=None)
+    key_a = build_tool_key(scope, "get_class_timetable", {"class_name": "10A ", "day_of_week": "Monday"})
+    key_b = build_tool_key(scope, "get_class_timetable", {"day_of_week": "monday", "class_name": "10a"})
+    assert key_a == key_b
+
+
+def test_run_with_only_read_only_tools_is_cacheable():
+    agent = _agent({"get_marks": read_only("marks", "exams")})
+    messages = [
+        HumanMessage(content="q"),
+        AIMessage(content="", tool_calls=[{"name": "get_marks", "args": {}, "id": "1"}]),
+        ToolMessage(content="{'status': 'success'}", tool_call_id="1", name="get_marks"),
+        AIMessage(content="The average is 71."),
+    ]
+
+    assert agent._cacheable_tables(messages) == frozenset({"marks", "exams"})
+
+
+def test_run_with_write_tool_is_not_cacheable():
+    agent = _agent({"get_marks": read_only("marks")})
+    messages = [
+        HumanMessage(content="q"),
+        AIMessage(content="", tool_calls=[{"name": "record_student_marks", "args": {}, "id": "1"}]),
+        ToolMessage(content="{'status': 'success'}", tool_call_id="1", name="record_student_marks"),
+        AIMessage(content="Recorded."),
+    ]
+
+    assert agent._cacheable_tables(messages) is None
+
+
+def test_run_with_non_deterministic_tool_is_not_cacheable():
+    agent = _agent({"find_current_period_for_class": read_only("timetable", deterministic=False)})
+    messages = [
+        AIMessage(content="", tool_calls=[{"name": "find_current_period_for_class", "args": {}, "id": "1"}]),
+        AIMessage(content="Period 3."),
+    ]
+
+    assert agent._cacheable_tables(messages) is None
+
+
+def test_invoke_serves_repeat_question_from_cache():
+    agent = _agent({"get_marks": read_only("marks")})
+    final_state = {"messages": [SystemMessage(content="sys"), HumanMessage(content="Class 10A average?"), AIMessage(content="71%")]}
+    agent.graph = MagicMock()
+    agent.graph.invoke.return_value = final_state
+
+    with use_tool_context(ToolRuntimeContext(current_profile=_profile("Teacher"))):
+        first = agent.invoke([SystemMessage(content="sys"), HumanMessage(content="Class 10A average?")])
+    with use_tool_context(ToolRuntimeContext(current_profile=_profile("Admin"))):
+        agent.invoke([SystemMessage(content="sys"), HumanMessage(content="class 10a   average")])
+    with use_tool_context(ToolRuntimeContext(current_profile=_profile("Teacher"))):
+        cached = agent.invoke([SystemMessage(content="sys"), HumanMessage(content="class 10a   average")])
+
+    # Admin has a separate scope, so only the second Teacher call is a hit.
+    assert agent.graph.invoke.call_count == 2
+    assert cached["messages"][-1].content == first["messages"][-1].content
+
+
+def test_invoke_with_history_bypasses_cache():
+    agent = _agent({"get_marks": read_only("marks")})
+    agent.graph = MagicMock()
+    agent.graph.invoke.return_value = {"messages": [AIMessage(content="ok")]}
+    history = [SystemMessage(content="sys"), HumanMessage(content="hi"), AIMessage(content="hello"), HumanMessage(content="avg?")]
+
+    with use_tool_context(ToolRuntimeContext(current_profile=_profile("Teacher"))):
+        agent.invoke(history)
+        agent.invoke(history)
+
+    assert agent.graph.invoke.call_count == 2
+    assert len(agent_response_cache) == 0
+
+
+def test_call_tool_reuses_cached_tool_result():
+    agent = _agent({"get_marks": read_only("marks")})
+    agent.tool_executor = MagicMock()
+    agent._run_coroutine = MagicMock(return_value={"status": "success", "average": 71})
+    state = {"messages": [AIMessage(content="", tool_calls=[{"name": "get_marks", "args": {"class_name": "10A"}, "id": "1"}])]}
+
+    with use_tool_context(ToolRuntimeContext(current_profile=_profile("Teacher"))):
+        first = agent._call_tool(state)
+        second = agent._call_tool(state)
+
+    assert agent._run_coroutine.call_count == 1
+    assert first["messages"][0].content == second["messages"][0].content
+
+
+def test_call_tool_does_not_cache_failed_lookups():
+    agent = _agent({"get_marks": read_only("marks")})
+    agent.tool_executor = MagicMock()
+    agent._run_coroutine = MagicMock(return_value={"status": "not_found", "message": "No marks"})
+    state = {"messages": [AIMessage(content="", tool_calls=[{"name": "get_marks", "args": {}, "id": "1"}])]}
+
+    with use_tool_context(ToolRuntimeContext(current_profile=_profile("Teacher"))):
+        agent._call_tool(state)
+        agent._call_tool(state)
+
+    assert agent._run_coroutine.call_count == 2
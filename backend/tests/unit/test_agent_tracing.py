@@ -0,0 +1,117 @@
+"""
+Unit tests for agent tracing.
+
+Runs a BaseAgent with the scripted fake LLM and checks the Sentry spans it opens,
+the Prometheus metrics it records and the DB/HTTP work attributed to tool calls.
+"""
+
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import httpx
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.tools import tool
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.agents import tracing
+from app.agents.base_agent import BaseAgent
+from app.agents.benchmark import ScriptedChatModel, answer_turn, tool_call, tool_turn
+from app.agents.utils.llm_router import use_llm_override
+
+
+@tool
+async def count_rows(table: str) -> dict:
+    """Runs two queries against an in-memory database."""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("select 1"))
+            await conn.execute(text("select 2"))
+    finally:
+        await engine.dispose()
+    return {"status": "success", "table": table}
+
+
+class TracedAgent(BaseAgent):
+    pass
+
+
+def _sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_token_usage_reads_every_provider_format():
+    assert tracing.token_usage(AIMessage(content="", response_metadata={"token_usage": {"prompt_tokens": 12, "completion_tokens": 3}})) == (12, 3)
+    assert tracing.token_usage(AIMessage(content="", response_metadata={"usage": {"input_tokens": 7, "output_tokens": 2}})) == (7, 2)
+    assert tracing.token_usage(AIMessage(content="", response_metadata={"usage_metadata": {"prompt_token_count": 5, "candidates_token_count": 1}})) == (5, 1)
+    assert tracing.token_usage(AIMessage(content="")) == (None, None)
+
+
+def test_describe_model_unwraps_tool_bindings():
+    model = MagicMock(spec=["bound"])
+    model.bound = MagicMock(spec=["_llm_type", "model_name"], _llm_type="groq-chat", model_name="llama-3.3-70b")
+    assert tracing.describe_model(model) == ("groq-chat", "llama-3.3-70b")
+
+
+def test_agent_invocation_records_spans_and_metrics():
+    script = [
+        AIMessage(content="", tool_calls=[{"name": "count_rows", "args": {"table": "marks"}, "id": "call_1"}], response_metadata={"token_usage": {"prompt_tokens": 40, "completion_tokens": 8}}),
+        answer_turn("Done."),
+    ]
+    model = ScriptedChatModel(script=script)
+    with use_llm_override(lambda tier: model):
+        agent = TracedAgent(tools=[count_rows])
+
+    labels = {"agent": "TracedAgent", "tool": "count_rows"}
+    queries_before = _sample("agent_tool_db_queries_sum", **labels)
+    calls_before = _sample("agent_tool_call_seconds_count", outcome="success", **labels)
+    tokens_before = _sample("agent_llm_tokens_total", agent="TracedAgent", provider="scripted-chat-model", model="unknown", kind="prompt")
+    invocations_before = _sample("agent_invocation_seconds_count", agent="TracedAgent", outcome="success")
+
+    with patch.object(tracing, "sentry_sdk", wraps=tracing.sentry_sdk) as mock_sentry:
+        result = agent.invoke([HumanMessage(content="How many marks are there?")])
+
+    assert result["messages"][-1].content == "Done."
+    assert _sample("agent_tool_db_queries_sum", **labels) - queries_before == 2
+    assert _sample("agent_tool_call_seconds_count", outcome="success", **labels) - calls_before == 1
+    assert _sample("agent_llm_tokens_total", agent="TracedAgent", provider="scripted-chat-model", model="unknown", kind="prompt") - tokens_before == 40
+    assert _sample("agent_invocation_seconds_count", agent="TracedAgent", outcome="success") - invocations_before == 1
+
+    mock_sentry.start_transaction.assert_called_once_with(op="agent.invoke", name="agent.TracedAgent")
+    span_ops = [call.kwargs["op"] for call in mock_sentry.start_span.call_args_list]
+    assert span_ops == ["gen_ai.chat", "agent.tool", "gen_ai.chat"]
+
+
+def test_tool_trace_counts_http_requests_and_errors():
+    async def fetch() -> None:
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, json={}))
+        async with httpx.AsyncClient(transport=transport, event_hooks={"request": [tracing.record_http_request]}) as client:
+            await client.get("http://api/one")
+            await client.get("http://api/two")
+
+    with tracing.trace_tool_call("TracedAgent", "fetch", {"id": 1}) as trace:
+        asyncio.run(fetch())
+        trace.record_result({"success": True})
+    assert (trace.http_requests, trace.result_status) == (2, "True")
+    assert tracing.current_tool_trace() is None
+
+    errors_before = _sample("agent_tool_call_seconds_count", agent="TracedAgent", tool="fetch", outcome="error")
+    try:
+        with tracing.trace_tool_call("TracedAgent", "fetch", {}):
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    assert _sample("agent_tool_call_seconds_count", agent="TracedAgent", tool="fetch", outcome="error") - errors_before == 1
+
+
+def test_scripted_tool_turn_helpers_still_trace():
+    model = ScriptedChatModel(script=[tool_turn(tool_call("count_rows", table="exams")), answer_turn("Ok.")])
+    with use_llm_override(lambda tier: model):
+        agent = TracedAgent(tools=[count_rows])
+    before = _sample("agent_llm_call_seconds_count", agent="TracedAgent", provider="scripted-chat-model", model="unknown", outcome="success")
+
+    agent.invoke([HumanMessage(content="Count exams")])
+
+    assert _sample("agent_llm_call_seconds_count", agent="TracedAgent", provider="scripted-chat-model", model="unknown", outcome="success") - before == 2
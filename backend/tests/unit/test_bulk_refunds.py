@@ -0,0 +1,109 @@
+"""
+Unit tests for bulk refund jobs.
+
+A job must queue its refunds with one INSERT ... SELECT over the locked
+payments; running it must send each refund once (looking up, not re-sending, a
+refund whose earlier outcome was lost), mark gateway rejections failed, and
+reverse the refunded invoice allocations with set-based statements.
+"""
+
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.models.refund import Refund
+from app.models.refund_batch import RefundBatch
+from app.schemas.enums import RefundBatchStatus
+from app.schemas.refund_schema import RefundBatchCreate, RefundBatchOut
+from app.services import bulk_refund_service, invoice_service, razorpay_gateway
+from app.services.razorpay_gateway import RazorpayGateway
+from tests.utils.db_mocks import compiled_sql, mock_db, rows_result
+from tests.utils.fake_razorpay import FakeRazorpay
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_a_batch_queues_what_is_left_of_the_locked_payments_in_one_insert():
+    db = mock_db(rows_result([11, 12]), rows_result(rowcount=2))
+    batch_in = RefundBatchCreate(order_ids=[7], invoice_ids=[3], reason="Trip cancelled")
+
+    batch = await bulk_refund_service.create_refund_batch(db, school_id=4, batch_in=batch_in, user_id=uuid.uuid4())
+
+    lock_sql, queue_sql = (compiled_sql(call.args[0]) for call in db.execute.await_args_list)
+    assert "payments.order_id IN" in lock_sql and "payments.invoice_id IN" in lock_sql and lock_sql.endswith("FOR UPDATE")
+    assert queue_sql.startswith("INSERT INTO refunds (payment_id, amount, currency, reason, notes, processed_by_user_id, batch_id, status) SELECT payments.id, payments.amount_paid - (SELECT coalesce(sum(refunds.amount)")
+    assert (batch.status, batch.school_id) == (RefundBatchStatus.QUEUED.value, 4)
+    db.commit.assert_awaited_once()
+
+    db.execute = AsyncMock(side_effect=[rows_result([11]), rows_result(rowcount=0)])
+    with pytest.raises(HTTPException) as exc_info:
+        await bulk_refund_service.create_refund_batch(db, school_id=4, batch_in=batch_in, user_id=None)
+    assert exc_info.value.status_code == 404
+    db.rollback.assert_awaited_once()
+
+
+async def test_running_a_batch_sends_each_refund_once_and_records_the_outcomes():
+    fake = FakeRazorpay()
+    gateway = RazorpayGateway(fake.key_id, fake.key_secret, http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app), base_url="http://fake-razorpay/v1"))
+    order = await gateway.order.create(data={"amount": 150000})
+    new, resumed, rejected = (fake.add_payment(order["id"], status="captured", amount=150000) for _ in range(3))
+    # Sent by a worker that crashed before recording it
+    earlier = await gateway.payment.refund(resumed["id"], {"amount": 150000, "notes": {"internal_refund_id": 2}})
+    fake.requests.clear()
+
+    batch = RefundBatch(id=9, school_id=4, reason="Trip cancelled", status=RefundBatchStatus.INCOMPLETE.value, requested_by_user_id=uuid.uuid4())
+    refunds = [
+        (Refund(id=1, payment_id=21, batch_id=9, amount=Decimal("1500.00"), reason="Trip cancelled"), new["id"]),
+        (Refund(id=2, payment_id=22, batch_id=9, amount=Decimal("1500.00"), reason="Trip cancelled", submitted_at=datetime(2026, 10, 18, tzinfo=timezone.utc)), resumed["id"]),
+        (Refund(id=3, payment_id=23, batch_id=9, amount=Decimal("2000.00"), reason="Trip cancelled"), rejected["id"]),
+    ]
+    db = mock_db(rows_result(refunds), rows_result(), rows_result(), rows_result())
+    db.get = AsyncMock(return_value=batch)
+    db.scalar = AsyncMock(return_value=0)
+
+    with patch.object(razorpay_gateway, "get_school_gateway", AsyncMock(return_value=gateway)), patch.object(invoice_service, "reverse_payment_allocations", AsyncMock(return_value=2)) as reverse:
+        await bulk_refund_service.run_refund_batch(db, 9)
+
+    # The resumed refund is found at the gateway by its internal id instead of being sent again
+    assert fake.requests == [("POST", f"/v1/payments/{new['id']}/refund"), ("GET", f"/v1/payments/{resumed['id']}/refunds"), ("POST", f"/v1/payments/{rejected['id']}/refund")]
+    claim, lease, record, payments = (call.args for call in db.execute.await_args_list[:4])
+    assert "FOR UPDATE OF refunds SKIP LOCKED" in compiled_sql(claim[0]) and "refunds.submitted_at IS NULL OR refunds.submitted_at <" in compiled_sql(claim[0])
+    assert compiled_sql(lease[0]).startswith("UPDATE refunds SET submitted_at=now()")
+    outcomes = {outcome["id"]: outcome for outcome in record[1]}
+    assert outcomes[1]["status"] == "processed" and outcomes[2]["gateway_refund_id"] == earlier["id"]
+    assert outcomes[3]["status"] == "failed" and "rejected by payment gateway" in outcomes[3]["error_description"]
+    assert reverse.await_args.kwargs["refund_ids"] == [1, 2]
+    assert "WHERE payments.id IN" in compiled_sql(payments[0]) and "CAST(CASE WHEN" in compiled_sql(payments[0])
+    assert (batch.status, batch.finished_at is not None) == (RefundBatchStatus.COMPLETED.value, True)
+
+
+async def test_refunds_come_off_the_last_paid_invoice_items_with_negative_allocations():
+    db = mock_db(rows_result(rowcount=3), rows_result())
+
+    assert await invoice_service.reverse_payment_allocations(db, refund_ids=[1, 2], user_id=uuid.uuid4()) == 3
+
+    reversal_sql, invoice_sql = (compiled_sql(call.args[0]) for call in db.execute.await_args_list)
+    assert reversal_sql.startswith("INSERT INTO payment_allocations (payment_id, invoice_item_id, amount_allocated, allocated_by_user_id, notes) SELECT ranked.payment_id, ranked.invoice_item_id, -least(")
+    assert "sum(on_items.allocated) OVER (PARTITION BY on_items.payment_id ORDER BY on_items.invoice_item_id DESC)" in reversal_sql
+    assert invoice_sql.startswith("UPDATE invoices SET") and "amount_paid=(SELECT coalesce(sum(payment_allocations.amount_allocated)" in invoice_sql and "WHERE invoice_items.invoice_id = invoices.id" in invoice_sql
+
+
+async def test_batch_status_counts_each_refund_state():
+    batch = RefundBatch(id=9, school_id=4, reason="Trip cancelled", status=RefundBatchStatus.INCOMPLETE.value)
+    batch.refunds = [
+        Refund(id=1, payment_id=21, amount=Decimal("1500.00"), reason="Trip cancelled", status="processed", gateway_refund_id="rfnd_1"),
+        Refund(id=2, payment_id=22, amount=Decimal("500.00"), reason="Trip cancelled", status="pending", gateway_refund_id="rfnd_2"),
+        Refund(id=3, payment_id=23, amount=Decimal("700.00"), reason="Trip cancelled", status="pending"),
+        Refund(id=4, payment_id=24, amount=Decimal("900.00"), reason="Trip cancelled", status="failed", error_description="Refund rejected by payment gateway"),
+    ]
+    db = mock_db(rows_result([batch]))
+
+    out = RefundBatchOut.model_validate(await bulk_refund_service.get_refund_batch(db, 9, 4))
+
+    assert (out.queued, out.pending, out.processed, out.failed, out.amount_refunded) == (1, 1, 1, 1, Decimal("2000.00"))
+    assert [refund.id for refund in out.refunds] == [1, 2, 3, 4]
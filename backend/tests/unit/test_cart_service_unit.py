@@ -25,17 +25,19 @@ Architecture:
 """
 
 from decimal import Decimal
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock
 from uuid import UUID
 
 import pytest
 from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.cart import Cart
 from app.models.cart_item import CartItem
 from app.models.product import Product
-from app.schemas.cart_schema import CartItemIn
+from app.schemas.cart_schema import CartItemIn, CartMutationBatch, CartPackageIn
 from app.services.cart_service import CartService
 
 # ============================================================================
@@ -130,6 +132,20 @@ def create_mock_query_result(return_value, method="first"):
     return result_mock
 
 
+def create_cart_upsert_result(cart_id):
+    """Result of the cart upsert: INSERT ... ON CONFLICT DO UPDATE RETURNING cart_id."""
+    result_mock = MagicMock()
+    result_mock.scalar_one.return_value = cart_id
+    return result_mock
+
+
+def create_loaded_cart_result(cart):
+    """Result of the joined cart load: result.unique().scalar_one()."""
+    result_mock = MagicMock()
+    result_mock.unique.return_value.scalar_one.return_value = cart
+    return result_mock
+
+
 # ============================================================================
 # GET_OR_CREATE_CART TESTS
 # ============================================================================
@@ -718,34 +734,18 @@ async def test_update_item_quantity_to_stock_limit(mock_db_session, sample_user_
 @pytest.mark.asyncio
 async def test_clear_cart_success(mock_db_session, sample_user_id, sample_cart, sample_cart_item):
     """
-    Unit Test: Clear cart removes all items.
+    Unit Test: Clear cart removes all items with a single DELETE.
 
     Business Rule: All CartItems deleted, cart object remains.
     """
     # Arrange
-    cart_item_2 = CartItem(
-        cart_item_id=2,
-        cart_id=sample_cart.cart_id,
-        product_id=17,
-        quantity=1,
-    )
-    sample_cart.items = [sample_cart_item, cart_item_2]
-
-    # Mock queries
-    cart_query = create_mock_query_result(sample_cart)
-
-    # Mock cart items fetch
-    items_query = create_mock_query_result([sample_cart_item, cart_item_2], method="all")
-
-    # After clearing
     empty_cart = sample_cart
     empty_cart.items = []
-    hydrated_cart_query = create_mock_query_result(empty_cart)
 
     mock_db_session.execute.side_effect = [
-        cart_query,
-        items_query,
-        hydrated_cart_query,
+        create_cart_upsert_result(sample_cart.cart_id),
+        MagicMock(),  # DELETE
+        create_loaded_cart_result(empty_cart),
     ]
 
     service = CartService(mock_db_session)
@@ -756,7 +756,9 @@ async def test_clear_cart_success(mock_db_session, sample_user_id, sample_cart,
     # Assert
     assert result == empty_cart
     assert len(result.items) == 0
-    assert mock_db_session.delete.call_count == 2  # Both items deleted
+    delete_sql = str(mock_db_session.execute.call_args_list[1].args[0].compile(dialect=postgresql.dialect()))
+    assert delete_sql.startswith("DELETE FROM cart_items WHERE cart_items.cart_id = ")
+    assert not mock_db_session.delete.called  # No row-by-row deletes
     assert mock_db_session.commit.called
 
 
@@ -863,15 +865,10 @@ async def test_clear_empty_cart_succeeds(mock_db_session, sample_user_id, sample
     # Arrange
     sample_cart.items = []
 
-    # Mock queries
-    cart_query = create_mock_query_result(sample_cart)
-    items_query = create_mock_query_result([], method="all")  # No items
-    hydrated_cart_query = create_mock_query_result(sample_cart)
-
     mock_db_session.execute.side_effect = [
-        cart_query,
-        items_query,
-        hydrated_cart_query,
+        create_cart_upsert_result(sample_cart.cart_id),
+        MagicMock(),  # DELETE (no rows)
+        create_loaded_cart_result(sample_cart),
     ]
 
     service = CartService(mock_db_session)
@@ -882,41 +879,220 @@ async def test_clear_empty_cart_succeeds(mock_db_session, sample_user_id, sample
     # Assert
     assert result == sample_cart
     assert len(result.items) == 0
-    assert not mock_db_session.delete.called  # No items to delete
     assert mock_db_session.commit.called  # Still commits (timestamp update)
 
 
 @pytest.mark.asyncio
-async def test_clear_cart_with_single_item(mock_db_session, sample_user_id, sample_cart, sample_cart_item):
+async def test_clear_cart_creates_missing_cart_in_the_same_statement(mock_db_session, sample_user_id, sample_cart):
     """
-    Unit Test: Clear cart with single item works correctly.
+    Unit Test: The cart is fetched or created with one upsert that also bumps updated_at.
     """
     # Arrange
-    sample_cart.items = [sample_cart_item]
+    mock_db_session.execute.side_effect = [
+        create_cart_upsert_result(sample_cart.cart_id),
+        MagicMock(),
+        create_loaded_cart_result(sample_cart),
+    ]
 
-    # Mock queries
-    cart_query = create_mock_query_result(sample_cart)
-    items_query = create_mock_query_result([sample_cart_item], method="all")
+    service = CartService(mock_db_session)
 
-    empty_cart = sample_cart
-    empty_cart.items = []
-    hydrated_cart_query = create_mock_query_result(empty_cart)
+    # Act
+    await service.clear_cart(sample_user_id)
+
+    # Assert
+    upsert_sql = str(mock_db_session.execute.call_args_list[0].args[0].compile(dialect=postgresql.dialect()))
+    assert "INSERT INTO carts" in upsert_sql and "ON CONFLICT (user_id) DO UPDATE SET updated_at = now()" in upsert_sql
+    assert mock_db_session.execute.call_count == 3
+
+
+# ============================================================================
+# APPLY_MUTATIONS (BATCH) TESTS
+# ============================================================================
+
+
+def create_validation_result(rows):
+    """Result of the batch validation query: (product_id, name, is_active, stock_quantity, quantity in cart) rows."""
+    result_mock = MagicMock()
+    result_mock.all.return_value = [SimpleNamespace(product_id=p, name=n, is_active=a, stock_quantity=st, quantity=q) for p, n, a, st, q in rows]
+    return result_mock
+
+
+@pytest.mark.asyncio
+async def test_apply_mutations_upserts_and_deletes_in_one_transaction(mock_db_session, sample_user_id, sample_cart):
+    """
+    Unit Test: A batch validates stock in one query, writes with one upsert and
+    one DELETE, and reads the hydrated cart back before the single commit.
+    """
+    # Arrange
+    mutations = CartMutationBatch(add=[CartItemIn(product_id=16, quantity=3)], update=[CartItemIn(product_id=17, quantity=1)], remove=[8, 9])
 
     mock_db_session.execute.side_effect = [
-        cart_query,
-        items_query,
-        hydrated_cart_query,
+        create_cart_upsert_result(sample_cart.cart_id),
+        create_validation_result([(16, "House T-Shirt (Blue)", True, 10, 2), (17, "Tie", True, 5, None)]),
+        MagicMock(),  # upsert
+        MagicMock(),  # delete
+        create_loaded_cart_result(sample_cart),
     ]
 
     service = CartService(mock_db_session)
 
     # Act
-    result = await service.clear_cart(sample_user_id)
+    result = await service.apply_mutations(sample_user_id, mutations)
 
     # Assert
-    assert len(result.items) == 0
-    assert mock_db_session.delete.call_count == 1
-    assert mock_db_session.commit.called
+    assert result == sample_cart
+    assert mock_db_session.execute.call_count == 5
+    calls = [call.args[0] for call in mock_db_session.execute.call_args_list]
+    upsert_sql = str(calls[2].compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (cart_id, product_id) DO UPDATE SET quantity = excluded.quantity" in upsert_sql
+    upsert_params = calls[2].compile().params
+    assert [(upsert_params[f"product_id_m{i}"], upsert_params[f"quantity_m{i}"]) for i in range(2)] == [(16, 5), (17, 1)]  # 2 in cart + 3 added; set to 1
+    assert calls[3].compile().params["product_id_1"] == [8, 9]
+    assert "JOIN" in str(calls[4].compile(dialect=postgresql.dialect()))  # hydrated with one joined query
+    mock_db_session.commit.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_apply_mutations_rejects_the_whole_batch_on_any_stock_problem(mock_db_session, sample_user_id, sample_cart):
+    """
+    Unit Test: Every problem is reported and nothing is written.
+    """
+    # Arrange
+    mutations = CartMutationBatch(add=[CartItemIn(product_id=16, quantity=9), CartItemIn(product_id=18, quantity=1)], update=[CartItemIn(product_id=17, quantity=1)])
+
+    mock_db_session.execute.side_effect = [
+        create_cart_upsert_result(sample_cart.cart_id),
+        create_validation_result([(16, "House T-Shirt (Blue)", True, 10, 2), (17, "Tie", False, 5, None), (18, "Belt", True, 4, None)]),
+    ]
+
+    service = CartService(mock_db_session)
+
+    # Act & Assert
+    with pytest.raises(HTTPException) as exc_info:
+        await service.apply_mutations(sample_user_id, mutations)
+
+    assert exc_info.value.status_code == 400
+    assert "Insufficient stock for 'House T-Shirt (Blue)'. Requested: 11, Available: 10" in exc_info.value.detail
+    assert "Product 'Tie' is no longer available" in exc_info.value.detail
+    assert mock_db_session.execute.call_count == 2
+    assert not mock_db_session.commit.called
+
+
+@pytest.mark.asyncio
+async def test_apply_mutations_unknown_product_is_404(mock_db_session, sample_user_id, sample_cart):
+    """
+    Unit Test: Unknown products fail the batch with 404.
+    """
+    # Arrange
+    mock_db_session.execute.side_effect = [
+        create_cart_upsert_result(sample_cart.cart_id),
+        create_validation_result([]),
+    ]
+
+    service = CartService(mock_db_session)
+
+    # Act & Assert
+    with pytest.raises(HTTPException) as exc_info:
+        await service.apply_mutations(sample_user_id, CartMutationBatch(add=[CartItemIn(product_id=999, quantity=1)]))
+
+    assert exc_info.value.status_code == 404
+    assert "999" in exc_info.value.detail
+
+
+def test_mutation_batch_requires_distinct_products():
+    """
+    Unit Test: A product may appear only once per batch, and a batch may not be empty.
+    """
+    with pytest.raises(ValueError):
+        CartMutationBatch(add=[CartItemIn(product_id=16, quantity=1)], remove=[16])
+    with pytest.raises(ValueError):
+        CartMutationBatch()
+
+
+# ============================================================================
+# ADD_PACKAGE_TO_CART TESTS
+# ============================================================================
+
+
+def create_package_components_result(rows):
+    """Result of the package component query: (per-package quantity, product_id, name, is_active, stock_quantity, quantity in cart) rows."""
+    result_mock = MagicMock()
+    result_mock.all.return_value = [SimpleNamespace(per_package=k, product_id=p, name=n, is_active=a, stock_quantity=st, quantity=q) for k, p, n, a, st, q in rows]
+    return result_mock
+
+
+@pytest.mark.asyncio
+async def test_add_package_to_cart_checks_every_component_in_one_locking_read(mock_db_session, sample_user_id, sample_cart):
+    """
+    Unit Test: The package's components are read and locked in one query and
+    added with one upsert, multiplied by the number of packages.
+    """
+    # Arrange
+    mock_db_session.execute.side_effect = [
+        create_cart_upsert_result(sample_cart.cart_id),
+        create_package_components_result([(2, 16, "House T-Shirt (Blue)", True, 10, 1), (1, 17, "Tie", True, 5, None)]),
+        MagicMock(),  # upsert
+        create_loaded_cart_result(sample_cart),
+    ]
+
+    service = CartService(mock_db_session)
+
+    # Act
+    result = await service.add_package_to_cart(sample_user_id, 4, CartPackageIn(package_id=3, quantity=2))
+
+    # Assert
+    assert result == sample_cart
+    calls = [call.args[0] for call in mock_db_session.execute.call_args_list]
+    component_sql = str(calls[1].compile(dialect=postgresql.dialect()))
+    assert "JOIN package_items" in component_sql and "FOR SHARE OF products" in component_sql
+    assert "product_packages.is_active IS true" in component_sql
+    upsert_params = calls[2].compile().params
+    assert [(upsert_params[f"product_id_m{i}"], upsert_params[f"quantity_m{i}"]) for i in range(2)] == [(16, 5), (17, 2)]  # 1 in cart + 2 x 2; 2 x 1
+    mock_db_session.commit.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_add_package_to_cart_adds_nothing_when_a_component_is_short(mock_db_session, sample_user_id, sample_cart):
+    """
+    Unit Test: One short or discontinued component rejects the whole package.
+    """
+    # Arrange
+    mock_db_session.execute.side_effect = [
+        create_cart_upsert_result(sample_cart.cart_id),
+        create_package_components_result([(2, 16, "House T-Shirt (Blue)", True, 1, None), (1, 17, "Tie", False, 5, None), (1, 18, "Belt", True, 5, None)]),
+    ]
+
+    service = CartService(mock_db_session)
+
+    # Act & Assert
+    with pytest.raises(HTTPException) as exc_info:
+        await service.add_package_to_cart(sample_user_id, 4, CartPackageIn(package_id=3))
+
+    assert exc_info.value.status_code == 400
+    assert "Insufficient stock for 'House T-Shirt (Blue)'. Requested: 2, Available: 1" in exc_info.value.detail
+    assert "Product 'Tie' is no longer available" in exc_info.value.detail and "Belt" not in exc_info.value.detail
+    assert mock_db_session.execute.call_count == 2
+    assert not mock_db_session.commit.called
+
+
+@pytest.mark.asyncio
+async def test_add_package_to_cart_unknown_package_is_404(mock_db_session, sample_user_id, sample_cart):
+    """
+    Unit Test: A package of another school, inactive or empty is not found.
+    """
+    # Arrange
+    mock_db_session.execute.side_effect = [
+        create_cart_upsert_result(sample_cart.cart_id),
+        create_package_components_result([]),
+    ]
+
+    service = CartService(mock_db_session)
+
+    # Act & Assert
+    with pytest.raises(HTTPException) as exc_info:
+        await service.add_package_to_cart(sample_user_id, 4, CartPackageIn(package_id=99))
+
+    assert exc_info.value.status_code == 404
 
 
 # ============================================================================
@@ -0,0 +1,150 @@
+"""
+Unit tests for the cached store catalog.
+
+The catalog must be built with one query per entity, cached per school until a
+catalog table of that school is written, and served with a content-derived
+ETag that turns unchanged revalidations into 304s.
+"""
+
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from app.api.v1.endpoints import products as products_endpoint
+from app.db.write_tracking import notify_tables_committed
+from app.services import catalog_service
+from tests.utils.db_mocks import mock_db, rows_result
+
+pytestmark = pytest.mark.asyncio
+
+NOW = datetime(2026, 10, 1, 12, 0, tzinfo=timezone.utc)
+
+CATEGORY = SimpleNamespace(category_id=1, school_id=4, category_name="Uniforms", description=None, display_order=1, icon_url=None, is_active=True, created_at=NOW, updated_at=NOW)
+
+
+def _product(price: str = "750.00") -> SimpleNamespace:
+    return SimpleNamespace(
+        product_id=16,
+        school_id=4,
+        name="House T-Shirt (Blue)",
+        description=None,
+        price=Decimal(price),
+        stock_quantity=45,
+        sku="TSHIRT-BLUE",
+        image_url=None,
+        manufacturer=None,
+        reorder_level=None,
+        reorder_quantity=None,
+        is_active=True,
+        category=SimpleNamespace(category_id=1, category_name="Uniforms"),
+        created_at=NOW,
+        updated_at=NOW,
+        availability="in_stock",
+    )
+
+
+def _package(product: SimpleNamespace) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=3,
+        school_id=4,
+        name="Grade 5 Kit",
+        description=None,
+        price=Decimal("1200.00"),
+        image_url=None,
+        category=None,
+        academic_year="2026-2027",
+        is_active=True,
+        created_at=NOW,
+        updated_at=NOW,
+        available_quantity=product.stock_quantity // 2,
+        items=[
+            {
+                "product_id": product.product_id,
+                "quantity": 2,
+                "product_name": product.name,
+                "product_price": str(product.price),
+                "product_image_url": None,
+                "product_sku": product.sku,
+                "stock_quantity": product.stock_quantity,
+                "is_active": True,
+            }
+        ],
+    )
+
+
+def _catalog_results(price: str = "750.00") -> list:
+    product = _product(price)
+    packages = MagicMock()  # package_summary_query rows
+    packages.all.return_value = [_package(product)]
+    return [rows_result([CATEGORY]), rows_result([product]), packages]
+
+
+@pytest.fixture(autouse=True)
+def _empty_cache():
+    catalog_service.invalidate_catalog()
+    yield
+    catalog_service.invalidate_catalog()
+
+
+async def test_catalog_is_built_with_one_query_per_entity():
+    db = mock_db(*_catalog_results())
+
+    snapshot = await catalog_service.build_catalog(db, 4)
+
+    assert db.execute.await_count == 3
+    product_sql = str(db.execute.await_args_list[1].args[0].compile(dialect=postgresql.dialect()))
+    assert "LEFT OUTER JOIN product_categories" in product_sql and "products.is_active IS true" in product_sql
+    body = json.loads(snapshot.body)
+    assert [product["name"] for product in body["products"]] == ["House T-Shirt (Blue)"]
+    assert body["categories"][0]["category_name"] == "Uniforms"
+    assert body["packages"][0]["items"][0]["product_name"] == "House T-Shirt (Blue)" and body["packages"][0]["savings"] == "300.00"
+    assert body["packages"][0]["available_quantity"] == 22
+    assert snapshot.etag.startswith('"') and snapshot.etag.endswith('"')
+
+
+async def test_catalog_is_cached_until_a_catalog_table_of_the_school_is_written():
+    db = mock_db(*_catalog_results(), *_catalog_results(), *_catalog_results("800.00"))
+
+    first = await catalog_service.get_catalog(db, 4)
+    assert await catalog_service.get_catalog(db, 4) is first
+    notify_tables_committed({"products": {7}, "orders": {4}})  # another school's catalog, a non-catalog table
+    assert await catalog_service.get_catalog(db, 4) is first
+    assert db.execute.await_count == 3
+
+    notify_tables_committed({"product_categories": {4}})
+    rebuilt = await catalog_service.get_catalog(db, 4)
+    assert rebuilt is not first and rebuilt.etag == first.etag  # same content, same ETag
+
+    notify_tables_committed({"package_items": {None}})  # no school_id on the table: every school
+    assert (await catalog_service.get_catalog(db, 4)).etag != first.etag
+
+
+async def test_if_none_match_uses_weak_comparison():
+    assert catalog_service.etag_matches('"abc"', '"abc"')
+    assert catalog_service.etag_matches('"zzz", W/"abc"', '"abc"')
+    assert catalog_service.etag_matches("*", '"abc"')
+    assert not catalog_service.etag_matches('"abd"', '"abc"')
+    assert not catalog_service.etag_matches(None, '"abc"')
+
+
+async def test_endpoint_answers_an_unchanged_catalog_with_304():
+    profile = MagicMock(school_id=4)
+    db = mock_db(*_catalog_results())
+
+    full = await products_endpoint.get_school_catalog(school_id=4, if_none_match=None, db=db, current_profile=profile)
+    assert full.status_code == 200 and json.loads(full.body)["school_id"] == 4
+    assert full.headers["Cache-Control"] == "private, no-cache"
+
+    not_modified = await products_endpoint.get_school_catalog(school_id=4, if_none_match=full.headers["ETag"], db=db, current_profile=profile)
+    assert not_modified.status_code == 304 and not_modified.body == b""
+    assert not_modified.headers["ETag"] == full.headers["ETag"]
+
+    with pytest.raises(HTTPException) as exc_info:
+        await products_endpoint.get_school_catalog(school_id=7, if_none_match=None, db=db, current_profile=profile)
+    assert exc_info.value.status_code == 403
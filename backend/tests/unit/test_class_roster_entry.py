@@ -0,0 +1,166 @@
+"""
+Unit tests for class-wide mark and attendance entry.
+
+Covers roster matching (names, roll numbers, student ids), the record_class_marks
+agent tool, the roster attendance service and the mark_class_attendance HTTP tool.
+"""
+
+import uuid
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.agents.modules.academics.leaves.attendance_agent.tools import mark_class_attendance
+from app.agents.modules.academics.leaves.mark_agent.tools import record_class_marks
+from app.agents.tool_context import ToolRuntimeContext, use_tool_context
+from app.schemas.attendance_record_schema import ClassRosterAttendanceCreate, RosterAttendanceEntry
+from app.services import attendance_record_service, class_service, student_service
+from tests.utils.db_mocks import rows_result
+
+
+def _student(student_id: int, first_name: str, last_name: str, roll_number: str):
+    return SimpleNamespace(
+        student_id=student_id,
+        roll_number=roll_number,
+        current_class_id=10,
+        profile=SimpleNamespace(first_name=first_name, last_name=last_name),
+    )
+
+
+ROSTER = [
+    _student(1, "Rohan", "Sharma", "01"),
+    _student(2, "Priya", "Sharma", "02"),
+    _student(3, "Priya", "Nair", "03"),
+    _student(40, "Kabir", "Mehta", "04"),
+]
+
+
+@pytest.mark.asyncio
+async def test_match_class_roster_resolves_names_roll_numbers_and_ids():
+    with patch.object(student_service, "get_all_students_for_class", AsyncMock(return_value=ROSTER)) as mock_roster:
+        matches = await student_service.match_class_roster(AsyncMock(), class_id=10, lookups=["rohan  sharma", "03", "40", "Kabir", "Priya", "Meera"])
+
+    mock_roster.assert_awaited_once()
+    assert [match.student.student_id if match.student else None for match in matches] == [1, 3, 40, 40, None, None]
+    assert [match.status for match in matches[-2:]] == ["ambiguous", "not_found"]
+    assert [candidate.student_id for candidate in matches[4].candidates] == [2, 3]
+
+
+def test_parse_class_name():
+    assert class_service.parse_class_name("Grade 10 A") == (10, "A")
+    assert class_service.parse_class_name("12-Science") == (12, "Science")
+    assert class_service.parse_class_name("Science") is None
+
+
+def _teacher_context(db=None):
+    profile = SimpleNamespace(
+        user_id=uuid.uuid4(),
+        school_id=1,
+        roles=[SimpleNamespace(role_definition=SimpleNamespace(role_name="Teacher"))],
+    )
+    return use_tool_context(ToolRuntimeContext(db=db or AsyncMock(), current_profile=profile, jwt_token="token"))
+
+
+@pytest.mark.asyncio
+async def test_record_class_marks_writes_matched_rows_in_one_bulk_call():
+    tools = "app.agents.modules.academics.leaves.mark_agent.tools"
+    class_obj = SimpleNamespace(class_id=10, grade_level=10, section="A")
+    exam = SimpleNamespace(id=5, exam_name="Midterm")
+    subject = SimpleNamespace(subject_id=7, name="Mathematics")
+    created = [SimpleNamespace(id=100, student_id=1, marks_obtained=78, max_marks=100), SimpleNamespace(id=101, student_id=3, marks_obtained=45, max_marks=50)]
+
+    db = AsyncMock()
+    db.execute.return_value = rows_result([40])
+
+    with (
+        _teacher_context(db),
+        patch(f"{tools}._resolve_class", AsyncMock(return_value=(class_obj, None))),
+        patch(f"{tools}._resolve_exam", AsyncMock(return_value=(exam, None))),
+        patch(f"{tools}._resolve_subject", AsyncMock(return_value=(subject, None))),
+        patch.object(student_service, "get_all_students_for_class", AsyncMock(return_value=ROSTER)),
+        patch("app.services.mark_service.bulk_create_marks", AsyncMock(return_value=created)) as mock_bulk,
+    ):
+        result = await record_class_marks.ainvoke(
+            {
+                "class_name": "10A",
+                "exam_name": "Midterm",
+                "subject_name": "Mathematics",
+                "entries": [
+                    {"student": "Rohan Sharma", "marks_obtained": 78},
+                    {"student": "03", "marks_obtained": 45, "max_marks": 50},
+                    {"student": "Priya", "marks_obtained": 60},
+                    {"student": "Kabir Mehta", "marks_obtained": 70},
+                    {"student": "1", "marks_obtained": 80},
+                ],
+            }
+        )
+
+    mock_bulk.assert_awaited_once()
+    marks_in = mock_bulk.await_args.kwargs["marks_in"]
+    assert [(mark.student_id, mark.max_marks) for mark in marks_in] == [(1, 100.0), (3, 50.0)]
+    assert result["status"] == "partial_success"
+    assert result["recorded_entries"] == 2
+    assert [row["result"] for row in result["rows"]] == ["recorded", "recorded", "ambiguous", "already_recorded", "duplicate_row"]
+    assert result["rows"][0]["mark_id"] == 100
+
+
+@pytest.mark.asyncio
+async def test_record_class_marks_rejects_rows_above_max_marks():
+    with _teacher_context():
+        with pytest.raises(Exception, match="cannot exceed max marks"):
+            await record_class_marks.ainvoke({"class_name": "10A", "exam_name": "Midterm", "subject_name": "Mathematics", "max_marks": 50, "entries": [{"student": "Rohan", "marks_obtained": 60}]})
+
+
+@pytest.mark.asyncio
+async def test_record_class_roster_attendance_skips_unmatched_and_recorded_rows():
+    db = AsyncMock()
+    db.execute.return_value = rows_result([3])
+    roster_in = ClassRosterAttendanceCreate(
+        class_name="10A",
+        date=date(2025, 11, 17),
+        entries=[
+            RosterAttendanceEntry(student="Rohan Sharma", status="Absent", notes="Sick"),
+            RosterAttendanceEntry(student="Priya Nair"),
+            RosterAttendanceEntry(student="Meera"),
+            RosterAttendanceEntry(student="04"),
+        ],
+    )
+    records = [SimpleNamespace(id=900, student_id=1), SimpleNamespace(id=901, student_id=40)]
+
+    with (
+        patch.object(student_service, "get_all_students_for_class", AsyncMock(return_value=ROSTER)),
+        patch.object(attendance_record_service, "bulk_create_attendance_records", AsyncMock(return_value=records)) as mock_bulk,
+    ):
+        result = await attendance_record_service.record_class_roster_attendance(db, class_id=10, roster_in=roster_in, teacher_id=8)
+
+    payloads = mock_bulk.await_args.kwargs["attendance_data"]
+    assert [(record.student_id, record.status.value, record.teacher_id) for record in payloads] == [(1, "Absent", 8), (40, "Present", 8)]
+    assert (result.recorded, result.skipped) == (2, 2)
+    assert [row.result for row in result.rows] == ["recorded", "already_recorded", "not_found", "recorded"]
+    assert result.rows[3].attendance_id == 901
+
+
+@pytest.mark.asyncio
+async def test_mark_class_attendance_posts_the_whole_roster_once():
+    response = {"class_id": 10, "date": "2025-11-17", "recorded": 1, "skipped": 1, "rows": [{"row": 1, "result": "recorded"}, {"row": 2, "result": "not_found"}]}
+    client = AsyncMock()
+    client.post.return_value = response
+
+    with patch("app.agents.modules.academics.leaves.attendance_agent.tools.AgentHTTPClient") as mock_client_cls:
+        mock_client_cls.return_value.__aenter__.return_value = client
+        result = await mark_class_attendance.ainvoke(
+            {
+                "class_name": "10A",
+                "attendance_date": "2025-11-17",
+                "entries": [{"student": "Rohan Sharma", "status": "ABSENT", "remarks": "Sick"}, {"student": "Meera"}],
+            }
+        )
+
+    client.post.assert_awaited_once()
+    assert client.post.await_args.args[0] == "/attendance/roster"
+    assert client.post.await_args.kwargs["json"]["entries"] == [{"student": "Rohan Sharma", "status": "Absent", "notes": "Sick"}, {"student": "Meera", "status": "Present"}]
+    assert result["success"] is True
+    assert result["recorded_entries"] == 1
+    assert result["rows"] == response["rows"]
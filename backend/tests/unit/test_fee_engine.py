@@ -0,0 +1,114 @@
+"""
+Unit tests for the vectorized fee engine.
+
+The engine is checked against a reference copy of the per-student ``Decimal``
+computation the invoice generator used before it (rounded to paise per line,
+as the invoice columns store it) on seeded random schools, on the edge cases
+of the discount rules, and through the invoice generator's rows against the
+loop the benchmark (``scripts/fee_engine_benchmark.py``) times it against.
+Timing itself is left to the benchmark, not the unit suite.
+"""
+
+import random
+from decimal import ROUND_HALF_UP, Decimal
+
+import pytest
+
+from app.services import fee_engine
+from app.services.fee_engine import DiscountRule, StudentFees
+from scripts import fee_engine_benchmark
+
+CENT = Decimal("0.01")
+
+
+def _cents(amount: Decimal) -> Decimal:
+    return amount.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def reference_fees(class_fees: dict, student: StudentFees) -> tuple:
+    """The original per-student loop: every billed component against every discount."""
+    billable = {component_id: amount for component_id, amount in sorted(class_fees[student.class_id].items()) if component_id not in student.removed_component_ids}
+    lines, applied, amount_due = [], [], Decimal("0")
+    for component_id, original_amount in billable.items():
+        total_discount = Decimal("0.0")
+        for rule in student.discounts:
+            if rule.component_ids is None or component_id in rule.component_ids:
+                value = original_amount * (rule.value / Decimal(100)) if rule.percentage else rule.value
+                if value > 0:
+                    total_discount += value
+                    applied.append((rule.discount_id, _cents(value)))
+        final = max(original_amount - total_discount, Decimal("0.0"))
+        lines.append((component_id, _cents(original_amount), _cents(total_discount), _cents(final)))
+        amount_due += _cents(final)
+    return amount_due, lines, applied
+
+
+def _engine_fees(result: fee_engine.StudentInvoiceFees) -> tuple:
+    return result.amount_due, [(line.component_id, line.original_amount, line.discount_amount, line.final_amount) for line in result.lines], result.applied_discounts
+
+
+def _random_school(rng: random.Random, students: int) -> tuple:
+    components = list(range(1, rng.randint(1, 8) + 1))
+    class_fees = {class_id: {component_id: Decimal(rng.randrange(0, 2_000_000)) / 100 for component_id in components if rng.random() < 0.8} for class_id in range(1, rng.randint(1, 4) + 1)}
+    rules = []
+    for discount_id in range(1, 6):
+        percentage = rng.random() < 0.6
+        value = Decimal(rng.randrange(0, 10_001 if percentage else 500_000)) / 100
+        scope = frozenset(rng.sample(components, rng.randint(1, len(components)))) if rng.random() < 0.4 else None
+        rules.append(DiscountRule(discount_id=discount_id, percentage=percentage, value=value, component_ids=scope))
+    fees = [
+        StudentFees(
+            student_id=student_id,
+            class_id=rng.choice(list(class_fees)),
+            removed_component_ids=frozenset(rng.sample(components, rng.randint(0, len(components)))) if rng.random() < 0.3 else frozenset(),
+            discounts=tuple(rng.sample(rules, rng.randint(0, 3))),
+        )
+        for student_id in range(1, students + 1)
+    ]
+    return class_fees, fees
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_engine_matches_the_per_student_computation(seed):
+    rng = random.Random(seed)
+    class_fees, students = _random_school(rng, students=rng.randint(1, 40))
+
+    results = fee_engine.compute_student_fees(class_fees, students)
+
+    assert [result.student_id for result in results] == [student.student_id for student in students]
+    for student, result in zip(students, results):
+        assert _engine_fees(result) == reference_fees(class_fees, student)
+
+
+def test_discount_rules_edge_cases():
+    class_fees = {10: {1: Decimal("1000.00"), 2: Decimal("333.33"), 3: Decimal("0")}}
+    students = [
+        # Stacked discounts larger than the fee clamp the line at zero
+        StudentFees(student_id=1, class_id=10, discounts=(DiscountRule(1, True, Decimal("60")), DiscountRule(2, False, Decimal("500")))),
+        # A scoped discount only touches its components; removed components are not billed
+        StudentFees(student_id=2, class_id=10, removed_component_ids=frozenset({1}), discounts=(DiscountRule(3, True, Decimal("12.5"), frozenset({2})),)),
+        # Zero discounts and zero-amount components are never logged
+        StudentFees(student_id=3, class_id=10, discounts=(DiscountRule(4, False, Decimal("0")),)),
+    ]
+
+    clamped, scoped, plain = fee_engine.compute_student_fees(class_fees, students)
+
+    assert [(line.component_id, line.final_amount) for line in clamped.lines] == [(1, Decimal("0.00")), (2, Decimal("0.00")), (3, Decimal("0.00"))]
+    assert clamped.lines[0].discount_amount == Decimal("1100.00")
+    assert clamped.amount_due == Decimal("0.00")
+    assert (1, Decimal("0.00")) not in clamped.applied_discounts and (2, Decimal("500.00")) in clamped.applied_discounts
+    assert _engine_fees(scoped) == (Decimal("291.66"), [(2, Decimal("333.33"), Decimal("41.67"), Decimal("291.66")), (3, Decimal("0.00"), Decimal("0.00"), Decimal("0.00"))], [(3, Decimal("41.67"))])
+    assert (plain.amount_due, plain.applied_discounts) == (Decimal("1333.33"), [])
+    assert fee_engine.compute_student_fees(class_fees, []) == []
+
+
+def test_benchmarked_paths_write_the_same_rows():
+    school = fee_engine_benchmark.synthetic_school(300, 12)
+
+    loop_items, loop_discounts = fee_engine_benchmark.decimal_loop(school)
+    engine_items, engine_discounts = fee_engine_benchmark.fee_engine_path(school)
+
+    money = ("original_amount", "discount_amount", "final_amount", "amount_discounted")
+    rounded = [[{key: _cents(value) if key in money else value for key, value in row.items()} for row in rows] for rows in (loop_items, loop_discounts)]
+    assert rounded == [engine_items, engine_discounts]
+    assert len(engine_items) > 3_000 and engine_discounts
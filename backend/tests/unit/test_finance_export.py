@@ -0,0 +1,135 @@
+"""
+Unit tests for the streaming finance exports.
+
+The queries must be scoped to the admin's school, rows must be read through a
+server-side cursor in batches, and both encoders must emit each batch as soon as
+it is read, so memory stays flat as the export grows.
+"""
+
+import csv
+import io
+import tracemalloc
+import zipfile
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+from xml.etree import ElementTree
+
+import pytest
+
+from app.api.v1.endpoints import finance_exports
+from app.db.session import db_context
+from app.schemas.enums import ExportFormat, FinanceExportDataset
+from app.services import finance_export_service
+from tests.utils.db_mocks import compiled_sql
+
+pytestmark = pytest.mark.asyncio
+
+SHEET_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+
+
+def _payment_row(i: int) -> tuple:
+    return (i, 10 + i, None, 3, Decimal("1250.50"), "INR", "captured", "pending", "upi", f"pay_{i}", f"order_{i}", datetime(2026, 10, 1, tzinfo=timezone.utc))
+
+
+class _FakeStream:
+    def __init__(self, total: int, batch_size: int):
+        self.total, self.batch_size = total, batch_size
+
+    async def partitions(self):
+        for start in range(0, self.total, self.batch_size):
+            yield [_payment_row(i) for i in range(start, min(start + self.batch_size, self.total))]
+
+
+class _FakeSession:
+    def __init__(self, total: int, batch_size: int):
+        self.stream_result = _FakeStream(total, batch_size)
+        self.statements = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def stream(self, statement):
+        self.statements.append(statement)
+        return self.stream_result
+
+
+async def _export(file_format: ExportFormat, *, total: int, batch_size: int = 500, keep: bool = True):
+    session = _FakeSession(total, batch_size)
+    chunks, size = [], 0
+    with patch.dict(db_context, {"SessionLocal": lambda: session}):
+        async for chunk in finance_export_service.stream_export(FinanceExportDataset.PAYMENTS, file_format, school_id=4):
+            size += len(chunk)
+            if keep:
+                chunks.append(chunk)
+    return session, chunks, size
+
+
+@pytest.mark.parametrize("dataset", list(FinanceExportDataset))
+async def test_every_export_is_scoped_to_the_school(dataset):
+    headers, stmt = finance_export_service.export_query(dataset, school_id=4, created_from=datetime(2026, 9, 1), created_to=datetime(2026, 10, 1))
+
+    sql = compiled_sql(stmt)
+    assert len(headers) == len(stmt.selected_columns)
+    assert ("profiles.school_id = " if dataset is FinanceExportDataset.INVOICES else "payments.school_id = ") in sql
+    assert "created_at >= " in sql and "created_at < " in sql and "ORDER BY" in sql
+
+
+async def test_csv_is_streamed_per_batch_from_a_server_side_cursor():
+    session, chunks, _ = await _export(ExportFormat.CSV, total=1200, batch_size=500)
+
+    assert session.statements[0].get_execution_options()["yield_per"] == finance_export_service.FINANCE_EXPORT_BATCH_SIZE
+    assert len(chunks) == 1 + 3  # header, then one chunk per batch
+    rows = list(csv.reader(io.StringIO(b"".join(chunks).decode("utf-8-sig"))))
+    assert rows[0][:2] == ["payment_id", "invoice_id"] and len(rows) == 1201
+    assert rows[1][4] == "1250.50" and rows[1][2] == ""
+
+
+async def test_csv_neutralises_formula_cells():
+    encoder = finance_export_service._CsvEncoder(["reason"])
+    encoder.start()
+
+    row = next(csv.reader(io.StringIO(encoder.write_rows([("=HYPERLINK(1)",), ("fine",)]).decode())))
+    assert row == ["'=HYPERLINK(1)"]
+
+
+async def test_xlsx_is_a_valid_workbook_with_typed_cells():
+    _, chunks, _ = await _export(ExportFormat.XLSX, total=1200, batch_size=500)
+
+    assert len(chunks) >= 2  # the package parts go out before the first row is read
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as workbook:
+        assert workbook.testzip() is None
+        assert {"[Content_Types].xml", "xl/workbook.xml", "xl/worksheets/sheet1.xml"} <= set(workbook.namelist())
+        sheet = ElementTree.fromstring(workbook.read("xl/worksheets/sheet1.xml"))
+    rows = sheet.findall(f"{SHEET_NS}sheetData/{SHEET_NS}row")
+    assert len(rows) == 1201
+    header, first = rows[0], rows[1]
+    assert header[0].find(f"{SHEET_NS}is/{SHEET_NS}t").text == "payment_id"
+    assert first[4].find(f"{SHEET_NS}v").text == "1250.50" and first[4].get("t") is None
+    assert first[9].find(f"{SHEET_NS}is/{SHEET_NS}t").text == "pay_0"
+
+
+@pytest.mark.parametrize("file_format", list(ExportFormat))
+async def test_memory_stays_flat_as_the_export_grows(file_format):
+    peaks = []
+    for total in (2_000, 40_000):
+        tracemalloc.start()
+        _, _, size = await _export(file_format, total=total, keep=False)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    # 20x the rows (hundreds of KB to MB of output) may not grow peak memory beyond noise
+    assert size > 250_000
+    assert peaks[1] < peaks[0] * 2
+
+
+async def test_endpoint_streams_the_admins_school_with_a_download_name():
+    current_user = MagicMock(school_id=4)
+    with patch.object(finance_export_service, "stream_export", MagicMock(return_value=iter([b"x"]))) as stream_export:
+        response = await finance_exports.export_finance_data(dataset=FinanceExportDataset.REFUNDS, file_format=ExportFormat.XLSX, created_from=None, created_to=None, current_user=current_user)
+
+    stream_export.assert_called_once_with(FinanceExportDataset.REFUNDS, ExportFormat.XLSX, school_id=4, created_from=None, created_to=None)
+    assert response.media_type == finance_export_service.MEDIA_TYPES[ExportFormat.XLSX]
+    assert response.headers["content-disposition"].startswith("attachment; filename=refunds_4_") and response.headers["content-disposition"].endswith(".xlsx")
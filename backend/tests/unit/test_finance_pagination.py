@@ -0,0 +1,98 @@
+"""
+Unit tests for keyset-paginated finance listings.
+
+Covers the opaque cursor, the keyset predicate and ordering, the cached total
+(and its invalidation on commit), and the filters and item expansion of the
+invoice and payment listings.
+"""
+
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.db.write_tracking import notify_tables_committed
+from app.models.invoice import Invoice
+from app.services import invoice_service, pagination
+from app.services.payment_service import PaymentService
+from tests.utils.db_mocks import compiled_sql, mock_db, rows_result, scalar_result
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture(autouse=True)
+def clear_counts():
+    pagination._counts.clear()
+    yield
+    pagination._counts.clear()
+
+
+def _invoice(invoice_id: int, hour: int) -> SimpleNamespace:
+    return SimpleNamespace(id=invoice_id, created_at=datetime(2026, 10, 1, hour, tzinfo=timezone.utc))
+
+
+async def test_cursor_round_trip_and_rejection():
+    created_at = datetime(2026, 10, 1, 9, 30, tzinfo=timezone.utc)
+    cursor = pagination.encode_cursor(created_at, 42)
+
+    assert pagination.decode_cursor(cursor) == (created_at, 42)
+    assert "=" not in cursor
+    for bad in ("not-a-cursor", "", pagination.encode_cursor(created_at, 42)[:-3]):
+        with pytest.raises(ValueError):
+            pagination.decode_cursor(bad)
+
+
+async def test_invoice_page_uses_keyset_predicate_filters_and_cached_total():
+    page_one = [_invoice(30, 12), _invoice(20, 11), _invoice(10, 10)]
+    db = mock_db(scalar_result(3), rows_result(page_one), rows_result([_invoice(10, 10)]))
+
+    first = await invoice_service.get_invoices_page_for_school(db, school_id=4, limit=2, fee_term_id=3, class_id=7, payment_status="unpaid")
+    second = await invoice_service.get_invoices_page_for_school(db, school_id=4, limit=2, fee_term_id=3, class_id=7, payment_status="unpaid", cursor=first["next_cursor"])
+
+    assert ([i.id for i in first["items"]], first["total"]) == ([30, 20], 3)
+    assert pagination.decode_cursor(first["next_cursor"]) == (page_one[1].created_at, 20)
+    assert ([i.id for i in second["items"]], second["next_cursor"], second["total"]) == ([10], None, 3)
+    assert db.execute.await_count == 3  # the total was counted once
+
+    count_sql, first_sql, second_sql = (compiled_sql(call.args[0]) for call in db.execute.await_args_list)
+    assert "count(*)" in count_sql and "ORDER BY" not in count_sql
+    assert "invoices.fee_term_id = " in first_sql and "students.current_class_id = " in first_sql and "invoices.payment_status = " in first_sql
+    assert "ORDER BY invoices.created_at DESC, invoices.id DESC" in first_sql and "LIMIT" in first_sql
+    assert "(invoices.created_at, invoices.id) < (" not in first_sql
+    assert "(invoices.created_at, invoices.id) < (" in second_sql
+
+
+async def test_items_are_only_loaded_on_request():
+    db = mock_db(scalar_result(0), rows_result([]), rows_result([]))
+
+    await invoice_service.get_invoices_page_for_school(db, school_id=4)
+    await invoice_service.get_invoices_page_for_school(db, school_id=4, include_items=True)
+
+    plain, expanded = (call.args[0] for call in db.execute.await_args_list[1:])
+    assert plain._with_options[0].context[0].strategy == (("lazy", "noload"),)
+    assert expanded._with_options[0].context[0].strategy == (("lazy", "selectin"),)
+
+
+async def test_cached_total_is_dropped_when_the_table_is_written():
+    db = mock_db(scalar_result(5), scalar_result(6))
+    stmt = invoice_service.select(Invoice)
+
+    assert await pagination.cached_count(db, stmt, table="invoices", key=("a",)) == 5
+    assert await pagination.cached_count(db, stmt, table="invoices", key=("a",)) == 5
+    notify_tables_committed({"payments": {4}})
+    assert await pagination.cached_count(db, stmt, table="invoices", key=("a",)) == 5
+    notify_tables_committed({"invoices": {None}})
+    assert await pagination.cached_count(db, stmt, table="invoices", key=("a",)) == 6
+
+
+async def test_payment_listing_is_school_scoped_and_filterable():
+    db = mock_db(scalar_result(1), rows_result([SimpleNamespace(id=5, created_at=datetime(2026, 10, 1, tzinfo=timezone.utc))]), scalar_result(1))
+    created_from = datetime(2026, 9, 1, tzinfo=timezone.utc)
+
+    page = await PaymentService(db).list_payments(db=db, school_id=4, status="captured_allocation_failed", fee_term_id=3, created_from=created_from)
+
+    assert (page["total"], page["next_cursor"], [p.id for p in page["items"]]) == (1, None, [5])
+    sql = compiled_sql(db.execute.await_args_list[1].args[0])
+    assert "payments.school_id = " in sql and "payments.status = " in sql and "JOIN invoices ON invoices.id = payments.invoice_id" in sql and "payments.created_at >= " in sql
+    with pytest.raises(ValueError):
+        await PaymentService(db).list_payments(db=db, school_id=4, cursor="garbage")
@@ -0,0 +1,125 @@
+"""
+Unit tests for set-based payment allocation in invoice_service.
+
+The session is mocked: the tests check the waterfall over invoice items, the
+invoice totals, and that allocation issues a fixed number of queries and a
+single flush regardless of how many items or payments are involved.
+"""
+
+import uuid
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1.endpoints import payments as payments_endpoint
+from app.schemas.enums import PaymentStatus
+from app.services import invoice_service
+from app.services.payment_service import PaymentService
+from tests.utils.db_mocks import compiled_sql, mock_db, rows_result
+
+pytestmark = pytest.mark.asyncio
+
+
+def _db(payment_rows: list, item_rows: list) -> AsyncMock:
+    return mock_db(rows_result(payment_rows), rows_result(item_rows))
+
+
+def _invoice(invoice_id: int, amount_due: str) -> SimpleNamespace:
+    return SimpleNamespace(id=invoice_id, amount_due=Decimal(amount_due), amount_paid=Decimal("0"), payment_status="unpaid")
+
+
+def _item(item_id: int, invoice_id: int, final_amount: str) -> SimpleNamespace:
+    return SimpleNamespace(id=item_id, invoice_id=invoice_id, final_amount=Decimal(final_amount))
+
+
+def _payment(payment_id: int, invoice_id: int, amount: str) -> SimpleNamespace:
+    return SimpleNamespace(id=payment_id, invoice_id=invoice_id, amount_paid=Decimal(amount), user_id=uuid.uuid4())
+
+
+async def test_batch_allocation_fills_items_in_order_with_two_queries_and_one_flush():
+    tuition, transport = _invoice(1, "5000.00"), _invoice(2, "800.00")
+    first, second, third = _payment(11, 1, "2500.00"), _payment(12, 1, "2000.00"), _payment(13, 2, "800.00")
+    db = _db(
+        [(first, tuition, False), (second, tuition, False), (third, transport, False)],
+        [(_item(101, 1, "3000.00"), Decimal("1000.00")), (_item(102, 1, "2000.00"), 0), (_item(201, 2, "800.00"), 0)],
+    )
+
+    allocations = await invoice_service.allocate_payments_to_invoice_items(db, payment_ids=[11, 12, 13])
+
+    split = {payment_id: [(a.invoice_item_id, a.amount_allocated) for a in payment_allocations] for payment_id, payment_allocations in allocations.items()}
+    assert split == {11: [(101, Decimal("2000.00")), (102, Decimal("500.00"))], 12: [(102, Decimal("1500.00"))], 13: [(201, Decimal("800.00"))]}
+    assert allocations[11][0].allocated_by_user_id == first.user_id
+    assert (tuition.amount_paid, tuition.payment_status) == (Decimal("5000.00"), "paid")
+    assert (transport.amount_paid, transport.payment_status) == (Decimal("800.00"), "paid")
+    assert db.execute.await_count == 2
+    db.add_all.assert_called_once()
+    assert len(db.add_all.call_args.args[0]) == 4
+    db.flush.assert_awaited_once()
+    db.commit.assert_not_called()
+
+
+async def test_already_allocated_payments_are_skipped():
+    invoice = _invoice(1, "3000.00")
+    db = _db([(_payment(11, 1, "1000.00"), invoice, True), (_payment(12, 1, "500.00"), invoice, False)], [(_item(101, 1, "3000.00"), Decimal("1000.00"))])
+
+    allocations = await invoice_service.allocate_payments_to_invoice_items(db, payment_ids=[11, 12])
+
+    assert list(allocations) == [12]
+    assert (invoice.amount_paid, invoice.payment_status) == (Decimal("1500.00"), "partially_paid")
+
+
+async def test_single_payment_allocation_uses_the_batch_path():
+    invoice = _invoice(1, "3000.00")
+    payment = _payment(11, 1, "1200.00")
+    db = _db([(payment, invoice, False)], [(_item(101, 1, "1000.00"), 0), (_item(102, 1, "2000.00"), 0)])
+    db.get = AsyncMock(return_value=payment)
+    user_id = uuid.uuid4()
+
+    allocations = await invoice_service.allocate_payment_to_invoice_items(db=db, payment_id=11, user_id=user_id)
+
+    assert [(a.invoice_item_id, a.amount_allocated, a.allocated_by_user_id) for a in allocations] == [(101, Decimal("1000.00"), user_id), (102, Decimal("200.00"), user_id)]
+
+    db.get = AsyncMock(return_value=None)
+    with pytest.raises(ValueError):
+        await invoice_service.allocate_payment_to_invoice_items(db=db, payment_id=99, user_id=user_id)
+
+
+async def test_bulk_retry_of_failed_allocations(mocker):
+    failed = [SimpleNamespace(id=11, invoice_id=1, status=PaymentStatus.CAPTURED_ALLOCATION_FAILED, error_description="x"), SimpleNamespace(id=12, invoice_id=None, status=PaymentStatus.CAPTURED_ALLOCATION_FAILED, error_description="x")]
+    db = AsyncMock(spec=AsyncSession)
+    service = PaymentService(db)
+    mocker.patch.object(service, "get_failed_allocations", AsyncMock(return_value=failed))
+    allocate = mocker.patch("app.services.invoice_service.allocate_payments_to_invoice_items", new_callable=AsyncMock, return_value={11: [MagicMock(), MagicMock()]})
+
+    summary = await service.retry_failed_allocations(db=db, school_id=4)
+
+    allocate.assert_awaited_once_with(db, payment_ids=[11])
+    assert summary == {"retried": 2, "allocations_created": 2}
+    assert all(payment.status == PaymentStatus.CAPTURED for payment in failed)
+    db.commit.assert_awaited_once()
+
+    allocate.side_effect = Exception("deadlock detected")
+    with pytest.raises(HTTPException) as exc_info:
+        await service.retry_failed_allocations(db=db, school_id=4)
+    assert exc_info.value.status_code == 500
+    db.rollback.assert_awaited_once()
+
+
+async def test_bulk_retry_leaves_other_schools_payments_alone(mocker):
+    # The database holds failed payments of schools 4 and 9; it answers the query with the ones it matches
+    ours = SimpleNamespace(id=11, school_id=4, invoice_id=None, status=PaymentStatus.CAPTURED_ALLOCATION_FAILED, error_description="x")
+    theirs = SimpleNamespace(id=12, school_id=9, invoice_id=None, status=PaymentStatus.CAPTURED_ALLOCATION_FAILED, error_description="x")
+    db = mock_db()
+    db.execute.side_effect = lambda stmt: rows_result([payment for payment in (ours, theirs) if payment.school_id == stmt.compile().params["school_id_1"]])
+    mocker.patch("app.services.invoice_service.allocate_payments_to_invoice_items", new_callable=AsyncMock, return_value={})
+
+    summary = await payments_endpoint.retry_all_failed_payment_allocations(db=db, current_user=SimpleNamespace(school_id=4))
+
+    sql = compiled_sql(db.execute.await_args.args[0])
+    assert "payments.school_id = " in sql and "payments.status = " in sql
+    assert summary == {"retried": 1, "allocations_created": 0}
+    assert (ours.status, theirs.status) == (PaymentStatus.CAPTURED, PaymentStatus.CAPTURED_ALLOCATION_FAILED)
@@ -0,0 +1,156 @@
+"""
+Unit tests for bulk invoice generation in invoice_service.
+
+The session is mocked: the tests check the in-memory fee computation, that a
+batch of students costs a fixed number of statements, and the progress that a
+school-wide job reports.
+"""
+
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.school_invoice_job import SchoolInvoiceJob
+from app.schemas.invoice_schema import BulkInvoiceCreate
+from app.services import invoice_service
+from tests.utils.db_mocks import rows_result
+
+pytestmark = pytest.mark.asyncio
+
+FEE_TERM = SimpleNamespace(id=3, fee_template_id=9, due_date=date(2026, 7, 10))
+
+
+def _job() -> SchoolInvoiceJob:
+    return SchoolInvoiceJob(job_id="a" * 32, school_id=4, fee_term_id=3, status="pending", classes_total=0, classes_done=0, students_total=0, invoices_created=0, students_skipped=0)
+
+
+async def _sessions(session):
+    yield session
+
+
+def _discount(discount_id: int, type_: str, value: str, component_ids: list = None) -> SimpleNamespace:
+    return SimpleNamespace(id=discount_id, type=type_, value=Decimal(value), is_active=True, rules={"applicable_to_component_ids": component_ids} if component_ids else None)
+
+
+async def test_bulk_generation_uses_a_fixed_number_of_statements():
+    db = AsyncMock(spec=AsyncSession)
+    number = invoice_service._invoice_number
+    db.execute = AsyncMock(
+        side_effect=[
+            rows_result([(10, 1, Decimal("5000")), (10, 2, Decimal("1000")), (20, 1, Decimal("6000"))]),  # class fees
+            rows_result([(10, 4), (20, 4)]),  # class -> school
+            rows_result([(1, "Tuition"), (2, "Transport")]),  # component names
+            rows_result([number(103, FEE_TERM.id)]),  # already invoiced
+            rows_result([(101, 2)]),  # transport switched off for student 101
+            rows_result([(102, _discount(7, "percentage", "10", [1]))]),  # sibling discount on tuition
+            rows_result([(501, 101), (502, 102), (503, 201)]),  # INSERT invoices ... RETURNING
+            rows_result([]),  # INSERT invoice items
+            rows_result([]),  # INSERT applied discounts
+        ]
+    )
+
+    counts = await invoice_service._bulk_generate_invoices(db, students=[(101, 10), (102, 10), (103, 10), (201, 20)], fee_term=FEE_TERM)
+
+    assert counts == {10: {"created": 2, "skipped": 1}, 20: {"created": 1, "skipped": 0}}
+    assert db.execute.await_count == 9
+    invoices = db.execute.await_args_list[6].args[1]
+    assert [(row["student_id"], row["amount_due"], row["invoice_number"]) for row in invoices] == [(101, Decimal("5000"), number(101, 3)), (102, Decimal("5500.0"), number(102, 3)), (201, Decimal("6000"), number(201, 3))]
+    items = db.execute.await_args_list[7].args[1]
+    assert [(row["invoice_id"], row["component_name"], row["final_amount"]) for row in items] == [
+        (501, "Tuition", Decimal("5000")),
+        (502, "Tuition", Decimal("4500.0")),
+        (502, "Transport", Decimal("1000")),
+        (503, "Tuition", Decimal("6000")),
+    ]
+    assert all(row["school_id"] == 4 for row in items)
+    assert db.execute.await_args_list[8].args[1] == [{"discount_id": 7, "amount_discounted": Decimal("500.0"), "invoice_id": 502}]
+
+
+async def test_class_generation_reports_created_and_skipped(mocker):
+    db = AsyncMock(spec=AsyncSession)
+    db.execute = AsyncMock(return_value=rows_result([(101, 10), (102, 10)]))
+    db.get = AsyncMock(return_value=FEE_TERM)
+    bulk = mocker.patch.object(invoice_service, "_bulk_generate_invoices", AsyncMock(return_value={10: {"created": 1, "skipped": 1}}))
+
+    result = await invoice_service.generate_invoices_for_class(db, obj_in=BulkInvoiceCreate(class_id=10, fee_term_id=3))
+
+    assert result == {"detail": "Bulk invoice generation complete.", "successful": 1, "failed": 0, "skipped": 1}
+    bulk.assert_awaited_once_with(db, students=[(101, 10), (102, 10)], fee_term=FEE_TERM)
+
+
+async def test_school_job_processes_classes_in_chunks_and_reports_progress(mocker):
+    db = AsyncMock(spec=AsyncSession)
+    db.execute = AsyncMock(return_value=rows_result([(1, 10), (2, 10), (3, 20), (4, 30), (5, 30)]))
+    db.get = AsyncMock(return_value=FEE_TERM)
+    progress = []
+
+    async def bulk(db, *, students, fee_term):
+        progress.append((job.classes_done, [student_id for student_id, _ in students]))
+        return {class_id: {"created": sum(1 for _, c in students if c == class_id), "skipped": 0} for _, class_id in students}
+
+    mocker.patch.object(invoice_service, "INVOICE_BULK_CHUNK_SIZE", 3)
+    mocker.patch.object(invoice_service, "_bulk_generate_invoices", side_effect=bulk)
+    saved = []
+    mocker.patch.object(invoice_service, "_save_job_progress", AsyncMock(side_effect=lambda job: saved.append((job.status, job.classes_done, job.invoices_created))))
+    job = _job()
+
+    await invoice_service.generate_invoices_for_school(db, job=job)
+
+    assert progress == [(0, [1, 2, 3]), (2, [4, 5])]
+    assert (job.status, job.classes_total, job.classes_done, job.students_total, job.invoices_created) == ("completed", 3, 3, 5, 5)
+    # Saved before the first chunk, after each chunk, and when done
+    assert saved == [("running", 0, 0), ("running", 2, 3), ("running", 3, 5), ("completed", 3, 5)]
+    db.commit.assert_awaited_once()
+
+
+async def test_school_job_failure_rolls_back_everything(mocker):
+    db = AsyncMock(spec=AsyncSession)
+    db.execute = AsyncMock(return_value=rows_result([(1, 10), (2, 20)]))
+    db.get = AsyncMock(return_value=FEE_TERM)
+    mocker.patch.object(invoice_service, "INVOICE_BULK_CHUNK_SIZE", 1)
+    mocker.patch.object(invoice_service, "_bulk_generate_invoices", side_effect=[{10: {"created": 1, "skipped": 0}}, Exception("duplicate key value")])
+    log_failure = mocker.patch.object(invoice_service, "_log_bulk_failure", AsyncMock())
+    save = mocker.patch.object(invoice_service, "_save_job_progress", AsyncMock())
+    job = _job()
+
+    await invoice_service.generate_invoices_for_school(db, job=job)
+
+    assert (job.status, job.classes_done, job.invoices_created) == ("failed", 1, 0)
+    assert "rolled back" in job.error
+    assert save.await_args.args[0] is job and job.finished_at is not None
+    db.rollback.assert_awaited_once()
+    db.commit.assert_not_called()
+    log_failure.assert_awaited_once()
+
+
+async def test_school_jobs_are_stored_and_read_back_per_school(mocker):
+    db = AsyncMock(spec=AsyncSession)
+    db.add = MagicMock()
+
+    job = await invoice_service.create_school_invoice_job(db, school_id=4, fee_term_id=3)
+
+    db.add.assert_called_once_with(job)
+    db.commit.assert_awaited_once()
+    assert (job.status, len(job.job_id)) == ("pending", 32)
+
+    db.execute = AsyncMock(return_value=rows_result([job]))
+    db.execute.return_value.scalars.return_value.first.return_value = job
+    assert await invoice_service.get_school_invoice_job(db, job.job_id, 4) is job
+    lookup = db.execute.await_args.args[0].compile().params
+    assert (lookup["job_id_1"], lookup["school_id_1"]) == (job.job_id, 4)
+
+    # The worker runs a detached copy, so rolling back the invoices cannot expire it
+    worker_db = AsyncMock(spec=AsyncSession)
+    worker_db.get = AsyncMock(return_value=job)
+    worker_db.expunge = MagicMock()
+    mocker.patch.object(invoice_service, "get_db", lambda: _sessions(worker_db))
+    generate = mocker.patch.object(invoice_service, "generate_invoices_for_school", AsyncMock())
+
+    await invoice_service.run_school_invoice_job(job.job_id)
+
+    worker_db.expunge.assert_called_once_with(job)
+    generate.assert_awaited_once_with(worker_db, job=job)
@@ -0,0 +1,83 @@
+"""
+Unit tests for bulk cancellation of unpaid orders.
+
+Orders must be locked in chunks with SKIP LOCKED and committed per chunk, only
+unpaid pending orders of the admin's school may be cancelled, and abandoned
+orders must be expired by the pending-payment reconciliation.
+"""
+
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from pydantic import ValidationError
+
+from app.api.v1.endpoints import orders
+from app.schemas.order_schema import OrderBulkCancel
+from app.services import order_cancellation_service, stock_reservation_service
+from tests.utils.db_mocks import compiled_sql, mock_db, rows_result
+
+pytestmark = pytest.mark.asyncio
+
+NOW = datetime(2026, 10, 1, 12, 0, tzinfo=timezone.utc)
+
+
+async def test_order_ids_are_cancelled_in_committed_chunks_and_the_rest_reported():
+    # [1, 2] cancelled; of [3, 5] order 5 is locked elsewhere; [9] is already paid
+    db = mock_db(rows_result([1, 2]), MagicMock(), rows_result([3]), MagicMock(), rows_result([]))
+    restore = AsyncMock(side_effect=[4, 1])
+
+    with patch.object(stock_reservation_service, "restore_stock", restore):
+        result = await order_cancellation_service.cancel_unpaid_orders(db, school_id=4, order_ids=[5, 1, 2, 9, 3, 2], chunk_size=2, now=NOW)
+
+    assert result == {"orders_cancelled": 3, "units_restocked": 5, "chunks": 3, "cancelled_order_ids": [1, 2, 3], "skipped_order_ids": [5, 9]}
+    lock_sql = compiled_sql(db.execute.await_args_list[0].args[0])
+    assert "FOR UPDATE SKIP LOCKED" in lock_sql and "orders.school_id = " in lock_sql and "NOT (EXISTS" in lock_sql
+    assert db.execute.await_args_list[0].args[0].compile().params["order_id_1"] == [1, 2]
+    assert compiled_sql(db.execute.await_args_list[1].args[0]).startswith("UPDATE orders SET status=")
+    assert [call.args[1] for call in restore.await_args_list] == [[1, 2], [3]]
+    assert db.commit.await_count == 2  # one per chunk that cancelled something
+
+
+async def test_criteria_run_repeats_until_no_unlocked_order_matches():
+    db = mock_db(rows_result([1, 2]), MagicMock(), rows_result([3]), MagicMock(), rows_result([]))
+
+    with patch.object(stock_reservation_service, "restore_stock", AsyncMock(return_value=2)):
+        result = await order_cancellation_service.cancel_unpaid_orders(db, school_id=4, created_before=NOW - timedelta(days=7), chunk_size=2, now=NOW)
+
+    assert (result["orders_cancelled"], result["units_restocked"], result["chunks"], result["skipped_order_ids"]) == (3, 4, 2, [])
+    lock = db.execute.await_args_list[0].args[0]
+    assert "orders.created_at < " in compiled_sql(lock) and lock.compile().params["param_1"] == 2
+    assert db.commit.await_count == 2
+
+
+async def test_expiry_leaves_orders_with_a_pending_payment_to_the_reconciler():
+    db = mock_db(rows_result([]))
+
+    summary = await order_cancellation_service.expire_unpaid_orders(db, now=NOW)
+
+    lock = db.execute.await_args.args[0]
+    params = lock.compile().params
+    assert "pending" in params["status_2"] and "captured" in params["status_2"]
+    assert params["created_at_1"] == NOW - timedelta(hours=order_cancellation_service.ORDER_PENDING_PAYMENT_EXPIRY_HOURS)
+    assert "orders.school_id" not in compiled_sql(lock)  # every school
+    assert summary == {"unpaid_orders_expired": 0, "unpaid_units_restocked": 0}
+    db.commit.assert_not_called()
+
+
+async def test_bulk_cancel_needs_exactly_one_selection():
+    with pytest.raises(ValidationError):
+        OrderBulkCancel(reason="cleanup")
+    with pytest.raises(ValidationError):
+        OrderBulkCancel(order_ids=[1], older_than_days=3, reason="cleanup")
+
+
+async def test_endpoint_scopes_the_run_to_the_admins_school():
+    run = {"orders_cancelled": 2, "units_restocked": 3, "chunks": 1, "cancelled_order_ids": [1, 2], "skipped_order_ids": []}
+    with patch.object(order_cancellation_service, "cancel_unpaid_orders", AsyncMock(return_value=run)) as cancel:
+        result = await orders.admin_bulk_cancel_orders(cancel_data=OrderBulkCancel(older_than_days=7, reason="Unpaid for a week"), db=MagicMock(), current_profile=MagicMock(school_id=4))
+
+    kwargs = cancel.await_args.kwargs
+    assert (kwargs["school_id"], kwargs["order_ids"], kwargs["reason"]) == (4, None, "Unpaid for a week")
+    assert timedelta(days=7) <= datetime.now(timezone.utc) - kwargs["created_before"] < timedelta(days=7, minutes=1)
+    assert result.orders_cancelled == 2
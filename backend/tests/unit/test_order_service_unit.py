@@ -15,6 +15,7 @@ from uuid import UUID
 
 import pytest
 from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.cart import Cart
@@ -42,6 +43,7 @@ def mock_db_session():
     session.commit = AsyncMock()
     session.refresh = AsyncMock()
     session.add = MagicMock()
+    session.add_all = MagicMock()
     session.delete = AsyncMock()
     session.flush = AsyncMock()
     session.rollback = AsyncMock()
@@ -193,6 +195,20 @@ def create_mock_query_result(return_value, method="first"):
     return result_mock
 
 
+def create_reservation_result(product_id):
+    """Result of a conditional stock decrement (None when the units are gone)."""
+    result_mock = MagicMock()
+    result_mock.scalar_one_or_none.return_value = product_id
+    return result_mock
+
+
+def create_release_result(rows):
+    """Result of releasing an order's held reservations: (product_id, quantity) rows."""
+    result_mock = MagicMock()
+    result_mock.all.return_value = rows
+    return result_mock
+
+
 def create_order_instance(user_id: UUID, school_id: int, student_id: int) -> Order:
     """Helper function to create Order instances in tests."""
     return Order(
@@ -245,6 +261,7 @@ async def test_create_order_from_cart_success(
         contact_query,
         cart_query,
         product_lock_query,
+        create_reservation_result(16),
         final_order_query,
     ]
 
@@ -304,6 +321,7 @@ async def test_create_order_preserves_price_at_time_of_order(
         contact_query,
         cart_query,
         product_lock_query,
+        create_reservation_result(16),
         final_order_query,
     ]
 
@@ -354,6 +372,7 @@ async def test_create_order_generates_unique_order_number(
         contact_query,
         cart_query,
         product_lock_query,
+        create_reservation_result(16),
         final_order_query,
     ]
 
@@ -389,16 +408,17 @@ async def test_cancel_order_with_refund_flag(
     order_fetch_query = create_mock_query_result(sample_order)
 
     # Mock queries for cancel_order operation
-    order_items_query = create_mock_query_result([sample_order_item], method="all")
-    product_lock_query = create_mock_query_result(sample_product)
+    order_items_query = create_release_result([(sample_order_item.product_id, sample_order_item.quantity)])
 
     # Mock final order reload
     final_order_query = create_mock_query_result(sample_order)
 
     mock_db_session.execute.side_effect = [
         order_fetch_query,  # _get_order_by_id_internal
-        order_items_query,  # Get order items
-        product_lock_query,  # Lock product
+        create_mock_query_result(sample_order),  # The order, locked
+        create_release_result([]),  # No held reservations
+        order_items_query,  # Order item quantities per product
+        MagicMock(),  # Restock
         final_order_query,  # Reload order after commit
     ]
 
@@ -418,7 +438,7 @@ async def test_cancel_order_with_refund_flag(
 
 
 @pytest.mark.asyncio
-async def test_create_order_uses_pessimistic_locking(
+async def test_create_order_reserves_stock_with_conditional_decrement(
     mock_db_session,
     sample_parent_profile,
     sample_student,
@@ -428,7 +448,8 @@ async def test_create_order_uses_pessimistic_locking(
     sample_student_contact,
 ):
     """
-    Unit Test: Verify pessimistic locking (SELECT FOR UPDATE) is used.
+    Unit Test: Products are read without locks; stock is taken by a conditional
+    decrement right before commit and recorded as a held reservation.
     """
     # Arrange
     sample_cart.items = [sample_cart_item]
@@ -448,6 +469,7 @@ async def test_create_order_uses_pessimistic_locking(
         contact_query,
         cart_query,
         product_lock_query,
+        create_reservation_result(16),
         final_order_query,
     ]
 
@@ -459,7 +481,12 @@ async def test_create_order_uses_pessimistic_locking(
         await service.create_order_from_cart(checkout_data=checkout_data, current_profile=sample_parent_profile)
 
     # Assert
-    assert mock_db_session.execute.call_count >= 4
+    statements = [str(call.args[0].compile(dialect=postgresql.dialect())) for call in mock_db_session.execute.await_args_list]
+    assert "FOR UPDATE" not in statements[3]
+    assert "UPDATE products SET stock_quantity=(products.stock_quantity - " in statements[4]
+    assert "products.stock_quantity >= " in statements[4] and "RETURNING products.product_id" in statements[4]
+    [reservations] = mock_db_session.add_all.call_args.args
+    assert [(r.product_id, r.quantity, r.status) for r in reservations] == [(16, 2, "held")]
 
 
 @pytest.mark.asyncio
@@ -506,14 +533,14 @@ async def test_stock_validation_after_lock_acquisition(
 
 
 @pytest.mark.asyncio
-async def test_cancel_order_uses_pessimistic_locking_for_stock(
+async def test_cancel_order_restores_stock_in_one_statement(
     mock_db_session,
     sample_order,
     sample_order_item,
     sample_product,
 ):
     """
-    Unit Test: Cancellation also uses pessimistic locking for stock restoration.
+    Unit Test: Cancellation restores the stock of all items with one UPDATE ... FROM (VALUES ...).
     """
     # Arrange
     sample_order.status = OrderStatus.PENDING_PAYMENT
@@ -523,14 +550,15 @@ async def test_cancel_order_uses_pessimistic_locking_for_stock(
 
     # Mock queries
     order_fetch_query = create_mock_query_result(sample_order)
-    order_items_query = create_mock_query_result([sample_order_item], method="all")
-    product_lock_query = create_mock_query_result(sample_product)
+    order_items_query = create_release_result([(16, 2), (21, 1)])
     final_order_query = create_mock_query_result(sample_order)
 
     mock_db_session.execute.side_effect = [
         order_fetch_query,
+        create_mock_query_result(sample_order),  # The order, locked
+        create_release_result([]),  # No held reservations
         order_items_query,
-        product_lock_query,
+        MagicMock(),
         final_order_query,
     ]
 
@@ -539,8 +567,44 @@ async def test_cancel_order_uses_pessimistic_locking_for_stock(
     # Act
     await service.cancel_order(order_id=sample_order.order_id, user_id=sample_order.parent_user_id, is_admin=False, cancel_data=cancel_data, cancelled_by_user_id=UUID("da134162-0d5d-4215-b93b-aefb747ffa17"))
 
-    # Assert - 4 execute calls: fetch order, get items, lock product, reload order
-    assert mock_db_session.execute.call_count == 4
+    # Assert - 6 execute calls: fetch order, lock it, release reservations, sum items, restock, reload order
+    assert mock_db_session.execute.call_count == 6
+    restock_sql = str(mock_db_session.execute.call_args_list[4].args[0].compile(dialect=postgresql.dialect()))
+    assert "FROM (VALUES " in restock_sql and restock_sql.count("FOR UPDATE") == 1  # one lock for all products, not one per item
+    assert sample_order.status == OrderStatus.CANCELLED
+
+
+@pytest.mark.asyncio
+async def test_cancel_order_rechecks_the_status_under_the_order_lock(
+    mock_db_session,
+    sample_order,
+):
+    """
+    Unit Test: The order row is locked before any stock moves, and an order that
+    changed meanwhile (here: shipped) is not cancelled or restocked.
+    """
+    # Arrange
+    sample_order.status = OrderStatus.PENDING_PAYMENT
+
+    def shipped_meanwhile():
+        sample_order.status = OrderStatus.SHIPPED
+        return sample_order
+
+    locked_query = MagicMock()
+    locked_query.scalars.return_value.first.side_effect = shipped_meanwhile
+    mock_db_session.execute.side_effect = [create_mock_query_result(sample_order), locked_query]
+
+    service = OrderService(mock_db_session)
+
+    # Act & Assert
+    with pytest.raises(HTTPException) as exc_info:
+        await service.cancel_order(order_id=sample_order.order_id, user_id=sample_order.parent_user_id, is_admin=False, cancel_data=OrderCancel(reason="Changed my mind"), cancelled_by_user_id=sample_order.parent_user_id)
+
+    assert exc_info.value.status_code == 400
+    lock_sql = str(mock_db_session.execute.call_args_list[1].args[0].compile(dialect=postgresql.dialect()))
+    assert "WHERE orders.order_id = " in lock_sql and lock_sql.endswith("FOR UPDATE")
+    assert mock_db_session.execute.call_count == 2  # no reservation released, nothing restocked
+    mock_db_session.commit.assert_not_called()
 
 
 # ============================================================================
@@ -576,6 +640,7 @@ async def test_create_order_handles_database_commit_failure(
         contact_query,
         cart_query,
         product_lock_query,
+        create_reservation_result(16),
     ]
 
     # Simulate commit failure
@@ -611,13 +676,14 @@ async def test_cancel_order_handles_commit_failure(
 
     # Mock queries
     order_fetch_query = create_mock_query_result(sample_order)
-    order_items_query = create_mock_query_result([sample_order_item], method="all")
-    product_lock_query = create_mock_query_result(sample_product)
+    order_items_query = create_release_result([(16, 2)])
 
     mock_db_session.execute.side_effect = [
         order_fetch_query,
+        create_mock_query_result(sample_order),  # The order, locked
+        create_release_result([]),  # No held reservations
         order_items_query,
-        product_lock_query,
+        MagicMock(),  # Restock
     ]
 
     # Simulate commit failure
@@ -722,6 +788,8 @@ async def test_order_total_calculated_correctly(
         contact_query,
         cart_query,
         product_lock_query,
+        create_reservation_result(16),
+        create_reservation_result(17),
         final_order_query,
     ]
 
@@ -768,6 +836,7 @@ async def test_order_status_starts_as_pending_payment(
         contact_query,
         cart_query,
         product_lock_query,
+        create_reservation_result(16),
         final_order_query,
     ]
 
@@ -813,6 +882,7 @@ async def test_cart_cleared_only_after_successful_order(
         contact_query,
         cart_query,
         product_lock_query,
+        create_reservation_result(16),
         final_order_query,
     ]
 
@@ -0,0 +1,103 @@
+"""
+Unit tests for the order statistics snapshot.
+
+The snapshot must be one conditional-aggregation scan on orders.school_id (no
+join), cached until the TTL runs out or an order of the school is written, and
+a date range must add a gap-free daily series.
+"""
+
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException
+
+from app.db.write_tracking import notify_tables_committed
+from app.services import order_statistics_service
+from app.services.order_service import OrderService
+from tests.utils.db_mocks import compiled_sql, mock_db
+
+pytestmark = pytest.mark.asyncio
+
+ROW = {
+    "total_orders": 5,
+    "pending_payment_count": 1,
+    "processing_count": 1,
+    "shipped_count": 0,
+    "delivered_count": 2,
+    "cancelled_count": 1,
+    "total_revenue": Decimal("4500.00"),
+    "pending_revenue": Decimal("1000.00"),
+}
+
+
+@pytest.fixture(autouse=True)
+def _empty_cache():
+    order_statistics_service.invalidate_snapshots()
+    yield
+    order_statistics_service.invalidate_snapshots()
+
+
+def _snapshot_row(row: dict = ROW) -> MagicMock:
+    result = MagicMock()
+    result.mappings.return_value.one.return_value = row
+    return result
+
+
+def _days(rows: list) -> MagicMock:
+    result = MagicMock()
+    result.all.return_value = [SimpleNamespace(day=day, orders=orders, revenue=revenue, pending_revenue=pending) for day, orders, revenue, pending in rows]
+    return result
+
+
+async def test_snapshot_is_one_scan_of_the_schools_orders():
+    db = mock_db(_snapshot_row())
+
+    stats = await OrderService(db).get_order_statistics(school_id=4)
+
+    assert db.execute.await_count == 1
+    sql = compiled_sql(db.execute.await_args.args[0])
+    assert "count(*) FILTER (WHERE orders.status = " in sql and "sum(orders.total_amount) FILTER" in sql
+    assert "orders.school_id = " in sql and "JOIN" not in sql
+    assert stats["delivered_count"] == 2 and stats["total_revenue"] == Decimal("4500.00")
+    assert stats["average_order_value"] == Decimal("900.00") and "daily" not in stats
+
+
+async def test_snapshot_is_cached_until_an_order_of_the_school_is_written():
+    db = mock_db(_snapshot_row(), _snapshot_row({**ROW, "total_orders": 6}))
+
+    first = await order_statistics_service.get_snapshot(db, 4)
+    assert await order_statistics_service.get_snapshot(db, 4) == first
+    notify_tables_committed({"orders": {7}})  # another school
+    assert (await order_statistics_service.get_snapshot(db, 4))["total_orders"] == 5
+    assert db.execute.await_count == 1
+
+    notify_tables_committed({"orders": {4}})
+    assert (await order_statistics_service.get_snapshot(db, 4))["total_orders"] == 6
+
+
+async def test_daily_series_covers_every_day_of_the_range():
+    db = mock_db(_snapshot_row(), _days([(date(2026, 9, 2), 3, Decimal("1500.00"), Decimal("0.00"))]))
+
+    stats = await order_statistics_service.get_snapshot(db, 4, date_from=date(2026, 9, 1), date_to=date(2026, 9, 3))
+
+    snapshot_stmt, series_stmt = (call.args[0] for call in db.execute.await_args_list)
+    assert "orders.created_at >= " in compiled_sql(snapshot_stmt) and "orders.created_at < " in compiled_sql(snapshot_stmt)
+    assert "GROUP BY day" in compiled_sql(series_stmt)
+    assert [(day["date"], day["orders"], day["revenue"]) for day in stats["daily"]] == [
+        (date(2026, 9, 1), 0, Decimal("0.00")),
+        (date(2026, 9, 2), 3, Decimal("1500.00")),
+        (date(2026, 9, 3), 0, Decimal("0.00")),
+    ]
+
+
+async def test_reversed_or_overlong_ranges_are_rejected():
+    service = OrderService(mock_db())
+
+    with pytest.raises(HTTPException) as exc_info:
+        await service.get_order_statistics(school_id=4, date_from=date(2026, 9, 2), date_to=date(2026, 9, 1))
+    assert exc_info.value.status_code == 400
+    with pytest.raises(HTTPException):
+        await service.get_order_statistics(school_id=4, date_from=date(2025, 1, 1), date_to=date(2026, 9, 1))
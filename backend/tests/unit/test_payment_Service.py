@@ -373,16 +373,17 @@ async def test_verify_payment_valid_signature_for_order(mocker, mock_razorpay_cl
     db = AsyncMock(spec=AsyncSession)
 
     # RACE CONDITION FIX: verify_payment now uses SELECT ... FOR UPDATE
-    # db.execute is called TWICE:
-    # 1. First for SELECT Payment ... FOR UPDATE (get payment with lock)
-    # 2. Second for SELECT Order ... (fetch order for update)
+    # db.execute is called for:
+    # 1. SELECT Payment ... FOR UPDATE (get payment with lock)
+    # 2. UPDATE orders ... WHERE status = 'pending_payment' RETURNING (confirm the order)
+    # 3. UPDATE stock_reservations, 4. the sales rollup
     mock_payment_result = MagicMock()
     mock_payment_result.scalar_one_or_none.return_value = mock_pending_payment
 
     mock_order_result = MagicMock()
-    mock_order_result.scalar_one_or_none.return_value = mock_order
+    mock_order_result.scalar_one_or_none.return_value = mock_order.order_id
 
-    db.execute = AsyncMock(side_effect=[mock_payment_result, mock_order_result])
+    db.execute = AsyncMock(side_effect=[mock_payment_result, mock_order_result, MagicMock(), MagicMock()])
 
     # db.get fetches the school only
     async def db_get_side_effect(model, pk, **kwargs):
@@ -414,12 +415,12 @@ async def test_verify_payment_valid_signature_for_order(mocker, mock_razorpay_cl
     mock_razorpay_client.payment.fetch.assert_called_once_with("pay_VALID_SIG")
 
     # Assert: If order: order.status = 'processing' (KEY TEST)
-    # RACE CONDITION FIX: db.execute is called twice now:
-    # 1. SELECT Payment ... FOR UPDATE (fetch payment with lock)
-    # 2. SELECT Order ... (fetch order for update)
-    assert db.execute.call_count == 2
-    # Check the *mock_order* object itself was modified
-    assert mock_order.status == "processing"
+    # The order is confirmed with a conditional UPDATE, so a cancellation that won the row lock is never overwritten
+    confirm = str(db.execute.await_args_list[1].args[0])
+    assert confirm.startswith("UPDATE orders SET status=") and "orders.status = :status_1" in confirm
+    assert db.execute.await_args_list[1].args[0].compile().params["status"] == "processing"
+    assert "UPDATE stock_reservations SET status" in str(db.execute.await_args_list[2].args[0])
+    assert db.execute.call_count == 4
 
     # Assert: Transaction was committed
     db.commit.assert_called_once()
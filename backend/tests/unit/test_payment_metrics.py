@@ -0,0 +1,93 @@
+"""
+Unit tests for the incrementally maintained payment health rollup.
+
+Status transitions are collected from a real (unbound) ORM session, so the
+attribute history the flush hook relies on is exercised; the database side is
+checked through the compiled upsert and mocked reads.
+"""
+
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.models.gateway_webhook_event import GatewayWebhookEvent
+from app.models.payment import Payment
+from app.schemas.enums import PaymentStatus
+from app.services import payment_metrics_service
+from app.services.payment_service import PaymentService
+
+NOW = datetime(2026, 10, 19, 13, 42, 7, tzinfo=timezone.utc)
+HOUR = datetime(2026, 10, 19, 13, tzinfo=timezone.utc)
+
+
+def _persistent(session: Session, obj):
+    make_transient_to_detached(obj)
+    session.add(obj)
+    return obj
+
+
+def test_status_transitions_are_counted_per_school_and_hour():
+    session = Session()
+    session.add(Payment(school_id=1, status="pending"))
+    captured = _persistent(session, Payment(id=10, school_id=1, status="pending", error_description=None))
+    reconciled = _persistent(session, Payment(id=11, school_id=2, status="pending", error_description=None))
+    allocation_failed = _persistent(session, Payment(id=12, school_id=2, status="captured"))
+    untouched = _persistent(session, Payment(id=13, school_id=2, status="failed"))
+    event = _persistent(session, GatewayWebhookEvent(id=5, event_id="evt", status="received", school_id=None))
+
+    captured.status = PaymentStatus.CAPTURED
+    reconciled.status = PaymentStatus.FAILED
+    reconciled.error_description = "Reconciled: No payment attempt made within 30 hours. Likely abandoned."
+    allocation_failed.status = PaymentStatus.CAPTURED_ALLOCATION_FAILED
+    untouched.status = "failed"  # same value: not a transition
+    event.status = "processed"
+
+    deltas = payment_metrics_service.collect_deltas(session, now=NOW)
+
+    assert {key: dict(counts) for key, counts in deltas.items()} == {
+        (1, HOUR): {"payments_initiated": 1, "payments_captured": 1},
+        (2, HOUR): {"payments_failed": 1, "payments_reconciled": 1, "allocation_failures": 1},
+        (None, HOUR): {"webhooks_processed": 1},
+    }
+
+
+def test_counters_are_added_to_their_bucket_in_one_upsert():
+    deltas = {(2, HOUR): payment_metrics_service.Counter(payments_captured=3), (1, HOUR): payment_metrics_service.Counter(webhooks_failed=1)}
+
+    stmt = payment_metrics_service.upsert_statement(deltas)
+
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (school_id, hour_start) DO UPDATE SET" in sql
+    assert "payments_captured = (payment_metrics_hourly.payments_captured + excluded.payments_captured)" in sql
+    params = stmt.compile(dialect=postgresql.dialect()).params
+    assert (params["school_id_m0"], params["webhooks_failed_m0"], params["school_id_m1"], params["payments_captured_m1"]) == (1, 1, 2, 3)
+
+
+def test_flush_hook_writes_on_the_flushing_connection():
+    session = MagicMock()
+    with patch.object(payment_metrics_service, "collect_deltas", return_value={(1, HOUR): payment_metrics_service.Counter(payments_captured=1)}):
+        payment_metrics_service._record_flushed_transitions(session, None)
+    session.connection.return_value.execute.assert_called_once()
+
+    session.reset_mock()
+    with patch.object(payment_metrics_service, "collect_deltas", return_value={}):
+        payment_metrics_service._record_flushed_transitions(session, None)
+    session.connection.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_health_stats_read_the_last_24_buckets():
+    db = AsyncMock(spec=AsyncSession)
+    rollup = MagicMock()
+    rollup.mappings.return_value.one.return_value = {**dict.fromkeys(payment_metrics_service.COUNTERS, 0), "payments_initiated": 8, "payments_captured": 6, "allocation_failures": 1}
+    db.execute = AsyncMock(return_value=rollup)
+
+    stats = await PaymentService(db).get_payment_health_stats(db=db)
+
+    assert (stats.total_payments_24h, stats.successful_payments_24h, stats.success_rate_24h, stats.failed_allocations_24h) == (8, 6, 75.0, 1)
+    sql = str(db.execute.await_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "FROM payment_metrics_hourly" in sql and "payments" not in sql.replace("payments_", "")
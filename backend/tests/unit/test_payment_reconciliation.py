@@ -0,0 +1,151 @@
+"""
+Unit tests for the batched payment reconciliation engine.
+
+Covers resolving a pending backlog from per-school payment listings, the bound
+on concurrent gateway calls, SKIP LOCKED keyset batching and the throughput
+figures surfaced in the reconciliation report.
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.schemas.enums import PaymentStatus
+from app.services import payment_metrics_service, payment_reconciliation_service, razorpay_gateway
+from app.services.payment_service import PaymentService
+from app.services.razorpay_gateway import RazorpayGateway
+from tests.utils.db_mocks import mock_db, rows_result
+from tests.utils.fake_razorpay import FakeRazorpay
+
+pytestmark = pytest.mark.asyncio
+
+
+def _payment(payment_id: int, status: str, hours_old: float, school_id: int = 1, **fields) -> SimpleNamespace:
+    defaults = {"gateway_order_id": None, "gateway_payment_id": None, "invoice_id": 40 + payment_id, "order_id": None, "amount_paid": Decimal("1500.00"), "user_id": "user-1", "error_description": None}
+    created_at = datetime.now(timezone.utc) - timedelta(hours=hours_old)
+    return SimpleNamespace(id=payment_id, status=status, created_at=created_at, school_id=school_id, **{**defaults, **fields})
+
+
+def _db(*batches: list) -> AsyncMock:
+    return mock_db(*(rows_result(batch) for batch in batches))
+
+
+async def test_pending_backlog_is_resolved_from_school_listings():
+    fake = FakeRazorpay()
+    gateway = RazorpayGateway(fake.key_id, fake.key_secret, http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app), base_url="http://fake-razorpay/v1"))
+    paid, failed, abandoned = [await gateway.order.create(data={"amount": 150000}) for _ in range(3)]
+    fake.add_payment(paid["id"], status="failed")
+    captured = fake.add_payment(paid["id"], status="captured")
+    fake.add_payment(failed["id"], status="failed")
+    fake.requests.clear()
+
+    payments = [
+        _payment(1, PaymentStatus.PENDING, 2, school_id=1, gateway_order_id=paid["id"]),
+        _payment(2, PaymentStatus.PENDING, 3, school_id=2, gateway_order_id=failed["id"]),
+        _payment(3, PaymentStatus.PENDING, 30, school_id=2, gateway_order_id=abandoned["id"]),
+    ]
+    db = _db(payments, [], [])  # the claimed batch, then the (empty) expired stock hold and abandoned order sweeps
+
+    with patch.object(razorpay_gateway, "get_school_gateway", AsyncMock(return_value=gateway)), patch("app.services.invoice_service.allocate_payment_to_invoice_items", new_callable=AsyncMock) as mock_allocate:
+        summary = await PaymentService(db).reconcile_pending_payments(db)
+
+    assert [payment.status for payment in payments] == [PaymentStatus.CAPTURED, PaymentStatus.FAILED, PaymentStatus.FAILED]
+    assert payments[0].gateway_payment_id == captured["id"]
+    assert "All 1 payment attempt(s) failed" in payments[1].error_description
+    assert "Likely abandoned" in payments[2].error_description
+    mock_allocate.assert_awaited_once()
+    # One listing per school; only the order without any attempt is looked up individually
+    assert sorted(fake.requests) == [("GET", "/v1/orders/" + abandoned["id"]), ("GET", "/v1/payments"), ("GET", "/v1/payments")]
+    assert (summary["processed"], summary["reconciled"], summary["failed"], summary["schools"], summary["gateway_calls"]) == (3, 1, 2, 2, 3)
+    assert (summary["orders_expired"], summary["units_released"], summary["unpaid_orders_expired"]) == (0, 0, 0)
+    assert db.commit.await_count == 3  # the batch, the run's record, then the sweep
+
+
+async def test_gateway_calls_are_bounded_by_the_concurrency_limit():
+    in_flight = peak = 0
+
+    async def capture(payment_id, amount):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {"id": payment_id, "status": "captured"}
+
+    gateway = MagicMock()
+    gateway.payment.capture = capture
+    payments = [_payment(payment_id, PaymentStatus.AUTHORIZED, 10, school_id=payment_id % 3, gateway_payment_id=f"pay_{payment_id}") for payment_id in range(1, 21)]
+    db = _db(payments)
+
+    with (
+        patch.object(payment_reconciliation_service, "PAYMENT_RECONCILE_GATEWAY_CONCURRENCY", 3),
+        patch.object(razorpay_gateway, "get_school_gateway", AsyncMock(return_value=gateway)),
+        patch("app.services.invoice_service.allocate_payment_to_invoice_items", new_callable=AsyncMock),
+    ):
+        summary = await PaymentService(db).reconcile_authorized_payments(db)
+
+    assert peak == 3
+    assert summary["captured"] == 20
+    assert all(payment.status == PaymentStatus.CAPTURED for payment in payments)
+
+
+async def test_batches_are_claimed_with_skip_locked_and_committed_separately():
+    batches = [[_payment(1, PaymentStatus.AUTHORIZED, 200), _payment(2, PaymentStatus.AUTHORIZED, 200)], [_payment(5, PaymentStatus.AUTHORIZED, 130)]]
+    db = _db(*batches)
+
+    run = await payment_reconciliation_service.reconcile_authorized(db, batch_size=2)
+
+    claims = [str(call.args[0].compile(dialect=postgresql.dialect())) for call in db.execute.await_args_list]
+    assert all("FOR UPDATE SKIP LOCKED" in claim and "payments.id >" in claim for claim in claims)
+    assert [call.args[0].compile().params["id_1"] for call in db.execute.await_args_list] == [0, 2]
+    assert (run.batches, run.processed, run.outcomes["expired"], db.commit.await_count) == (2, 3, 3, 3)  # and the run's record
+
+
+async def test_captures_survive_a_later_failure_and_an_already_captured_payment_is_recorded():
+    fake = FakeRazorpay()
+    gateway = RazorpayGateway(fake.key_id, fake.key_secret, http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app), base_url="http://fake-razorpay/v1"))
+    fresh, lost = [await gateway.order.create(data={"amount": 150000}) for _ in range(2)]
+    # The second was captured by an earlier run whose commit was lost
+    authorized, captured = fake.add_payment(fresh["id"], status="authorized", amount=150000), fake.add_payment(lost["id"], status="captured", amount=150000)
+    payments = [_payment(1, PaymentStatus.AUTHORIZED, 2, gateway_payment_id=authorized["id"], order_id=71, invoice_id=None), _payment(2, PaymentStatus.AUTHORIZED, 2, gateway_payment_id=captured["id"])]
+    db = _db(payments)
+
+    with (
+        patch.object(razorpay_gateway, "get_school_gateway", AsyncMock(return_value=gateway)),
+        patch("app.services.invoice_service.allocate_payment_to_invoice_items", new_callable=AsyncMock),
+        patch("app.services.stock_reservation_service.confirm_paid_order", AsyncMock(return_value=True)),
+        patch("app.services.stock_reservation_service.release_reservations", AsyncMock(side_effect=RuntimeError("deadlock detected"))),
+    ):
+        run = await payment_reconciliation_service.reconcile_authorized(db)
+
+    assert [payment.status for payment in payments] == [PaymentStatus.CAPTURED, PaymentStatus.CAPTURED]
+    assert (run.outcomes["captured"], run.outcomes["skipped"]) == (2, 0)
+    assert ("GET", f"/v1/payments/{captured['id']}") in fake.requests
+    db.rollback.assert_not_awaited()
+    assert db.commit.await_count == 2  # the batch, then the run's record
+
+
+async def test_reconciliation_report_includes_throughput():
+    db = _db([_payment(1, PaymentStatus.AUTHORIZED, 200)])
+    await payment_reconciliation_service.reconcile_authorized(db)
+    [recorded] = [call.args[0] for call in db.add.call_args_list]
+
+    rollup = MagicMock()
+    rollup.mappings.return_value.one.return_value = {**dict.fromkeys(payment_metrics_service.COUNTERS, 0), "webhooks_processed": 4, "webhooks_failed": 1, "payments_reconciled": 2}
+    report_db = mock_db(rollup, rows_result([recorded]))
+
+    report = await PaymentService(report_db).get_reconciliation_report(db=report_db)
+
+    assert "FROM payment_reconciliation_runs" in str(report_db.execute.await_args_list[1].args[0])
+    [run] = report.recent_runs
+    assert (run.kind, run.processed, run.updated, run.batches) == ("authorized", 1, 1, 1)
+    assert recorded.outcomes == {"expired": 1}
+    assert run.payments_per_second > 0
+    assert report.payments_per_second_24h > 0
+    assert (report.webhooks_processed_24h, report.webhooks_failed_24h, report.reconciled_via_task_24h) == (4, 1, 2)
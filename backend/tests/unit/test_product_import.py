@@ -0,0 +1,103 @@
+"""
+Unit tests for bulk product import.
+
+Each chunk must be validated with a constant number of queries, upserted with
+one INSERT ... ON CONFLICT (sku) and restocked with one statement; invalid rows
+must be reported by row number, and re-uploading a file under the same
+import_key must not apply its stock adjustments twice.
+"""
+
+import io
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.services import product_import_service
+from app.services.product_service import ProductService
+from tests.utils.db_mocks import compiled_sql, mock_db, rows_result
+
+pytestmark = pytest.mark.asyncio
+
+CSV = b"""sku,name,price,category_id,stock_quantity,stock_adjustment
+tshirt-m,House T-Shirt M,750,1,10,
+TIE,,,,,5
+NEW-1,,,,,
+BAD SKU!,Belt,100,,,
+"""
+
+TIE = SimpleNamespace(product_id=7, sku="TIE", school_id=4, name="School Tie", price=Decimal("150.00"), category_id=1, stock_quantity=3, description=None, manufacturer=None, image_url=None, reorder_level=None, reorder_quantity=None, is_active=True)
+
+
+def _upserted(*rows) -> MagicMock:
+    return rows_result([SimpleNamespace(product_id=product_id, sku=sku, stock_quantity=stock, created=created) for product_id, sku, stock, created in rows])
+
+
+async def test_chunk_is_upserted_and_restocked_in_set_based_statements():
+    db = mock_db(
+        rows_result([TIE]),  # existing SKUs, locked
+        rows_result([1]),  # categories of the school
+        rows_result([]),  # names taken by other products
+        _upserted((101, "TSHIRT-M", 10, True), (7, "TIE", 3, False)),
+        rows_result([]),  # adjustments already recorded under the key
+        rows_result([2]),  # adjustments recorded and applied now
+    )
+
+    summary = await ProductService(db).import_products(school_id=4, file=io.BytesIO(CSV), file_format="csv", import_key="term-2-restock")
+
+    assert (summary["rows"], summary["created"], summary["updated"], summary["adjustments_applied"], summary["chunks"]) == (4, 1, 1, 1, 1)
+    assert [(error["row"], error["sku"]) for error in summary["errors"]] == [(3, "NEW-1"), (4, "BAD SKU!")]
+    assert "name and price are required" in summary["errors"][0]["errors"][0]
+
+    statements = [call.args[0] for call in db.execute.await_args_list]
+    assert "FOR UPDATE" in compiled_sql(statements[0])
+    upsert = statements[3]
+    assert "ON CONFLICT (sku) DO UPDATE SET" in compiled_sql(upsert) and "WHERE products.school_id = excluded.school_id" in compiled_sql(upsert)
+    params = upsert.compile().params
+    assert (params["sku_m0"], params["stock_quantity_m0"], params["is_active_m0"]) == ("TSHIRT-M", 10, True)
+    assert (params["sku_m1"], params["name_m1"], params["price_m1"]) == ("TIE", "School Tie", Decimal("150.00"))  # blank cells keep the current values
+    assert "product_import_adjustments.school_id = " in compiled_sql(statements[4]) and statements[4].compile().params["school_id_1"] == 4
+    restock = compiled_sql(statements[5])
+    assert "WITH applied AS" in restock and "ON CONFLICT (school_id, import_key, row_number) DO NOTHING" in restock
+    assert "UPDATE products SET stock_quantity=(products.stock_quantity + totals.adjustment)" in restock
+    db.commit.assert_awaited_once()
+
+
+async def test_reupload_with_the_same_key_skips_recorded_adjustments():
+    db = mock_db(rows_result([TIE]), _upserted((7, "TIE", 8, False)), rows_result([1]))
+
+    summary = await product_import_service.import_products(db, 4, [(1, {"sku": "TIE", "stock_adjustment": "5"})], import_key="term-2-restock")
+
+    assert (summary["updated"], summary["adjustments_applied"], summary["adjustments_already_applied"], summary["error_count"]) == (1, 0, 1, 0)
+    assert db.execute.await_count == 3  # no restock statement
+
+
+async def test_rows_that_cannot_be_applied_are_reported_and_the_rest_imported():
+    other_school = SimpleNamespace(**{**vars(TIE), "product_id": 9, "sku": "BELT", "school_id": 8})
+    rows = [(1, {"sku": "TIE", "stock_adjustment": "-5"}), (2, {"sku": "BELT", "price": "99"}), (3, {"sku": "TIE", "stock_adjustment": "1"})]
+    db = mock_db(rows_result([TIE, other_school]), _upserted((7, "TIE", 3, False)), rows_result([]), rows_result([3]))
+
+    summary = await product_import_service.import_products(db, 4, rows, import_key="k")
+
+    assert [(error["row"], error["errors"][0]) for error in summary["errors"]] == [
+        (1, "stock_adjustment: -5 would take stock below zero (current: 3)"),
+        (2, "SKU is already used by another school"),
+    ]
+    assert summary["adjustments_applied"] == 1
+
+    no_key = await product_import_service.import_products(mock_db(), 4, [(1, {"sku": "TIE", "stock_adjustment": "1"})])
+    assert "import_key" in no_key["errors"][0]["errors"][0]
+
+
+async def test_large_files_are_committed_chunk_by_chunk():
+    rows = [(n, {"sku": f"SKU-{n}", "name": f"Item {n}", "price": "10"}) for n in (1, 2, 3)]
+    db = mock_db(
+        *(rows_result([]), rows_result([]), _upserted((1, "SKU-1", 0, True), (2, "SKU-2", 0, True))),  # existing SKUs, names taken, upsert
+        *(rows_result([]), rows_result([]), _upserted((3, "SKU-3", 0, True))),
+    )
+
+    summary = await product_import_service.import_products(db, 4, iter(rows), chunk_size=2)
+
+    assert (summary["created"], summary["chunks"]) == (3, 2)
+    assert db.commit.await_count == 2
@@ -0,0 +1,63 @@
+"""
+Unit tests for product package reads.
+
+Packages must be listed with one aggregate query over package_items joined to
+products: items, totals and component availability come from the database,
+and no package, item or product object is hydrated.
+"""
+
+from datetime import datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.schemas.product_package_schema import ProductPackageListOut, ProductPackageOut
+from app.services.product_package_service import ProductPackageService
+from tests.utils.db_mocks import compiled_sql, mock_db, rows_result
+
+pytestmark = pytest.mark.asyncio
+
+NOW = datetime(2026, 10, 1, 12, 0, tzinfo=timezone.utc)
+
+HEADER = dict(id=3, school_id=4, name="Grade 5 Kit", description=None, price=Decimal("1200.00"), image_url=None, category=None, academic_year="2026-2027", is_active=True, created_at=NOW, updated_at=NOW)
+ITEMS = [
+    {"product_id": 16, "quantity": 2, "product_name": "House T-Shirt (Blue)", "product_price": "750.10", "product_image_url": None, "product_sku": "TSHIRT-BLUE", "stock_quantity": 45, "is_active": True},
+    {"product_id": 17, "quantity": 1, "product_name": "Tie", "product_price": "150.00", "product_image_url": None, "product_sku": None, "stock_quantity": 0, "is_active": False},
+]
+TOTALS = dict(item_count=3, unique_product_count=2, calculated_price=Decimal("1650.20"), all_items_available=False, available_quantity=0)
+
+
+async def test_packages_are_listed_with_one_aggregate_query():
+    db = mock_db(rows_result([SimpleNamespace(**HEADER, **TOTALS, items=[dict(item) for item in ITEMS])]))
+
+    packages = await ProductPackageService(db).get_all_packages(school_id=4)
+
+    assert db.execute.await_count == 1
+    sql = compiled_sql(db.execute.await_args.args[0])
+    assert "json_agg(json_build_object('product_id', package_items.product_id" in sql and "ORDER BY package_items.product_id" in sql
+    assert "min(CASE WHEN (products.is_active IS true) THEN products.stock_quantity / package_items.quantity" in sql
+    assert "LEFT OUTER JOIN products" in sql and "GROUP BY product_packages.id" in sql and "product_packages.is_active IS true" in sql
+
+    package = ProductPackageOut.model_validate(packages[0])
+    assert [item.availability for item in package.items] == ["in_stock", "discontinued"]
+    assert package.calculated_price == Decimal("1650.20")  # prices arrive as strings: no float rounding
+    assert (package.available_quantity, package.all_items_available, package.is_purchasable) == (0, False, False)
+
+
+async def test_summaries_skip_the_items_and_a_missing_package_is_404():
+    db = mock_db(rows_result([SimpleNamespace(_mapping={**HEADER, **TOTALS, "price": None})]), rows_result([]))
+    service = ProductPackageService(db)
+
+    summaries = await service.get_package_summaries(school_id=4, include_inactive=True)
+
+    sql = compiled_sql(db.execute.await_args.args[0])
+    assert "json_agg" not in sql and "product_packages.is_active IS true" not in sql
+    summary = ProductPackageListOut.model_validate(summaries[0])
+    assert (summary.item_count, summary.effective_price, summary.available_quantity, summary.is_purchasable) == (3, Decimal("1650.20"), 0, False)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await service.get_package_by_id(99, 4)
+    assert exc_info.value.status_code == 404
+    assert "product_packages.id = " in compiled_sql(db.execute.await_args.args[0])
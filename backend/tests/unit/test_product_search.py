@@ -0,0 +1,106 @@
+"""
+Unit tests for storefront product search.
+
+On PostgreSQL the search must be one ranked, keyset-paginated query plus one
+facet query served by the tsvector/trigram indexes; without the extension the
+in-memory index must give the same shape, typo tolerance and cursors.
+"""
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import HTTPException
+
+from app.db.write_tracking import notify_tables_committed
+from app.services import product_search_service
+from app.services.product_service import ProductService
+from tests.utils.db_mocks import compiled_sql, mock_db
+
+pytestmark = pytest.mark.asyncio
+
+# product_id, category_id, category_name, name, sku, manufacturer, description
+ROWS = [
+    (1, 10, "Uniforms", "House T-Shirt (Blue)", "TSHIRT-BLUE-M", "Raymond", "Cotton shirt with emblem"),
+    (2, 10, "Uniforms", "House T-Shirt (Red)", "TSHIRT-RED-M", "Raymond", None),
+    (3, 20, "Stationery", "Notebook", "NB-200", None, "Ruled, blue cover"),
+    (4, None, None, "Sports Shorts", "SHORTS-S", None, None),
+]
+
+
+def _index_rows() -> MagicMock:
+    result = MagicMock()
+    result.all.return_value = ROWS
+    return result
+
+
+def _products(*product_ids) -> MagicMock:
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = [SimpleNamespace(product_id=product_id) for product_id in reversed(product_ids)]
+    return result
+
+
+@pytest.fixture(autouse=True)
+def _memory_backend(monkeypatch):
+    monkeypatch.setattr(product_search_service, "PRODUCT_SEARCH_BACKEND", "memory")
+    product_search_service.invalidate_index()
+    yield
+    product_search_service.invalidate_index()
+
+
+async def test_memory_search_ranks_name_matches_first_and_tolerates_typos():
+    db = mock_db(_index_rows(), _products(1, 3), _products(1, 2))
+
+    page = await product_search_service.search(db, 4, "blue")
+
+    assert [product.product_id for product in page["items"]] == [1, 3]  # name before description
+    assert page["total"] == 2 and page["next_cursor"] is None
+    assert page["facets"] == [{"category_id": 20, "category_name": "Stationery", "count": 1}, {"category_id": 10, "category_name": "Uniforms", "count": 1}]
+
+    typo = await product_search_service.search(db, 4, "shrt")
+    assert [product.product_id for product in typo["items"]] == [1, 2]  # "shirt"; "shorts" is too far
+    assert db.execute.await_count == 3  # one index build, then one hydration query per page
+
+
+async def test_memory_pages_follow_the_cursor_and_reuse_the_index_until_a_write():
+    db = mock_db(_index_rows(), _products(1), _products(2))
+
+    first = await product_search_service.search(db, 4, "tshirt", category_id=10, limit=1)
+    second = await product_search_service.search(db, 4, "tshirt", category_id=10, limit=1, cursor=first["next_cursor"])
+
+    assert [p.product_id for p in first["items"]] == [1] and first["next_cursor"]
+    assert [p.product_id for p in second["items"]] == [2] and second["next_cursor"] is None
+    assert first["total"] == 2
+    assert db.execute.await_count == 3  # the index was built once
+
+    notify_tables_committed({"products": {4}})
+    db.execute = AsyncMock(side_effect=[_index_rows(), _products(1)])
+    await product_search_service.search(db, 4, "tshirt blue", limit=1)
+    assert db.execute.await_count == 2  # rebuilt after the write
+
+
+async def test_postgres_search_is_one_ranked_page_query_and_one_facet_query(monkeypatch):
+    monkeypatch.setattr(product_search_service, "PRODUCT_SEARCH_BACKEND", "postgres")
+    facets = MagicMock()
+    facets.all.return_value = [SimpleNamespace(category_id=10, category_name="Uniforms", count=2)]
+    page_rows = MagicMock()
+    page_rows.all.return_value = [(SimpleNamespace(product_id=1), 1.25), (SimpleNamespace(product_id=2), 0.8)]
+    db = mock_db(facets, page_rows)
+
+    page = await product_search_service.search(db, 4, "blue shrt", limit=1, cursor=product_search_service.encode_cursor(1.5, 9))
+
+    facet_stmt, page_stmt = (call.args[0] for call in db.execute.await_args_list)
+    assert "GROUP BY products.category_id" in compiled_sql(facet_stmt)
+    sql = compiled_sql(page_stmt).replace("%%", "%")
+    assert "products.search_vector @@ websearch_to_tsquery(" in sql and "<% products.name" in sql and "<% products.sku" in sql
+    assert "ts_rank_cd(products.search_vector" in sql and "ORDER BY ranked.rank DESC, products.product_id ASC" in sql
+    assert "ranked.rank < " in sql and page_stmt.compile().params["param_3"] == 2  # after the cursor; limit + 1
+    assert [p.product_id for p in page["items"]] == [1]
+    assert product_search_service.decode_cursor(page["next_cursor"]) == (1.25, 1)
+    assert page["total"] == 2
+
+
+async def test_malformed_cursor_is_rejected():
+    with pytest.raises(HTTPException) as exc_info:
+        await ProductService(mock_db()).search_products(school_id=4, query="shirt", cursor="not-a-cursor")
+    assert exc_info.value.status_code == 400
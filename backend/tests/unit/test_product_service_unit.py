@@ -666,7 +666,11 @@ async def test_bulk_update_category_success(mock_db_session, sample_category):
     products_result = MagicMock()
     products_result.scalars.return_value.all.return_value = [product1, product2]
 
-    mock_db_session.execute.side_effect = [category_result, products_result]
+    # Mock the reload after commit (one query, not one refresh per product)
+    reloaded_result = MagicMock()
+    reloaded_result.scalars.return_value.all.return_value = [product1, product2]
+
+    mock_db_session.execute.side_effect = [category_result, products_result, reloaded_result]
 
     service = ProductService(mock_db_session)
 
@@ -678,6 +682,8 @@ async def test_bulk_update_category_success(mock_db_session, sample_category):
     assert result[0].category_id == 2
     assert result[1].category_id == 2
     assert mock_db_session.commit.called
+    assert mock_db_session.execute.call_count == 3
+    assert not mock_db_session.refresh.called
 
 
 @pytest.mark.asyncio
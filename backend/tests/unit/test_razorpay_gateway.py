@@ -0,0 +1,292 @@
+"""
+Unit tests for the non-blocking Razorpay gateway adapter.
+
+Runs RazorpayGateway against the in-memory fake Razorpay API and covers error
+mapping, the retry policy for reads and writes, signature checks, the pooled
+per-loop HTTP client, the per-school credential cache and the refund service's
+gateway call.
+"""
+
+import asyncio
+import itertools
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from prometheus_client import REGISTRY
+from razorpay.errors import BadRequestError, ServerError, SignatureVerificationError
+
+from app.db.write_tracking import notify_tables_committed
+from app.models.refund import Refund
+from app.models.school import School
+from app.schemas.refund_schema import RefundCreate
+from app.services import razorpay_gateway
+from app.services.payment_service import PaymentService
+from app.services.razorpay_gateway import RazorpayGateway, RazorpayNetworkError, get_school_credentials, get_school_gateway
+from app.services.refund_service import RefundService
+from tests.utils.db_mocks import compiled_sql, mock_db, rows_result, scalar_result
+from tests.utils.fake_razorpay import FakeRazorpay
+
+
+@pytest.fixture
+def fake() -> FakeRazorpay:
+    return FakeRazorpay()
+
+
+@pytest.fixture(autouse=True)
+def _no_backoff():
+    with patch.object(razorpay_gateway, "_retry_delay", return_value=0):
+        yield
+
+
+def _gateway(fake: FakeRazorpay, key_secret: str = None) -> RazorpayGateway:
+    http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app), base_url="http://fake-razorpay/v1")
+    return RazorpayGateway(fake.key_id, key_secret or fake.key_secret, http_client=http_client)
+
+
+def _sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_order_round_trip_against_the_fake_api(fake: FakeRazorpay):
+    gateway = _gateway(fake)
+    calls_before = _sample("payment_gateway_call_seconds_count", operation="order.create", outcome="success")
+
+    order = await gateway.order.create(data={"amount": 150000, "currency": "INR", "receipt": "SCHOOS_PAY_1", "notes": {"target_invoice_id": 7}})
+    fake.add_payment(order["id"], status="failed")
+    payment = fake.add_payment(order["id"], status="authorized")
+    captured = await gateway.payment.capture(payment["id"], 150000)
+
+    assert (await gateway.order.fetch(order["id"]))["status"] == "paid"
+    assert [item["status"] for item in (await gateway.order.payments(order["id"]))["items"]] == ["failed", "captured"]
+    assert captured["status"] == "captured"
+    assert (await gateway.payment.fetch(payment["id"]))["notes"] == {"target_invoice_id": 7}
+    assert _sample("payment_gateway_call_seconds_count", operation="order.create", outcome="success") - calls_before == 1
+
+
+@pytest.mark.asyncio
+async def test_error_responses_map_to_razorpay_sdk_exceptions(fake: FakeRazorpay):
+    gateway = _gateway(fake)
+    order = await gateway.order.create(data={"amount": 5000})
+    payment = fake.add_payment(order["id"], status="captured")
+
+    with pytest.raises(BadRequestError, match="already been captured"):
+        await gateway.payment.capture(payment["id"], 5000)
+    with pytest.raises(BadRequestError, match="Authentication failed"):
+        await _gateway(fake, key_secret="wrong").order.fetch(order["id"])
+
+
+@pytest.mark.asyncio
+async def test_reads_are_retried_on_server_errors(fake: FakeRazorpay):
+    gateway = _gateway(fake)
+    order = await gateway.order.create(data={"amount": 5000})
+    retries_before = _sample("payment_gateway_retries_total", operation="order.fetch")
+    fake.fail_next = [503, 502]
+
+    assert (await gateway.order.fetch(order["id"]))["id"] == order["id"]
+    assert _sample("payment_gateway_retries_total", operation="order.fetch") - retries_before == 2
+
+    fake.fail_next = [503, 503, 503]
+    with pytest.raises(ServerError):
+        await gateway.order.fetch(order["id"])
+
+
+@pytest.mark.asyncio
+async def test_writes_are_not_replayed_after_reaching_the_gateway(fake: FakeRazorpay):
+    gateway = _gateway(fake)
+    fake.fail_next = [503]
+
+    with pytest.raises(ServerError):
+        await gateway.order.create(data={"amount": 5000})
+    assert fake.requests == [("POST", "/v1/orders")]
+
+    fake.fail_next = [429]
+    assert (await gateway.order.create(data={"amount": 5000}))["status"] == "created"
+
+
+@pytest.mark.asyncio
+async def test_network_errors_retry_only_when_safe():
+    attempts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        attempts.append(request.url.path)
+        if request.url.path.endswith("/capture"):
+            raise httpx.ReadTimeout("timed out", request=request)
+        if len(attempts) == 1:
+            raise httpx.ConnectError("refused", request=request)
+        return httpx.Response(200, json={"id": "order_1", "status": "created"})
+
+    gateway = RazorpayGateway("key", "secret", http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://fake-razorpay/v1"))
+
+    assert (await gateway.order.create(data={"amount": 5000}))["id"] == "order_1"
+    with pytest.raises(RazorpayNetworkError):
+        await gateway.payment.capture("pay_1", 5000)
+    assert attempts == ["/v1/orders", "/v1/orders", "/v1/payments/pay_1/capture"]
+
+
+def test_signature_verification(fake: FakeRazorpay):
+    utility = RazorpayGateway("", fake.key_secret).utility
+    params = {"razorpay_order_id": "order_1", "razorpay_payment_id": "pay_1", "razorpay_signature": fake.signature("order_1", "pay_1")}
+
+    assert utility.verify_payment_signature(params) is True
+    with pytest.raises(SignatureVerificationError):
+        utility.verify_payment_signature({**params, "razorpay_payment_id": "pay_2"})
+
+
+def test_http_client_is_pooled_per_event_loop():
+    async def clients():
+        return razorpay_gateway.get_http_client(), razorpay_gateway.get_http_client()
+
+    first, again = asyncio.run(clients())
+    other, _ = asyncio.run(clients())
+
+    assert first is again
+    assert first is not other
+
+
+def _refund_db(payment: SimpleNamespace, *results) -> AsyncMock:
+    """A session for RefundService: the locked payment, then ``results``; added refunds get id 31."""
+    db = mock_db(rows_result([payment]), *results)
+    db.add.side_effect = lambda refund: setattr(refund, "id", 31)
+    return db
+
+
+@pytest.mark.asyncio
+async def test_refund_service_records_the_gateway_refund(fake: FakeRazorpay):
+    gateway = _gateway(fake)
+    order = await gateway.order.create(data={"amount": 200000})
+    gateway_payment = fake.add_payment(order["id"], status="captured")
+
+    payment = SimpleNamespace(id=12, school_id=1, status="captured", amount_paid=Decimal("2000.00"), gateway_payment_id=gateway_payment["id"])
+    # No earlier refund to settle, 500.00 refunded, then the outcome, no allocation to reverse and the payment's status
+    db = _refund_db(payment, rows_result(), scalar_result(Decimal("500.00")), MagicMock(), rows_result(rowcount=0), MagicMock())
+    fake.requests.clear()
+    requests_at_commit = []
+    db.commit.side_effect = lambda: requests_at_commit.append(len(fake.requests))
+
+    refund_in = RefundCreate(payment_id=12, amount=Decimal("750.00"), reason="Duplicate fee payment", processed_by_user_id=uuid.uuid4())
+    with patch.object(razorpay_gateway, "get_school_gateway", AsyncMock(return_value=gateway)):
+        refund = await RefundService(db).process_refund(refund_in)
+
+    assert compiled_sql(db.execute.await_args_list[0].args[0]).endswith("FOR UPDATE")
+    assert (refund.id, refund.submitted_at is not None) == (31, True)
+    assert requests_at_commit == [0, 1]  # saved before the refund was sent, the outcome after
+    gateway_refund = next(iter(fake.refunds.values()))
+    assert gateway_refund["amount"] == 75000 and gateway_refund["notes"]["internal_refund_id"] == 31
+    assert db.execute.await_args_list[3].args[1] == [{"id": 31, "gateway_refund_id": gateway_refund["id"], "status": "processed", "error_description": None}]
+    assert db.execute.await_count == 6
+
+    db = _refund_db(payment, rows_result(), scalar_result(Decimal("1250.00")))
+    with patch.object(razorpay_gateway, "get_school_gateway", AsyncMock(return_value=gateway)), pytest.raises(HTTPException) as exc_info:
+        await RefundService(db).process_refund(refund_in.model_copy(update={"amount": Decimal("1000.00")}))
+    assert exc_info.value.status_code == 400
+    db.commit.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_refund_whose_answer_was_lost_is_looked_up_and_not_sent_again(fake: FakeRazorpay):
+    gateway = _gateway(fake)
+    order = await gateway.order.create(data={"amount": 200000})
+    gateway_payment = fake.add_payment(order["id"], status="captured")
+    payment = SimpleNamespace(id=12, school_id=1, status="captured", amount_paid=Decimal("2000.00"), gateway_payment_id=gateway_payment["id"])
+    # Sent by an earlier request that crashed before recording it; the other one never reached Razorpay
+    crashed = Refund(id=29, payment_id=12, amount=Decimal("300.00"), reason="Overcharged", status="pending")
+    never_sent = Refund(id=30, payment_id=12, amount=Decimal("200.00"), reason="Overcharged", status="pending")
+    earlier = await gateway.payment.refund(gateway_payment["id"], {"amount": 30000, "notes": {"internal_refund_id": 29}})
+
+    send_refund = gateway.payment.refund
+
+    async def refund_then_time_out(payment_id, data):
+        await send_refund(payment_id, data)
+        raise RazorpayNetworkError("read timeout")
+
+    # The two lost refunds and their outcomes, the reversal of the found one, the payment's status; then the new refund
+    db = _refund_db(payment, rows_result([crashed, never_sent]), MagicMock(), rows_result(rowcount=1), MagicMock(), MagicMock(), scalar_result(Decimal("300.00")), MagicMock(), rows_result(rowcount=0), MagicMock())
+    fake.requests.clear()
+    refund_in = RefundCreate(payment_id=12, amount=Decimal("750.00"), reason="Duplicate fee payment", processed_by_user_id=uuid.uuid4())
+    with patch.object(razorpay_gateway, "get_school_gateway", AsyncMock(return_value=gateway)), patch.object(gateway.payment, "refund", side_effect=refund_then_time_out):
+        refund = await RefundService(db).process_refund(refund_in)
+
+    settled = {outcome["id"]: outcome for outcome in db.execute.await_args_list[2].args[1]}
+    assert (settled[29]["gateway_refund_id"], settled[30]["status"]) == (earlier["id"], "failed")
+    [recorded] = db.execute.await_args_list[7].args[1]
+    assert (refund.id, recorded["status"], recorded["gateway_refund_id"] is not None) == (31, "processed", True)
+    assert [item["amount"] for item in fake.refunds.values()] == [30000, 75000]  # sent once, found by its id
+    assert [request for request in fake.requests if request[0] == "POST"] == [("POST", f"/v1/payments/{gateway_payment['id']}/refund")]
+
+
+def _school(school_id: int, webhook_secret: bytes = b"enc-webhook") -> SimpleNamespace:
+    return SimpleNamespace(school_id=school_id, razorpay_key_id_encrypted=b"enc-key-id", razorpay_key_secret_encrypted=b"enc-key-secret", razorpay_webhook_secret_encrypted=webhook_secret)
+
+
+def _school_db(*schools: SimpleNamespace) -> AsyncMock:
+    db = AsyncMock()
+    db.get.side_effect = lambda model, school_id, **kwargs: next((school for school in schools if school.school_id == school_id), None)
+    return db
+
+
+@pytest.mark.asyncio
+async def test_school_credentials_are_decrypted_once_and_cached():
+    db = _school_db(_school(1), _school(2, webhook_secret=None))
+    with patch("app.core.crypto_service.decrypt_value", side_effect=lambda value: f"plain:{value.decode()}") as mock_decrypt:
+        first = await get_school_gateway(db, 1)
+        again = await get_school_gateway(db, 1)
+        credentials = await get_school_credentials(db, 1)
+        secrets = (credentials.key_id, credentials.webhook_secret, credentials.webhook_secret)
+        other = await get_school_credentials(db, 2)
+
+    assert first is again
+    assert db.get.await_count == 2
+    assert secrets == ("plain:enc-key-id", "plain:enc-webhook", "plain:enc-webhook")
+    assert other.webhook_secret is None
+    assert mock_decrypt.call_count == 3
+    assert "plain" not in repr(credentials)
+
+
+@pytest.mark.asyncio
+async def test_school_credentials_are_dropped_when_the_school_row_changes():
+    db = _school_db(_school(1), _school(2))
+    with patch("app.core.crypto_service.decrypt_value", return_value="plain"):
+        school_1 = await get_school_gateway(db, 1)
+        school_2 = await get_school_gateway(db, 2)
+
+        notify_tables_committed({"payments": {1}})
+        assert await get_school_gateway(db, 1) is school_1
+
+        notify_tables_committed({"schools": {1}})
+        assert await get_school_gateway(db, 1) is not school_1
+        assert await get_school_gateway(db, 2) is school_2
+
+    db.get.side_effect = None
+    db.get.return_value = None
+    razorpay_gateway.invalidate_school_credentials()
+    with pytest.raises(HTTPException) as exc_info:
+        await get_school_gateway(db, 1)
+    assert exc_info.value.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_reconciling_a_batch_decrypts_once_per_school():
+    recent = datetime.now(timezone.utc) - timedelta(hours=2)
+    payments = [SimpleNamespace(id=payment_id, school_id=payment_id % 2 + 1, gateway_order_id=f"order_{payment_id}", created_at=recent, status="pending") for payment_id in range(10)]
+    db = _school_db(_school(1), _school(2))
+    result, empty = MagicMock(), MagicMock()
+    result.scalars.return_value.all.return_value = payments
+    empty.scalars.return_value.all.return_value = []
+    db.execute.side_effect = itertools.chain([result], itertools.repeat(empty))  # the claimed batch, then empty sweeps
+    gateway = MagicMock()
+    gateway.order.fetch = AsyncMock(return_value={"status": "created"})
+
+    with patch("app.core.crypto_service.decrypt_value", return_value="plain") as mock_decrypt, patch.object(razorpay_gateway, "RazorpayGateway", return_value=gateway):
+        summary = await PaymentService(db).reconcile_pending_payments(db)
+
+    assert summary["processed"] == 10
+    assert gateway.order.fetch.await_count == 10
+    assert mock_decrypt.call_count == 4  # key id + key secret, per school
+    assert db.get.await_args_list[0].args == (School, 1)
@@ -230,9 +230,8 @@ class TestForwardReconciliation:
             # Payment should be marked as captured but allocation failed
             assert mock_payment.status == PaymentStatus.CAPTURED_ALLOCATION_FAILED
             assert "Recon allocation fail" in mock_payment.error_description
-            assert db.rollback.called
-            # After rollback, payment should be added and committed again
-            assert db.add.called
+            # Allocation runs in a savepoint; the failure marker is committed with the batch
+            db.begin_nested.assert_called()
             assert db.commit.call_count >= 1
 
 
@@ -654,7 +653,7 @@ class TestAuthorizedPaymentReconciliation:
         # --- ASSERT ---
         # Status should remain AUTHORIZED (not changed)
         assert mock_payment.status == PaymentStatus.AUTHORIZED
-        assert db.rollback.called
+        mock_razorpay_client.payment.capture.assert_awaited_once()
         # Counters should not increment for this payment
         assert result["captured"] == 0
         assert result["failed"] == 0
@@ -697,8 +696,8 @@ class TestAuthorizedPaymentReconciliation:
             # --- ASSERT ---
             assert mock_payment.status == PaymentStatus.CAPTURED_ALLOCATION_FAILED
             assert "Capture allocation fail" in mock_payment.error_description
-            assert db.rollback.called
-            assert db.add.called
+            db.begin_nested.assert_called()
+            assert db.commit.called
 
     async def test_reconcile_authorized_payment_for_order(self, mocker, mock_razorpay_client):
         """
@@ -0,0 +1,146 @@
+"""
+Unit tests for the sales analytics rollup.
+
+Order status transitions must be picked up at flush time and added to the
+daily rollup with one INSERT ... SELECT; the reports must read only the rollup
+(plus the labels of the rows they return), and the backfill must rebuild past
+days from the orders table in one transaction.
+"""
+
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.models.order import Order
+from app.schemas.enums import OrderStatus, PaymentStatus, SalesInterval, SalesRanking
+from app.schemas.sales_analytics_schema import SalesComparisonOut, SalesTimeSeriesOut
+from app.services import payment_reconciliation_service, razorpay_gateway, sales_analytics_service
+from tests.utils.db_mocks import compiled_sql, mock_db, rows_result
+
+pytestmark = pytest.mark.asyncio
+
+
+def _counters(units_sold=0, revenue="0", units_cancelled=0, revenue_cancelled="0", prefix="", **extra) -> dict:
+    return {f"{prefix}units_sold": units_sold, f"{prefix}revenue": Decimal(revenue), f"{prefix}units_cancelled": units_cancelled, f"{prefix}revenue_cancelled": Decimal(revenue_cancelled), **extra}
+
+
+def _persisted(session: Session, order_id: int, status: OrderStatus) -> Order:
+    order = Order(order_id=order_id)
+    set_committed_value(order, "status", status)
+    make_transient_to_detached(order)
+    session.add(order)
+    return order
+
+
+async def test_paid_orders_and_their_cancellations_are_collected_at_flush():
+    session = Session()
+    _persisted(session, 1, OrderStatus.PENDING_PAYMENT).status = "processing"  # as set by payment verification
+    _persisted(session, 2, OrderStatus.PROCESSING).status = OrderStatus.CANCELLED
+    _persisted(session, 3, OrderStatus.PENDING_PAYMENT).status = OrderStatus.CANCELLED  # never paid: not a sale
+    _persisted(session, 4, OrderStatus.PROCESSING).status = OrderStatus.SHIPPED  # already counted
+    session.add(Order(order_id=5, status=OrderStatus.DELIVERED))
+
+    sold, cancelled = sales_analytics_service.collect_transitions(session)
+
+    assert (sorted(sold), cancelled) == ([1, 5], [2])
+    sql = compiled_sql(sales_analytics_service.rollup_statement(sold, cancelled, date(2026, 10, 1)))
+    assert "INSERT INTO product_sales_daily" in sql and "SELECT orders.school_id" in sql and "FROM order_items JOIN orders" in sql
+    assert "sum(order_items.quantity) FILTER (WHERE order_items.order_id IN" in sql
+    assert "ON CONFLICT (school_id, day, product_id) DO UPDATE SET" in sql and "units_sold = (product_sales_daily.units_sold + excluded.units_sold)" in sql
+
+
+async def test_orders_confirmed_by_reconciliation_are_counted():
+    # The reconciler confirms orders with a Core UPDATE, which the flush hook cannot see
+    payment = SimpleNamespace(
+        id=1,
+        status=PaymentStatus.AUTHORIZED,
+        created_at=datetime.now(timezone.utc) - timedelta(hours=10),
+        school_id=4,
+        gateway_payment_id="pay_1",
+        invoice_id=None,
+        order_id=77,
+        amount_paid=Decimal("1500.00"),
+        user_id="user-1",
+        error_description=None,
+    )
+    claimed, confirmed = MagicMock(), MagicMock()  # the claimed batch, then the order the capture confirms
+    claimed.scalars.return_value.all.return_value = [payment]
+    confirmed.scalar_one_or_none.return_value = 77
+    db = mock_db(claimed, confirmed, MagicMock(), MagicMock())
+    gateway = MagicMock()
+    gateway.payment.capture = AsyncMock(return_value={"id": "pay_1", "status": "captured"})
+
+    with patch.object(razorpay_gateway, "get_school_gateway", AsyncMock(return_value=gateway)):
+        run = await payment_reconciliation_service.reconcile_authorized(db)
+
+    assert run.outcomes["captured"] == 1
+    confirm, _reservations, rollup = (call.args[0] for call in db.execute.await_args_list[1:4])
+    assert "WHERE orders.order_id = " in compiled_sql(confirm) and "RETURNING orders.order_id" in compiled_sql(confirm)
+    assert compiled_sql(rollup).startswith("INSERT INTO product_sales_daily") and 77 in rollup.compile().params["order_id_1"]
+
+
+async def test_time_series_reads_the_rollup_and_fills_empty_buckets():
+    db = mock_db(rows_result([SimpleNamespace(period_start=date(2026, 9, 7), **_counters(12, "9000.00", 2, "1500.00"))]))
+
+    series = await sales_analytics_service.time_series(db, 4, date(2026, 9, 2), date(2026, 9, 16), interval=SalesInterval.WEEK, category_id=1)
+
+    sql = compiled_sql(db.execute.await_args.args[0])
+    assert "FROM product_sales_daily" in sql and "order_items" not in sql
+    assert "date_trunc('week', product_sales_daily.day)" in sql and "product_sales_daily.category_id = " in sql
+    out = SalesTimeSeriesOut.model_validate(series)
+    assert [point.period_start for point in out.points] == [date(2026, 8, 31), date(2026, 9, 7), date(2026, 9, 14)]
+    assert [(point.net_units, point.net_revenue) for point in out.points] == [(0, Decimal("0")), (10, Decimal("7500.00")), (0, Decimal("0"))]
+
+
+async def test_top_products_are_ranked_on_the_rollup_and_labelled_after_the_limit():
+    db = mock_db(rows_result([SimpleNamespace(product_id=16, product_name="House T-Shirt (Blue)", sku="TSHIRT-BLUE", category_id=1, **_counters(40, "30000.00"))]))
+
+    top = await sales_analytics_service.top_products(db, 4, date(2026, 6, 1), date(2026, 9, 30), limit=5, rank_by=SalesRanking.UNITS)
+
+    sql = compiled_sql(db.execute.await_args.args[0])
+    assert "FROM product_sales_daily" in sql and "GROUP BY product_sales_daily.product_id) AS ranked JOIN products" in sql
+    assert "ORDER BY ranked.units_sold - ranked.units_cancelled DESC" in sql
+    assert top == [{"product_id": 16, "product_name": "House T-Shirt (Blue)", "sku": "TSHIRT-BLUE", "category_id": 1, **_counters(40, "30000.00")}]
+
+    with pytest.raises(HTTPException) as exc_info:
+        await sales_analytics_service.top_products(db, 4, date(2026, 9, 30), date(2026, 6, 1))
+    assert exc_info.value.status_code == 400
+
+
+async def test_comparison_defaults_to_the_preceding_period_and_scans_both_at_once():
+    db = mock_db(
+        rows_result(
+            [
+                SimpleNamespace(category_id=1, category_name="Uniforms", **_counters(30, "24000.00", prefix="current_"), **_counters(20, "16000.00", 1, "800.00", prefix="previous_")),
+                SimpleNamespace(category_id=None, category_name=None, **_counters(5, "1000.00", prefix="current_"), **_counters(prefix="previous_")),
+            ]
+        )
+    )
+
+    comparison = SalesComparisonOut.model_validate(await sales_analytics_service.compare_periods(db, 4, date(2026, 10, 1), date(2026, 10, 31)))
+
+    assert (comparison.previous_from, comparison.previous_to) == (date(2026, 8, 31), date(2026, 9, 30))
+    assert db.execute.await_count == 1 and "FILTER (WHERE product_sales_daily.day >= " in compiled_sql(db.execute.await_args.args[0])
+    assert (comparison.current.net_revenue, comparison.previous.net_revenue) == (Decimal("25000.00"), Decimal("15200.00"))
+    assert comparison.net_revenue_change_percentage == Decimal("64.47")
+    assert [category.category_name for category in comparison.categories] == ["Uniforms", None]
+
+
+async def test_backfill_rebuilds_past_days_from_orders_in_one_transaction():
+    deleted, sales, cancellations = MagicMock(rowcount=3), MagicMock(rowcount=7), MagicMock(rowcount=1)
+    db = mock_db(deleted, sales, cancellations)
+
+    summary = await sales_analytics_service.backfill(db, school_id=4, date_from=date(2026, 4, 1), date_to=date(2026, 9, 30))
+
+    assert (summary["rows_deleted"], summary["sale_rows_written"], summary["cancellation_rows_written"]) == (3, 7, 1)
+    delete_sql, sales_sql, cancellations_sql = (compiled_sql(call.args[0]) for call in db.execute.await_args_list)
+    assert delete_sql.startswith("DELETE FROM product_sales_daily WHERE product_sales_daily.day <= ")
+    assert "orders.status IN (" in sales_sql and "EXISTS (SELECT payments.id" in sales_sql and "GROUP BY orders.school_id, day, order_items.product_id" in sales_sql
+    assert "date(timezone(" in cancellations_sql and "orders.updated_at" in cancellations_sql
+    db.commit.assert_awaited_once()
@@ -0,0 +1,199 @@
+"""
+Unit tests for the stock reservation engine.
+
+Stock must be taken by conditional decrements in ascending product order, a
+lost race must reject the checkout, and held units must go back to stock (with
+the order cancelled) when the payment fails or the hold expires, but never once
+the payment has been captured.
+"""
+
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import write_tracking
+from app.schemas.enums import OrderStatus, PaymentStatus
+from app.services import payment_reconciliation_service, stock_reservation_service, webhook_queue_service
+from app.services.order_service import OrderService
+from app.services.stock_reservation_service import StockUnavailableError
+from tests.utils.db_mocks import compiled_sql, mock_db, rows_result, scalar_result
+
+pytestmark = pytest.mark.asyncio
+
+NOW = datetime(2026, 10, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _values_rows(statement) -> list[tuple]:
+    """The (product_id, quantity) rows of a restock statement's VALUES list."""
+    sql = str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    values_list = sql.split("FROM (VALUES ", 1)[1].split(") AS restock", 1)[0]
+    return [tuple(int(n) for n in row.strip("() ").split(", ")) for row in values_list.split("), (")]
+
+
+async def test_stock_is_taken_in_product_order_and_recorded_as_held():
+    db = mock_db(scalar_result(3), scalar_result(9), scalar_result(12))
+
+    reservations = await stock_reservation_service.reserve_stock(db, order_id=7, school_id=1, quantities={12: 1, 3: 2, 9: 5}, now=NOW)
+
+    decrements = [call.args[0] for call in db.execute.await_args_list]
+    assert [stmt.compile().params["product_id_1"] for stmt in decrements] == [3, 9, 12]
+    assert [stmt.compile().params["stock_quantity_1"] for stmt in decrements] == [2, 5, 1]
+    assert "products.is_active IS true" in compiled_sql(decrements[0]) and "FOR UPDATE" not in compiled_sql(decrements[0])
+    assert [(r.product_id, r.quantity, r.status, r.order_id) for r in reservations] == [(3, 2, "held", 7), (9, 5, "held", 7), (12, 1, "held", 7)]
+    assert reservations[0].expires_at == NOW + timedelta(minutes=stock_reservation_service.STOCK_RESERVATION_TTL_MINUTES)
+    db.add_all.assert_called_once_with(reservations)
+
+
+async def test_a_lost_race_stops_at_the_first_unavailable_product():
+    db = mock_db(scalar_result(3), scalar_result(None))
+
+    with pytest.raises(StockUnavailableError) as exc_info:
+        await stock_reservation_service.reserve_stock(db, order_id=7, school_id=1, quantities={3: 1, 9: 4, 12: 1})
+
+    assert (exc_info.value.product_id, exc_info.value.quantity) == (9, 4)
+    assert db.execute.await_count == 2
+    db.add_all.assert_not_called()
+
+
+def _statement_writes(statement) -> dict:
+    """The writes the commit-time tracking records for ``statement`` run through a session."""
+    session = SimpleNamespace(info={})
+    state = SimpleNamespace(is_insert=False, is_update=True, is_delete=False, statement=statement, execution_options=statement.get_execution_options(), session=session)
+    write_tracking._collect_statement_writes(state)
+    return session.info.get("pending_table_writes", {})
+
+
+async def test_stock_changes_mark_only_their_schools_products_as_written():
+    db = mock_db(scalar_result(3))
+    await stock_reservation_service.reserve_stock(db, order_id=7, school_id=4, quantities={3: 1})
+    # A checkout must not drop every school's cached catalog
+    assert _statement_writes(db.execute.await_args.args[0]) == {"products": {4}}
+
+    db = mock_db(rows_result([4, 7, 4]))
+    db.info = {}
+    await stock_reservation_service.restock(db, {3: 1, 12: 2})
+    restock_stmt = db.execute.await_args.args[0]
+    assert compiled_sql(restock_stmt).endswith("RETURNING products.school_id")
+    assert _statement_writes(restock_stmt) == {} and db.info["pending_table_writes"] == {"products": {4, 7}}
+
+
+async def test_checkout_that_loses_the_race_is_rejected_without_commit():
+    db = AsyncMock(spec=AsyncSession)
+    service = OrderService(db)
+    product_data = {9: {"name": "House T-Shirt (Blue)"}}
+
+    async def sold_out(*args, **kwargs):
+        raise StockUnavailableError(9, 2)
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(stock_reservation_service, "reserve_stock", sold_out)
+        with pytest.raises(HTTPException) as exc_info:
+            await service._reserve_stock(7, 1, {9: 2}, product_data, "Checkout validation failed")
+
+    assert exc_info.value.status_code == 400
+    assert "Insufficient stock for 'House T-Shirt (Blue)'" in exc_info.value.detail and "sold out" in exc_info.value.detail
+    db.flush.assert_awaited_once()  # everything else is written before product rows are locked
+    db.commit.assert_not_called()
+
+
+async def test_restock_is_one_statement_that_locks_products_in_order():
+    db = mock_db(MagicMock())
+
+    await stock_reservation_service.restock(db, {12: 5, 3: 2, 9: 0})
+
+    stmt = db.execute.await_args.args[0]
+    sql = compiled_sql(stmt)
+    assert sql.startswith("WITH locked_products AS") and "ORDER BY products.product_id FOR UPDATE" in sql
+    assert "UPDATE products SET stock_quantity=(products.stock_quantity + restock.quantity)" in sql and "FROM (VALUES " in sql
+    assert _values_rows(stmt) == [(3, 2), (12, 5)]  # zero quantities are dropped
+
+
+async def test_restock_of_nothing_runs_no_statement():
+    db = mock_db()
+
+    await stock_reservation_service.restock(db, {})
+
+    db.execute.assert_not_called()
+
+
+async def test_restore_puts_back_held_units_and_the_items_of_orders_without_a_hold():
+    db = mock_db(rows_result([(7, 12, 1), (7, 3, 2)]), rows_result([(3, 1), (16, 4)]), MagicMock())
+
+    units = await stock_reservation_service.restore_stock(db, [7, 8], now=NOW)
+
+    release, items, restock = db.execute.await_args_list
+    assert "RETURNING stock_reservations.order_id" in compiled_sql(release.args[0])
+    items_sql = compiled_sql(items.args[0])
+    assert "sum(order_items.quantity)" in items_sql and "GROUP BY order_items.product_id" in items_sql
+    assert items.args[0].compile().params["order_id_1"] == [8]  # order 7 had a hold
+    assert _values_rows(restock.args[0]) == [(3, 3), (12, 1), (16, 4)]
+    assert units == 8
+
+
+async def test_release_cancels_unpaid_orders_first_and_restocks_in_product_order():
+    db = mock_db(rows_result([7, 8]), rows_result([(7, 12, 1), (7, 3, 2), (8, 12, 4)]), MagicMock())
+
+    units = await stock_reservation_service.release_reservations(db, [7, 8, 9], cancel_orders=True, now=NOW)
+
+    cancel, release, restock = db.execute.await_args_list
+    cancel_sql = compiled_sql(cancel.args[0])
+    assert cancel_sql.startswith("UPDATE orders SET status=") and "orders.status = " in cancel_sql and "RETURNING orders.order_id" in cancel_sql
+    assert release.args[0].compile().params["order_id_1"] == [7, 8]  # only the orders that were actually cancelled
+    assert "stock_reservations.status = " in compiled_sql(release.args[0])
+    assert _values_rows(restock.args[0]) == [(3, 2), (12, 5)]
+    assert units == 7
+
+
+async def test_release_touches_nothing_once_the_orders_are_paid():
+    db = mock_db(rows_result([]))
+
+    assert await stock_reservation_service.release_reservations(db, [7], cancel_orders=True) == 0
+    assert db.execute.await_count == 1
+
+
+async def test_expired_holds_of_unpaid_orders_are_swept_with_skip_locked():
+    db = mock_db(rows_result([7]), rows_result([7]), rows_result([(7, 3, 1)]), MagicMock())
+
+    summary = await stock_reservation_service.release_expired_reservations(db, now=NOW)
+
+    sweep = compiled_sql(db.execute.await_args_list[0].args[0])
+    assert "stock_reservations.expires_at <= " in sweep and "NOT (EXISTS" in sweep and "payments.status IN" in sweep
+    assert "FOR UPDATE SKIP LOCKED" in sweep
+    # A payment still pending at the gateway may be captured: its order is left to the reconciler
+    excluded = db.execute.await_args_list[0].args[0].compile().params["status_3"]
+    assert PaymentStatus.PENDING.value in excluded and PaymentStatus.CAPTURED.value in excluded
+    assert summary == {"orders_expired": 1, "units_released": 1}
+
+
+async def test_reconciler_releases_orders_whose_payment_failed():
+    payment = SimpleNamespace(
+        id=1, status=PaymentStatus.AUTHORIZED, created_at=NOW - timedelta(days=10), school_id=1, order_id=77, invoice_id=None, gateway_payment_id="pay_1", gateway_order_id=None, amount_paid=Decimal("500.00"), user_id="u", error_description=None
+    )
+    db = mock_db(rows_result([payment]), rows_result([77]), rows_result([(77, 16, 2)]), MagicMock())
+
+    run = await payment_reconciliation_service.reconcile_authorized(db)
+
+    assert (run.outcomes["expired"], payment.status) == (1, PaymentStatus.FAILED)
+    assert db.execute.await_args_list[1].args[0].compile().params["order_id_1"] == [77]
+    assert _values_rows(db.execute.await_args_list[3].args[0]) == [(16, 2)]
+    assert db.commit.await_count == 2  # the batch, then the run's record
+
+
+async def test_late_capture_leaves_a_cancelled_order_alone_and_flags_the_payment_for_refund():
+    payment = SimpleNamespace(id=1, status="pending", order_id=9, invoice_id=None, gateway_payment_id=None, user_id="u")
+    # The hold-expiry sweep cancelled the order while the capture waited on its row lock
+    db = mock_db(scalar_result(payment), scalar_result(None), scalar_result(OrderStatus.CANCELLED))
+
+    await webhook_queue_service._apply_capture(db, {"id": "pay_1", "order_id": "order_1"})
+
+    confirm = str(db.execute.await_args_list[1].args[0].compile(dialect=postgresql.dialect()))
+    assert "WHERE orders.order_id = " in confirm and "orders.status = " in confirm  # never overwrites the cancellation
+    assert (payment.status, payment.gateway_payment_id) == (PaymentStatus.CAPTURED_ALLOCATION_FAILED, "pay_1")
+    assert "in status 'cancelled'; refund required" in payment.error_description
+    assert db.execute.await_count == 3  # no reservation is committed for it
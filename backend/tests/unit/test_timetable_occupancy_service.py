@@ -0,0 +1,169 @@
+"""
+Unit tests for the per-school timetable occupancy index.
+
+Covers building the index from query rows, free-teacher lookups as a set
+difference, current-slot resolution, invalidation on committed writes and the
+index-backed timetable agent tools.
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.agents.modules.academics.leaves.timetable_agent.tools import find_current_period_for_class, find_free_teachers, get_class_timetable, get_teacher_timetable
+from app.agents.tool_context import ToolRuntimeContext, use_tool_context
+from app.db.write_tracking import notify_tables_committed
+from app.services import timetable_occupancy_service
+from app.services.timetable_occupancy_service import TimetableOccupancy, build_occupancy, day_number, get_occupancy, invalidate_occupancy
+
+# (entry_id, day, period_number, period_id, start, end, class_id, subject_id, teacher_id)
+SLOT_ROWS = [
+    (1, 1, 1, 11, time(9, 0), time(9, 45), 100, 7, 1),
+    (2, 1, 2, 12, time(9, 45), time(10, 30), 100, 8, 2),
+    (3, 1, 1, 11, time(9, 0), time(9, 45), 101, 8, 2),
+    (4, 2, 3, 13, time(10, 45), time(11, 30), 100, 9, 3),
+]
+TEACHER_ROWS = [
+    (1, "Meera", "Krishnan", "Mathematics", "Algebra"),
+    (2, "Ravi", "Kumar", "Science", None),
+    (3, "Anita", "Rao", "English", None),
+    (4, "Ravi", "Shankar", "Physical Education", None),
+]
+SUBJECT_ROWS = [(7, "Mathematics"), (8, "Science"), (9, "English")]
+CLASS_ROWS = [(100, 10, "A"), (101, 10, "B")]
+
+
+def _result(rows):
+    result = MagicMock()
+    result.all.return_value = rows
+    return result
+
+
+def _mock_db():
+    db = AsyncMock()
+    db.execute.side_effect = lambda *args, **kwargs: _result({0: SLOT_ROWS, 1: TEACHER_ROWS, 2: SUBJECT_ROWS, 3: CLASS_ROWS}[db.execute.await_count - 1])
+    return db
+
+
+@pytest.fixture(autouse=True)
+def _clear_indexes():
+    invalidate_occupancy()
+    yield
+    invalidate_occupancy()
+
+
+@pytest.fixture
+def occupancy():
+    return asyncio.run(build_occupancy(_mock_db(), school_id=1))
+
+
+def test_build_occupancy_indexes_busy_teachers_per_slot(occupancy: TimetableOccupancy):
+    assert occupancy.busy_teachers[(1, 1)] == frozenset({1, 2})
+    assert occupancy.busy_teachers[(2, 3)] == frozenset({3})
+    assert occupancy.classes == {100: "10A", 101: "10B"}
+    assert occupancy.period_numbers == (1, 2, 3)
+    assert [slot.entry_id for slot in occupancy.class_schedule(100)] == [1, 2, 4]
+    assert [slot.entry_id for slot in occupancy.teacher_schedule(2, 1)] == [2, 3]
+
+
+def test_free_teachers_is_a_set_difference(occupancy: TimetableOccupancy):
+    assert [teacher.name for teacher in occupancy.free_teachers(1, 1)] == ["Anita Rao", "Ravi Shankar"]
+    assert len(occupancy.free_teachers(5, 1)) == 4
+
+
+def test_slot_at_resolves_the_running_period(occupancy: TimetableOccupancy):
+    monday = datetime(2025, 11, 10, 9, 50)
+
+    assert occupancy.slot_at(100, monday).entry_id == 2
+    assert occupancy.slot_at(100, monday.replace(hour=13)) is None
+    assert occupancy.slot_at(101, monday) is None
+
+
+def test_name_lookups(occupancy: TimetableOccupancy):
+    assert occupancy.find_class_id("Grade 10 A") == 100
+    assert occupancy.find_class_id("10-b") == 101
+    assert occupancy.find_class_id("9A") is None
+    assert [teacher.teacher_id for teacher in occupancy.find_teachers("Dr. Meera Krishnan")] == [1]
+    assert [teacher.teacher_id for teacher in occupancy.find_teachers("ravi")] == [2, 4]
+    assert day_number("tue") == 2
+    assert day_number("Funday") is None
+
+
+@pytest.mark.asyncio
+async def test_get_occupancy_is_cached_until_a_timetable_write_commits():
+    db = _mock_db()
+
+    first = await get_occupancy(db, 1)
+    assert await get_occupancy(db, 1) is first
+    assert db.execute.await_count == 4
+
+    notify_tables_committed({"attendance_records": {1}})
+    assert await get_occupancy(db, 1) is first
+
+    notify_tables_committed({"timetable": {2}})
+    assert await get_occupancy(db, 1) is first
+
+    notify_tables_committed({"timetable": {1}})
+    db.execute.reset_mock()
+    assert await get_occupancy(db, 1) is not first
+
+
+@pytest.mark.asyncio
+async def test_get_occupancy_does_not_cache_a_snapshot_raced_by_a_write():
+    async def build_during_write(db, school_id):
+        invalidate_occupancy(school_id)
+        return TimetableOccupancy(school_id=school_id)
+
+    with patch.object(timetable_occupancy_service, "build_occupancy", side_effect=build_during_write) as mock_build:
+        await get_occupancy(AsyncMock(), 1)
+        await get_occupancy(AsyncMock(), 1)
+
+    assert mock_build.await_count == 2
+
+
+def _tool_context():
+    profile = SimpleNamespace(user_id=uuid.uuid4(), school_id=1, roles=[])
+    return use_tool_context(ToolRuntimeContext(db=AsyncMock(), current_profile=profile))
+
+
+@pytest.mark.asyncio
+async def test_timetable_tools_answer_from_the_index(occupancy: TimetableOccupancy):
+    with _tool_context(), patch.object(timetable_occupancy_service, "get_occupancy", AsyncMock(return_value=occupancy)):
+        free = await find_free_teachers.ainvoke({"day_of_week": "Monday", "period_number": 1})
+        invalid_period = await find_free_teachers.ainvoke({"day_of_week": "Monday", "period_number": 6})
+        class_day = await get_class_timetable.ainvoke({"class_name": "10A", "day_of_week": "Monday"})
+        class_week = await get_class_timetable.ainvoke({"class_name": "10A"})
+        teacher = await get_teacher_timetable.ainvoke({"teacher_name": "Ravi Kumar", "day_of_week": "Monday"})
+        ambiguous = await get_teacher_timetable.ainvoke({"teacher_name": "Ravi"})
+        missing = await get_class_timetable.ainvoke({"class_name": "12C"})
+
+    assert free["total_free_teachers"] == 2
+    assert [entry["teacher_name"] for entry in free["free_teachers"]] == ["Anita Rao", "Ravi Shankar"]
+    assert invalid_period["status"] == "error"
+    assert class_day["schedule"][1] == {"period": 2, "start_time": "09:45", "end_time": "10:30", "subject": "Science", "teacher": "Ravi Kumar"}
+    assert class_week["total_days"] == 2
+    assert teacher["total_periods"] == 2 and teacher["free_periods"] == 1
+    assert ambiguous["status"] == "ambiguous"
+    assert missing["status"] == "not_found"
+
+
+@pytest.mark.asyncio
+async def test_find_current_period_reports_the_running_slot(occupancy: TimetableOccupancy):
+    monday = datetime(2025, 11, 10, 10, 0)
+    with _tool_context(), patch.object(timetable_occupancy_service, "get_occupancy", AsyncMock(return_value=occupancy)), patch("app.agents.modules.academics.leaves.timetable_agent.tools.datetime") as mock_datetime:
+        mock_datetime.now.return_value = monday
+        current = await find_current_period_for_class.ainvoke({"class_name": "10A"})
+
+    assert current["is_class_time"] is True
+    assert current["current_period"] == 2
+    assert current["teacher"] == "Ravi Kumar"
+
+
+@pytest.mark.asyncio
+async def test_timetable_tools_require_a_tool_context():
+    result = await find_free_teachers.ainvoke({"day_of_week": "Monday", "period_number": 1})
+    assert result["status"] == "context_unavailable"
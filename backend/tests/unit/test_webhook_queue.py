@@ -0,0 +1,127 @@
+"""
+Unit tests for two-phase webhook handling.
+
+Phase one (PaymentService.handle_webhook_event) must only verify and queue;
+phase two (webhook_queue_service) claims queued events without reordering a
+payment's events and applies them under the payment row lock.
+"""
+
+import hashlib
+import hmac
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import BackgroundTasks, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1.endpoints import webhooks
+from app.services import razorpay_gateway, webhook_queue_service
+from app.services.payment_service import PaymentService
+from tests.utils.db_mocks import compiled_sql, scalar_result
+
+pytestmark = pytest.mark.asyncio
+
+SECRET = "whsec_test"
+
+
+def _payload(gateway_order_id: str = "order_1", payment_id: str = "pay_1") -> dict:
+    return {"event": "payment.captured", "created_at": 1760000000, "payload": {"payment": {"entity": {"id": payment_id, "order_id": gateway_order_id, "notes": {}}}}}
+
+
+def _signed(payload: dict) -> tuple[bytes, str]:
+    raw_body = json.dumps(payload).encode()
+    return raw_body, hmac.new(SECRET.encode(), raw_body, hashlib.sha256).hexdigest()
+
+
+@pytest.fixture
+def credentials():
+    with patch.object(razorpay_gateway, "get_school_credentials", AsyncMock(return_value=SimpleNamespace(webhook_secret=SECRET))) as mock_credentials:
+        yield mock_credentials
+
+
+async def test_phase_one_verifies_and_queues_without_touching_the_payment(credentials):
+    db = AsyncMock(spec=AsyncSession)
+    db.execute = AsyncMock(side_effect=[scalar_result(4), scalar_result(77)])
+    payload = _payload()
+    raw_body, signature = _signed(payload)
+
+    queued = await PaymentService(db).handle_webhook_event(payload=payload, raw_body=raw_body, signature=signature)
+
+    assert queued is True
+    credentials.assert_awaited_once_with(db, 4)
+    lookup, insert = (call.args[0] for call in db.execute.await_args_list)
+    assert "FOR UPDATE" not in compiled_sql(lookup)
+    assert "ON CONFLICT (event_id) DO NOTHING" in compiled_sql(insert)
+    assert insert.compile().params["status"] == "received"
+    db.commit.assert_awaited_once()
+
+
+async def test_phase_one_duplicate_delivery_is_not_queued_again(credentials):
+    db = AsyncMock(spec=AsyncSession)
+    db.execute = AsyncMock(side_effect=[scalar_result(4), scalar_result(None)])  # ON CONFLICT DO NOTHING returns no row
+    payload = _payload()
+    raw_body, signature = _signed(payload)
+
+    assert await PaymentService(db).handle_webhook_event(payload=payload, raw_body=raw_body, signature=signature) is False
+
+
+async def test_phase_one_rejects_a_forged_signature_without_storing_it(credentials):
+    db = AsyncMock(spec=AsyncSession)
+    db.execute = AsyncMock(side_effect=[scalar_result(4)])
+    payload = _payload()
+    raw_body, _ = _signed(payload)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await PaymentService(db).handle_webhook_event(payload=payload, raw_body=raw_body, signature="forged")
+
+    assert exc_info.value.status_code == 400
+    assert db.execute.await_count == 1
+    db.commit.assert_not_called()
+
+
+async def test_endpoint_acknowledges_and_schedules_the_consumer():
+    payload = _payload()
+    raw_body, signature = _signed(payload)
+    request = MagicMock(headers={}, client=SimpleNamespace(host="1.2.3.4"), state=SimpleNamespace(raw_body=raw_body))
+    request.json = AsyncMock(return_value=payload)
+    service = MagicMock()
+    service.handle_webhook_event = AsyncMock(return_value=True)
+    background_tasks = BackgroundTasks()
+
+    response = await webhooks.handle_razorpay_webhook(request=request, background_tasks=background_tasks, x_razorpay_signature=signature, service=service)
+
+    assert response == {"status": "ok"}
+    assert [task.func for task in background_tasks.tasks] == [webhook_queue_service.run_webhook_consumer]
+
+
+def _event(event_id: int, gateway_order_id: str) -> SimpleNamespace:
+    return SimpleNamespace(id=event_id, event_id=f"payment.captured_pay_{event_id}", payload=_payload(gateway_order_id, f"pay_{event_id}"), status="received", processing_error=None, received_at=datetime.now(timezone.utc))
+
+
+async def test_consumer_claims_in_order_per_payment_and_applies_captures():
+    db = AsyncMock(spec=AsyncSession)
+    order_payment = SimpleNamespace(id=1, status="pending", order_id=9, invoice_id=None, gateway_payment_id=None, user_id="u")
+    events = [_event(1, "order_1"), _event(2, "order_missing")]
+    claimed = MagicMock()
+    claimed.scalars.return_value.all.return_value = events
+    empty = MagicMock()
+    empty.scalars.return_value.all.return_value = []
+    # event 1: the payment, the order confirmed, its reservations and sales rollup; event 2: no payment
+    db.execute = AsyncMock(side_effect=[claimed, scalar_result(order_payment), scalar_result(9), MagicMock(), MagicMock(), scalar_result(None), empty])
+
+    summary = await webhook_queue_service.process_webhook_queue(db)
+
+    claim = compiled_sql(db.execute.await_args_list[0].args[0])
+    assert "FOR UPDATE SKIP LOCKED" in claim and "NOT (EXISTS" in claim and "ORDER BY gateway_webhook_events.id" in claim
+    assert "FOR UPDATE" in compiled_sql(db.execute.await_args_list[1].args[0])
+    confirm = compiled_sql(db.execute.await_args_list[2].args[0])
+    assert confirm.startswith("UPDATE orders SET status=") and "orders.status = " in confirm and "RETURNING orders.order_id" in confirm
+    assert "UPDATE stock_reservations" in compiled_sql(db.execute.await_args_list[3].args[0])
+    assert (order_payment.status, order_payment.gateway_payment_id) == ("captured", "pay_1")
+    assert [event.status for event in events] == ["processed", "failed"]
+    assert "order_missing" in events[1].processing_error
+    assert (summary["processed"], summary["failed"], summary["batches"]) == (1, 1, 1)
+    db.commit.assert_awaited_once()
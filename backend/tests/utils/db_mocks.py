@@ -0,0 +1,58 @@
+"""
+Mocked ``AsyncSession`` and query results for the service unit tests.
+
+A test queues, in order, the results the code under test gets from
+``db.execute``, then checks the statements it was called with, compiled for
+PostgreSQL::
+
+    db = mock_db(rows_result([(7, "TIE")]), scalar_result(None))
+    await service.do_something(db)
+    assert "FOR UPDATE" in compiled_sql(db.execute.await_args_list[0].args[0])
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+__all__ = ["compiled_sql", "mock_db", "rows_result", "scalar_result"]
+
+
+def mock_db(*results: Any) -> AsyncMock:
+    """An ``AsyncSession`` whose ``execute`` returns ``results`` one call at a time."""
+    db = AsyncMock(spec=AsyncSession)
+    db.execute = AsyncMock(side_effect=list(results))
+    # Synchronous on a real session
+    db.add = MagicMock()
+    db.add_all = MagicMock()
+    db.expunge = MagicMock()
+    return db
+
+
+def rows_result(rows: Sequence = (), *, rowcount: int | None = None) -> MagicMock:
+    """A result that yields ``rows`` from ``all()``/``first()``, and from ``scalars()`` the same way."""
+    result = MagicMock()
+    result.all.return_value = list(rows)
+    result.first.return_value = rows[0] if rows else None
+    result.scalars.return_value.all.return_value = list(rows)
+    result.scalars.return_value.first.return_value = rows[0] if rows else None
+    if rowcount is not None:
+        result.rowcount = rowcount
+    return result
+
+
+def scalar_result(value: Any) -> MagicMock:
+    """A result holding one value (``scalar``, ``scalar_one``, ``scalar_one_or_none``)."""
+    result = MagicMock()
+    result.scalar.return_value = value
+    result.scalar_one.return_value = value
+    result.scalar_one_or_none.return_value = value
+    return result
+
+
+def compiled_sql(statement: Any) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
@@ -0,0 +1,207 @@
+"""
+In-memory fake of the Razorpay REST API used by the payment gateway tests.
+
+Implements the endpoints RazorpayGateway calls (orders, order payments, payment
+listing/fetch/capture/refund, refund listing) with Razorpay's error envelope and basic auth. Tests mount
+``FakeRazorpay().app`` with ``httpx.ASGITransport``; it can also be served
+locally for manual runs:
+
+    python -m tests.utils.fake_razorpay --port 9010
+    RAZORPAY_API_URL=http://127.0.0.1:9010/v1 uvicorn app.main:app
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import itertools
+import time
+from typing import Any
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+__all__ = ["FakeRazorpay"]
+
+
+def _error(status_code: int, code: str, description: str) -> JSONResponse:
+    return JSONResponse(status_code=status_code, content={"error": {"code": code, "description": description}})
+
+
+class FakeRazorpay:
+    """State and ASGI app of one fake Razorpay account."""
+
+    def __init__(self, key_id: str = "rzp_test_fake", key_secret: str = "fake_secret"):
+        self.key_id = key_id
+        self.key_secret = key_secret
+        self.orders: dict[str, dict] = {}
+        self.payments: dict[str, dict] = {}
+        self.refunds: dict[str, dict] = {}
+        self.requests: list[tuple[str, str]] = []
+        # Status codes returned (with a SERVER_ERROR body) before the next requests are handled.
+        self.fail_next: list[int] = []
+        self.latency_seconds = 0.0
+        self._ids = itertools.count(1)
+        self.app = self._build_app()
+
+    def _new_id(self, prefix: str) -> str:
+        return f"{prefix}_FAKE{next(self._ids):010d}"
+
+    def signature(self, order_id: str, payment_id: str) -> str:
+        """The checkout signature Razorpay would hand to the frontend."""
+        return hmac.new(self.key_secret.encode(), f"{order_id}|{payment_id}".encode(), hashlib.sha256).hexdigest()
+
+    def add_payment(self, order_id: str, *, status: str = "captured", amount: int | None = None, method: str = "upi") -> dict:
+        """Simulate a customer paying (or attempting to pay) an order."""
+        order = self.orders[order_id]
+        payment = {
+            "id": self._new_id("pay"),
+            "entity": "payment",
+            "order_id": order_id,
+            "amount": amount if amount is not None else order["amount"],
+            "currency": order["currency"],
+            "status": status,
+            "method": method,
+            "captured": status == "captured",
+            "amount_refunded": 0,
+            "notes": order["notes"],
+            "created_at": int(time.time()),
+        }
+        self.payments[payment["id"]] = payment
+        order["attempts"] += 1
+        if status == "captured":
+            order["status"] = "paid"
+            order["amount_paid"] = payment["amount"]
+        elif order["status"] == "created":
+            order["status"] = "attempted"
+        return payment
+
+    def _authorized(self, request: Request) -> bool:
+        header = request.headers.get("authorization", "")
+        if not header.startswith("Basic "):
+            return False
+        key_id, _, key_secret = base64.b64decode(header[6:]).decode().partition(":")
+        return key_id == self.key_id and key_secret == self.key_secret
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI(title="Fake Razorpay")
+
+        @app.middleware("http")
+        async def record_and_fail(request: Request, call_next):
+            self.requests.append((request.method, request.url.path))
+            if self.latency_seconds:
+                await asyncio.sleep(self.latency_seconds)
+            if self.fail_next:
+                return _error(self.fail_next.pop(0), "SERVER_ERROR", "The server encountered an error. The incident has been reported to admins")
+            if not self._authorized(request):
+                return _error(401, "BAD_REQUEST_ERROR", "Authentication failed")
+            return await call_next(request)
+
+        @app.post("/v1/orders")
+        async def create_order(request: Request):
+            data: dict[str, Any] = await request.json()
+            amount = data.get("amount")
+            if not isinstance(amount, int) or amount < 100:
+                return _error(400, "BAD_REQUEST_ERROR", "The amount must be atleast INR 1.00")
+            order = {
+                "id": self._new_id("order"),
+                "entity": "order",
+                "amount": amount,
+                "amount_paid": 0,
+                "currency": data.get("currency", "INR"),
+                "receipt": data.get("receipt"),
+                "status": "created",
+                "attempts": 0,
+                "notes": data.get("notes") or {},
+                "created_at": int(time.time()),
+            }
+            self.orders[order["id"]] = order
+            return order
+
+        @app.get("/v1/orders/{order_id}")
+        async def fetch_order(order_id: str):
+            if order_id not in self.orders:
+                return _error(400, "BAD_REQUEST_ERROR", "The id provided does not exist")
+            return self.orders[order_id]
+
+        @app.get("/v1/orders/{order_id}/payments")
+        async def fetch_order_payments(order_id: str):
+            if order_id not in self.orders:
+                return _error(400, "BAD_REQUEST_ERROR", "The id provided does not exist")
+            items = [payment for payment in self.payments.values() if payment["order_id"] == order_id]
+            return {"entity": "collection", "count": len(items), "items": items}
+
+        @app.get("/v1/payments")
+        async def list_payments(request: Request):
+            query = request.query_params
+            since, until = int(query.get("from", 0)), int(query.get("to", 2**31))
+            count, skip = min(int(query.get("count", 10)), 100), int(query.get("skip", 0))
+            # Newest first, like Razorpay
+            items = sorted((payment for payment in self.payments.values() if since <= payment["created_at"] <= until), key=lambda payment: payment["created_at"], reverse=True)[skip : skip + count]
+            return {"entity": "collection", "count": len(items), "items": items}
+
+        @app.get("/v1/payments/{payment_id}")
+        async def fetch_payment(payment_id: str):
+            if payment_id not in self.payments:
+                return _error(400, "BAD_REQUEST_ERROR", "The id provided does not exist")
+            return self.payments[payment_id]
+
+        @app.post("/v1/payments/{payment_id}/capture")
+        async def capture_payment(payment_id: str, request: Request):
+            payment = self.payments.get(payment_id)
+            if payment is None:
+                return _error(400, "BAD_REQUEST_ERROR", "The id provided does not exist")
+            data = await request.json()
+            if payment["status"] == "captured":
+                return _error(400, "BAD_REQUEST_ERROR", "This payment has already been captured")
+            if payment["status"] != "authorized":
+                return _error(400, "BAD_REQUEST_ERROR", "Only payments which have been authorized and not yet captured can be captured")
+            if data.get("amount") != payment["amount"]:
+                return _error(400, "BAD_REQUEST_ERROR", "Capture amount must be equal to the amount authorized")
+            payment.update(status="captured", captured=True)
+            order = self.orders[payment["order_id"]]
+            order.update(status="paid", amount_paid=payment["amount"])
+            return payment
+
+        @app.get("/v1/payments/{payment_id}/refunds")
+        async def list_payment_refunds(payment_id: str, request: Request):
+            if payment_id not in self.payments:
+                return _error(400, "BAD_REQUEST_ERROR", "The id provided does not exist")
+            count, skip = min(int(request.query_params.get("count", 10)), 100), int(request.query_params.get("skip", 0))
+            items = [refund for refund in self.refunds.values() if refund["payment_id"] == payment_id][skip : skip + count]
+            return {"entity": "collection", "count": len(items), "items": items}
+
+        @app.post("/v1/payments/{payment_id}/refund")
+        async def refund_payment(payment_id: str, request: Request):
+            payment = self.payments.get(payment_id)
+            if payment is None:
+                return _error(400, "BAD_REQUEST_ERROR", "The id provided does not exist")
+            if payment["status"] not in ("captured", "refunded"):
+                return _error(400, "BAD_REQUEST_ERROR", "The payment has not been captured")
+            data = await request.json()
+            amount = data.get("amount", payment["amount"] - payment["amount_refunded"])
+            if amount > payment["amount"] - payment["amount_refunded"]:
+                return _error(400, "BAD_REQUEST_ERROR", "The refund amount provided is greater than amount captured")
+            refund = {"id": self._new_id("rfnd"), "entity": "refund", "payment_id": payment_id, "amount": amount, "currency": payment["currency"], "notes": data.get("notes") or {}, "status": "processed", "created_at": int(time.time())}
+            self.refunds[refund["id"]] = refund
+            payment["amount_refunded"] += amount
+            if payment["amount_refunded"] == payment["amount"]:
+                payment["status"] = "refunded"
+            return refund
+
+        return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve a fake Razorpay API for local testing.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9010)
+    parser.add_argument("--key-id", default="rzp_test_fake")
+    parser.add_argument("--key-secret", default="fake_secret")
+    args = parser.parse_args()
+    uvicorn.run(FakeRazorpay(key_id=args.key_id, key_secret=args.key_secret).app, host=args.host, port=args.port)